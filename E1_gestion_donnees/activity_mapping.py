@@ -0,0 +1,167 @@
+"""
+Correspondance déclarative entre les activités brutes Garmin et les champs stockés
+
+ACTIVITY_FIELDS décrit une seule fois chaque champ : chemin dans l'activité
+Garmin, colonne de la table E1 activities, champ(s) du modèle Django
+Activity, type et valeur par défaut. Le stockage E1 (process_garmin_activities)
+et le stockage Django (activities.ingestion.activity_values_from_frame)
+lisent la même table.
+
+normalize_activities la compile en un traitement par colonnes : projection
+des seules clés utiles (DataFrame.from_records), aplatissement des objets
+imbriqués (pd.json_normalize), conversion de type colonne par colonne et une
+seule analyse des dates par tranche. Un flux est lu par tranches de
+NORMALIZE_CHUNK_SIZE activités sans être matérialisé en entier ; les
+DataFrames des tranches sont concaténés. Une valeur numérique illisible
+rejette l'activité ; une date illisible est laissée vide.
+"""
+
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+NORMALIZE_CHUNK_SIZE = 5000  # activités brutes par tranche de normalize_activities
+
+
+class FieldSpec(NamedTuple):
+    name: str                     # colonne E1 (table activities)
+    source: str                   # chemin dans l'activité Garmin, '.' pour les objets imbriqués
+    dtype: str                    # 'int', 'float', 'str' ou 'datetime'
+    default: Any = None           # valeur si absente
+    django: Tuple[str, ...] = ()  # champs du modèle Django Activity
+    e1: bool = True               # colonne de la table E1 activities
+
+
+ACTIVITY_FIELDS: Tuple[FieldSpec, ...] = (
+    FieldSpec("activity_id", "activityId", "int", django=("activity_id", "garmin_id")),
+    FieldSpec("activity_name", "activityName", "str", django=("activity_name",)),
+    FieldSpec("activity_type", "activityType.typeKey", "str", django=("activity_type",)),
+    FieldSpec("start_time", "startTimeLocal", "datetime", django=("start_time",)),
+    FieldSpec("end_time", "endTimeLocal", "datetime", django=("end_time",), e1=False),
+    FieldSpec("distance_meters", "distance", "float", 0.0, django=("distance_meters",)),
+    FieldSpec("duration_seconds", "duration", "float", 0.0, django=("duration_seconds",)),
+    FieldSpec("average_speed", "averageSpeed", "float", django=("average_speed",)),
+    FieldSpec("max_speed", "maxSpeed", "float", django=("max_speed",)),
+    FieldSpec("calories", "calories", "float", 0.0, django=("calories",)),
+    FieldSpec("average_hr", "averageHR", "float", django=("average_hr",)),
+    FieldSpec("max_hr", "maxHR", "float", django=("max_hr",)),
+    FieldSpec("elevation_gain", "elevationGain", "float", 0.0, django=("elevation_gain",)),
+    FieldSpec("elevation_loss", "elevationLoss", "float", 0.0, django=("elevation_loss",)),
+    FieldSpec("start_latitude", "startLatitude", "float", django=("start_latitude",)),
+    FieldSpec("start_longitude", "startLongitude", "float", django=("start_longitude",)),
+    FieldSpec("device_name", "deviceName", "str", django=("device_name",)),
+    FieldSpec("steps", "steps", "int", django=("steps",)),
+    FieldSpec("average_running_cadence", "averageRunningCadenceInStepsPerMinute", "float", django=("average_cadence",)),
+    FieldSpec("max_running_cadence", "maxRunningCadenceInStepsPerMinute", "float", django=("max_cadence",)),
+    FieldSpec("stride_length", "avgStrideLength", "float", django=("stride_length",)),
+    FieldSpec("vo2max_estime", "vO2MaxValue", "float", django=("vo2_max",)),
+    FieldSpec("training_load", "activityTrainingLoad", "float", django=("training_load",)),
+    FieldSpec("aerobic_effect", "aerobicTrainingEffect", "float", django=("aerobic_effect",)),
+    FieldSpec("anaerobic_effect", "anaerobicTrainingEffect", "float", django=("anaerobic_effect",)),
+    FieldSpec("temp_min", "minTemperature", "float"),
+    FieldSpec("temp_max", "maxTemperature", "float"),
+    FieldSpec("fastest_split_5000", "fastestSplit_5000", "float", django=("fastest_5k",)),
+    FieldSpec("fastest_split_10000", "fastestSplit_10000", "float", django=("fastest_10k",)),
+    # Temps en zone en secondes, comme les champs hr_zone_N_time du modèle Django
+    *(FieldSpec(f"hr_zone_{n}", f"hrTimeInZone_{n}", "float", django=(f"hr_zone_{n}_time",)) for n in range(1, 6)),
+)
+
+# Colonnes de process_garmin_activities (table E1 activities)
+E1_COLUMNS: List[str] = ["user_id", *[spec.name for spec in ACTIVITY_FIELDS if spec.e1], "created_timestamp"]
+
+
+def _cast(values: pd.Series, dtype: str) -> pd.Series:
+    if dtype == "float":
+        return pd.to_numeric(values, errors="coerce").astype("float64")
+    if dtype == "int":
+        return pd.to_numeric(values, errors="coerce").round().astype("Int64")
+    if dtype == "datetime":
+        # Une seule analyse pour tout le lot ('AAAA-MM-JJ HH:MM:SS' de Garmin ou ISO 8601)
+        return pd.to_datetime(values, format="ISO8601", errors="coerce")
+    return values.astype(object).where(values.notna(), None)
+
+
+def _normalize_chunk(activities: List[Dict[str, Any]], fields: Tuple[FieldSpec, ...]) -> Tuple[pd.DataFrame, int]:
+    """Normalise une tranche d'activités ; renvoie les lignes valides et le nombre de rejets"""
+    top_keys = list(dict.fromkeys(spec.source.split(".", 1)[0] for spec in fields))
+    raw = pd.DataFrame.from_records(activities, columns=top_keys) if activities else pd.DataFrame(columns=top_keys)
+
+    nested: Dict[str, pd.DataFrame] = {}
+    for prefix in {spec.source.split(".", 1)[0] for spec in fields if "." in spec.source}:
+        objects = [value if isinstance(value, dict) else {} for value in raw[prefix]]
+        nested[prefix] = pd.json_normalize(objects) if objects else pd.DataFrame()
+
+    columns: Dict[str, pd.Series] = {}
+    invalid = pd.Series(False, index=raw.index)
+    for spec in fields:
+        if "." in spec.source:
+            prefix, path = spec.source.split(".", 1)
+            source = nested[prefix][path] if path in nested[prefix] else pd.Series(None, index=raw.index, dtype=object)
+            source.index = raw.index
+        else:
+            source = raw[spec.source]
+        values = _cast(source, spec.dtype)
+        if spec.dtype in ("int", "float"):
+            invalid |= source.notna() & values.isna()
+        if spec.default is not None:
+            values = values.fillna(spec.default)
+        columns[spec.name] = values
+
+    frame = pd.DataFrame(columns, index=raw.index)
+    return frame[~invalid], int(invalid.sum())
+
+
+def normalize_activities(activities: Iterable[Dict[str, Any]], user_id: Optional[int] = None,
+                         fields: Tuple[FieldSpec, ...] = ACTIVITY_FIELDS,
+                         chunk_size: int = NORMALIZE_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Normalise un lot d'activités brutes Garmin selon la table de correspondance
+
+    Args:
+        activities: Activités brutes Garmin (liste ou flux, ex. raw_archive.iter_raw_activities)
+        user_id: Utilisateur propriétaire (colonne user_id)
+        fields: Table de correspondance
+        chunk_size: Activités lues et normalisées par tranche
+
+    Returns:
+        pd.DataFrame: une ligne par activité valide, une colonne par champ, plus user_id
+            et created_timestamp ; attrs["rejected"] compte les activités rejetées
+    """
+    iterator = iter(activities)
+    frames: List[pd.DataFrame] = []
+    rejected = 0
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk and frames:
+            break
+        frame, chunk_rejected = _normalize_chunk(chunk, fields)
+        frames.append(frame)
+        rejected += chunk_rejected
+        if len(chunk) < chunk_size:
+            break
+
+    frame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    frame.insert(0, "user_id", user_id)
+    frame["created_timestamp"] = datetime.now()
+    if rejected:
+        log.warning(f"{rejected} activités rejetées (valeur numérique illisible).")
+    frame = frame.reset_index(drop=True)
+    frame.attrs["rejected"] = rejected
+    return frame
+
+
+def activity_records(frame: pd.DataFrame, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Lignes d'un DataFrame normalisé en dicts de types Python (None pour les valeurs absentes)"""
+    frame = frame if columns is None else frame[columns]
+    converted = {}
+    for name in frame.columns:
+        values = frame[name]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.Series(values.dt.to_pydatetime(), index=frame.index, dtype=object)
+        converted[name] = values.astype(object).where(values.notna(), None)
+    return pd.DataFrame(converted, index=frame.index).to_dict("records")
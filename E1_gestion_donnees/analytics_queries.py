@@ -0,0 +1,73 @@
+"""
+Requêtes analytiques exprimées une seule fois en SQLAlchemy Core
+
+Chaque requête est construite au chargement du module, avec des paramètres
+liés (bindparam) : aucune branche par dialecte ni SQL brut assemblé par
+f-string. SQLAlchemy compile la requête une fois par dialecte puis la sert
+depuis le cache de compilation du moteur (query_cache_size, DB_QUERY_CACHE_SIZE),
+seules les valeurs liées changeant d'un appel à l'autre.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+import sqlalchemy as sa
+
+# Table E1 activities (historique des prédictions)
+activities = sa.table(
+    "activities",
+    sa.column("user_id", sa.Integer), sa.column("distance_meters", sa.Float),
+    sa.column("duration_seconds", sa.Float), sa.column("average_hr", sa.Float),
+    sa.column("max_hr", sa.Integer), sa.column("training_load", sa.Float),
+    sa.column("start_time", sa.DateTime(timezone=True)),
+)
+
+# Table Django activities_activity (métriques de l'agent)
+django_activities = sa.table(
+    "activities_activity",
+    sa.column("user_id", sa.Integer), sa.column("distance_meters", sa.Float),
+    sa.column("duration_seconds", sa.Float), sa.column("average_hr", sa.Float),
+    sa.column("average_speed", sa.Float), sa.column("start_time", sa.DateTime(timezone=True)),
+)
+
+PREDICTION_HISTORY_LIMIT = 100
+RECENT_SUMMARY_DAYS = 90
+
+# 100 dernières sorties d'au moins 3 km et 10 minutes
+_a = activities.c
+PREDICTION_HISTORY = sa.select(
+    (_a.distance_meters / 1000.0).label("distance_km"),
+    (_a.duration_seconds / 60.0).label("duration_min"),
+    (_a.distance_meters / _a.duration_seconds * 3.6).label("pace_kmh"),
+    _a.average_hr,
+    _a.max_hr,
+    _a.training_load,
+    _a.start_time,
+).where(
+    _a.user_id == sa.bindparam("user_id", type_=sa.Integer),
+    _a.distance_meters >= 3000,
+    _a.duration_seconds > 600,
+).order_by(_a.start_time.desc()).limit(PREDICTION_HISTORY_LIMIT)
+
+# Synthèse des activités depuis :since (jour inclus)
+_d = django_activities.c
+RECENT_ACTIVITY_SUMMARY = sa.select(
+    sa.func.count().label("total_activities"),
+    sa.func.avg(_d.distance_meters / 1000.0).label("avg_distance_km"),
+    sa.func.avg(_d.duration_seconds / 60.0).label("avg_duration_min"),
+    sa.func.avg(_d.average_hr).label("avg_heart_rate"),
+    sa.func.max(_d.start_time).label("last_activity_date"),
+    sa.func.avg(_d.average_speed).label("avg_speed_kmh"),
+    sa.func.sum(_d.distance_meters / 1000.0).label("total_distance_km"),
+    sa.func.sum(_d.duration_seconds / 3600.0).label("total_duration_hours"),
+).where(
+    _d.user_id == sa.bindparam("user_id", type_=sa.Integer),
+    # Lié en Date : 'AAAA-MM-JJ' sous SQLite, comme l'ancien date('now', '-90 days')
+    _d.start_time >= sa.bindparam("since", type_=sa.Date),
+)
+
+
+def recent_summary_params(user_id: int, days: int = RECENT_SUMMARY_DAYS,
+                          today: Optional[date] = None) -> Dict[str, Any]:
+    """Paramètres de RECENT_ACTIVITY_SUMMARY : les `days` derniers jours"""
+    return {"user_id": user_id, "since": (today or date.today()) - timedelta(days=days)}
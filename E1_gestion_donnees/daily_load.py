@@ -0,0 +1,216 @@
+"""
+Table de synthèse daily_user_load (une ligne par utilisateur, jour et type d'activité)
+
+Les fenêtres de charge 7j/28j, l'ACWR (forme/fatigue) et les tendances sont
+lues sur cette table plutôt que recalculées depuis les activités brutes : leur
+coût dépend du nombre de jours de la fenêtre, plus de l'historique.
+La table est maintenue à l'écriture par store_activities_in_db : seuls les
+jours touchés par les nouvelles activités sont recalculés.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+import sqlalchemy as sa
+
+log = logging.getLogger(__name__)
+
+HR_ZONES = range(1, 6)
+
+daily_user_load = sa.Table(
+    "daily_user_load", sa.MetaData(),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id"), primary_key=True),
+    sa.Column("day", sa.Date, primary_key=True),
+    sa.Column("activity_type", sa.String(50), primary_key=True),
+    sa.Column("activity_count", sa.Integer, nullable=False, default=0),
+    sa.Column("distance_meters", sa.Float, nullable=False, default=0.0),
+    sa.Column("duration_seconds", sa.Float, nullable=False, default=0.0),
+    sa.Column("training_load", sa.Float, nullable=False, default=0.0),
+    sa.Column("calories", sa.Float, nullable=False, default=0.0),
+    # Somme et effectif pour recombiner des moyennes exactes sur plusieurs jours
+    sa.Column("average_hr_sum", sa.Float, nullable=False, default=0.0),
+    sa.Column("average_hr_count", sa.Integer, nullable=False, default=0),
+    sa.Column("max_distance_meters", sa.Float, nullable=False, default=0.0),
+    sa.Column("max_duration_seconds", sa.Float, nullable=False, default=0.0),
+    *[sa.Column(f"hr_zone_{zone}_seconds", sa.Float, nullable=False, default=0.0) for zone in HR_ZONES]
+)
+
+
+def activity_day_expression(start_time, dialect_name: str):
+    """Jour calendaire d'une activité, calculé côté base"""
+    if dialect_name == "sqlite":
+        # CAST(... AS DATE) n'existe pas en SQLite : date() renvoie 'AAAA-MM-JJ'
+        return sa.func.date(start_time, type_=sa.Date)
+    return sa.cast(start_time, sa.Date)
+
+
+def _as_day(value) -> Optional[date]:
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.to_datetime(value).date()
+
+
+def touched_days(activities: Iterable[Dict[str, Any]]) -> Dict[int, List[date]]:
+    """Jours modifiés par un lot d'activités, groupés par utilisateur"""
+    days: Dict[int, set] = {}
+    for activity in activities:
+        day = _as_day(activity.get("start_time"))
+        if activity.get("user_id") is not None and day is not None:
+            days.setdefault(activity["user_id"], set()).add(day)
+    return {user_id: sorted(user_days) for user_id, user_days in days.items()}
+
+
+def refresh_daily_user_load(conn, activities_table: sa.Table, user_id: int,
+                            first_day: Optional[date] = None, last_day: Optional[date] = None,
+                            load_table: sa.Table = daily_user_load) -> int:
+    """
+    Recalcule les lignes de synthèse de l'utilisateur entre first_day et last_day inclus
+    (tout l'historique si les bornes sont omises), dans la transaction de l'appelant.
+    """
+    a = activities_table.c
+    day = activity_day_expression(a.start_time, conn.dialect.name)
+    activity_type = sa.func.coalesce(a.activity_type, "other")
+
+    source = sa.select(
+        a.user_id,
+        day.label("day"),
+        activity_type.label("activity_type"),
+        sa.func.count().label("activity_count"),
+        sa.func.coalesce(sa.func.sum(a.distance_meters), 0.0).label("distance_meters"),
+        sa.func.coalesce(sa.func.sum(a.duration_seconds), 0.0).label("duration_seconds"),
+        sa.func.coalesce(sa.func.sum(a.training_load), 0.0).label("training_load"),
+        sa.func.coalesce(sa.func.sum(a.calories), 0.0).label("calories"),
+        sa.func.coalesce(sa.func.sum(a.average_hr), 0.0).label("average_hr_sum"),
+        sa.func.count(a.average_hr).label("average_hr_count"),
+        sa.func.coalesce(sa.func.max(a.distance_meters), 0.0).label("max_distance_meters"),
+        sa.func.coalesce(sa.func.max(a.duration_seconds), 0.0).label("max_duration_seconds"),
+        *[sa.func.coalesce(sa.func.sum(a[f"hr_zone_{zone}"]), 0.0).label(f"hr_zone_{zone}_seconds") for zone in HR_ZONES]
+    ).where(a.user_id == user_id, a.start_time.is_not(None))
+
+    delete = sa.delete(load_table).where(load_table.c.user_id == user_id)
+    if first_day is not None and last_day is not None:
+        # Marge d'un jour sur start_time (index utilisateur/date), bornes exactes sur le jour
+        source = source.where(
+            a.start_time >= datetime.combine(first_day - timedelta(days=1), datetime.min.time()),
+            a.start_time < datetime.combine(last_day + timedelta(days=2), datetime.min.time()),
+            day >= first_day,
+            day <= last_day,
+        )
+        delete = delete.where(load_table.c.day >= first_day, load_table.c.day <= last_day)
+    source = source.group_by(a.user_id, day, activity_type)
+
+    conn.execute(delete)
+    result = conn.execute(sa.insert(load_table).from_select([column.name for column in load_table.c], source))
+    return result.rowcount
+
+
+def refresh_for_activities(conn, activities_table: sa.Table, activities: Iterable[Dict[str, Any]],
+                           load_table: sa.Table = daily_user_load):
+    """Maintenance incrémentale après insertion : recalcul des seuls jours touchés"""
+    for user_id, days in touched_days(activities).items():
+        refresh_daily_user_load(conn, activities_table, user_id, days[0], days[-1], load_table)
+
+
+def rebuild_daily_user_load(engine, tables: Dict[str, sa.Table], user_id: Optional[int] = None):
+    """Reconstruit la synthèse à partir des activités (initialisation d'une base existante)"""
+    activities_table = tables["activities"]
+    load_table = tables["daily_user_load"]
+    with engine.begin() as conn:
+        if user_id is None:
+            user_ids = conn.execute(sa.select(activities_table.c.user_id).distinct()).scalars().all()
+        else:
+            user_ids = [user_id]
+        for uid in user_ids:
+            refresh_daily_user_load(conn, activities_table, uid, load_table=load_table)
+    log.info(f"Synthèse daily_user_load reconstruite pour {len(user_ids)} utilisateur(s).")
+
+
+def _daily_totals(conn, user_id: int, first_day: date, load_table: sa.Table) -> Dict[date, Dict[str, float]]:
+    c = load_table.c
+    rows = conn.execute(
+        sa.select(
+            c.day,
+            sa.func.sum(c.activity_count).label("activity_count"),
+            sa.func.sum(c.distance_meters).label("distance_meters"),
+            sa.func.sum(c.duration_seconds).label("duration_seconds"),
+            sa.func.sum(c.training_load).label("training_load"),
+            sa.func.sum(c.average_hr_sum).label("average_hr_sum"),
+            sa.func.sum(c.average_hr_count).label("average_hr_count"),
+        )
+        .where(c.user_id == user_id, c.day >= first_day)
+        .group_by(c.day)
+    )
+    return {_as_day(row.day): row._asdict() for row in rows}
+
+
+def load_windows(totals: Dict[date, Dict[str, float]], as_of: date) -> Dict[str, float]:
+    """Charges aiguë (7 derniers jours) et chronique (28 derniers jours), ACWR"""
+    charge_7j = sum(row["training_load"] or 0.0 for day, row in totals.items() if day > as_of - timedelta(days=7))
+    charge_28j = sum(row["training_load"] or 0.0 for day, row in totals.items() if day > as_of - timedelta(days=28))
+    acwr = charge_7j / (charge_28j / 4) if charge_28j > 0 else None
+    return {"charge_7j": charge_7j, "charge_28j": charge_28j, "acwr": acwr}
+
+
+def get_load_windows(engine, user_id: int, as_of: Optional[date] = None,
+                     load_table: sa.Table = daily_user_load) -> Dict[str, float]:
+    """Fenêtres de charge d'un utilisateur (au plus 28 lignes de synthèse par type lues)"""
+    as_of = as_of or date.today()
+    with engine.connect() as conn:
+        totals = _daily_totals(conn, user_id, as_of - timedelta(days=27), load_table)
+    return load_windows(totals, as_of)
+
+
+def get_load_trends(engine, user_id: int, period_weeks: int = 12, as_of: Optional[date] = None,
+                    load_table: sa.Table = daily_user_load) -> Dict[str, Any]:
+    """
+    Tendances quotidiennes sur period_weeks semaines, lues sur daily_user_load.
+    Chaque jour actif porte ses volumes et les charges glissantes 7j/28j à cette date.
+    Les activités de moins de 10 minutes sont incluses (l'ancienne liste par activité
+    les excluait) : la synthèse alimente aussi les fenêtres de charge, qui les comptent.
+    """
+    as_of = as_of or date.today()
+    first_day = as_of - timedelta(weeks=period_weeks) + timedelta(days=1)
+    with engine.connect() as conn:
+        # 27 jours de plus pour que la charge 28j du premier jour soit complète
+        totals = _daily_totals(conn, user_id, first_day - timedelta(days=27), load_table)
+
+    # Charges cumulées jour par jour sur le calendrier complet (jours sans activité inclus)
+    calendar = [first_day - timedelta(days=27) + timedelta(days=i) for i in range((as_of - first_day).days + 28)]
+    cumulative = [0.0]
+    for day in calendar:
+        cumulative.append(cumulative[-1] + (totals.get(day, {}).get("training_load") or 0.0))
+
+    trends = []
+    for index in range(len(calendar) - 1, 26, -1):
+        day = calendar[index]
+        row = totals.get(day)
+        if row is None:
+            continue
+        charge_7j = cumulative[index + 1] - cumulative[index - 6]
+        charge_28j = cumulative[index + 1] - cumulative[index - 27]
+        distance, duration = row["distance_meters"] or 0.0, row["duration_seconds"] or 0.0
+        trends.append({
+            "date": day.isoformat(),
+            "activities_count": row["activity_count"],
+            "distance_km": round(distance / 1000, 2),
+            "duration_min": round(duration / 60, 1),
+            "pace_kmh": round(distance / duration * 3.6, 2) if duration > 0 else 0,
+            "average_hr": round(row["average_hr_sum"] / row["average_hr_count"]) if row["average_hr_count"] else None,
+            "training_load": round(row["training_load"] or 0.0, 1),
+            "charge_7j": round(charge_7j, 1),
+            "charge_28j": round(charge_28j, 1),
+            "acwr": round(charge_7j / (charge_28j / 4), 2) if charge_28j > 0 else None,
+        })
+
+    return {
+        "user_id": user_id,
+        "period_weeks": period_weeks,
+        "trends_count": len(trends),
+        "trends": trends,
+    }
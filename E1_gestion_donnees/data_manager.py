@@ -1,10 +1,8 @@
 import logging
-import json
 import numpy as np
 from sqlalchemy import select
-from datetime import datetime, timedelta
 import pandas as pd
-from typing import List, Dict, Any, Tuple, Optional
+from typing import Callable, Iterable, List, Dict, Any, Tuple, Optional
 from garminconnect import Garmin, GarminConnectAuthenticationError
 
 import sys
@@ -13,8 +11,11 @@ project_root = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(project_root))
 log = logging.getLogger(__name__)
 
-from src.config import GARMIN_EMAIL, GARMIN_PASSWORD, DATA_DIR
+from src.config import GARMIN_EMAIL, GARMIN_PASSWORD, GARMIN_FETCH_WORKERS
+from E1_gestion_donnees.activity_mapping import E1_COLUMNS, activity_records, normalize_activities
 from E1_gestion_donnees.db_manager import create_db_engine, create_tables, store_activities_in_db
+from E1_gestion_donnees.garmin_sync import fetch_garmin_activities
+from E1_gestion_donnees.raw_archive import RawArchiveWriter
 
 def connect_garmin(email: str, password: str) -> Optional[Garmin]:
     try:
@@ -31,88 +32,52 @@ def connect_garmin(email: str, password: str) -> Optional[Garmin]:
         return None
 
 
-def get_all_garmin_activities(garmin: Garmin, batch_size: int = 100) -> List[Dict[str, Any]]:
-    all_activities = []
-    start_index = 0
-    log.info(f"Début de la récupération des activités par lots de {batch_size}.")
-    
-    while True:
-        try:
-            log.info(f"Récupération du lot d'activités démarrant à l'index {start_index}...")
-            activities_batch = garmin.get_activities(start_index, batch_size)
-            
-            if not activities_batch:
-                log.info("Aucune nouvelle activité trouvée. Fin de la récupération.")
-                break
-            
-            all_activities.extend(activities_batch)
-            log.info(f"{len(activities_batch)} activités ajoutées. Total actuel : {len(all_activities)}.")
-            start_index += batch_size
-            
-        except Exception as e:
-            log.error(f"Erreur lors de la récupération du lot d'activités à l'index {start_index}.", exc_info=True)
-            break
-            
-    if all_activities:
-        first_date = all_activities[0].get('startTimeLocal')
-        last_date = all_activities[-1].get('startTimeLocal')
-        log.info(f"Récupération terminée. {len(all_activities)} activités trouvées, de {first_date} à {last_date}.")
-        
-    return all_activities
-
-def process_garmin_activities(activities: List[Dict[str, Any]], user_id: int) -> List[Dict[str, Any]]:
-    processed_data = []
+def get_all_garmin_activities(garmin: Garmin, batch_size: int = 100, stop_at_activity_id: Optional[int] = None,
+                              resume_token: Optional[str] = None, max_workers: int = GARMIN_FETCH_WORKERS,
+                              on_page: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Récupère les activités Garmin, les plus récentes d'abord (voir garmin_sync.fetch_garmin_activities)
 
-    for activity in activities:
-        processed_data.append({
-            "user_id": user_id,
-            "activity_id": activity.get("activityId"),
-            "activity_name": activity.get("activityName"),
-            "activity_type": activity.get("activityType", {}).get("typeKey"),
-            "start_time": pd.to_datetime(activity.get("startTimeLocal")) if activity.get("startTimeLocal") else None,
-            "distance_meters": activity.get("distance",0.0),
-            "duration_seconds": activity.get("duration",0.0),
-            "average_speed": activity.get("averageSpeed"),
-            "max_speed": activity.get("maxSpeed"),
-            "calories": activity.get("calories",0.0),
-            "average_hr": activity.get("averageHR"),
-            "max_hr": activity.get("maxHR"),
-            "elevation_gain": activity.get("elevationGain",0.0),
-            "elevation_loss": activity.get("elevationLoss",0.0),
-            "start_latitude": activity.get("startLatitude"),
-            "start_longitude": activity.get("startLongitude"),
-            "device_name": activity.get("deviceName"),
-            "created_timestamp": datetime.now(),
-            "steps": activity.get("steps"),
-            "average_running_cadence": activity.get("averageRunningCadenceInStepsPerMinute"),
-            "max_running_cadence": activity.get("maxRunningCadenceInStepsPerMinute"),
-            "stride_length": activity.get("avgStrideLength"),
-            "vo2max_estime": activity.get("vO2MaxValue"),
-            "training_load": activity.get("activityTrainingLoad"),
-            "aerobic_effect": activity.get("aerobicTrainingEffect"),
-            "anaerobic_effect": activity.get("anaerobicTrainingEffect"),
-            "temp_min": activity.get("minTemperature"),
-            "temp_max": activity.get("maxTemperature"),
-            "fastest_split_5000": activity.get("fastestSplit_5000"),
-            "fastest_split_10000": activity.get("fastestSplit_10000"),
-            "hr_zone_1": activity.get("hrTimeInZone_1"),
-            "hr_zone_2": activity.get("hrTimeInZone_2"),
-            "hr_zone_3": activity.get("hrTimeInZone_3"),
-            "hr_zone_4": activity.get("hrTimeInZone_4"),
-            "hr_zone_5": activity.get("hrTimeInZone_5"),
-        })
+    En cas d'échec définitif d'une page, la liste partielle est renvoyée comme
+    auparavant ; le jeton de reprise est journalisé. Utiliser
+    fetch_garmin_activities pour le récupérer et save_sync_state pour le persister.
+    """
+    result = fetch_garmin_activities(
+        garmin, batch_size=batch_size, stop_at_activity_id=stop_at_activity_id,
+        resume_token=resume_token, max_workers=max_workers, on_page=on_page
+    )
+    if not result.complete:
+        log.warning(f"Récupération partielle ({len(result.activities)} activités). Jeton de reprise : {result.resume_token}")
+    return result.activities
+
+def process_garmin_activities(activities: Iterable[Dict[str, Any]], user_id: int) -> List[Dict[str, Any]]:
+    """
+    Normalise les activités brutes Garmin en lignes de la table E1 activities
+    Traitement par colonnes selon activity_mapping.ACTIVITY_FIELDS (voir normalize_activities)
+    """
+    processed_data = activity_records(normalize_activities(activities, user_id=user_id), E1_COLUMNS)
     log.info(f"{len(processed_data)} activités ont été traitées et normalisées.")
     return processed_data
 
-def save_raw_data(activities, filename=None):
-    filename = DATA_DIR / f"raw_garmin_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+def save_raw_data(activities, filename=None, user_id=None):
+    """
+    Ajoute les activités brutes à l'archive NDJSON compressée (voir raw_archive)
+
+    Args:
+        activities: Activités brutes Garmin
+        filename: Fichier cible (codec déduit de l'extension .zst/.gz) ; partition utilisateur/jour par défaut
+        user_id: Utilisateur propriétaire, pour la partition par défaut
+
+    Returns:
+        str: Chemin du fichier d'archive
+    """
+    writer = RawArchiveWriter(user_id=user_id, path=filename)
     try:
-        with open(filename, "w") as f:
-            json.dump(activities, f, indent=4)
-        log.info(f"Données brutes sauvegardées avec succès dans {filename}")
-        return str(filename)
+        writer.write_page(activities)
+        log.info(f"Données brutes sauvegardées avec succès dans {writer.path}")
+        return str(writer.path)
     except Exception as e:
-        log.error(f"Impossible de sauvegarder les données brutes dans {filename}.", exc_info=True)
+        log.error(f"Impossible de sauvegarder les données brutes dans {writer.path}.", exc_info=True)
         raise
 
 def create_activities_dataframe(processed_data):
@@ -125,20 +90,27 @@ def fetch_and_process_garmin_data(user_id: int, save_raw: bool = True) -> Option
         log.error("Échec de l'orchestration : la connexion à Garmin a échoué.")
         return None
 
-    activities = get_all_garmin_activities(garmin_client)
+    # Archive brute écrite au fil des pages reçues
+    archive = RawArchiveWriter(user_id=user_id) if save_raw else None
+    activities = get_all_garmin_activities(garmin_client, on_page=archive.write_page if archive else None)
     if not activities:
         log.warning("Aucune activité n'a été récupérée pour ce compte.")
         return None
 
-    if save_raw:
-        save_raw_data(activities)
-
-    processed_data = process_garmin_activities(activities, user_id=user_id)
-    df = pd.DataFrame(processed_data)
+    df = normalize_activities(activities, user_id=user_id)[E1_COLUMNS]
+    processed_data = activity_records(df)
+    log.info(f"{len(processed_data)} activités ont été traitées et normalisées.")
 
     return df, processed_data
 
-def compute_performance_metrics(activities_df: pd.DataFrame, user_id: int) -> Dict[str, Any]:
+def compute_performance_metrics(activities_df: pd.DataFrame, user_id: int, load_windows: Optional[Dict[str, float]] = None,
+                                now: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """
+    Calcule les métriques agrégées de l'utilisateur.
+    load_windows (charge_7j, charge_28j) provient de la table daily_user_load
+    (daily_load.get_load_windows) ; à défaut, les fenêtres sont recalculées sur le DataFrame.
+    Pour recalculer toute la base, voir compute_performance_metrics_batch.
+    """
     log.info(f"Début du calcul des métriques de performance pour l'utilisateur {user_id} à partir de {len(activities_df)} activités.")
     
     if activities_df.empty:
@@ -152,7 +124,7 @@ def compute_performance_metrics(activities_df: pd.DataFrame, user_id: int) -> Di
     if running_df.empty:
         log.warning("Aucune activité de 'running' trouvée. Certaines métriques ne seront pas calculées.")
     
-    now = pd.Timestamp.now()
+    now = now if now is not None else pd.Timestamp.now()
 
     vma_kmh = None
     vma_source = None
@@ -173,17 +145,21 @@ def compute_performance_metrics(activities_df: pd.DataFrame, user_id: int) -> Di
             if not valid.empty and 'max_speed' in valid:
                 vma_kmh = valid['max_speed'].max() * 3.6
                 vma_source = "Vitesse max sur activité > 5 min"
-    if vma_kmh:
+    if vma_kmh is not None:
         vma_kmh = round(vma_kmh, 2)
         log.info(f"VMA estimée : {vma_kmh} km/h ({vma_source})")
     else:
         log.warning("Impossible d'estimer la VMA (pas d'effort suffisant trouvé)")
 
-    charge_28j_df = df[df['start_time'] >= now - pd.Timedelta(days=28)]
-    charge_28j = charge_28j_df['training_load'].sum() if 'training_load' in charge_28j_df else 0.0
+    if load_windows is not None:
+        charge_28j = load_windows['charge_28j']
+        charge_7j = load_windows['charge_7j']
+    else:
+        charge_28j_df = df[df['start_time'] >= now - pd.Timedelta(days=28)]
+        charge_28j = charge_28j_df['training_load'].sum() if 'training_load' in charge_28j_df else 0.0
 
-    charge_7j_df = df[df['start_time'] >= now - pd.Timedelta(days=7)]
-    charge_7j = charge_7j_df['training_load'].sum() if 'training_load' in charge_7j_df else 0.0
+        charge_7j_df = df[df['start_time'] >= now - pd.Timedelta(days=7)]
+        charge_7j = charge_7j_df['training_load'].sum() if 'training_load' in charge_7j_df else 0.0
 
     forme = charge_28j
     fatigue = charge_7j
@@ -235,6 +211,142 @@ def compute_performance_metrics(activities_df: pd.DataFrame, user_id: int) -> Di
     log.info(f"Métriques finales calculées pour l'utilisateur {user_id}: {metrics}")
     return metrics
 
+METRICS_COLUMNS = [
+    "user_id", "date_calcul", "vma_kmh", "vo2max_estime", "charge_7j", "charge_28j", "forme", "fatigue",
+    "ratio_endurance", "prediction_10k_min", "recommandation_jour"
+]
+
+
+def _column_values(df: pd.DataFrame, name: str) -> np.ndarray:
+    if name in df.columns:
+        return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+    return np.full(len(df), np.nan)
+
+
+def _utc_naive(values):
+    """Dates avec fuseau (colonne DateTime(timezone=True) lue sous PostgreSQL) ramenées en UTC sans fuseau"""
+    if isinstance(values, pd.Series):
+        return values.dt.tz_convert("UTC").dt.tz_localize(None) if values.dt.tz is not None else values
+    return values.tz_convert("UTC").tz_localize(None) if values.tzinfo is not None else values
+
+def compute_performance_metrics_batch(activities_df: pd.DataFrame, now: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Version multi-utilisateurs de compute_performance_metrics, pour le recalcul nocturne.
+
+    Prend un DataFrame long (colonne user_id) et calcule toutes les métriques en
+    un passage groupby/NumPy, sans copie ni boucle par utilisateur. Retourne une
+    ligne par utilisateur (colonnes METRICS_COLUMNS, NaN là où la version par
+    utilisateur renvoie None), avec les mêmes règles de sélection et d'arrondi.
+    """
+    if activities_df.empty:
+        return pd.DataFrame(columns=METRICS_COLUMNS)
+
+    df = activities_df
+    codes, user_ids = pd.factorize(df["user_id"], sort=True)
+    n_users = len(user_ids)
+    positions = np.arange(len(df))
+
+    start_times = pd.to_datetime(df["start_time"])
+    now = now if now is not None else pd.Timestamp.now(tz="UTC" if start_times.dt.tz is not None else None)
+    # Comparaisons en datetime64 (une colonne avec fuseau serait un tableau d'objets) : UTC sans fuseau
+    start_time = _utc_naive(start_times).to_numpy()
+    reference = _utc_naive(now)
+    duration = _column_values(df, "duration_seconds")
+    distance = _column_values(df, "distance_meters")
+    running = (df["activity_type"] == "running").to_numpy()
+
+    def count(mask):
+        return np.bincount(codes[mask], minlength=n_users)
+
+    def reduce(values, mask, how):
+        return pd.Series(values[mask]).groupby(codes[mask]).agg(how).reindex(range(n_users)).to_numpy(dtype=float)
+
+    def first_extreme(mask, key, largest):
+        # Équivalent de idxmax/idxmin par utilisateur : première occurrence, valeurs manquantes ignorées
+        extreme = reduce(key, mask, "max" if largest else "min")
+        with np.errstate(invalid="ignore"):
+            candidates = mask & (key == extreme[codes])
+        first = reduce(positions, candidates, "min")
+        return np.where(np.isnan(first), -1, np.nan_to_num(first)).astype(int)
+
+    def pick(values, chosen):
+        return np.where(chosen >= 0, values[np.maximum(chosen, 0)], np.nan)
+
+    # --- VMA : meilleur 1000 m, sinon plus longue distance sur >= 6 min, sinon vitesse max sur >= 5 min
+    vma = np.full(n_users, np.nan)
+    decided = np.zeros(n_users, dtype=bool)
+    if "fastest_split_1000" in df.columns:
+        best_1000 = reduce(_column_values(df, "fastest_split_1000"), running, "min")
+        with np.errstate(invalid="ignore"):
+            from_split = best_1000 > 0
+        vma[from_split] = 3600 / best_1000[from_split]
+        decided |= from_split
+
+    long_efforts = running & (duration >= 6 * 60)
+    longest = first_extreme(long_efforts, distance, largest=True)
+    from_effort = ~decided & (count(long_efforts) > 0)
+    vma[from_effort] = (pick(distance, longest) / pick(duration, longest) * 3.6)[from_effort]
+    decided |= from_effort
+
+    valid_efforts = running & (duration >= 5 * 60)
+    if "max_speed" in df.columns:
+        from_speed = ~decided & (count(valid_efforts) > 0)
+        vma[from_speed] = (reduce(_column_values(df, "max_speed"), valid_efforts, "max") * 3.6)[from_speed]
+        decided |= from_speed
+    vma = np.where(decided, np.round(vma, 2), np.nan)
+
+    # --- Charges 7j / 28j
+    training_load = np.nan_to_num(_column_values(df, "training_load"))
+    charge_28j = np.bincount(codes, weights=np.where(start_time >= (reference - pd.Timedelta(days=28)).to_datetime64(), training_load, 0.0), minlength=n_users)
+    charge_7j = np.bincount(codes, weights=np.where(start_time >= (reference - pd.Timedelta(days=7)).to_datetime64(), training_load, 0.0), minlength=n_users)
+
+    # --- Endurance et prédiction 10 km (split 10k, sinon Riegel depuis le 5 km+ le plus rapide)
+    runs = count(running)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio_endurance = np.where(runs > 0, np.round(count(running & (duration >= 45 * 60)) / runs, 2), np.nan)
+
+    prediction = np.full(n_users, np.nan)
+    from_split_10k = np.zeros(n_users, dtype=bool)
+    if "fastest_split_10000" in df.columns:
+        split_10k = _column_values(df, "fastest_split_10000")
+        from_split_10k = count(running & ~np.isnan(split_10k)) > 0
+        prediction[from_split_10k] = (reduce(split_10k, running, "min") / 60)[from_split_10k]
+    fastest = first_extreme(running & (distance >= 5000), duration, largest=False)
+    from_riegel = ~from_split_10k & (fastest >= 0)
+    d_ref_km = pick(distance, fastest) / 1000
+    with np.errstate(invalid="ignore", divide="ignore"):
+        riegel = pick(duration, fastest) / 60 * ((10 / d_ref_km) ** 1.06)
+    prediction[from_riegel] = riegel[from_riegel]
+    prediction = np.round(prediction, 1)
+
+    # --- Recommandation du jour (forme = charge 28j, fatigue = charge 7j)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        overload = (charge_28j > 0) & (charge_7j / (charge_28j / 4) > 1.5)
+    recommandation = np.select(
+        [overload, charge_7j == 0],
+        ["Repos ou récupération conseillée.", "Nouveau cycle d'entraînement possible."],
+        default="Entraînement normal"
+    )
+
+    vo2max = reduce(_column_values(df, "vo2max_estime"), np.ones(len(df), dtype=bool), "max")
+    charge_7j_rounded = [round(float(value), 1) for value in charge_7j]
+    charge_28j_rounded = [round(float(value), 1) for value in charge_28j]
+
+    log.info(f"Métriques calculées en lot pour {n_users} utilisateurs à partir de {len(df)} activités.")
+    return pd.DataFrame({
+        "user_id": user_ids,
+        "date_calcul": now,
+        "vma_kmh": vma,
+        "vo2max_estime": [round(float(value), 1) if not np.isnan(value) else np.nan for value in vo2max],
+        "charge_7j": charge_7j_rounded,
+        "charge_28j": charge_28j_rounded,
+        "forme": charge_28j_rounded,
+        "fatigue": charge_7j_rounded,
+        "ratio_endurance": ratio_endurance,
+        "prediction_10k_min": prediction,
+        "recommandation_jour": recommandation,
+    }, columns=METRICS_COLUMNS)
+
 def extract_splits_from_activities(activities):
     all_splits = []
     for activity in activities:
@@ -1,35 +1,52 @@
 import logging
+from datetime import datetime
 from typing import List,Dict, Any
 
 import sqlalchemy as sa
 from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from src.config import DATABASE_URL
+from src.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_QUERY_CACHE_SIZE, DB_UPSERT_CHUNK_SIZE
+)
+from src.stats_cache import invalidate_user_stats
+from E1_gestion_donnees.daily_load import daily_user_load, refresh_for_activities
+from E1_gestion_donnees.garmin_sync import garmin_sync_state
 
 log = logging.getLogger(__name__)
 
+def engine_kwargs_for(db_url: str) -> Dict[str, Any]:
+    """Options de create_engine (pool, connect_args) adaptées au dialecte."""
+    engine_kwargs = {
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+        'query_cache_size': DB_QUERY_CACHE_SIZE
+    }
+
+    if 'postgresql' in db_url:
+        engine_kwargs['connect_args'] = {
+            'application_name': 'coach_ai_fastapi'
+        }
+    elif 'mssql' in db_url or 'sqlserver' in db_url:
+        engine_kwargs['connect_args'] = {
+            'timeout': 30,
+            'connect_timeout': 30,
+            'autocommit': True
+        }
+    elif 'sqlite' in db_url:
+        engine_kwargs['connect_args'] = {
+            'check_same_thread': False
+        }
+
+    if 'sqlite' not in db_url:
+        engine_kwargs['pool_size'] = DB_POOL_SIZE
+        engine_kwargs['max_overflow'] = DB_MAX_OVERFLOW
+    return engine_kwargs
+
 def create_db_engine(db_url=DATABASE_URL):
     try:
-        engine_kwargs = {
-            'pool_timeout': 30,
-            'pool_recycle': 3600,
-            'pool_pre_ping': True
-        }
-        
-        if 'postgresql' in db_url:
-            engine_kwargs['connect_args'] = {
-                'application_name': 'coach_ai_fastapi'
-            }
-        elif 'mssql' in db_url or 'sqlserver' in db_url:
-            engine_kwargs['connect_args'] = {
-                'timeout': 30,
-                'connect_timeout': 30,
-                'autocommit': True
-            }
-        elif 'sqlite' in db_url:
-            engine_kwargs['connect_args'] = {
-                'check_same_thread': False
-            }
+        engine_kwargs = engine_kwargs_for(db_url)
         
         engine = sa.create_engine(db_url, **engine_kwargs)
         
@@ -55,6 +72,29 @@ def create_db_engine(db_url=DATABASE_URL):
         
         raise
 
+def create_read_only_engine(db_url: str, pool_size: int = DB_POOL_SIZE):
+    """
+    Moteur en lecture seule, sans connexion ni DDL à la création (connexions ouvertes à la demande).
+    PostgreSQL : transactions read-only par défaut ; SQLite : PRAGMA query_only.
+    """
+    engine_kwargs = engine_kwargs_for(db_url)
+    if 'postgresql' in db_url:
+        engine_kwargs['connect_args'] = {
+            'application_name': 'coach_ai_analytics',
+            'options': '-c default_transaction_read_only=on'
+        }
+    if 'sqlite' not in db_url:
+        engine_kwargs['pool_size'] = pool_size
+    engine = sa.create_engine(db_url, **engine_kwargs)
+
+    if engine.dialect.name == 'sqlite':
+        @sa.event.listens_for(engine, "connect")
+        def _query_only(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA query_only = ON")
+    elif engine.dialect.name != 'postgresql':
+        log.warning(f"Lecture seule non imposée pour le dialecte {engine.dialect.name}.")
+    return engine
+
 def create_tables(engine) -> Dict[str, sa.Table]:
     metadata = sa.MetaData()
 
@@ -97,6 +137,8 @@ def create_tables(engine) -> Dict[str, sa.Table]:
         sa.Column("start_longitude", sa.Float),
         sa.Column("device_name", sa.String(100)),
         sa.Column("created_timestamp", sa.DateTime),
+        # Dernière écriture effective par store_activities_in_db (empreintes de l'export Parquet)
+        sa.Column("updated_at", sa.DateTime),
         sa.Column("steps", sa.Integer),
         sa.Column("average_running_cadence", sa.Float),
         sa.Column("max_running_cadence", sa.Float),
@@ -113,7 +155,9 @@ def create_tables(engine) -> Dict[str, sa.Table]:
         sa.Column("hr_zone_2", sa.Float),
         sa.Column("hr_zone_3", sa.Float),
         sa.Column("hr_zone_4", sa.Float),
-        sa.Column("hr_zone_5", sa.Float)
+        sa.Column("hr_zone_5", sa.Float),
+        # Recalcul de daily_user_load à l'ingestion : jours touchés d'un utilisateur
+        sa.Index("ix_activities_user_id_start_time", "user_id", "start_time")
     )
 
     gps_data = sa.Table(
@@ -122,7 +166,8 @@ def create_tables(engine) -> Dict[str, sa.Table]:
         sa.Column("activity_id", sa.Integer, sa.ForeignKey("activities.id")),
         sa.Column("latitude", sa.Float),
         sa.Column("longitude", sa.Float),
-        sa.Column("timestamp", sa.DateTime)
+        sa.Column("timestamp", sa.DateTime),
+        sa.Index("ix_gps_data_activity_id", "activity_id")
     )
 
     metrics = sa.Table(
@@ -140,7 +185,10 @@ def create_tables(engine) -> Dict[str, sa.Table]:
         sa.Column("tendance_progression", sa.String(50)),
         sa.Column("ratio_endurance", sa.Float),
         sa.Column("prediction_10k_min", sa.Float),
-        sa.Column("recommandation_jour", sa.Text)
+        sa.Column("recommandation_jour", sa.Text),
+        # Une ligne par calcul : cible de l'upsert de store_metrics_in_db, sert aussi
+        # la lecture des dernières métriques (user_id puis date_calcul décroissante)
+        sa.Index("uq_metrics_user_id_date_calcul", "user_id", "date_calcul", unique=True)
     )
 
     splits = sa.Table(
@@ -154,11 +202,16 @@ def create_tables(engine) -> Dict[str, sa.Table]:
         sa.Column("average_speed", sa.Float),
         sa.Column("max_speed", sa.Float),
         sa.Column("elevation_gain", sa.Float),
-        sa.Column("elevation_loss", sa.Float)
+        sa.Column("elevation_loss", sa.Float),
+        sa.Index("ix_splits_activity_id", "activity_id")
     )
 
+    daily_user_load.to_metadata(metadata)
+    garmin_sync_state.to_metadata(metadata)
+
     try:
         metadata.create_all(engine)
+        migrate_schema(engine, metadata)
         log.info("Vérification des tables terminée. Les tables sont prêtes.")
     except Exception as e:
         log.error("Erreur lors de la création des tables.", exc_info=True)
@@ -166,6 +219,51 @@ def create_tables(engine) -> Dict[str, sa.Table]:
 
     return metadata.tables
 
+def _drop_duplicates(conn, table: sa.Table, columns: List[str]) -> int:
+    """Supprime les doublons sur `columns` en gardant la ligne de plus grande clé primaire"""
+    primary_key = list(table.primary_key.columns)[0]
+    keys = [table.c[column] for column in columns]
+    kept = sa.select(sa.func.max(primary_key)).group_by(*keys)
+    result = conn.execute(
+        table.delete().where(*[key.is_not(None) for key in keys], primary_key.not_in(kept.scalar_subquery()))
+    )
+    return result.rowcount
+
+def migrate_schema(engine, metadata: sa.MetaData) -> List[str]:
+    """
+    Migration des bases existantes : create_all ne crée colonnes et index qu'avec leur table,
+    les colonnes (nullables) et index déclarés depuis sont donc ajoutés ici aux tables déjà présentes.
+    Avant un index unique, les doublons sont supprimés (la ligne la plus récente est gardée).
+    Retourne les noms des colonnes (table.colonne) et index créés.
+    """
+    created = []
+    with engine.begin() as conn:
+        inspector = sa.inspect(conn)
+        preparer = conn.dialect.identifier_preparer
+        for table in metadata.sorted_tables:
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns or not column.nullable:
+                    continue
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+                    f"{preparer.format_column(column)} {column.type.compile(dialect=conn.dialect)}"
+                )
+                created.append(f"{table.name}.{column.name}")
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                if index.unique:
+                    removed = _drop_duplicates(conn, table, [column.name for column in index.columns])
+                    if removed:
+                        log.warning(f"{removed} doublons supprimés de {table.name} avant la création de {index.name}.")
+                index.create(conn)
+                created.append(index.name)
+    if created:
+        log.info(f"Migration du schéma : colonnes et index créés {', '.join(created)}")
+    return created
+
 def insert_user(engine, tables, user_data):
     with engine.connect() as conn:
         try:
@@ -205,43 +303,111 @@ def ensure_user_exists(engine, tables, user_id, user_defaults=None):
             conn.commit()
             log.info(f"Utilisateur user_id={user_id} inséré automatiquement.")
 
-def store_activities_in_db(engine, tables: Dict, processed_data: List[Dict[str, Any]]):
+# Colonnes jamais réécrites par un upsert (identité et horodatage de première ingestion)
+UPSERT_IMMUTABLE_COLUMNS = {"id", "activity_id", "created_timestamp"}
+# Colonnes réécrites avec la ligne mais ignorées pour décider si elle a changé
+UPSERT_TOUCH_COLUMNS = {"updated_at"}
+
+def _chunks(rows: List[Dict[str, Any]], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def upsert_statement(dialect_name: str, table: sa.Table, conflict_columns: List[str], update_columns: List[str]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE (PostgreSQL, SQLite) qui ne réécrit une ligne
+    existante que si une valeur change. Retourne None pour les autres dialectes.
+    """
+    if dialect_name == "postgresql":
+        stmt = pg_insert(table)
+    elif dialect_name == "sqlite":
+        stmt = sqlite_insert(table)
+    else:
+        return None
+    changed = sa.or_(*[
+        table.c[column].is_distinct_from(stmt.excluded[column])
+        for column in update_columns if column not in UPSERT_TOUCH_COLUMNS
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={column: stmt.excluded[column] for column in update_columns},
+        where=changed
+    )
+
+def _upsert_chunk_generic(conn, table: sa.Table, chunk: List[Dict[str, Any]], update_columns: List[str]):
+    """Repli sans ON CONFLICT : détection des existants limitée aux identifiants du lot"""
+    ids = [row["activity_id"] for row in chunk]
+    existing = set(conn.execute(sa.select(table.c.activity_id).where(table.c.activity_id.in_(ids))).scalars())
+    new_rows = [row for row in chunk if row["activity_id"] not in existing]
+    updated_rows = [{**row, "b_activity_id": row["activity_id"]} for row in chunk if row["activity_id"] in existing]
+    if new_rows:
+        conn.execute(sa.insert(table), new_rows)
+    if updated_rows:
+        conn.execute(
+            table.update()
+            .where(table.c.activity_id == sa.bindparam("b_activity_id"))
+            .values({column: sa.bindparam(column) for column in update_columns}),
+            updated_rows
+        )
+    return chunk
+
+def store_activities_in_db(engine, tables: Dict, processed_data: List[Dict[str, Any]],
+                           chunk_size: int = DB_UPSERT_CHUNK_SIZE) -> int:
+    """
+    Insère ou met à jour les activités par lots (upsert sur activity_id).
+    La détection des activités existantes reste en base : le coût dépend du lot,
+    pas de la taille de la table. Retourne le nombre d'activités insérées ou modifiées.
+    """
     if not processed_data:
         log.info("Aucune activité à stocker.")
-        return
+        return 0
 
     activities_table = tables["activities"]
     if processed_data:
         user_id = processed_data[0].get("user_id")
         if user_id is not None:
             ensure_user_exists(engine, tables, user_id)
-    
-    with engine.connect() as conn:
-        existing_ids_query = sa.select(activities_table.c.activity_id)
-        result = conn.execute(existing_ids_query)
-        existing_ids = {row[0] for row in result}
-        log.info(f"{len(existing_ids)} activités déjà présentes dans la base de données.")
-
-    new_activities = [
-        activity for activity in processed_data 
-        if activity["activity_id"] not in existing_ids
-    ]
-    
-    skipped_count = len(processed_data) - len(new_activities)
-    if skipped_count > 0:
-        log.info(f"{skipped_count} activités déjà existantes ont été ignorées.")
 
-    if not new_activities:
-        log.info("Aucune nouvelle activité à insérer.")
-        return
+    # Un même activity_id ne peut apparaître qu'une fois par instruction ON CONFLICT : la dernière version l'emporte
+    rows_by_id = {}
+    for activity in processed_data:
+        if activity.get("activity_id") is None:
+            log.warning(f"Activité sans activity_id ignorée : {activity.get('activity_name')}")
+            continue
+        rows_by_id[activity["activity_id"]] = activity
+    # updated_at n'est conservé que pour les lignes insérées ou réellement modifiées
+    updated_at = datetime.now()
+    rows = [{**row, "updated_at": updated_at} for row in rows_by_id.values()]
+    if not rows:
+        return 0
+
+    update_columns = [
+        column for column in rows[0]
+        if column in activities_table.c and column not in UPSERT_IMMUTABLE_COLUMNS
+    ]
 
-    log.info(f"Début de l'insertion de {len(new_activities)} nouvelles activités...")
+    log.info(f"Début de l'upsert de {len(rows)} activités par lots de {chunk_size}...")
     try:
+        changed = []
         with engine.begin() as conn:
-            conn.execute(sa.insert(activities_table), new_activities)
-        log.info(f"Stockage terminé: {len(new_activities)} nouvelles activités ajoutées.")
+            stmt = upsert_statement(conn.dialect.name, activities_table, ["activity_id"], update_columns)
+            for chunk in _chunks(rows, chunk_size):
+                if stmt is None:
+                    changed.extend(_upsert_chunk_generic(conn, activities_table, chunk, update_columns))
+                else:
+                    result = conn.execute(
+                        stmt.returning(activities_table.c.user_id, activities_table.c.start_time), chunk
+                    )
+                    changed.extend(row._asdict() for row in result)
+            refresh_for_activities(conn, activities_table, changed, tables["daily_user_load"])
+        skipped_count = len(rows) - len(changed)
+        if skipped_count > 0:
+            log.info(f"{skipped_count} activités déjà existantes et inchangées ont été ignorées.")
+        log.info(f"Stockage terminé: {len(changed)} activités ajoutées ou mises à jour.")
+        for changed_user_id in {activity.get("user_id") for activity in changed}:
+            invalidate_user_stats(changed_user_id)
+        return len(changed)
     except Exception as e:
-        log.error("Erreur lors de l'insertion en masse des activités. Transaction annulée.", exc_info=True)
+        log.error("Erreur lors de l'upsert en masse des activités. Transaction annulée.", exc_info=True)
         raise
 
 def store_metrics_in_db(engine, tables: Dict, metrics_data: Dict[str, Any]):
@@ -252,26 +418,32 @@ def store_metrics_in_db(engine, tables: Dict, metrics_data: Dict[str, Any]):
     metrics_table = tables["metrics"]
     user_id = metrics_data["user_id"]
     date_calcul = metrics_data["date_calcul"]
+    update_columns = [
+        column for column in metrics_data
+        if column in metrics_table.c and column not in ("metrics_id", "user_id", "date_calcul")
+    ]
 
-    with engine.connect() as conn:
-        select_stmt = metrics_table.select().where(
-            (metrics_table.c.user_id == user_id) &
-            (metrics_table.c.date_calcul == date_calcul)
-        )
-        result = conn.execute(select_stmt).fetchone()
-
-        if result:
+    with engine.begin() as conn:
+        # Upsert atomique sur l'index unique (user_id, date_calcul)
+        stmt = None
+        if update_columns:
+            stmt = upsert_statement(conn.dialect.name, metrics_table, ["user_id", "date_calcul"], update_columns)
+        if stmt is not None:
+            conn.execute(stmt, metrics_data)
+            log.info(f"Métriques enregistrées pour user_id={user_id}, date={date_calcul}")
+        else:
+            # Autres dialectes : UPDATE puis INSERT si aucune ligne n'existe
             update_stmt = metrics_table.update().where(
                 (metrics_table.c.user_id == user_id) &
                 (metrics_table.c.date_calcul == date_calcul)
             ).values(**metrics_data)
-            conn.execute(update_stmt)
-            log.info(f"Métriques mises à jour pour user_id={user_id}, date={date_calcul}")
-        else:
-            insert_stmt = metrics_table.insert().values(**metrics_data)
-            conn.execute(insert_stmt)
-            log.info(f"Nouvelles métriques insérées pour user_id={user_id}, date={date_calcul}")
-        conn.commit()
+            if conn.execute(update_stmt).rowcount:
+                log.info(f"Métriques mises à jour pour user_id={user_id}, date={date_calcul}")
+            else:
+                conn.execute(metrics_table.insert().values(**metrics_data))
+                log.info(f"Nouvelles métriques insérées pour user_id={user_id}, date={date_calcul}")
+    # Les métriques font partie du contexte de coaching mis en cache par utilisateur
+    invalidate_user_stats(user_id)
 
 def get_activities_from_db(engine, tables, limit=10, offset=0):
     with engine.connect() as conn:
@@ -0,0 +1,201 @@
+"""
+Récupération paginée des activités Garmin : incrémentale, concurrente et reprenable
+
+Les pages de get_activities(start, limit) sont préchargées par un pool de
+threads borné et consommées dans l'ordre (les plus récentes d'abord). Une
+page en échec est relancée avec une attente exponentielle ; si elle échoue
+définitivement, la récupération s'arrête avec un jeton de reprise au lieu
+d'une liste partielle silencieuse.
+
+En mode incrémental, la pagination s'arrête à la plus récente activité déjà
+stockée (high-water mark), persistée par utilisateur dans garmin_sync_state
+avec le jeton de reprise éventuel. Le high-water mark n'est avancé qu'après
+le stockage des activités (save_sync_state), jamais à la récupération.
+"""
+
+import base64
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import sqlalchemy as sa
+
+from src.config import GARMIN_FETCH_BACKOFF_SECONDS, GARMIN_FETCH_RETRIES, GARMIN_FETCH_WORKERS
+
+log = logging.getLogger(__name__)
+
+garmin_sync_state = sa.Table(
+    "garmin_sync_state", sa.MetaData(),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id"), primary_key=True),
+    # Plus récente activité stockée : la synchronisation incrémentale s'arrête là
+    sa.Column("high_water_activity_id", sa.BigInteger),
+    # Jeton de la dernière récupération interrompue, repris au prochain passage
+    sa.Column("resume_token", sa.String(255)),
+    sa.Column("updated_at", sa.DateTime, default=datetime.now),
+)
+
+
+@dataclass
+class GarminFetchResult:
+    """Activités récupérées (les plus récentes d'abord) et état de la récupération"""
+    activities: List[Dict[str, Any]] = field(default_factory=list)
+    complete: bool = True
+    resume_token: Optional[str] = None
+    newest_activity_id: Optional[int] = None
+    stop_at_activity_id: Optional[int] = None
+
+    @property
+    def high_water_mark(self) -> Optional[int]:
+        """High-water mark à persister une fois les activités stockées"""
+        if not self.complete:
+            # Les activités entre l'ancien repère et la page en échec restent à récupérer
+            return self.stop_at_activity_id
+        return self.newest_activity_id or self.stop_at_activity_id
+
+
+def encode_resume_token(start_index: int, stop_at_activity_id: Optional[int], newest_activity_id: Optional[int]) -> str:
+    payload = {"start": start_index, "stop_at": stop_at_activity_id, "newest": newest_activity_id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_resume_token(token: str) -> Dict[str, Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return {"start": int(payload["start"]), "stop_at": payload.get("stop_at"), "newest": payload.get("newest")}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Jeton de reprise Garmin invalide : {token!r}") from e
+
+
+def _fetch_page(garmin, start_index: int, limit: int, max_retries: int, backoff_seconds: float) -> List[Dict[str, Any]]:
+    # Import différé : db_manager importe ce module pour la table garmin_sync_state
+    from garminconnect import GarminConnectAuthenticationError
+
+    for attempt in range(max_retries + 1):
+        try:
+            return garmin.get_activities(start_index, limit) or []
+        except GarminConnectAuthenticationError:
+            raise
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_seconds * 2 ** attempt
+            log.warning(f"Échec du lot à l'index {start_index} ({e}), nouvelle tentative dans {delay:.1f}s.")
+            time.sleep(delay)
+
+
+def fetch_garmin_activities(garmin, batch_size: int = 100, stop_at_activity_id: Optional[int] = None,
+                            resume_token: Optional[str] = None, max_workers: int = GARMIN_FETCH_WORKERS,
+                            max_retries: int = GARMIN_FETCH_RETRIES,
+                            backoff_seconds: float = GARMIN_FETCH_BACKOFF_SECONDS,
+                            on_page: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> GarminFetchResult:
+    """
+    Récupère les activités Garmin, des plus récentes aux plus anciennes
+
+    Args:
+        garmin: Client Garmin connecté (get_activities(start, limit))
+        batch_size: Nombre d'activités par page
+        stop_at_activity_id: High-water mark ; arrêt à la première activité d'identifiant inférieur ou égal
+        resume_token: Jeton d'une récupération interrompue ; reprend à la page en échec
+        max_workers: Nombre maximal de pages en vol
+        max_retries: Relances par page avant abandon
+        backoff_seconds: Attente avant la première relance (doublée ensuite)
+        on_page: Appelé dans l'ordre avec les nouvelles activités de chaque page (archive brute)
+
+    Returns:
+        GarminFetchResult: activités, complétude et jeton de reprise en cas d'échec
+    """
+    start_index, newest_activity_id = 0, None
+    if resume_token:
+        token = decode_resume_token(resume_token)
+        # Une page de recouvrement : des suppressions côté Garmin ont pu décaler les index
+        start_index = max(0, token["start"] - batch_size)
+        stop_at_activity_id = token["stop_at"]
+        newest_activity_id = token["newest"]
+        log.info(f"Reprise de la récupération Garmin à l'index {start_index}.")
+
+    result = GarminFetchResult(newest_activity_id=newest_activity_id, stop_at_activity_id=stop_at_activity_id)
+    seen = set()
+    # En incrémental la première page suffit souvent : la fenêtre de préchargement grandit ensuite
+    window = 1 if stop_at_activity_id is not None else max_workers
+    next_index = start_index
+    pending = deque()
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="garmin-fetch")
+    log.info(f"Début de la récupération des activités par lots de {batch_size} ({max_workers} en parallèle).")
+    try:
+        while True:
+            while len(pending) < window:
+                pending.append((next_index, pool.submit(_fetch_page, garmin, next_index, batch_size, max_retries, backoff_seconds)))
+                next_index += batch_size
+
+            page_index, future = pending.popleft()
+            try:
+                page = future.result()
+            except Exception:
+                log.error(f"Erreur lors de la récupération du lot d'activités à l'index {page_index}.", exc_info=True)
+                result.complete = False
+                result.resume_token = encode_resume_token(page_index, stop_at_activity_id, result.newest_activity_id)
+                break
+
+            if not page:
+                log.info("Aucune nouvelle activité trouvée. Fin de la récupération.")
+                break
+
+            reached = False
+            page_start = len(result.activities)
+            for activity in page:
+                activity_id = activity.get("activityId")
+                if stop_at_activity_id is not None and activity_id is not None and activity_id <= stop_at_activity_id:
+                    reached = True
+                    break
+                if activity_id is not None:
+                    if activity_id in seen:
+                        continue
+                    seen.add(activity_id)
+                    if result.newest_activity_id is None:
+                        result.newest_activity_id = activity_id
+                result.activities.append(activity)
+            if on_page is not None:
+                on_page(result.activities[page_start:])
+            log.info(f"{len(page)} activités reçues à l'index {page_index}. Total actuel : {len(result.activities)}.")
+
+            if reached:
+                log.info(f"Activité {stop_at_activity_id} déjà stockée atteinte. Fin de la récupération incrémentale.")
+                break
+            window = min(max_workers, window * 2)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if result.activities:
+        first_date = result.activities[0].get('startTimeLocal')
+        last_date = result.activities[-1].get('startTimeLocal')
+        log.info(f"Récupération terminée. {len(result.activities)} activités trouvées, de {first_date} à {last_date}.")
+    return result
+
+
+def load_sync_state(engine, user_id: int, table: sa.Table = garmin_sync_state) -> Dict[str, Any]:
+    """High-water mark et jeton de reprise de l'utilisateur (vides à la première synchronisation)"""
+    with engine.connect() as conn:
+        row = conn.execute(
+            sa.select(table.c.high_water_activity_id, table.c.resume_token).where(table.c.user_id == user_id)
+        ).first()
+    if row is None:
+        return {"high_water_activity_id": None, "resume_token": None}
+    return {"high_water_activity_id": row.high_water_activity_id, "resume_token": row.resume_token}
+
+
+def save_sync_state(engine, user_id: int, result: GarminFetchResult, table: sa.Table = garmin_sync_state) -> None:
+    """Persiste le repère d'une récupération, à appeler après le stockage de ses activités"""
+    values = {
+        "high_water_activity_id": result.high_water_mark,
+        "resume_token": result.resume_token,
+        "updated_at": datetime.now(),
+    }
+    with engine.begin() as conn:
+        updated = conn.execute(table.update().where(table.c.user_id == user_id).values(**values))
+        if updated.rowcount == 0:
+            conn.execute(table.insert().values(user_id=user_id, **values))
@@ -0,0 +1,152 @@
+"""
+Profil FC par utilisateur et répartition des activités par zone cardiaque
+
+Le profil (FC max observée, FC de repos du UserProfile Django, bornes des
+zones) est calculé par une seule agrégation puis mis en cache par
+utilisateur : le cache réutilise les marqueurs de version de stats_cache,
+remplacés à chaque écriture d'activités ou modification du UserProfile. La répartition est ensuite une
+seule agrégation GROUP BY dont le CASE compare la FC moyenne aux bornes
+liées en paramètres, au lieu de réévaluer MAX(max_hr) dans chaque branche.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import sqlalchemy as sa
+
+from src.stats_cache import UserStatsCache
+
+log = logging.getLogger(__name__)
+
+# (fraction de la FC max, libellé) ; la dernière zone n'a pas de borne haute
+FIVE_ZONES: Tuple[Tuple[Optional[float], str], ...] = (
+    (0.6, "Zone 1 - Récupération active"),
+    (0.7, "Zone 2 - Endurance fondamentale"),
+    (0.8, "Zone 3 - Tempo/Seuil aérobie"),
+    (0.9, "Zone 4 - Seuil anaérobie"),
+    (None, "Zone 5 - Puissance/VO2max"),
+)
+THREE_ZONES: Tuple[Tuple[Optional[float], str], ...] = (
+    (0.7, "Zone 1-2 - Endurance"),
+    (0.85, "Zone 3-4 - Tempo/Seuil"),
+    (None, "Zone 5 - VO2max"),
+)
+
+# Activités trop courtes exclues de la répartition (secondes)
+MIN_DURATION_SECONDS = 300
+
+activities = sa.table(
+    "activities",
+    sa.column("user_id"), sa.column("max_hr"), sa.column("average_hr"),
+    sa.column("duration_seconds"), sa.column("distance_meters"), sa.column("training_load"),
+)
+
+hr_profile_cache = UserStatsCache(max_entries=4096)
+
+
+class HRProfile(NamedTuple):
+    user_id: int
+    max_hr_recorded: Optional[float]
+    avg_max_hr: Optional[float]
+    activities_with_hr: int
+    resting_hr: Optional[int] = None
+
+    def boundaries(self, zones=FIVE_ZONES) -> Tuple[float, ...]:
+        """Bornes hautes (FC) des zones, vides sans FC max observée"""
+        if self.max_hr_recorded is None:
+            return ()
+        return tuple(self.max_hr_recorded * fraction for fraction, _ in zones if fraction is not None)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "max_hr_recorded": self.max_hr_recorded,
+            "avg_max_hr": self.avg_max_hr,
+            "activities_with_hr": self.activities_with_hr,
+            "resting_hr": self.resting_hr,
+        }
+
+
+def compute_hr_profile(engine, user_id: int) -> HRProfile:
+    """FC max observée de l'utilisateur, en une agrégation"""
+    query = sa.select(
+        sa.func.max(activities.c.max_hr), sa.func.avg(activities.c.max_hr), sa.func.count()
+    ).where(activities.c.user_id == user_id, activities.c.max_hr.is_not(None))
+    with engine.connect() as conn:
+        max_hr, avg_max_hr, count = conn.execute(query).one()
+    return HRProfile(user_id, max_hr, avg_max_hr, count or 0)
+
+
+def get_hr_profile(engine, user_id: int, resting_hr: Optional[int] = None,
+                   cache: UserStatsCache = hr_profile_cache,
+                   resting_hr_loader: Optional[Callable[[int], Optional[int]]] = None) -> HRProfile:
+    """
+    Profil FC mis en cache, invalidé à la prochaine écriture d'activités ou de
+    UserProfile de l'utilisateur
+
+    Args:
+        resting_hr: FC de repos imposée par l'appelant, prioritaire sur celle du cache
+        resting_hr_loader: lecture de la FC de repos du UserProfile Django, appelée
+            seulement quand le profil est recalculé ; sa valeur est conservée dans le cache
+    """
+    cached = cache.get(user_id)
+    if cached is None:
+        version = cache.version(user_id)
+        cached = compute_hr_profile(engine, user_id)
+        if resting_hr_loader is not None:
+            cached = cached._replace(resting_hr=resting_hr_loader(user_id))
+        cache.set(user_id, cached, version)
+    return cached if resting_hr is None else cached._replace(resting_hr=resting_hr)
+
+
+def _round(value, digits: int) -> Optional[float]:
+    return None if value is None else round(float(value), digits)
+
+
+def zone_distribution(engine, profile: HRProfile, zones=FIVE_ZONES) -> List[Dict[str, Any]]:
+    """
+    Répartition des activités de l'utilisateur par zone FC, en un passage
+
+    Une activité est dans la première zone dont la borne haute est >= sa FC
+    moyenne ; sans FC max observée, toutes tombent dans la dernière zone.
+    Les bornes du profil sont liées en paramètres : l'agrégation reste en base.
+    """
+    a = activities.c
+    boundaries = profile.boundaries(zones)
+    zone = sa.case(
+        *[(a.average_hr <= boundary, index) for index, boundary in enumerate(boundaries)], else_=len(zones) - 1
+    ) if boundaries else sa.literal(len(zones) - 1)
+    # Zone calculée dans une sous-requête : le GROUP BY porte sur une colonne, pas sur le CASE paramétré
+    classified = sa.select(
+        zone.label("zone"), a.average_hr, a.duration_seconds, a.training_load,
+        (a.distance_meters / a.duration_seconds * 3.6).label("pace_kmh"),
+    ).where(
+        a.user_id == profile.user_id,
+        a.average_hr.is_not(None),
+        a.duration_seconds > MIN_DURATION_SECONDS,
+    ).subquery()
+    c = classified.c
+    query = sa.select(
+        c.zone,
+        sa.func.count().label("activities_count"),
+        sa.func.avg(c.duration_seconds).label("avg_duration"),
+        sa.func.sum(c.duration_seconds).label("total_duration"),
+        sa.func.avg(c.training_load).label("avg_training_load"),
+        sa.func.avg(c.pace_kmh).label("avg_pace_kmh"),
+        sa.func.min(c.average_hr).label("min_hr"),
+        sa.func.max(c.average_hr).label("max_hr"),
+        sa.func.avg(c.average_hr).label("avg_hr"),
+    ).group_by(c.zone).order_by(c.zone)
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
+
+    return [{
+        "hr_zone": zones[row.zone][1],
+        "activities_count": row.activities_count,
+        "avg_duration_min": _round(row.avg_duration / 60.0, 1),
+        "total_hours": _round(row.total_duration / 3600.0, 1),
+        "avg_training_load": _round(row.avg_training_load, 1),
+        "avg_pace_kmh": _round(row.avg_pace_kmh, 2),
+        "min_hr": _round(row.min_hr, 0),
+        "max_hr": _round(row.max_hr, 0),
+        "avg_hr": _round(row.avg_hr, 0),
+    } for row in rows]
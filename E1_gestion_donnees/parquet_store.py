@@ -0,0 +1,301 @@
+"""
+Export colonnaire (Parquet) des activités pour l'analytique et les exports
+
+Un fichier par utilisateur et par mois, en partitionnement Hive :
+<PARQUET_EXPORT_DIR>/activities/user_id=<id>/month=<AAAA-MM>/part-0.parquet
+
+Les lectures (read_activities) passent par pyarrow.dataset : seules les
+colonnes demandées sont décodées, la partition de l'utilisateur est choisie
+par le chemin et les filtres sont évalués sur les statistiques des groupes
+de lignes, sans solliciter la base transactionnelle.
+
+Le rafraîchissement est incrémental : une empreinte par partition (nombre
+de lignes, sommes d'identifiants et de colonnes numériques, longueur des
+libellés, derniers created_timestamp et updated_at) est calculée côté base
+en une requête GROUP BY et comparée au manifeste ; seules les partitions
+dont l'empreinte a changé sont réécrites. updated_at, avancé par chaque
+upsert qui modifie une ligne (db_manager.store_activities_in_db), couvre
+les colonnes hors empreinte ; une écriture directe qui ne le met pas à
+jour peut passer inaperçue : full=True reconstruit tout l'export. Les activités sans start_time ne sont pas exportées.
+"""
+
+import json
+import logging
+import shutil
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import sqlalchemy as sa
+
+from src.config import PARQUET_EXPORT_DIR
+
+log = logging.getLogger(__name__)
+
+PARTITION_COLUMNS = ("user_id", "month")
+MANIFEST_NAME = "_manifest.json"
+
+
+def month_expression(start_time, dialect_name: str):
+    """Mois 'AAAA-MM' d'une activité, calculé côté base"""
+    if dialect_name == "sqlite":
+        return sa.func.strftime("%Y-%m", start_time)
+    return sa.func.to_char(start_time, "YYYY-MM")
+
+
+def _arrow_type(column: sa.Column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, (sa.Integer, sa.BigInteger)):
+        return pa.int64()
+    if isinstance(column_type, sa.Float):
+        return pa.float64()
+    if isinstance(column_type, sa.DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, sa.Date):
+        return pa.date32()
+    if isinstance(column_type, sa.Boolean):
+        return pa.bool_()
+    return pa.string()
+
+
+def arrow_schema(table: sa.Table) -> pa.Schema:
+    """
+    Schéma fixe dérivé de la table : une partition dont une colonne est
+    entièrement vide garde le même type que les autres
+    """
+    return pa.schema([
+        pa.field(column.name, _arrow_type(column))
+        for column in table.columns if column.name not in PARTITION_COLUMNS
+    ])
+
+
+def _dataset_dir(root: Path) -> Path:
+    return Path(root) / "activities"
+
+
+def _partition_dir(root: Path, user_id: int, month: str) -> Path:
+    return _dataset_dir(root) / f"user_id={user_id}" / f"month={month}"
+
+
+def _load_manifest(root: Path) -> Dict[str, Any]:
+    path = _dataset_dir(root) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(root: Path, manifest: Dict[str, Any]) -> None:
+    path = _dataset_dir(root) / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    tmp.replace(path)
+
+
+def partition_fingerprints(conn, activities_table: sa.Table,
+                           user_ids: Optional[Iterable[int]] = None) -> Dict[Tuple[int, str], str]:
+    """Empreinte de chaque partition (utilisateur, mois), en une requête agrégée"""
+    a = activities_table.c
+    month = month_expression(a.start_time, conn.dialect.name).label("month")
+    numeric = [a.distance_meters, a.duration_seconds, a.training_load, a.average_hr, a.calories, a.average_speed]
+    query = (
+        sa.select(
+            a.user_id, month,
+            sa.func.count(),
+            sa.func.sum(a.activity_id),
+            *[sa.func.sum(sa.func.coalesce(column, 0)) for column in numeric],
+            sa.func.sum(sa.func.coalesce(sa.func.length(a.activity_name), 0)),
+            sa.func.sum(sa.func.coalesce(sa.func.length(a.activity_type), 0)),
+            sa.func.max(a.created_timestamp),
+            sa.func.max(a.updated_at),
+        )
+        .where(a.start_time.is_not(None))
+        .group_by(a.user_id, month)
+    )
+    if user_ids is not None:
+        query = query.where(a.user_id.in_(list(user_ids)))
+    return {
+        (row[0], row[1]): json.dumps([str(value) for value in row[2:]])
+        for row in conn.execute(query)
+    }
+
+
+def _month_bounds(month: str) -> Tuple[date, date]:
+    year, month_number = map(int, month.split("-"))
+    start = date(year, month_number, 1)
+    end = date(year + month_number // 12, month_number % 12 + 1, 1)
+    return start, end
+
+
+def _write_user_partitions(conn, activities_table: sa.Table, schema: pa.Schema, root: Path,
+                           user_id: int, months: List[str]) -> int:
+    """Réécrit les mois donnés de l'utilisateur, lus en une seule requête"""
+    a = activities_table.c
+    first, _ = _month_bounds(min(months))
+    _, last = _month_bounds(max(months))
+    month = month_expression(a.start_time, conn.dialect.name).label("month")
+    # Bornes sur start_time : l'index (user_id, start_time) sert la lecture
+    query = (
+        sa.select(month, *[activities_table.c[name] for name in schema.names])
+        .where(a.user_id == user_id, a.start_time >= first, a.start_time < last)
+        .order_by(a.start_time)
+    )
+    df = pd.DataFrame(conn.execute(query).fetchall(), columns=["month", *schema.names])
+    months_of_rows = df.pop("month").to_numpy()
+    for field in schema:
+        if pa.types.is_timestamp(field.type):
+            values = pd.to_datetime(df[field.name])
+            # Horodatages avec fuseau (PostgreSQL) stockés en UTC sans fuseau
+            df[field.name] = values.dt.tz_convert(None) if values.dt.tz is not None else values
+    # Conversion Arrow unique par utilisateur ; triées par start_time, les lignes d'un mois sont contiguës
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False).replace_schema_metadata(None)
+
+    rows = 0
+    for month_value in months:
+        positions = np.flatnonzero(months_of_rows == month_value)
+        month_table = table.slice(positions[0], len(positions)) if len(positions) else table.slice(0, 0)
+        partition = _partition_dir(root, user_id, month_value)
+        partition.mkdir(parents=True, exist_ok=True)
+        # Fichier temporaire masqué (préfixe '.') : jamais lu par activities_dataset
+        tmp = partition / ".part-0.parquet.tmp"
+        pq.write_table(month_table, tmp, compression="zstd")
+        tmp.replace(partition / "part-0.parquet")
+        rows += month_table.num_rows
+    return rows
+
+
+def refresh_parquet_export(engine, tables: Dict[str, sa.Table], root: Path = PARQUET_EXPORT_DIR,
+                           user_ids: Optional[Iterable[int]] = None, full: bool = False) -> Dict[str, int]:
+    """
+    Met à jour l'export Parquet des activités
+
+    Args:
+        engine: Moteur SQLAlchemy de la base transactionnelle
+        tables: Tables de create_tables
+        root: Racine de l'export
+        user_ids: Utilisateurs à rafraîchir (tous par défaut)
+        full: Réécrit toutes les partitions sans comparer les empreintes
+
+    Returns:
+        dict: partitions réécrites, supprimées et inchangées, lignes écrites
+    """
+    activities_table = tables["activities"]
+    schema = arrow_schema(activities_table)
+    user_ids = None if user_ids is None else set(user_ids)
+    manifest = {} if full else _load_manifest(root)
+    stats = {"written": 0, "deleted": 0, "unchanged": 0, "rows": 0}
+
+    with engine.connect() as conn:
+        fingerprints = partition_fingerprints(conn, activities_table, user_ids)
+        changed: Dict[int, List[str]] = {}
+        for (user_id, month), fingerprint in sorted(fingerprints.items()):
+            if manifest.get(f"{user_id}/{month}") == fingerprint and _partition_dir(root, user_id, month).exists():
+                stats["unchanged"] += 1
+            else:
+                changed.setdefault(user_id, []).append(month)
+
+        for user_id, months in changed.items():
+            stats["rows"] += _write_user_partitions(conn, activities_table, schema, root, user_id, months)
+            for month in months:
+                manifest[f"{user_id}/{month}"] = fingerprints[(user_id, month)]
+            stats["written"] += len(months)
+
+    # Partitions disparues de la base (activités supprimées ou déplacées)
+    current = {f"{user_id}/{month}" for user_id, month in fingerprints}
+    for key in list(manifest):
+        user_id, month = key.split("/")
+        if key in current or (user_ids is not None and int(user_id) not in user_ids):
+            continue
+        shutil.rmtree(_partition_dir(root, int(user_id), month), ignore_errors=True)
+        del manifest[key]
+        stats["deleted"] += 1
+    if full:
+        known = {f"{user_id}/{month}" for user_id, month in fingerprints}
+        for partition in _dataset_dir(root).glob("user_id=*/month=*"):
+            user_id, month = partition.parent.name.split("=")[1], partition.name.split("=")[1]
+            if f"{user_id}/{month}" not in known and (user_ids is None or int(user_id) in user_ids):
+                shutil.rmtree(partition, ignore_errors=True)
+                stats["deleted"] += 1
+
+    _save_manifest(root, manifest)
+    log.info(
+        f"Export Parquet : {stats['written']} partitions réécrites ({stats['rows']} lignes), "
+        f"{stats['unchanged']} inchangées, {stats['deleted']} supprimées."
+    )
+    return stats
+
+
+def parquet_export_available(root: Path = PARQUET_EXPORT_DIR) -> bool:
+    return (_dataset_dir(root) / MANIFEST_NAME).exists()
+
+
+def activities_dataset(root: Path = PARQUET_EXPORT_DIR, user_id: Optional[int] = None) -> ds.Dataset:
+    """Dataset des activités exportées ; avec user_id, seul le répertoire de l'utilisateur est parcouru"""
+    if user_id is not None:
+        source = _dataset_dir(root) / f"user_id={user_id}"
+        partitioning = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+    else:
+        source = _dataset_dir(root)
+        partitioning = ds.partitioning(pa.schema([("user_id", pa.int64()), ("month", pa.string())]), flavor="hive")
+    return ds.dataset(source, format="parquet", partitioning=partitioning,
+                      exclude_invalid_files=False, ignore_prefixes=[".", "_"])
+
+
+def _read_latest(user_id: int, latest: int, columns: Optional[List[str]],
+                 filter: Optional[ds.Expression], root: Path) -> pd.DataFrame:
+    """Parcourt les mois du plus récent au plus ancien et s'arrête dès `latest` lignes retenues"""
+    months = sorted(_dataset_dir(root).glob(f"user_id={user_id}/month=*/part-0.parquet"), reverse=True)
+    scan_columns = None if columns is None else list(dict.fromkeys([*columns, "start_time"]))
+    tables, rows = [], 0
+    for path in months:
+        table = ds.dataset(path, format="parquet").to_table(columns=scan_columns, filter=filter)
+        tables.append(table)
+        rows += table.num_rows
+        if rows >= latest:
+            break
+    if not tables:
+        return pd.DataFrame(columns=columns or [])
+    df = pa.concat_tables(tables).to_pandas()
+    df = df.sort_values("start_time", ascending=False, kind="stable").head(latest).reset_index(drop=True)
+    return df if columns is None else df[columns]
+
+
+def read_activities(user_id: Optional[int] = None, columns: Optional[List[str]] = None,
+                    filter: Optional[ds.Expression] = None, root: Path = PARQUET_EXPORT_DIR,
+                    latest: Optional[int] = None) -> pd.DataFrame:
+    """
+    Lit les activités exportées
+
+    Args:
+        user_id: Restreint au répertoire de l'utilisateur (les autres partitions ne sont pas listées)
+        columns: Colonnes à décoder (toutes par défaut)
+        filter: Prédicat pyarrow (ds.field("distance_meters") >= 3000), poussé aux groupes de lignes
+        root: Racine de l'export
+        latest: Avec user_id, les `latest` activités les plus récentes (par start_time décroissant) ;
+            seuls les mois nécessaires sont lus
+
+    Returns:
+        pd.DataFrame: activités correspondantes
+    """
+    if user_id is None:
+        return activities_dataset(root).to_table(columns=columns, filter=filter).to_pandas()
+    if not (_dataset_dir(root) / f"user_id={user_id}").exists():
+        return pd.DataFrame(columns=columns or [])
+    wants_user_id = columns is None or "user_id" in columns
+    dataset_columns = None if columns is None else [c for c in columns if c != "user_id"]
+    if latest is not None:
+        df = _read_latest(user_id, latest, dataset_columns, filter, root)
+    else:
+        df = activities_dataset(root, user_id).to_table(columns=dataset_columns, filter=filter).to_pandas()
+    if wants_user_id:
+        df["user_id"] = user_id
+        if columns is not None:
+            df = df[columns]
+    return df
@@ -0,0 +1,140 @@
+"""
+Archive brute des activités Garmin : NDJSON compressé, en ajout seul
+
+Une ligne JSON par activité, un fichier par utilisateur et par jour de
+synchronisation : <RAW_ARCHIVE_DIR>/user_<id>/<AAAA-MM-JJ>.ndjson.zst
+(.ndjson.gz si zstandard n'est pas installé).
+
+Chaque page reçue de Garmin est ajoutée comme une trame compressée
+indépendante (gzip et zstd lisent les trames concaténées) : l'écriture se
+fait au fil de la pagination, sans garder tout l'historique en mémoire, et
+une synchronisation interrompue laisse une archive lisible jusqu'à la
+dernière page écrite. La relecture est en flux, ligne à ligne.
+"""
+
+import gzip
+import io
+import json
+import logging
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from src.config import RAW_ARCHIVE_CODEC, RAW_ARCHIVE_DIR
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger(__name__)
+
+SUFFIXES = {"zstd": ".ndjson.zst", "gzip": ".ndjson.gz", None: ".ndjson"}
+
+
+def resolve_codec(codec: Optional[str]) -> Optional[str]:
+    """Codec effectivement utilisable (repli gzip si zstandard est absent)"""
+    if codec == "zstd" and zstandard is None:
+        log.warning("zstandard non disponible - archive brute compressée en gzip")
+        return "gzip"
+    if codec not in SUFFIXES:
+        raise ValueError(f"Codec d'archive non pris en charge : {codec}")
+    return codec
+
+
+def codec_for_path(path: Path) -> Optional[str]:
+    if path.name.endswith(".zst"):
+        return "zstd"
+    if path.name.endswith(".gz"):
+        return "gzip"
+    return None
+
+
+def partition_path(user_id: Optional[int], day: date, root: Path = RAW_ARCHIVE_DIR,
+                   codec: Optional[str] = RAW_ARCHIVE_CODEC) -> Path:
+    owner = f"user_{user_id}" if user_id is not None else "user_inconnu"
+    return Path(root) / owner / f"{day.isoformat()}{SUFFIXES[resolve_codec(codec)]}"
+
+
+def _compress(payload: bytes, codec: Optional[str]) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(payload)
+    if codec == "gzip":
+        return gzip.compress(payload, compresslevel=6)
+    return payload
+
+
+class RawArchiveWriter:
+    """Ajoute des pages d'activités brutes à un fichier NDJSON compressé"""
+
+    def __init__(self, user_id: Optional[int] = None, path: Optional[Union[str, Path]] = None,
+                 root: Path = RAW_ARCHIVE_DIR, codec: Optional[str] = RAW_ARCHIVE_CODEC, day: Optional[date] = None):
+        if path is not None:
+            self.path = Path(path)
+            self.codec = resolve_codec(codec_for_path(self.path))
+        else:
+            self.codec = resolve_codec(codec)
+            self.path = partition_path(user_id, day or date.today(), root, self.codec)
+        self.count = 0
+
+    def write_page(self, activities: List[Dict[str, Any]]) -> None:
+        """Ajoute une page (une trame compressée) ; utilisable comme on_page de fetch_garmin_activities"""
+        if not activities:
+            return
+        payload = "".join(
+            json.dumps(activity, ensure_ascii=False, separators=(",", ":")) + "\n" for activity in activities
+        ).encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(_compress(payload, self.codec))
+        self.count += len(activities)
+
+
+def _open_text(path: Path):
+    codec = codec_for_path(path)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError(f"zstandard est requis pour lire {path}")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    if codec == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_raw_activities(paths: Union[str, Path, Iterable[Union[str, Path]]]) -> Iterator[Dict[str, Any]]:
+    """
+    Relit des activités brutes en flux, fichier par fichier et ligne par ligne
+
+    Les anciens fichiers raw_garmin_data_*.json (liste JSON indentée) restent
+    lisibles, mais sont chargés en entier.
+    """
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+    for path in map(Path, paths):
+        if path.suffix == ".json":
+            with open(path, "r", encoding="utf-8") as f:
+                yield from json.load(f)
+            continue
+        with _open_text(path) as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def archive_paths(user_id: Optional[int], root: Path = RAW_ARCHIVE_DIR,
+                  start: Optional[date] = None, end: Optional[date] = None) -> List[Path]:
+    """Fichiers de l'utilisateur, par jour croissant, éventuellement bornés (inclus)"""
+    owner = f"user_{user_id}" if user_id is not None else "user_inconnu"
+    paths = []
+    for path in (Path(root) / owner).glob("*.ndjson*"):
+        day = date.fromisoformat(path.name.split(".", 1)[0])
+        if (start is None or day >= start) and (end is None or day <= end):
+            paths.append((day, path))
+    return [path for _, path in sorted(paths)]
+
+
+def iter_user_archive(user_id: Optional[int], root: Path = RAW_ARCHIVE_DIR,
+                      start: Optional[date] = None, end: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+    """Rejoue l'archive brute d'un utilisateur (à passer à process_garmin_activities)"""
+    return iter_raw_activities(archive_paths(user_id, root, start, end))
@@ -1,5 +1,10 @@
-
+import argparse
 import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
 
 def export_sqlite_to_sqlite_dump(sqlite_db_path, output_file):
     conn = sqlite3.connect(sqlite_db_path)
@@ -9,8 +14,28 @@ def export_sqlite_to_sqlite_dump(sqlite_db_path, output_file):
     conn.close()
     print(f"Dump SQLite exporté dans {output_file}")
 
+
+def export_activities_to_parquet(full=False):
+    """Export Parquet des activités (partitions utilisateur/mois), incrémental sauf full=True"""
+    from E1_gestion_donnees.db_manager import create_db_engine, create_tables
+    from E1_gestion_donnees.parquet_store import refresh_parquet_export
+    from src.config import PARQUET_EXPORT_DIR
+
+    engine = create_db_engine()
+    stats = refresh_parquet_export(engine, create_tables(engine), full=full)
+    print(f"Export Parquet dans {PARQUET_EXPORT_DIR} : {stats}")
+
+
 if __name__ == "__main__":
-    sqlite_db_path = "data/garmin_data.db"  # Chemin vers votre base de données SQLite
-    output_file = "data/garmin_data_dump.sql"  # Chemin vers le fichier de sortie
-    
-    export_sqlite_to_sqlite_dump(sqlite_db_path, output_file)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Export de la base de données.")
+    parser.add_argument('--parquet', action='store_true', help="Export Parquet des activités au lieu du dump SQLite.")
+    parser.add_argument('--full', action='store_true', help="Avec --parquet : réécrit toutes les partitions.")
+    args = parser.parse_args()
+
+    if args.parquet:
+        export_activities_to_parquet(full=args.full)
+    else:
+        sqlite_db_path = "data/garmin_data.db"  # Chemin vers votre base de données SQLite
+        output_file = "data/garmin_data_dump.sql"  # Chemin vers le fichier de sortie
+
+        export_sqlite_to_sqlite_dump(sqlite_db_path, output_file)
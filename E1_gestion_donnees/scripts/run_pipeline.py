@@ -4,6 +4,8 @@ import sys
 import os
 import logging
 import argparse
+import pandas as pd
+import sqlalchemy as sa
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
@@ -14,13 +16,23 @@ project_root = Path(__file__).resolve().parent.parent
 
 # --- Imports de votre logique métier ---
 # MODIFICATION: On importe les nouvelles fonctions et dépendances
-from E1_gestion_donnees.data_manager import fetch_and_process_garmin_data, compute_performance_metrics, fetch_and_store_splits
+from E1_gestion_donnees.data_manager import (
+    connect_garmin,
+    process_garmin_activities,
+    create_activities_dataframe,
+    compute_performance_metrics,
+    fetch_and_store_splits
+)
 from E1_gestion_donnees.db_manager import (
     create_db_engine, 
     create_tables, 
     store_activities_in_db,
     store_metrics_in_db  # NOTE: Fonction à créer dans db_manager.py
 )
+from E1_gestion_donnees.daily_load import get_load_windows
+from E1_gestion_donnees.parquet_store import refresh_parquet_export
+from E1_gestion_donnees.garmin_sync import fetch_garmin_activities, load_sync_state, save_sync_state
+from E1_gestion_donnees.raw_archive import RawArchiveWriter
 from src.config import USER_ID, LOG_LEVEL, GARMIN_EMAIL, GARMIN_PASSWORD
 
 # --- Configuration du Logging ---
@@ -40,7 +52,7 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 
-def run_garmin_data_pipeline(user: int):
+def run_garmin_data_pipeline(user: int, incremental: bool = False):
     """
     Exécute l'ensemble du pipeline de données Garmin pour un utilisateur donné.
     Ce script orchestre un processus en deux temps :
@@ -49,40 +61,72 @@ def run_garmin_data_pipeline(user: int):
     
     Args:
         user (int): L'identifiant de l'utilisateur pour lequel exécuter le pipeline.
+        incremental (bool): Ne récupère que les activités postérieures au dernier repère
+            persisté (et reprend une récupération interrompue).
     """
     try:
         log.info(f"Démarrage du pipeline de données Garmin pour l'utilisateur ID: {user}...")
+        engine = create_db_engine()
+        tables = create_tables(engine)
         
         # --- ÉTAPE 1: EXTRACTION ET TRANSFORMATION DES ACTIVITÉS ---
         log.info("Étape 1/4: Récupération et traitement des données depuis la source Garmin.")
-        processed_result = fetch_and_process_garmin_data(user_id=user, save_raw=True)
-        if processed_result is None:
-            log.error("Aucune donnée n'a été récupérée ou traitée. Arrêt du pipeline.")
+        garmin_client = connect_garmin(GARMIN_EMAIL, GARMIN_PASSWORD)
+        if not garmin_client:
+            log.error("La connexion à Garmin a échoué. Arrêt du pipeline.")
+            return
+        # Archive brute (NDJSON compressé) écrite au fil des pages reçues de Garmin
+        archive = RawArchiveWriter(user_id=user)
+        if incremental:
+            sync_state = load_sync_state(engine, user, tables["garmin_sync_state"])
+            fetch_result = fetch_garmin_activities(
+                garmin_client,
+                stop_at_activity_id=sync_state["high_water_activity_id"],
+                resume_token=sync_state["resume_token"],
+                on_page=archive.write_page,
+            )
+        else:
+            fetch_result = fetch_garmin_activities(garmin_client, on_page=archive.write_page)
+        if not fetch_result.complete:
+            log.warning(f"Récupération interrompue : {len(fetch_result.activities)} activités, reprise au prochain passage incrémental.")
+        activities_raw = fetch_result.activities
+        if not activities_raw:
+            log.info("Aucune nouvelle activité à traiter.")
+            save_sync_state(engine, user, fetch_result, tables["garmin_sync_state"])
             return
-        activities_df, processed_activities = processed_result
+        log.info(f"{archive.count} activités brutes archivées dans {archive.path}")
+        processed_activities = process_garmin_activities(activities_raw, user_id=user)
+        activities_df = create_activities_dataframe(processed_activities)
         log.info(f"DataFrame créé avec succès, contenant {len(activities_df)} activités.")
 
-        # --- ÉTAPE 1B: RÉCUPÉRATION ET STOCKAGE DES SPLITS ---
-        log.info("Étape 1B: Récupération et stockage des splits pour chaque activité.")
-        engine = create_db_engine()
-        tables = create_tables(engine)
-        # On doit récupérer le client Garmin et la liste d'activités brutes
-        from garminconnect import Garmin
-        garmin_client = Garmin(GARMIN_EMAIL, GARMIN_PASSWORD)
-        garmin_client.login()
-        # Récupère toutes les activités brutes (non processées)
-        from E1_gestion_donnees.data_manager import get_all_garmin_activities
-        activities_raw = get_all_garmin_activities(garmin_client)
+        # --- ÉTAPE 1B: STOCKAGE DES SPLITS ---
+        # Les splits sont extraits des activités brutes déjà récupérées (plus de second passage Garmin)
+        log.info("Étape 1B: Stockage des splits pour chaque activité.")
         fetch_and_store_splits(garmin_client, engine, tables, activities_raw)
 
         # --- ÉTAPE 2: STOCKAGE DES ACTIVITÉS TRAITÉES ---
         log.info("Étape 2/4: Connexion à la base de données et stockage des activités.")
         store_activities_in_db(engine, tables, processed_activities)
         log.info("Activités stockées avec succès dans la base de données.")
+        # Repère avancé seulement une fois les activités stockées
+        save_sync_state(engine, user, fetch_result, tables["garmin_sync_state"])
+        # Export Parquet de l'analytique : seules les partitions mensuelles modifiées sont réécrites
+        try:
+            refresh_parquet_export(engine, tables, user_ids=[user])
+        except Exception as e:
+            log.warning(f"Rafraîchissement de l'export Parquet ignoré : {e}")
         
         # --- ÉTAPE 3: CALCUL DES MÉTRIQUES DE PERFORMANCE ---
         log.info("Étape 3/4: Calcul des métriques de performance agrégées.")
-        metrics_data = compute_performance_metrics(activities_df=activities_df, user_id=user)
+        if incremental:
+            # Seules les nouvelles activités ont été récupérées : VMA et records portent sur tout l'historique
+            activities_table = tables["activities"]
+            activities_df = pd.read_sql(
+                sa.select(activities_table).where(activities_table.c.user_id == user), engine
+            )
+        # Charges 7j/28j lues sur la synthèse daily_user_load maintenue à l'étape 2
+        load_windows = get_load_windows(engine, user, load_table=tables["daily_user_load"])
+        metrics_data = compute_performance_metrics(activities_df=activities_df, user_id=user, load_windows=load_windows)
         if not metrics_data:
             log.warning("Le calcul des métriques n'a retourné aucune donnée. Étape de stockage des métriques ignorée.")
         else:
@@ -107,9 +151,14 @@ def main():
         default=USER_ID,
         help=f"L'ID de l'utilisateur à traiter (défaut: {USER_ID} depuis le fichier de config)."
     )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="Ne récupère que les nouvelles activités depuis la dernière synchronisation."
+    )
     args = parser.parse_args()
     
-    run_garmin_data_pipeline(user=args.user_id)
+    run_garmin_data_pipeline(user=args.user_id, incremental=args.incremental)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Maintenance et lecture de la synthèse DailyUserLoad
+
+Le dashboard et les fenêtres de charge 7j/28j lisent DailyUserLoad (une ligne
+par utilisateur, jour et type) au lieu d'agréger les activités brutes : le
+coût dépend de la période affichée, plus de l'historique de l'utilisateur.
+Chaque écriture d'Activity recalcule uniquement les jours touchés (signals.py) ;
+deferred_daily_load_refresh() regroupe ces recalculs pour les synchronisations
+en masse.
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+HR_ZONES = range(1, 6)
+DAYS_PER_QUERY = 500  # limite de paramètres SQLite pour day__in
+
+_deferred = threading.local()
+
+
+def activity_day(start_time):
+    """Jour calendaire d'une activité dans le fuseau courant (identique à TruncDate)"""
+    if isinstance(start_time, str):
+        start_time = parse_datetime(start_time)
+    if timezone.is_aware(start_time):
+        return timezone.localdate(start_time)
+    return start_time.date()
+
+
+def _aggregates():
+    aggregates = {
+        'n_activities': Count('id'),
+        'total_distance': Coalesce(Sum('distance_meters'), 0.0),
+        'total_duration': Coalesce(Sum('duration_seconds'), 0),
+        'total_load': Coalesce(Sum('training_load'), 0.0),
+        'total_calories': Coalesce(Sum('calories'), 0),
+        'longest_distance': Coalesce(Max('distance_meters'), 0.0),
+        'longest_duration': Coalesce(Max('duration_seconds'), 0),
+        'hr_sum': Coalesce(Sum('average_hr'), 0),
+        'hr_count': Count('average_hr'),
+        'pace_sum': Coalesce(Sum('average_pace'), 0.0),
+        'pace_count': Count('average_pace'),
+    }
+    for zone in HR_ZONES:
+        aggregates[f'zone_{zone}'] = Coalesce(Sum(f'hr_zone_{zone}_time'), 0)
+    return aggregates
+
+
+def refresh_daily_user_load(user_id, days=None, activity_model=None, load_model=None):
+    """
+    Recalcule les lignes DailyUserLoad de l'utilisateur pour les jours donnés
+    (tout l'historique si days est None). Les modèles sont paramétrables pour
+    être utilisables depuis une migration.
+    """
+    if activity_model is None or load_model is None:
+        from .models import Activity, DailyUserLoad
+        activity_model, load_model = activity_model or Activity, load_model or DailyUserLoad
+
+    if days is None:
+        batches = [None]
+    else:
+        days = sorted(set(days))
+        batches = [days[i:i + DAYS_PER_QUERY] for i in range(0, len(days), DAYS_PER_QUERY)]
+
+    with transaction.atomic():
+        for batch in batches:
+            activities = activity_model.objects.filter(user_id=user_id)
+            existing = load_model.objects.filter(user_id=user_id)
+            if batch is not None:
+                activities = activities.filter(start_time__date__in=batch)
+                existing = existing.filter(day__in=batch)
+
+            rows = (
+                activities.annotate(day=TruncDate('start_time'))
+                .values('day', 'activity_type')
+                .annotate(**_aggregates())
+                .order_by()
+            )
+            existing.delete()
+            load_model.objects.bulk_create([
+                load_model(
+                    user_id=user_id,
+                    day=row['day'],
+                    activity_type=row['activity_type'],
+                    activity_count=row['n_activities'],
+                    distance_meters=row['total_distance'],
+                    duration_seconds=row['total_duration'],
+                    training_load=row['total_load'],
+                    calories=row['total_calories'],
+                    max_distance_meters=row['longest_distance'],
+                    max_duration_seconds=row['longest_duration'],
+                    average_hr_sum=row['hr_sum'],
+                    average_hr_count=row['hr_count'],
+                    average_pace_sum=row['pace_sum'],
+                    average_pace_count=row['pace_count'],
+                    **{f'hr_zone_{zone}_seconds': row[f'zone_{zone}'] for zone in HR_ZONES}
+                )
+                for row in rows
+            ])
+
+
+def schedule_refresh(user_id, day):
+    """Recalcule le jour immédiatement, ou à la sortie de deferred_daily_load_refresh()"""
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.setdefault(user_id, set()).add(day)
+    else:
+        transaction.on_commit(lambda: refresh_daily_user_load(user_id, [day]))
+
+
+@contextmanager
+def deferred_daily_load_refresh():
+    """Regroupe les recalculs déclenchés par une synchronisation : un seul passage par utilisateur"""
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+    _deferred.pending = {}
+    try:
+        yield
+    finally:
+        pending, _deferred.pending = _deferred.pending, None
+        for user_id, days in pending.items():
+            refresh_daily_user_load(user_id, days)
+
+
+def period_summary(user, days=30, today=None):
+    """
+    Statistiques du dashboard sur les `days` derniers jours, lues sur DailyUserLoad.
+    Toutes les activités comptent, y compris celles de moins de 10 minutes, comme
+    l'agrégat d'origine du dashboard (aucun filtre de durée).
+    """
+    from .models import DailyUserLoad
+
+    today = today or timezone.localdate()
+    rows = DailyUserLoad.objects.filter(user=user, day__gt=today - timedelta(days=days))
+
+    totals = rows.aggregate(
+        total_count=Sum('activity_count'),
+        total_distance=Sum('distance_meters'),
+        total_duration=Sum('duration_seconds'),
+        hr_sum=Sum('average_hr_sum'),
+        hr_count=Sum('average_hr_count'),
+        pace_sum=Sum('average_pace_sum'),
+        pace_count=Sum('average_pace_count'),
+        max_distance=Max('max_distance_meters'),
+        max_duration=Max('max_duration_seconds'),
+    )
+    stats = {
+        'total_count': totals['total_count'] or 0,
+        'total_distance': totals['total_distance'],
+        'total_duration': totals['total_duration'],
+        'avg_pace': totals['pace_sum'] / totals['pace_count'] if totals['pace_count'] else None,
+        'avg_hr': totals['hr_sum'] / totals['hr_count'] if totals['hr_count'] else None,
+        'max_distance': totals['max_distance'],
+        'max_duration': totals['max_duration'],
+    }
+    activity_types = list(
+        rows.values('activity_type')
+        .annotate(count=Sum('activity_count'), distance=Sum('distance_meters'))
+        .order_by('-count')
+    )
+    return stats, activity_types
+
+
+def get_load_windows(user_id, today=None):
+    """Charges 7j/28j pour compute_performance_metrics (au plus 28 jours de synthèse lus)"""
+    from .models import DailyUserLoad
+
+    today = today or timezone.localdate()
+    loads = DailyUserLoad.objects.filter(user_id=user_id, day__gt=today - timedelta(days=28))
+    charge_28j = loads.aggregate(total=Sum('training_load'))['total'] or 0.0
+    charge_7j = loads.filter(day__gt=today - timedelta(days=7)).aggregate(total=Sum('training_load'))['total'] or 0.0
+    return {
+        'charge_7j': charge_7j,
+        'charge_28j': charge_28j,
+        'acwr': charge_7j / (charge_28j / 4) if charge_28j > 0 else None,
+    }
@@ -0,0 +1,249 @@
+"""
+Ingestion en masse des activités synchronisées (Garmin)
+
+Une synchronisation de N activités ne fait plus N x 3 allers-retours
+(exists() puis create() par activité) : les clés déjà présentes sont
+préchargées par lots, les nouvelles activités sont écrites avec
+bulk_create et les existantes avec bulk_update, le tout dans une seule
+transaction.
+
+bulk_create/bulk_update ne déclenchent pas les signaux d'Activity : les
+jours touchés de DailyUserLoad sont donc planifiés ici, et recalculés une
+seule fois en fin de synchronisation.
+
+Les valeurs des champs viennent de la table de correspondance partagée
+avec E1 (E1_gestion_donnees.activity_mapping) : activity_values_from_frame
+convertit un lot normalisé en champs d'Activity, colonne par colonne.
+"""
+
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from .daily_load import activity_day, deferred_daily_load_refresh, schedule_refresh
+from .models import Activity
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK_SIZE = 500  # sous la limite de paramètres SQLite pour les filtres __in
+
+# Types Garmin (typeKey) vers les choix d'Activity.activity_type ; les autres deviennent 'other'
+GARMIN_ACTIVITY_TYPES = {
+    **{choice: choice for choice, _ in Activity._meta.get_field('activity_type').choices},
+    'fitness_equipment': 'strength_training',
+}
+# Valeurs des champs obligatoires du modèle quand Garmin ne les fournit pas (absentes ou vides)
+DEFAULT_VALUES = {'activity_name': 'Activité Garmin', 'device_name': 'Inconnu'}
+
+
+@dataclass
+class IngestionResult:
+    """Bilan d'une ingestion : chaque activité reçue est comptée une seule fois"""
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+
+def activity_values_from_frame(frame):
+    """
+    Champs d'Activity pour un lot normalisé (E1_gestion_donnees.activity_mapping)
+
+    Args:
+        frame: DataFrame de normalize_activities (ou ses colonnes E1)
+
+    Returns:
+        list: dicts {champ d'Activity: valeur}, dates aware dans le fuseau par défaut
+    """
+    from E1_gestion_donnees.activity_mapping import ACTIVITY_FIELDS, activity_records
+
+    columns = {}
+    for spec in ACTIVITY_FIELDS:
+        if not spec.django or spec.name not in frame:
+            continue
+        values = frame[spec.name]
+        if spec.dtype == 'datetime' and values.dt.tz is None:
+            # Heure locale Garmin interprétée dans le fuseau par défaut (comme timezone.make_aware)
+            values = values.dt.tz_localize(
+                timezone.get_default_timezone(), ambiguous=np.ones(len(values), dtype=bool), nonexistent='shift_forward'
+            )
+        for field in spec.django:
+            columns[field] = values
+    values = pd.DataFrame(columns, index=frame.index)
+
+    if 'activity_type' in values:
+        values['activity_type'] = values['activity_type'].astype('string').str.lower().map(GARMIN_ACTIVITY_TYPES).fillna('other')
+    if 'start_time' in values:
+        # Date absente ou illisible : repli sur maintenant
+        now = pd.Timestamp(timezone.now()).tz_convert(values['start_time'].dt.tz)
+        values['start_time'] = values['start_time'].fillna(now)
+    for field, default in DEFAULT_VALUES.items():
+        if field in values:
+            values[field] = values[field].mask(values[field].isna() | (values[field] == ''), default)
+    return activity_records(values)
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _name_time_key(values):
+    return values.get('activity_name'), values.get('start_time')
+
+
+def _prefetch_existing(user, activities, update_existing, chunk_size):
+    """
+    Activités déjà en base pour les clés du lot uniquement (jamais tout
+    l'historique) : activity_id (unique sur toute la table), garmin_id et
+    couple nom/date de l'utilisateur.
+    """
+    by_activity_id, by_garmin_id, by_name_time = {}, {}, {}
+
+    activity_ids = {values['activity_id'] for values in activities if values.get('activity_id')}
+    for chunk in _chunks(activity_ids, chunk_size):
+        for activity_id, pk, user_id, start_time in (
+            Activity.objects.filter(activity_id__in=chunk).values_list('activity_id', 'pk', 'user_id', 'start_time')
+        ):
+            by_activity_id[activity_id] = (pk, user_id, start_time, activity_id)
+
+    if update_existing:
+        garmin_ids = {values['garmin_id'] for values in activities if values.get('garmin_id')}
+        for chunk in _chunks(garmin_ids, chunk_size):
+            for garmin_id, pk, start_time, current_id in (
+                Activity.objects.filter(user=user, garmin_id__in=chunk)
+                .values_list('garmin_id', 'pk', 'start_time', 'activity_id')
+            ):
+                by_garmin_id[garmin_id] = (pk, user.id, start_time, current_id)
+
+    start_times = {values['start_time'] for values in activities if values.get('start_time')}
+    for chunk in _chunks(start_times, chunk_size):
+        for name, start_time, pk, current_id in (
+            Activity.objects.filter(user=user, start_time__in=chunk)
+            .values_list('activity_name', 'start_time', 'pk', 'activity_id')
+        ):
+            by_name_time[(name, start_time)] = (pk, user.id, start_time, current_id)
+
+    return by_activity_id, by_garmin_id, by_name_time
+
+
+def _stored_keys(keys, chunk_size, user=None):
+    """
+    Clés du lot (activity_id, ou couple nom/date sans activity_id) déjà en
+    base, pour l'utilisateur seulement si user est fourni
+    """
+    activity_ids = [key for key in keys if not isinstance(key, tuple)]
+    name_times = {key for key in keys if isinstance(key, tuple)}
+    queryset = Activity.objects.filter(user=user) if user is not None else Activity.objects.all()
+
+    stored = set()
+    for chunk in _chunks(activity_ids, chunk_size):
+        stored.update(queryset.filter(activity_id__in=chunk).values_list('activity_id', flat=True))
+    for chunk in _chunks({start_time for _, start_time in name_times}, chunk_size):
+        stored.update(
+            key for key in queryset.filter(start_time__in=chunk, activity_id__isnull=True)
+            .values_list('activity_name', 'start_time')
+            if key in name_times
+        )
+    return stored
+
+
+def bulk_store_activities(user, activities, update_existing=False, synced_at=None,
+                          chunk_size=BULK_CHUNK_SIZE) -> IngestionResult:
+    """
+    Stocke un lot d'activités pour l'utilisateur
+
+    Args:
+        user: Instance utilisateur Django
+        activities: Liste de dicts {champ d'Activity: valeur} (start_time aware)
+        update_existing: Met à jour les activités déjà présentes au lieu de les ignorer
+        synced_at: Horodatage de la synchronisation (maintenant par défaut)
+        chunk_size: Taille des lots de préchargement et d'écriture
+
+    Returns:
+        IngestionResult: activités insérées, mises à jour et ignorées
+    """
+    synced_at = synced_at or timezone.now()
+    result = IngestionResult()
+
+    with deferred_daily_load_refresh(), transaction.atomic():
+        by_activity_id, by_garmin_id, by_name_time = _prefetch_existing(user, activities, update_existing, chunk_size)
+
+        to_create = {}
+        to_update = {}
+        seen_name_time = set()
+        for values in activities:
+            activity_id = values.get('activity_id')
+            name_time = _name_time_key(values)
+            existing = (
+                by_activity_id.get(activity_id)
+                or (update_existing and by_garmin_id.get(values.get('garmin_id')))
+                or by_name_time.get(name_time)
+            )
+
+            if existing:
+                pk, owner_id, previous_start, current_id = existing
+                # activity_id est unique sur toute la table : jamais de réaffectation à un autre utilisateur
+                if not update_existing or owner_id != user.id or (activity_id and current_id not in (None, activity_id)):
+                    result.skipped += 1
+                    continue
+                if pk in to_update:
+                    result.skipped += 1  # doublon dans le lot : la dernière version est retenue
+                to_update[pk] = (values, previous_start)
+                continue
+
+            key = activity_id or name_time
+            if key in to_create:
+                result.skipped += 1  # doublon dans le lot
+                if update_existing:
+                    to_create[key] = values
+                continue
+            if name_time in seen_name_time:
+                result.skipped += 1  # même nom et même date qu'une autre activité du lot
+                continue
+            to_create[key] = values
+            seen_name_time.add(name_time)
+
+        # ignore_conflicts : une synchronisation concurrente a pu insérer les mêmes activités entre-temps.
+        # Les lignes écrites sont les clés du lot absentes avant l'insertion et présentes après
+        # (ni comptage par synced_at, partagé par d'autres lots, ni lignes écartées par un conflit)
+        stored_before = _stored_keys(to_create, chunk_size)
+        Activity.objects.bulk_create(
+            [Activity(user=user, synced_at=synced_at, **values) for values in to_create.values()],
+            batch_size=chunk_size, ignore_conflicts=True,
+        )
+        inserted_keys = _stored_keys(to_create, chunk_size, user=user) - stored_before
+        result.inserted = len(inserted_keys)
+        result.skipped += len(to_create) - result.inserted
+        for key in inserted_keys:
+            schedule_refresh(user.id, activity_day(to_create[key].get('start_time')))
+
+        if to_update:
+            update_fields = sorted({field for values, _ in to_update.values() for field in values} | {'synced_at', 'updated_at'})
+            Activity.objects.bulk_update(
+                [
+                    Activity(pk=pk, user=user, synced_at=synced_at, updated_at=synced_at, **values)
+                    for pk, (values, _) in to_update.items()
+                ],
+                update_fields,
+                batch_size=chunk_size,
+            )
+            result.updated = len(to_update)
+            for values, previous_start in to_update.values():
+                schedule_refresh(user.id, activity_day(values.get('start_time') or previous_start))
+                schedule_refresh(user.id, activity_day(previous_start))
+
+    if result.inserted or result.updated:
+        # Les statistiques mises en cache par FastAPI ne sont plus à jour
+        from src.stats_cache import invalidate_user_stats
+        invalidate_user_stats(user.id)
+
+    logger.info(
+        f"Ingestion utilisateur {user.id} : {result.inserted} insérées, "
+        f"{result.updated} mises à jour, {result.skipped} ignorées"
+    )
+    return result
@@ -8,10 +8,7 @@ Utilise Django ORM au lieu de SQLAlchemy
 import logging
 import sys
 from pathlib import Path
-from datetime import datetime
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.utils import timezone
 
 # Imports pour les données Garmin
 # Chemin depuis django_app vers la racine du projet
@@ -29,6 +26,8 @@ except ImportError as e:
 # Imports Django
 from accounts.models import User
 from activities.models import Activity, ActivitySplit
+from activities.daily_load import get_load_windows
+from activities.ingestion import activity_values_from_frame, bulk_store_activities
 
 
 class Command(BaseCommand):
@@ -80,86 +79,30 @@ class Command(BaseCommand):
                 log.error("Aucune donnée récupérée depuis Garmin")
                 return
 
-            activities_df, processed_activities = processed_result
+            activities_df, _ = processed_result
             log.info(f"DataFrame créé: {len(activities_df)} activités")
 
             # --- ÉTAPE 2: STOCKAGE AVEC DJANGO ORM ---
             log.info("💾 Étape 2/4: Stockage des activités avec Django ORM...")
             
-            stored_count = 0
-            updated_count = 0
-
-            for activity_data in processed_activities:
-                try:
-                    with transaction.atomic():
-                        # Convertir les données pour Django
-                        garmin_id = activity_data.get('activity_id')
-                        
-                        # Parse de la date
-                        start_time = activity_data.get('start_time')
-                        if isinstance(start_time, str):
-                            try:
-                                start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                            except:
-                                start_time = datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S')
-                        
-                        if start_time and not timezone.is_aware(start_time):
-                            start_time = timezone.make_aware(start_time)
-
-                        # Créer ou mettre à jour l'activité
-                        activity, created = Activity.objects.update_or_create(
-                            garmin_id=garmin_id,
-                            defaults={
-                                'user': django_user,
-                                'activity_name': activity_data.get('activity_name', f'Activité {garmin_id}'),
-                                'activity_type': activity_data.get('activity_type', 'running'),
-                                'start_time': start_time,
-                                'duration_seconds': int(activity_data.get('duration_seconds', 0)),
-                                'distance_meters': float(activity_data.get('distance_meters', 0)),
-                                'average_speed': activity_data.get('average_speed'),
-                                'max_speed': activity_data.get('max_speed'),
-                                'calories': int(activity_data.get('calories')) if activity_data.get('calories') else None,
-                                'average_hr': int(activity_data.get('average_hr')) if activity_data.get('average_hr') else None,
-                                'max_hr': int(activity_data.get('max_hr')) if activity_data.get('max_hr') else None,
-                                'elevation_gain': activity_data.get('elevation_gain'),
-                                'elevation_loss': activity_data.get('elevation_loss'),
-                                'start_latitude': activity_data.get('start_latitude'),
-                                'start_longitude': activity_data.get('start_longitude'),
-                                'device_name': activity_data.get('device_name') or 'Inconnu',
-                                'steps': int(activity_data.get('steps')) if activity_data.get('steps') else None,
-                                'average_cadence': int(activity_data.get('average_running_cadence')) if activity_data.get('average_running_cadence') else None,
-                                'max_cadence': int(activity_data.get('max_running_cadence')) if activity_data.get('max_running_cadence') else None,
-                                'stride_length': activity_data.get('stride_length'),
-                                'vo2_max': activity_data.get('vo2max_estime'),
-                                'training_load': activity_data.get('training_load'),
-                                'aerobic_effect': activity_data.get('aerobic_effect'),
-                                'anaerobic_effect': activity_data.get('anaerobic_effect'),
-                                'fastest_5k': activity_data.get('fastest_split_5000'),
-                                'fastest_10k': activity_data.get('fastest_split_10000'),
-                                'hr_zone_1_time': int(activity_data.get('hr_zone_1', 0) * 60) if activity_data.get('hr_zone_1') else None,
-                                'hr_zone_2_time': int(activity_data.get('hr_zone_2', 0) * 60) if activity_data.get('hr_zone_2') else None,
-                                'hr_zone_3_time': int(activity_data.get('hr_zone_3', 0) * 60) if activity_data.get('hr_zone_3') else None,
-                                'hr_zone_4_time': int(activity_data.get('hr_zone_4', 0) * 60) if activity_data.get('hr_zone_4') else None,
-                                'hr_zone_5_time': int(activity_data.get('hr_zone_5', 0) * 60) if activity_data.get('hr_zone_5') else None,
-                                'synced_at': timezone.now()
-                            }
-                        )
-
-                        if created:
-                            stored_count += 1
-                        else:
-                            updated_count += 1
-
-                except Exception as e:
-                    log.error(f"Erreur traitement activité {garmin_id}: {e}")
-
-            log.info(f"Stockage terminé: {stored_count} créées, {updated_count} mises à jour")
+            # Champs d'Activity tirés de la même table de correspondance que le stockage E1
+            activities = activity_values_from_frame(activities_df)
+
+            # Création ou mise à jour en masse : une transaction, synthèse DailyUserLoad recalculée une fois par jour touché
+            result = bulk_store_activities(django_user, activities, update_existing=True)
+
+            log.info(
+                f"Stockage terminé: {result.inserted} créées, {result.updated} mises à jour, "
+                f"{result.skipped} ignorées"
+            )
 
             # --- ÉTAPE 3: CALCUL DES MÉTRIQUES ---
             log.info("Étape 3/4: Calcul des métriques de performance...")
             
             try:
-                metrics_data = compute_performance_metrics(activities_df=activities_df, user_id=user_id)
+                metrics_data = compute_performance_metrics(
+                    activities_df=activities_df, user_id=user_id, load_windows=get_load_windows(django_user.id)
+                )
                 if metrics_data:
                     log.info(f"Métriques calculées: {len(metrics_data)} entrées")
                 else:
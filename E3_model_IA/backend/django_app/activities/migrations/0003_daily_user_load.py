@@ -0,0 +1,141 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_daily_user_load(apps, schema_editor):
+    """Initialise la synthèse à partir des activités existantes"""
+    from activities.daily_load import refresh_daily_user_load
+
+    Activity = apps.get_model("activities", "Activity")
+    DailyUserLoad = apps.get_model("activities", "DailyUserLoad")
+    user_ids = Activity.objects.values_list("user_id", flat=True).distinct().order_by()
+    for user_id in user_ids:
+        refresh_daily_user_load(user_id, activity_model=Activity, load_model=DailyUserLoad)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("activities", "0002_activity_activities__user_id_27dc1d_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyUserLoad",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="Day")),
+                (
+                    "activity_type",
+                    models.CharField(max_length=50, verbose_name="Activity type"),
+                ),
+                (
+                    "activity_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Activities"),
+                ),
+                (
+                    "distance_meters",
+                    models.FloatField(default=0.0, verbose_name="Distance (meters)"),
+                ),
+                (
+                    "duration_seconds",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Duration (seconds)"
+                    ),
+                ),
+                (
+                    "training_load",
+                    models.FloatField(default=0.0, verbose_name="Training load"),
+                ),
+                (
+                    "calories",
+                    models.IntegerField(default=0, verbose_name="Calories burned"),
+                ),
+                (
+                    "max_distance_meters",
+                    models.FloatField(
+                        default=0.0, verbose_name="Max distance (meters)"
+                    ),
+                ),
+                (
+                    "max_duration_seconds",
+                    models.IntegerField(
+                        default=0, verbose_name="Max duration (seconds)"
+                    ),
+                ),
+                ("average_hr_sum", models.FloatField(default=0.0)),
+                ("average_hr_count", models.PositiveIntegerField(default=0)),
+                ("average_pace_sum", models.FloatField(default=0.0)),
+                ("average_pace_count", models.PositiveIntegerField(default=0)),
+                (
+                    "hr_zone_1_seconds",
+                    models.IntegerField(
+                        default=0, verbose_name="HR Zone 1 time (seconds)"
+                    ),
+                ),
+                (
+                    "hr_zone_2_seconds",
+                    models.IntegerField(
+                        default=0, verbose_name="HR Zone 2 time (seconds)"
+                    ),
+                ),
+                (
+                    "hr_zone_3_seconds",
+                    models.IntegerField(
+                        default=0, verbose_name="HR Zone 3 time (seconds)"
+                    ),
+                ),
+                (
+                    "hr_zone_4_seconds",
+                    models.IntegerField(
+                        default=0, verbose_name="HR Zone 4 time (seconds)"
+                    ),
+                ),
+                (
+                    "hr_zone_5_seconds",
+                    models.IntegerField(
+                        default=0, verbose_name="HR Zone 5 time (seconds)"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_loads",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily user load",
+                "verbose_name_plural": "Daily user loads",
+                "ordering": ["-day"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "day"], name="activities__user_id_a936d1_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dailyuserload",
+            constraint=models.UniqueConstraint(
+                fields=("user", "day", "activity_type"),
+                name="unique_user_day_activity_type",
+            ),
+        ),
+        migrations.RunPython(backfill_daily_user_load, migrations.RunPython.noop),
+    ]
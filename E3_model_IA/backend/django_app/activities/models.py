@@ -146,6 +146,15 @@ class Activity(models.Model):
             )
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Jour d'origine pour la synthèse DailyUserLoad (signals.py), sans relecture avant save()
+        loaded = dict(zip(field_names, values))
+        if 'user_id' in loaded and 'start_time' in loaded:
+            instance._daily_load_previous = (loaded['user_id'], loaded['start_time'])
+        return instance
+    
     def __str__(self):
         return f"{self.activity_name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
     
@@ -257,4 +266,52 @@ class GPSPoint(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.activity.activity_name} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.activity.activity_name} - {self.timestamp}"
+
+class DailyUserLoad(models.Model):
+    """Synthèse quotidienne par utilisateur et type d'activité (maintenue à l'écriture, voir daily_load.py)"""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_loads')
+    day = models.DateField(_('Day'))
+    activity_type = models.CharField(_('Activity type'), max_length=50)
+    
+    # Volumes et charge
+    activity_count = models.PositiveIntegerField(_('Activities'), default=0)
+    distance_meters = models.FloatField(_('Distance (meters)'), default=0.0)
+    duration_seconds = models.BigIntegerField(_('Duration (seconds)'), default=0)
+    training_load = models.FloatField(_('Training load'), default=0.0)
+    calories = models.IntegerField(_('Calories burned'), default=0)
+    max_distance_meters = models.FloatField(_('Max distance (meters)'), default=0.0)
+    max_duration_seconds = models.IntegerField(_('Max duration (seconds)'), default=0)
+    
+    # Sommes et effectifs : moyennes exactes recombinables sur une période
+    average_hr_sum = models.FloatField(default=0.0)
+    average_hr_count = models.PositiveIntegerField(default=0)
+    average_pace_sum = models.FloatField(default=0.0)
+    average_pace_count = models.PositiveIntegerField(default=0)
+    
+    # Temps dans les zones de FC
+    hr_zone_1_seconds = models.IntegerField(_('HR Zone 1 time (seconds)'), default=0)
+    hr_zone_2_seconds = models.IntegerField(_('HR Zone 2 time (seconds)'), default=0)
+    hr_zone_3_seconds = models.IntegerField(_('HR Zone 3 time (seconds)'), default=0)
+    hr_zone_4_seconds = models.IntegerField(_('HR Zone 4 time (seconds)'), default=0)
+    hr_zone_5_seconds = models.IntegerField(_('HR Zone 5 time (seconds)'), default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Daily user load')
+        verbose_name_plural = _('Daily user loads')
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['user', 'day']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'activity_type'],
+                name='unique_user_day_activity_type'
+            )
+        ]
+    
+    def __str__(self):
+        return f"{self.user} - {self.day} - {self.activity_type}"
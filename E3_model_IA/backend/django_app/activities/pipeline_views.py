@@ -147,7 +147,7 @@ def run_garmin_pipeline_for_user(user, garmin_email: str, garmin_password: str)
             from E1_gestion_donnees.db_manager import create_db_engine, create_tables, store_activities_in_db
             
             # Sauvegarder JSON brut (requis pour E1-C1)
-            json_file = save_raw_data(raw_activities)
+            json_file = save_raw_data(raw_activities, user_id=user.id)
             logger.info(f"📄 Données brutes E1 sauvegardées : {json_file}")
             
             # Traitement et stockage E1 avec user_id cohérent (requis pour E1-C3, E1-C4)
@@ -191,6 +191,10 @@ def run_garmin_pipeline_for_user(user, garmin_email: str, garmin_password: str)
 def store_activities_in_django(user, raw_activities: list) -> int:
     """
     Stocke les activités Garmin dans les modèles Django avec prévention de duplication renforcée
+
+    Les activités sont normalisées par lot (table de correspondance partagée avec E1),
+    les doublons (par activity_id, puis par nom et date) détectés en une requête par lot
+    et les nouvelles activités écrites en masse (voir activities.ingestion).
     
     Args:
         user: Instance utilisateur Django
@@ -199,104 +203,22 @@ def store_activities_in_django(user, raw_activities: list) -> int:
     Returns:
         int: Nombre d'activités stockées
     """
-    from activities.models import Activity
-    from django.utils.dateparse import parse_datetime
-    from datetime import datetime
-    from django.db import transaction
-    
-    stored_count = 0
-    skipped_count = 0
-    
-    # Récupérer tous les activity_id existants pour cet utilisateur d'un coup
-    existing_activity_ids = set(
-        Activity.objects.filter(user=user)
-        .exclude(activity_id__isnull=True)
-        .values_list('activity_id', flat=True)
+    from E1_gestion_donnees.activity_mapping import normalize_activities
+    from activities.ingestion import activity_values_from_frame, bulk_store_activities
+
+    synced_at = timezone.now()
+    frame = normalize_activities(raw_activities, user_id=user.id)
+    activities = activity_values_from_frame(frame)
+    rejected_count = frame.attrs['rejected']
+
+    logger.info(f"🔍 Utilisateur {user.email} (ID: {user.id}) : {len(activities)} activités à synchroniser")
+    result = bulk_store_activities(user, activities, synced_at=synced_at)
+
+    logger.info(
+        f"🎯 Pipeline terminée pour utilisateur {user.id}: {result.inserted} nouvelles activités, "
+        f"{result.skipped} doublons évités, {rejected_count} rejetées"
     )
-    
-    logger.info(f"🔍 Utilisateur {user.email} (ID: {user.id}) a déjà {len(existing_activity_ids)} activités existantes")
-    
-    for activity_data in raw_activities:
-        try:
-            # Vérification renforcée de duplication
-            activity_id = activity_data.get('activityId')
-            
-            # 1. Vérification par activity_id
-            if activity_id and activity_id in existing_activity_ids:
-                logger.debug(f"Activité {activity_id} déjà existante (par ID), ignorée")
-                skipped_count += 1
-                continue
-            
-            # 2. Vérification par nom et date (au cas où activity_id serait manquant)
-            activity_name = activity_data.get('activityName', 'Activité Garmin')
-            start_time_str = activity_data.get('startTimeLocal')
-            
-            if start_time_str:
-                try:
-                    start_time = parse_datetime(start_time_str)
-                    if start_time and Activity.objects.filter(
-                        user=user,
-                        activity_name=activity_name,
-                        start_time=start_time
-                    ).exists():
-                        logger.debug(f"Activité '{activity_name}' du {start_time} déjà existante (par nom/date), ignorée")
-                        skipped_count += 1
-                        continue
-                except:
-                    start_time = timezone.now()
-            else:
-                start_time = timezone.now()
-            
-            # Parser end_time
-            end_time = None
-            if activity_data.get('endTimeLocal'):
-                try:
-                    end_time = parse_datetime(activity_data.get('endTimeLocal'))
-                except:
-                    pass
-            
-            # Utiliser une transaction pour éviter les doublons en cas de concurrence
-            with transaction.atomic():
-                # Double vérification dans la transaction
-                if activity_id and Activity.objects.filter(user=user, activity_id=activity_id).exists():
-                    logger.debug(f"Activité {activity_id} créée entre temps, ignorée")
-                    skipped_count += 1
-                    continue
-                
-                # Créer la nouvelle activité
-                activity = Activity.objects.create(
-                    user=user,
-                    activity_id=activity_id,
-                    activity_name=activity_name,
-                    activity_type=map_garmin_activity_type(activity_data.get('activityType', {}).get('typeKey', 'other')),
-                    start_time=start_time,
-                    end_time=end_time,
-                    duration_seconds=int(activity_data.get('duration', 0)) if activity_data.get('duration') else 0,
-                    distance_meters=float(activity_data.get('distance', 0)) if activity_data.get('distance') else 0.0,
-                    average_speed=activity_data.get('averageSpeed'),
-                    max_speed=activity_data.get('maxSpeed'),
-                    average_hr=activity_data.get('averageHR'),
-                    max_hr=activity_data.get('maxHR'),
-                    calories=activity_data.get('calories'),
-                    elevation_gain=activity_data.get('elevationGain'),
-                    elevation_loss=activity_data.get('elevationLoss'),
-                    device_name=activity_data.get('deviceDisplayName', ''),
-                    synced_at=timezone.now()
-                )
-                
-                # Ajouter à la liste des IDs existants
-                if activity_id:
-                    existing_activity_ids.add(activity_id)
-                
-                stored_count += 1
-                logger.info(f"✅ Activité '{activity.activity_name}' stockée pour utilisateur {user.id} (Garmin ID: {activity_id})")
-            
-        except Exception as e:
-            logger.error(f"Erreur lors du stockage d'une activité : {str(e)}")
-            continue
-    
-    logger.info(f"🎯 Pipeline terminée pour utilisateur {user.id}: {stored_count} nouvelles activités, {skipped_count} doublons évités")
-    return stored_count
+    return result.inserted
 
 
 def map_garmin_activity_type(garmin_type: str) -> str:
@@ -309,17 +231,9 @@ def map_garmin_activity_type(garmin_type: str) -> str:
     Returns:
         str: Type d'activité Django
     """
-    mapping = {
-        'running': 'running',
-        'cycling': 'cycling',
-        'swimming': 'swimming',
-        'walking': 'walking',
-        'hiking': 'hiking',
-        'fitness_equipment': 'strength_training',
-        'yoga': 'yoga',
-    }
-    
-    return mapping.get(garmin_type.lower(), 'other')
+    from activities.ingestion import GARMIN_ACTIVITY_TYPES
+
+    return GARMIN_ACTIVITY_TYPES.get(garmin_type.lower(), 'other')
 
 
 @login_required
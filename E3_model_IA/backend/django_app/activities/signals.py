@@ -0,0 +1,38 @@
+"""
+Maintien de la synthèse DailyUserLoad à chaque écriture d'Activity
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .daily_load import activity_day, schedule_refresh
+from .models import Activity
+
+
+@receiver(pre_save, sender=Activity)
+def remember_previous_day(sender, instance, raw=False, **kwargs):
+    """
+    Une modification de start_time déplace l'activité : l'ancien jour doit aussi être recalculé.
+    Connu depuis le chargement (Activity.from_db) ; relu seulement pour une instance qui n'en vient pas.
+    """
+    if instance.pk and not raw and getattr(instance, '_daily_load_previous', None) is None:
+        instance._daily_load_previous = (
+            Activity.objects.filter(pk=instance.pk).values_list('user_id', 'start_time').first()
+        )
+
+
+@receiver(post_save, sender=Activity)
+def refresh_day_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_refresh(instance.user_id, activity_day(instance.start_time))
+    previous = getattr(instance, '_daily_load_previous', None)
+    if previous:
+        schedule_refresh(previous[0], activity_day(previous[1]))
+    # Sauvegardes suivantes de la même instance : l'état enregistré devient la référence
+    instance._daily_load_previous = (instance.user_id, instance.start_time)
+
+
+@receiver(post_delete, sender=Activity)
+def refresh_day_on_delete(sender, instance, **kwargs):
+    schedule_refresh(instance.user_id, activity_day(instance.start_time))
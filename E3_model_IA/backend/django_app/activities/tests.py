@@ -1,3 +1,246 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+
+from .daily_load import refresh_daily_user_load
+from .ingestion import activity_values_from_frame, bulk_store_activities
+from .models import Activity, DailyUserLoad
+from .pipeline_views import store_activities_in_django
+
+START = timezone.make_aware(datetime(2025, 6, 1, 8, 0))
+
+
+def setUpModule():
+    # Marqueurs d'invalidation écrits par les signaux de coaching : répertoire temporaire, jamais sous data/
+    markers = tempfile.TemporaryDirectory()
+    patcher = mock.patch('src.stats_cache.STATS_CACHE_DIR', markers.name)
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+    unittest.addModuleCleanup(markers.cleanup)
+
+
+def activity_values(activity_id, day=0, **overrides):
+    values = {
+        'activity_id': activity_id,
+        'activity_name': f'Sortie {activity_id}',
+        'activity_type': 'running',
+        'start_time': START + timedelta(days=day),
+        'duration_seconds': 1800,
+        'distance_meters': 5000.0,
+        'training_load': 50.0,
+    }
+    values.update(overrides)
+    return values
+
+
+def load_rows(user):
+    return list(
+        DailyUserLoad.objects.filter(user=user).order_by('day', 'activity_type')
+        .values_list('day', 'activity_type', 'activity_count', 'distance_meters', 'training_load')
+    )
+
+
+@mock.patch('src.stats_cache.invalidate_user_stats')
+class BulkStoreActivitiesTests(TestCase):
+    """Ingestion en masse : comptes exacts, nombre de requêtes constant, synthèse maintenue"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='coureur@example.com', username='coureur', password='x')
+        self.other = User.objects.create_user(email='autre@example.com', username='autre', password='x')
+
+    def test_insertion_puis_doublons_ignores(self, invalidate):
+        result = bulk_store_activities(self.user, [activity_values(i, day=i % 5) for i in range(1, 21)])
+        self.assertEqual((result.inserted, result.updated, result.skipped), (20, 0, 0))
+
+        batch = [activity_values(i) for i in range(15, 26)]
+        # Même nom et même date qu'une activité existante, sans activity_id
+        batch.append(activity_values(None, day=1, activity_name='Sortie 1', start_time=START + timedelta(days=1)))
+        result = bulk_store_activities(self.user, batch)
+        self.assertEqual((result.inserted, result.updated, result.skipped), (5, 0, 7))
+        self.assertEqual(Activity.objects.filter(user=self.user).count(), 25)
+        invalidate.assert_called_with(self.user.id)
+
+    def test_requetes_par_lot_et_non_par_activite(self, invalidate):
+        bulk_store_activities(self.user, [activity_values(i) for i in range(1, 201)])
+        batch = [activity_values(i, day=i % 50) for i in range(100, 500)]
+        with CaptureQueriesContext(connection) as queries:
+            result = bulk_store_activities(self.user, batch)
+        self.assertEqual((result.inserted, result.skipped), (299, 101))
+        # L'ancien chemin faisait jusqu'à trois requêtes par activité
+        self.assertLess(len(queries), len(batch) // 10)
+
+    def test_doublons_dans_le_lot(self, invalidate):
+        batch = [activity_values(1), activity_values(1, distance_meters=9000.0), activity_values(2, activity_name='Sortie 1')]
+        result = bulk_store_activities(self.user, batch)
+        self.assertEqual((result.inserted, result.skipped), (1, 2))
+        self.assertEqual(Activity.objects.get(activity_id=1).distance_meters, 5000.0)
+
+    def test_activity_id_d_un_autre_utilisateur_ignore(self, invalidate):
+        bulk_store_activities(self.other, [activity_values(1)])
+        result = bulk_store_activities(self.user, [activity_values(1)], update_existing=True)
+        self.assertEqual((result.inserted, result.updated, result.skipped), (0, 0, 1))
+        self.assertEqual(Activity.objects.get(activity_id=1).user, self.other)
+
+    def test_mise_a_jour_et_synthese_identique_a_une_reconstruction(self, invalidate):
+        bulk_store_activities(self.user, [activity_values(i, day=i % 4) for i in range(1, 13)])
+        Activity.objects.filter(activity_id=3).update(notes='Ressenti : bon')
+
+        # Déplacement d'une activité vers un autre jour, modification d'une autre, une nouvelle
+        batch = [
+            activity_values(3, day=10, training_load=120.0),
+            activity_values(4, training_load=80.0),
+            activity_values(50, day=2),
+        ]
+        result = bulk_store_activities(self.user, batch, update_existing=True)
+        self.assertEqual((result.inserted, result.updated, result.skipped), (1, 2, 0))
+
+        moved = Activity.objects.get(activity_id=3)
+        self.assertEqual(moved.training_load, 120.0)
+        self.assertEqual(moved.notes, 'Ressenti : bon')  # champs hors synchronisation conservés
+
+        incremental = load_rows(self.user)
+        refresh_daily_user_load(self.user.id)
+        self.assertEqual(load_rows(self.user), incremental)
+        self.assertEqual(sum(row[2] for row in incremental), 13)
+
+    def test_meme_synced_at_pour_deux_lots(self, invalidate):
+        synced_at = timezone.now()
+        bulk_store_activities(self.user, [activity_values(i) for i in range(1, 4)], synced_at=synced_at)
+        result = bulk_store_activities(self.user, [activity_values(i) for i in range(3, 6)], synced_at=synced_at)
+        self.assertEqual((result.inserted, result.skipped), (2, 1))
+
+    def test_conflit_concurrent_ni_compte_ni_planifie(self, invalidate):
+        bulk_store_activities(self.user, [activity_values(1, day=3)])
+        batch = [activity_values(1, day=3), activity_values(2, day=5)]
+        # Activité 1 insérée par une autre synchronisation après le préchargement
+        with mock.patch('activities.ingestion._prefetch_existing', return_value=({}, {}, {})), \
+                mock.patch('activities.ingestion.schedule_refresh') as schedule:
+            result = bulk_store_activities(self.user, batch)
+        self.assertEqual((result.inserted, result.skipped), (1, 1))
+        schedule.assert_called_once_with(self.user.id, (START + timedelta(days=5)).date())
+
+    def test_correspondance_par_garmin_id(self, invalidate):
+        Activity.objects.create(user=self.user, garmin_id=77, activity_name='Ancienne', start_time=START)
+        result = bulk_store_activities(
+            self.user, [activity_values(77, garmin_id=77, activity_name='Renommée')], update_existing=True
+        )
+        self.assertEqual((result.inserted, result.updated), (0, 1))
+        activity = Activity.objects.get(garmin_id=77)
+        self.assertEqual((activity.activity_id, activity.activity_name), (77, 'Renommée'))
+
+
+@mock.patch('src.stats_cache.invalidate_user_stats')
+class StoreActivitiesInDjangoTests(TestCase):
+    """Flux Garmin brut de pipeline_views"""
+
+    def test_activites_garmin_brutes(self, invalidate):
+        user = User.objects.create_user(email='coureur@example.com', username='coureur', password='x')
+        raw = [
+            {
+                'activityId': 1000 + i,
+                'activityName': f'Course {i}',
+                'activityType': {'typeKey': 'running'},
+                'startTimeLocal': f'2025-06-{i + 1:02d} 07:30:00',
+                'duration': 1800.5,
+                'distance': 5000,
+                'averageHR': 150,
+            }
+            for i in range(10)
+        ]
+        self.assertEqual(store_activities_in_django(user, raw), 10)
+        # Date illisible : repli sur maintenant comme avant ; durée invalide : activité rejetée
+        invalid = [{'activityId': 5000, 'startTimeLocal': 'invalide'}, {'activityId': 6000, 'duration': 'x'}]
+        self.assertEqual(store_activities_in_django(user, raw + invalid), 1)
+
+        self.assertEqual(DailyUserLoad.objects.filter(user=user).count(), 11)
+        activity = Activity.objects.get(activity_id=1003)
+        self.assertEqual(activity.duration_seconds, 1800)
+        self.assertEqual(timezone.localtime(activity.start_time).hour, 7)
+
+
+class ActivityValuesFromFrameTests(TestCase):
+    """Champs d'Activity tirés de la table de correspondance partagée avec E1"""
+
+    def setUp(self):
+        from E1_gestion_donnees.activity_mapping import normalize_activities
+
+        self.raw = [
+            {
+                'activityId': 2001,
+                'activityName': 'Renfo',
+                'activityType': {'typeKey': 'strength_training'},
+                'startTimeLocal': '2025-03-30 02:30:00',
+                'duration': 1500.7,
+                'averageHR': 120.0,
+                'hrTimeInZone_1': 50.8,
+                'vO2MaxValue': 48.0,
+            },
+            {
+                'activityId': 2002,
+                'activityType': {'typeKey': 'tennis_v2'},
+                'startTimeLocal': '2025-08-22 18:36:33',
+                'distance': 5049.87,
+                'avgStrideLength': 95.8,
+            },
+        ]
+        self.frame = normalize_activities(self.raw, user_id=1)
+
+    def test_champs_django(self):
+        first, second = activity_values_from_frame(self.frame)
+        self.assertEqual((first['activity_id'], first['garmin_id']), (2001, 2001))
+        self.assertEqual(first['activity_type'], 'strength_training')
+        self.assertEqual(second['activity_type'], 'other')
+        # Temps en zone déjà en secondes chez Garmin
+        self.assertEqual(first['hr_zone_1_time'], 50.8)
+        self.assertEqual((first['vo2_max'], second['stride_length']), (48.0, 95.8))
+        self.assertEqual((second['activity_name'], second['device_name']), ('Activité Garmin', 'Inconnu'))
+        self.assertEqual(timezone.localtime(second['start_time']).replace(tzinfo=None), datetime(2025, 8, 22, 18, 36, 33))
+        # Heure inexistante (passage à l'heure d'été) décalée au lieu de lever une erreur
+        self.assertTrue(timezone.is_aware(first['start_time']))
+
+    @mock.patch('src.stats_cache.invalidate_user_stats')
+    def test_colonnes_e1_du_pipeline(self, invalidate):
+        from E1_gestion_donnees.activity_mapping import E1_COLUMNS
+
+        user = User.objects.create_user(email='coureur@example.com', username='coureur', password='x')
+        result = bulk_store_activities(user, activity_values_from_frame(self.frame[E1_COLUMNS]), update_existing=True)
+        self.assertEqual(result.inserted, 2)
+        activity = Activity.objects.get(garmin_id=2001)
+        self.assertEqual((activity.duration_seconds, activity.average_hr, activity.hr_zone_1_time), (1500, 120, 50))
+        self.assertIsNone(activity.end_time)
+
+
+class DailyLoadSignalTests(TestCase):
+    """Synthèse maintenue par les signaux d'Activity"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='coureur@example.com', username='coureur', password='x')
+
+    def test_deplacement_sans_relecture_de_l_activite(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            created = Activity.objects.create(user=self.user, **activity_values(1))
+        activity = Activity.objects.get(pk=created.pk)
+        activity.start_time = START + timedelta(days=3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                activity.save()
+        # Ancien jour connu depuis le chargement : UPDATE seul, sans SELECT préalable
+        self.assertEqual([q['sql'].split()[0] for q in queries.captured_queries], ['UPDATE'])
+
+        rows = load_rows(self.user)
+        self.assertEqual([row[:3] for row in rows], [((START + timedelta(days=3)).date(), 'running', 1)])
 
-# Create your tests here.
+        # Seconde sauvegarde de la même instance : l'ancien jour est celui du save précédent
+        activity.start_time = START + timedelta(days=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.save()
+        self.assertEqual([row[0] for row in load_rows(self.user)], [(START + timedelta(days=5)).date()])
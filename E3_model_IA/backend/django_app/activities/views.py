@@ -4,7 +4,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.db.models import Count, Avg, Sum, Max, Min, Q
+from django.db.models import Count, Avg, Sum, Min, Q
 from django.http import JsonResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -13,6 +13,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Activity, ActivitySplit, GPSPoint
+from .daily_load import period_summary
 from .serializers import ActivitySerializer, ActivitySplitSerializer, GPSPointSerializer
 from .forms import ActivityForm, ActivityFilterForm
 import json
@@ -141,16 +142,8 @@ def dashboard_view(request):
     date_from = timezone.now() - timedelta(days=30)
     activities = Activity.objects.filter(user=user, start_time__gte=date_from)
     
-    # Statistiques générales
-    stats = activities.aggregate(
-        total_count=Count('id'),
-        total_distance=Sum('distance_meters'),
-        total_duration=Sum('duration_seconds'),
-        avg_pace=Avg('average_pace'),
-        avg_hr=Avg('average_hr'),
-        max_distance=Max('distance_meters'),
-        max_duration=Max('duration_seconds')
-    )
+    # Statistiques générales et répartition par type, lues sur la synthèse quotidienne
+    stats, activity_types = period_summary(user, days=30)
     
     # Conversion des unités
     if stats['total_distance']:
@@ -162,12 +155,6 @@ def dashboard_view(request):
     if stats['max_distance']:
         stats['max_distance_km'] = round(stats['max_distance'] / 1000, 1)
     
-    # Activités par type
-    activity_types = activities.values('activity_type').annotate(
-        count=Count('id'),
-        distance=Sum('distance_meters')
-    ).order_by('-count')
-    
     # Activités récentes
     recent_activities = activities.order_by('-start_time')[:5]
     
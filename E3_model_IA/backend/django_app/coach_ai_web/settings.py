@@ -224,6 +224,10 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Agent IA de coaching : boucle asyncio de fond partagée (coaching/agent_runner.py)
+COACHING_AGENT_MAX_CONCURRENCY = env.int('COACHING_AGENT_MAX_CONCURRENCY', default=8)
+COACHING_AGENT_TIMEOUT = env.float('COACHING_AGENT_TIMEOUT', default=120.0)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
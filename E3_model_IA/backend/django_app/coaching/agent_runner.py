@@ -0,0 +1,139 @@
+"""
+Exécution de l'agent IA de coaching depuis les vues Django synchrones
+
+Les vues DRF sont synchrones : un asyncio.run() par appel crée puis ferme une
+boucle à chaque requête, alors que le graphe compilé et son checkpointer
+(AsyncSqliteSaver) restent liés à la boucle qui les a créés. Une boucle unique,
+exécutée dans un thread dédié, possède donc le graphe et le checkpointer pour
+toute la durée du processus ; chaque requête y soumet sa coroutine
+(run_coroutine_threadsafe) et attend le résultat.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+
+async def build_coaching_graph():
+    """Graphe LangGraph de l'agent coach (import différé : dépendances IA optionnelles)"""
+    from E3_model_IA.scripts.advanced_agent import get_coaching_graph, set_user_context_provider
+    from E3_model_IA.scripts.agent_metrics_cache import user_metrics
+
+    # L'outil de métriques lit les métriques en cache (partagées avec l'instantané du contexte de coaching)
+    set_user_context_provider(user_metrics)
+    return await get_coaching_graph()
+
+
+class AgentLoop:
+    """Boucle asyncio de fond, propriétaire du graphe compilé et de son checkpointer"""
+
+    def __init__(self, graph_factory: Callable[[], Awaitable[Any]],
+                 max_concurrency: int = 8, timeout: Optional[float] = None):
+        self.graph_factory = graph_factory
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._graph = None
+        self._graph_task: Optional[asyncio.Future] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Boucle de fond, démarrée au premier appel"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="coaching-agent-loop", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Planifie une coroutine sur la boucle de fond depuis n'importe quel thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def get_graph(self):
+        """Graphe compilé une seule fois ; None si l'initialisation échoue (nouvel essai à l'appel suivant)"""
+        if self._graph is None:
+            if self._graph_task is None:
+                self._graph_task = asyncio.ensure_future(self.graph_factory())
+            task = self._graph_task
+            try:
+                # shield : une requête annulée (timeout) n'interrompt pas la compilation partagée
+                self._graph = await asyncio.shield(task)
+            except Exception as e:
+                log.error(f"Erreur chargement agent IA: {e}")
+                if self._graph_task is task:
+                    self._graph_task = None
+                return None
+        return self._graph
+
+    async def collect(self, inputs: Dict[str, Any], config: Dict[str, Any]) -> Optional[str]:
+        """Concatène le dernier message de chaque étape du flux de l'agent"""
+        graph = await self.get_graph()
+        if graph is None:
+            return None
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            parts = []
+            async for event in graph.astream(inputs, config=config):
+                for step in event.values():
+                    message_obj = step["messages"][-1]
+                    if hasattr(message_obj, 'content') and message_obj.content:
+                        parts.append(message_obj.content)
+            return ''.join(parts)
+
+    def run(self, inputs: Dict[str, Any], config: Dict[str, Any]) -> Optional[str]:
+        """Exécute l'agent depuis un thread de requête ; None si l'agent n'est pas initialisé"""
+        future = self.submit(self.collect(inputs, config))
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        """Arrête la boucle de fond ; le prochain appel en redémarre une avec un nouveau graphe"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+            self._graph = self._graph_task = self._semaphore = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            loop.close()
+
+
+_agent_loop: Optional[AgentLoop] = None
+_agent_loop_lock = threading.Lock()
+
+
+def get_agent_loop() -> AgentLoop:
+    """Boucle de l'agent partagée par le processus"""
+    global _agent_loop
+    with _agent_loop_lock:
+        if _agent_loop is None:
+            _agent_loop = AgentLoop(
+                build_coaching_graph,
+                max_concurrency=getattr(settings, 'COACHING_AGENT_MAX_CONCURRENCY', 8),
+                timeout=getattr(settings, 'COACHING_AGENT_TIMEOUT', 120.0),
+            )
+        return _agent_loop
+
+
+def reset_agent_loop():
+    """Arrête et oublie la boucle partagée (tests, rechargement de configuration)"""
+    global _agent_loop
+    with _agent_loop_lock:
+        agent_loop, _agent_loop = _agent_loop, None
+    if agent_loop is not None:
+        agent_loop.stop()
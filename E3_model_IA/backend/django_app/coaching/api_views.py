@@ -6,7 +6,6 @@ Endpoints Django REST pour remplacer/compléter FastAPI
 
 import json
 import logging
-import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
@@ -16,7 +15,6 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.conf import settings
-from django.db.models import Count, Sum, Avg
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -26,6 +24,8 @@ import time
 
 from activities.models import Activity
 from accounts.models import User
+from .agent_runner import get_agent_loop
+from .context import get_coaching_context
 from .models import CoachingSession
 
 log = logging.getLogger(__name__)
@@ -37,25 +37,14 @@ try:
     project_root = Path(__file__).resolve().parent.parent.parent.parent.parent
     sys.path.append(str(project_root))
     
-    from E3_model_IA.scripts.advanced_agent import get_coaching_graph
+    # Sonde de disponibilité seulement : le graphe est construit par agent_runner
+    import E3_model_IA.scripts.advanced_agent  # noqa: F401
     from langchain_core.messages import HumanMessage
     AGENT_IA_AVAILABLE = True
 except ImportError as e:
     log.warning(f"Agent IA non disponible: {e}")
     AGENT_IA_AVAILABLE = False
 
-# Cache pour l'agent IA
-_coaching_agent = None
-
-async def get_agent_ia():
-    """Récupérer l'instance de l'agent IA (cache)"""
-    global _coaching_agent
-    if _coaching_agent is None and AGENT_IA_AVAILABLE:
-        try:
-            _coaching_agent = await get_coaching_graph()
-        except Exception as e:
-            log.error(f"Erreur chargement agent IA: {e}")
-    return _coaching_agent
 
 # ===== ENDPOINTS API AGENT IA =====
 
@@ -100,51 +89,31 @@ def chat_with_coach(request):
         
         # Pour Django, on fait un appel simplifié
         try:
-            agent = asyncio.run(get_agent_ia())
-            if not agent:
-                return Response({
-                    'response': 'Agent IA non initialisé.',
-                    'thread_id': thread_id,
-                    'user_id': user.id
-                })
-            
             config = {"configurable": {"thread_id": thread_id}}
             mode = "streamlit"  # Mode par défaut pour Django
             
-            # Récupération synchrone de la réponse
-            response_parts = []
-            result = asyncio.run(agent.astream({
+            started = time.perf_counter()
+            # Exécutée sur la boucle de fond de l'agent, qui conserve graphe et checkpointer
+            ai_response = get_agent_loop().run({
                 "messages": [HumanMessage(content=full_input)], 
                 "mode": mode
-            }, config=config))
-            
-            async def collect_response():
-                parts = []
-                async for event in result:
-                    for step in event.values():
-                        message_obj = step["messages"][-1]
-                        if hasattr(message_obj, 'content') and message_obj.content:
-                            parts.append(message_obj.content)
-                return ''.join(parts)
-            
-            ai_response = asyncio.run(collect_response())
-            
-            # Sauvegarder la session
-            session_data = {
-                'user_message': message,
-                'ai_response': ai_response,
-                'context_data': user_context,
-                'thread_id': thread_id
-            }
+            }, config)
+            if ai_response is None:
+                return Response({
+                    'response': 'Agent IA non initialisé.',
+                    'thread_id': thread_id,
+                    'user_id': user.id
+                })
             
+            # Sauvegarder la session (le modèle n'a pas de champ thread_id : conservé dans le contexte)
             CoachingSession.objects.create(
                 user=user,
                 session_id=str(uuid.uuid4()),
                 title=message[:100],
                 user_message=message,
                 ai_response=ai_response,
-                context_data=user_context,
-                thread_id=thread_id
+                context_data={**user_context, 'thread_id': thread_id},
+                response_time=time.perf_counter() - started
             )
             
             return Response({
@@ -253,28 +222,17 @@ def generate_training_plan(request):
         
         # Génération via agent IA
         try:
-            agent = asyncio.run(get_agent_ia())
-            if not agent:
-                return Response({
-                    'error': 'Agent IA non initialisé'
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-            
             thread_id = f"plan-generation-{user.id}-{int(time.time())}"
             config = {"configurable": {"thread_id": thread_id}}
             
-            # Collecte de la réponse
-            async def generate_plan():
-                ai_response_parts = []
-                async for event in agent.astream({
-                    "messages": [HumanMessage(content=prompt)]
-                }, config=config):
-                    for step in event.values():
-                        message_obj = step["messages"][-1]
-                        if hasattr(message_obj, 'content') and message_obj.content:
-                            ai_response_parts.append(message_obj.content)
-                return ''.join(ai_response_parts)
-            
-            ai_response = asyncio.run(generate_plan())
+            # Collecte de la réponse sur la boucle de fond de l'agent
+            ai_response = get_agent_loop().run({
+                "messages": [HumanMessage(content=prompt)]
+            }, config)
+            if ai_response is None:
+                return Response({
+                    'error': 'Agent IA non initialisé'
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
             # Parsing JSON de la réponse
             try:
@@ -364,7 +322,7 @@ def coaching_sessions_history(request):
                 'user_message': session.user_message,
                 'ai_response': session.ai_response,
                 'created_at': session.created_at.isoformat(),
-                'thread_id': session.thread_id
+                'thread_id': session.context_data.get('thread_id')
             })
         
         return Response({
@@ -382,12 +340,11 @@ def coaching_sessions_history(request):
 # ===== UTILITAIRES =====
 
 def get_user_context(user: User) -> Dict[str, Any]:
-    """Construire le contexte utilisateur pour l'IA"""
+    """Construire le contexte utilisateur pour l'IA (instantané partagé, voir context.py)"""
     try:
-        # Statistiques des activités
-        activities = Activity.objects.filter(user=user)
+        stats = get_coaching_context(user.id, 'django')['stats']
         
-        if not activities.exists():
+        if not stats['total_activities']:
             return {
                 'stats': {
                     'total_activities': 0,
@@ -395,31 +352,8 @@ def get_user_context(user: User) -> Dict[str, Any]:
                 }
             }
         
-        stats = activities.aggregate(
-            total_count=Count('id'),
-            total_distance=Sum('distance_meters'),
-            total_duration=Sum('duration_seconds'),
-            avg_hr=Avg('average_hr')
-        )
-        
-        # Activités récentes (30 derniers jours)
-        recent_cutoff = datetime.now() - timedelta(days=30)
-        recent_activities = activities.filter(
-            start_time__gte=recent_cutoff
-        ).count()
-        
-        # Dernière activité
-        last_activity = activities.order_by('-start_time').first()
-        
-        context = {
-            'stats': {
-                'total_activities': stats['total_count'] or 0,
-                'total_distance_km': round((stats['total_distance'] or 0) / 1000, 2),
-                'total_duration_hours': round((stats['total_duration'] or 0) / 3600, 1),
-                'avg_heart_rate': round(stats['avg_hr']) if stats['avg_hr'] else None,
-                'recent_activities_30d': recent_activities,
-                'last_activity_date': last_activity.start_time.isoformat() if last_activity else None
-            },
+        return {
+            'stats': dict(stats),
             'user_info': {
                 'id': user.id,
                 'email': user.email,
@@ -428,8 +362,6 @@ def get_user_context(user: User) -> Dict[str, Any]:
             }
         }
         
-        return context
-        
     except Exception as e:
         log.error(f"Erreur construction contexte: {e}")
         return {'error': str(e)}
@@ -0,0 +1,162 @@
+"""
+Instantané du contexte de coaching par utilisateur
+
+Trois chemins assemblaient le même contexte à chaque requête : le contexte
+FastAPI (get_user_context_for_coaching : profil, nombre d'activités et
+d'objectifs), la vue Django get_user_context (agrégats des activités) et
+l'outil get_user_metrics_from_db de l'agent (métriques E1 ou synthèse des
+90 derniers jours). Un seul instantané compact par utilisateur est construit
+(deux requêtes ORM et les métriques de l'agent, elles-mêmes mises en cache
+par E3_model_IA.scripts.agent_metrics_cache) puis lu en une consultation par
+les chemins Django ; l'outil de l'agent lit directement ce second cache.
+
+Le cache est local au processus mais réutilise les marqueurs de version de
+src.stats_cache : une synchronisation Garmin, le pipeline E1 (activités et
+métriques) ou une modification d'objectif ou de profil (signals.py)
+l'invalident dans tous les processus. Ses consultations ne sont pas comptées
+dans cache_efficiency_ratio : coaching_context_seconds (label source) en
+donne le taux de succès.
+"""
+
+import logging
+import sys
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.utils import timezone
+
+# Modules partagés du projet (src, E3_model_IA), comme l'import de l'agent dans api_views
+if str(settings.PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(settings.PROJECT_ROOT))
+
+from src.stats_cache import UserStatsCache
+
+try:
+    from prometheus_client import Histogram
+
+    coaching_context_seconds = Histogram(
+        'coaching_context_seconds',
+        'Latence d assemblage du contexte de coaching en secondes',
+        ['path', 'source'],
+        buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    )
+except ImportError:
+    coaching_context_seconds = None
+
+log = logging.getLogger(__name__)
+
+coaching_context_cache = UserStatsCache(max_entries=4096, green_metrics=False)
+
+RECENT_ACTIVITY_DAYS = 30
+
+
+def _agent_metrics(user_id: int) -> Optional[Dict[str, Any]]:
+    """Métriques vues par l'agent ; None si la base de l'agent est indisponible (requête à l'appel de l'outil)"""
+    from E3_model_IA.scripts.agent_metrics_cache import user_metrics
+    return user_metrics(user_id)
+
+
+def build_coaching_context(user_id: int) -> Dict[str, Any]:
+    """Construit l'instantané : profil et objectifs actifs, agrégats des activités, métriques de l'agent"""
+    from accounts.models import User, UserProfile
+    from activities.models import Activity
+
+    user = (
+        User.objects.select_related('profile')
+        .annotate(active_goals=Count('goals', filter=Q(goals__is_active=True)))
+        .filter(id=user_id, is_active=True)
+        .first()
+    )
+
+    recent_cutoff = timezone.now() - timedelta(days=RECENT_ACTIVITY_DAYS)
+    totals = Activity.objects.filter(user_id=user_id).aggregate(
+        total_count=Count('id'),
+        total_distance=Sum('distance_meters'),
+        total_duration=Sum('duration_seconds'),
+        avg_hr=Avg('average_hr'),
+        last_start=Max('start_time'),
+        recent_count=Count('id', filter=Q(start_time__gte=recent_cutoff)),
+    )
+
+    snapshot = {
+        'user': None,
+        'profile': None,
+        'active_goals': 0,
+        'stats': {
+            'total_activities': totals['total_count'] or 0,
+            'total_distance_km': round((totals['total_distance'] or 0) / 1000, 2),
+            'total_duration_hours': round((totals['total_duration'] or 0) / 3600, 1),
+            'avg_heart_rate': round(totals['avg_hr']) if totals['avg_hr'] else None,
+            'recent_activities_30d': totals['recent_count'] or 0,
+            'last_activity_date': totals['last_start'].isoformat() if totals['last_start'] else None,
+        },
+        'agent_metrics': _agent_metrics(user_id),
+    }
+    if user is None:
+        return snapshot
+
+    # Profil pas encore créé : valeurs par défaut, sans écriture sur le chemin de lecture
+    profile = getattr(user, 'profile', None) or UserProfile(user=user)
+    snapshot['active_goals'] = user.active_goals
+    snapshot['user'] = {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'birth_date': user.birth_date,
+        'weight': user.weight,
+        'height': user.height,
+        'preferred_activity': user.preferred_activity,
+        'main_goal': user.main_goal,
+        'is_premium': user.is_premium,
+        'bmi': user.bmi,
+    }
+    snapshot['profile'] = {
+        'vma': profile.vma,
+        'vo2_max': profile.vo2_max,
+        'resting_heart_rate': profile.resting_heart_rate,
+        'max_heart_rate': profile.max_heart_rate,
+        'current_fitness': profile.current_fitness,
+        'current_fatigue': profile.current_fatigue,
+        'current_form': profile.current_form,
+        'prediction_5k': profile.prediction_5k,
+        'prediction_10k': profile.prediction_10k,
+        'prediction_half_marathon': profile.prediction_half_marathon,
+        'prediction_marathon': profile.prediction_marathon,
+        'last_sync': profile.last_sync,
+    }
+    return snapshot
+
+
+def get_coaching_context(user_id: int, path: str, build: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Instantané de l'utilisateur en une consultation ; `path` identifie l'appelant dans la métrique de latence.
+    build=False : None s'il n'est pas en cache (appelant asynchrone, construction ORM hors de la boucle).
+    """
+    start = time.perf_counter()
+    snapshot = coaching_context_cache.get(user_id)
+    source = 'cache'
+    if snapshot is None:
+        if not build:
+            return None
+        source = 'build'
+        # Version lue avant le calcul : une invalidation concurrente rend l'entrée obsolète
+        version = coaching_context_cache.version(user_id)
+        snapshot = build_coaching_context(user_id)
+        coaching_context_cache.set(user_id, snapshot, version)
+
+    elapsed = time.perf_counter() - start
+    if coaching_context_seconds is not None:
+        coaching_context_seconds.labels(path=path, source=source).observe(elapsed)
+    log.debug(f"Contexte de coaching utilisateur {user_id} ({path}, {source}) : {elapsed * 1000:.2f} ms")
+    return snapshot
+
+
+def invalidate_coaching_context(user_id: Optional[int]):
+    """Publie une nouvelle version des données de l'utilisateur (tous les processus)"""
+    if user_id is not None:
+        coaching_context_cache.invalidate(user_id)
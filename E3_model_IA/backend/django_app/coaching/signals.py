@@ -0,0 +1,39 @@
+"""
+Invalidation de l'instantané du contexte de coaching (context.py) à chaque
+modification d'objectif, de profil ou d'activité par l'ORM ; les écritures en
+masse (ingestion Garmin, pipeline E1) publient leur propre invalidation.
+Une modification de l'utilisateur publie aussi un marqueur d'authentification
+(src.stats_cache.invalidate_user_auth) : désactivation et changement de mot de
+passe s'appliquent aussitôt au cache des utilisateurs de FastAPI, dans tous
+les processus.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import User, UserProfile
+from activities.models import Activity
+
+from .context import invalidate_coaching_context
+from src.stats_cache import invalidate_user_auth  # sys.path du projet complété par context
+from .models import Goal
+
+
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def invalidate_on_user_data_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_coaching_context(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_on_user_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    # La connexion met seulement à jour last_login : le contexte ne change pas
+    if raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    invalidate_coaching_context(instance.pk)
+    invalidate_user_auth(instance.pk)
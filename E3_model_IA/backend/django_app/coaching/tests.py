@@ -1,3 +1,212 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from accounts.models import User, UserProfile
+from activities.models import Activity
+from src.stats_cache import AUTH_MARKER_NAMESPACE, UserStatsCache
+
+from . import agent_runner, context
+from .api_views import get_user_context
+from .models import CoachingSession, Goal
+
+
+def setUpModule():
+    # Marqueurs d'invalidation (signaux) dans un répertoire temporaire, jamais sous data/ ;
+    # métriques de l'agent factices : aucune lecture de la base de l'agent
+    markers = tempfile.TemporaryDirectory()
+    patchers = [
+        mock.patch('src.stats_cache.STATS_CACHE_DIR', markers.name),
+        mock.patch.object(context, '_agent_metrics', lambda user_id: None),
+    ]
+    for patcher in patchers:
+        patcher.start()
+        unittest.addModuleCleanup(patcher.stop)
+    unittest.addModuleCleanup(markers.cleanup)
+
+
+class FakeGraph:
+    """Graphe compilé factice : note la boucle de chaque appel et le parallélisme atteint"""
+
+    def __init__(self):
+        self.loops = set()
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    async def astream(self, inputs, config=None):
+        self.loops.add(asyncio.get_running_loop())
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        thread_id = config['configurable']['thread_id']
+        yield {'llm': {'messages': [SimpleNamespace(content=f'Réponse {thread_id}')]}}
+
+
+@override_settings(COACHING_AGENT_MAX_CONCURRENCY=4, COACHING_AGENT_TIMEOUT=10.0)
+class AgentLoopTests(TransactionTestCase):
+    """Graphe et boucle de l'agent partagés entre requêtes, y compris en parallèle"""
+
+    def setUp(self):
+        agent_runner.reset_agent_loop()
+        self.addCleanup(agent_runner.reset_agent_loop)
+        self.graph = FakeGraph()
+        self.builds = []
+
+        async def factory():
+            self.builds.append(asyncio.get_running_loop())
+            await asyncio.sleep(0.01)
+            return self.graph
+
+        patcher = mock.patch.object(agent_runner, 'build_coaching_graph', factory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='coureur@example.com', username='coureur', password='x')
+
+    def post(self, url, payload):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post(url, payload, format='json')
+
+    def test_chats_paralleles_sur_une_seule_boucle(self):
+        def chat(i):
+            return self.post('/api/v1/coaching/api/chat/', {'message': f'Question {i}', 'thread_id': f'fil-{i}'})
+
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            responses = list(pool.map(chat, range(24)))
+
+        self.assertEqual([r.status_code for r in responses], [200] * 24)
+        self.assertEqual([r.data['response'] for r in responses], [f'Réponse fil-{i}' for i in range(24)])
+        # Un seul graphe compilé, sur la boucle de fond, réutilisé par toutes les requêtes
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(self.graph.loops, {agent_runner.get_agent_loop().loop})
+        self.assertEqual(self.graph.loops, set(self.builds))
+        self.assertTrue(1 < self.graph.peak <= 4)
+        self.assertEqual(CoachingSession.objects.filter(user=self.user).count(), 24)
+
+    def test_plan_et_chat_partagent_le_graphe(self):
+        self.post('/api/v1/coaching/api/chat/', {'message': 'Bonjour'})
+        response = self.post('/api/v1/coaching/api/generate-plan/', {
+            'running_goal': {'race_type': '10k'}, 'training_preferences': {}, 'personal_info': {},
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['generated_by'], 'Django (Fallback)')
+        self.assertEqual(len(self.builds), 1)
+
+    def test_echec_d_initialisation_retente_au_prochain_appel(self):
+        attempts = []
+
+        async def failing_then_ok():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError('checkpointer indisponible')
+            return self.graph
+
+        with mock.patch.object(agent_runner, 'build_coaching_graph', failing_then_ok):
+            agent_runner.reset_agent_loop()
+            first = self.post('/api/v1/coaching/api/chat/', {'message': 'Bonjour'})
+            second = self.post('/api/v1/coaching/api/chat/', {'message': 'Bonjour'})
+
+        self.assertEqual(first.data['response'], 'Agent IA non initialisé.')
+        self.assertEqual(second.data['response'], f'Réponse user-thread-{self.user.id}')
+        self.assertEqual(len(attempts), 2)
+
+
+@mock.patch.object(context, '_agent_metrics', lambda user_id: {'user_id': user_id, 'vma_kmh': 15.0})
+class CoachingContextTests(TestCase):
+    """Instantané du contexte de coaching : une consultation, invalidé à chaque modification"""
+
+    def setUp(self):
+        markers = tempfile.TemporaryDirectory()
+        self.addCleanup(markers.cleanup)
+        patcher = mock.patch.object(context, 'coaching_context_cache', UserStatsCache(marker_dir=markers.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.markers = markers.name
+
+        self.user = User.objects.create_user(email='coureur@example.com', username='coureur', password='x',
+                                             first_name='Léa', main_goal='performance')
+        UserProfile.objects.create(user=self.user, vma=15.0)
+        now = timezone.now()
+        for days, meters in ((2, 10000), (10, 5000), (60, 21100)):
+            Activity.objects.create(user=self.user, activity_name=f'Sortie {days}', start_time=now - timedelta(days=days),
+                                    distance_meters=meters, duration_seconds=meters * 0.3, average_hr=150)
+        Goal.objects.create(user=self.user, name='10k', goal_type='race_time', target_value=45,
+                            target_unit='min', target_date=date.today() + timedelta(days=60))
+
+    def test_une_consultation_apres_construction(self):
+        with self.assertNumQueries(2):
+            snapshot = context.get_coaching_context(self.user.id, 'django')
+        with self.assertNumQueries(0):
+            self.assertEqual(context.get_coaching_context(self.user.id, 'fastapi'), snapshot)
+
+        self.assertEqual(snapshot['agent_metrics'], {'user_id': self.user.id, 'vma_kmh': 15.0})
+        self.assertEqual(snapshot['active_goals'], 1)
+        self.assertEqual(snapshot['user']['main_goal'], 'performance')
+        self.assertEqual(snapshot['profile']['vma'], 15.0)
+        self.assertEqual(snapshot['stats']['total_activities'], 3)
+        self.assertEqual(snapshot['stats']['recent_activities_30d'], 2)
+        self.assertEqual(snapshot['stats']['total_distance_km'], 36.1)
+        self.assertEqual(REGISTRY.get_sample_value(
+            'coaching_context_seconds_count', {'path': 'fastapi', 'source': 'cache'}) > 0, True)
+
+    def test_vue_django_servie_par_l_instantane(self):
+        get_user_context(self.user)
+        with self.assertNumQueries(0):
+            user_context = get_user_context(self.user)
+        self.assertEqual(user_context['stats']['total_activities'], 3)
+        self.assertEqual(user_context['user_info']['first_name'], 'Léa')
+
+    def test_invalidation_par_objectif_profil_et_activite(self):
+        goal = Goal.objects.get(user=self.user)
+        goal.is_active = False
+        changes = [
+            goal.save,
+            lambda: self.user.profile.save(),
+            lambda: Activity.objects.filter(user=self.user).first().delete(),
+        ]
+        for change in changes:
+            context.get_coaching_context(self.user.id, 'django')
+            change()
+            with self.assertNumQueries(2):
+                snapshot = context.get_coaching_context(self.user.id, 'django')
+        self.assertEqual(snapshot['active_goals'], 0)
+        self.assertEqual(snapshot['stats']['total_activities'], 2)
+
+    def test_connexion_sans_invalidation(self):
+        context.get_coaching_context(self.user.id, 'django')
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            context.get_coaching_context(self.user.id, 'django')
+
+    def test_marqueur_d_authentification_publie_par_l_utilisateur_seul(self):
+        auth_markers = UserStatsCache(marker_namespace=AUTH_MARKER_NAMESPACE)
+        version = auth_markers.version(self.user.id)
+        Activity.objects.filter(user=self.user).first().delete()
+        self.user.profile.save()
+        self.assertEqual(auth_markers.version(self.user.id), version)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertNotEqual(auth_markers.version(self.user.id), version)
+
+    def test_invalidation_publiee_aux_autres_processus(self):
+        context.get_coaching_context(self.user.id, 'django')
+        # Autre processus (pipeline E1, ingestion Garmin) : même répertoire de marqueurs
+        UserStatsCache(marker_dir=self.markers).invalidate(self.user.id)
+        with self.assertNumQueries(2):
+            context.get_coaching_context(self.user.id, 'django')
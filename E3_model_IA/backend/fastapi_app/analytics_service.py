@@ -1,15 +1,21 @@
 """
 Service Analytics utilisant SQLAlchemy E1 pour des requêtes complexes
 impossible avec Django ORM seul
+
+Un seul service par processus (get_analytics_service), sur un moteur en
+lecture seule dédié, éventuellement un réplica (ANALYTICS_DATABASE_URL).
+Le schéma E1 est créé par le pipeline E1 (init_db, run_pipeline), jamais
+sur le chemin d'une requête.
 """
 
 import sys
 import os
+import threading
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import pandas as pd
-from sqlalchemy import text, func, case, and_, or_
+import pyarrow.dataset as ds
 from fastapi import HTTPException
 import logging
 
@@ -17,151 +23,50 @@ import logging
 project_root = Path(__file__).resolve().parent.parent.parent.parent
 sys.path.append(str(project_root))
 
-from E1_gestion_donnees.db_manager import create_db_engine, create_tables
+from E1_gestion_donnees.analytics_queries import PREDICTION_HISTORY
+from E1_gestion_donnees.db_manager import create_read_only_engine
+from E1_gestion_donnees.daily_load import get_load_trends
+from E1_gestion_donnees.hr_zones import get_hr_profile, zone_distribution
+from E1_gestion_donnees.parquet_store import parquet_export_available, read_activities
+from src.config import ANALYTICS_DATABASE_URL, ANALYTICS_DB_POOL_SIZE, ANALYTICS_READ_PARQUET
 
 logger = logging.getLogger(__name__)
 
 class AnalyticsService:
     """Service d'analytics avancées utilisant SQLAlchemy E1"""
     
-    def __init__(self):
-        self.engine = create_db_engine()
-        self.tables = create_tables(self.engine)
+    def __init__(self, engine=None):
+        # Ni connexion ni DDL ici : le moteur ouvre ses connexions à la première requête
+        self.engine = engine if engine is not None else create_read_only_engine(ANALYTICS_DATABASE_URL, ANALYTICS_DB_POOL_SIZE)
         
     def get_performance_trends(self, user_id: int, period_weeks: int = 12) -> Dict[str, Any]:
         """
-        Analyse des tendances de performance avec moyennes mobiles
-        Impossible avec Django ORM - Nécessite des window functions
+        Analyse des tendances de performance : volumes quotidiens et charges 7j/28j (ACWR)
+        Lues sur la synthèse daily_user_load, coût indépendant de la taille de l'historique
         """
         
-        # Adapter la requête selon le type de base de données
-        query = text("""
-        SELECT 
-            start_time,
-            distance_meters/1000.0 as distance_km,
-            duration_seconds/60.0 as duration_min,
-            CASE 
-                WHEN duration_seconds > 0 THEN (distance_meters/duration_seconds) * 3.6 
-                ELSE 0 
-            END as pace_kmh,
-            average_hr,
-            COALESCE(training_load, 0) as training_load,
-            -- Moyennes mobiles sur 7 activités (compatible SQLite)
-            AVG(CASE 
-                WHEN duration_seconds > 0 THEN (distance_meters/duration_seconds) * 3.6 
-                ELSE 0 
-            END) OVER (
-                ORDER BY start_time 
-                ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
-            ) as pace_trend_7_activities,
-            -- Charge d'entraînement cumulative
-            SUM(COALESCE(training_load, 0)) OVER (
-                ORDER BY start_time 
-                ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
-            ) as cumulative_load_7_activities,
-            -- Évolution de la FC au repos (estimation)
-            MIN(COALESCE(average_hr, 0)) OVER (
-                ORDER BY start_time 
-                ROWS BETWEEN 13 PRECEDING AND CURRENT ROW
-            ) as min_hr_14_activities
-        FROM activities 
-        WHERE user_id = :user_id 
-          AND start_time >= datetime('now', '-' || :weeks || ' days')
-          AND duration_seconds > 600  -- Au moins 10 minutes
-        ORDER BY start_time DESC
-        LIMIT 50
-        """)
-        
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(query, {'user_id': user_id, 'weeks': period_weeks})
-                trends = [dict(row._mapping) for row in result]
-                
-            return {
-                'user_id': user_id,
-                'period_weeks': period_weeks,
-                'trends_count': len(trends),
-                'trends': trends,
-                'analysis': self._analyze_trends(trends) if trends else {}
-            }
+            trends = get_load_trends(self.engine, user_id, period_weeks)
+            trends['analysis'] = self._analyze_trends(trends['trends']) if trends['trends'] else {}
+            return trends
             
         except Exception as e:
             logger.error(f"Erreur lors du calcul des tendances pour user {user_id}: {e}")
             raise HTTPException(status_code=500, detail=f"Erreur analytics: {str(e)}")
     
-    def get_training_zones_analysis(self, user_id: int) -> Dict[str, Any]:
+    def get_training_zones_analysis(self, user_id: int, resting_hr: Optional[int] = None) -> Dict[str, Any]:
         """
-        Analyse sophistiquée des zones d'entraînement basée sur la FC
-        Utilise des CASE complexes impossibles avec Django ORM
+        Analyse des zones d'entraînement basée sur la FC
+        Profil FC (FC max observée, bornes) mis en cache, répartition en un passage
         """
         
-        # D'abord, récupérer la FC max estimée
-        max_hr_query = text("""
-        SELECT MAX(max_hr) as max_hr_recorded,
-               AVG(max_hr) as avg_max_hr,
-               COUNT(*) as activities_with_hr
-        FROM activities 
-        WHERE user_id = :user_id AND max_hr IS NOT NULL
-        """)
-        
-        zones_query = text("""
-        WITH hr_zones AS (
-            SELECT 
-                *,
-                -- Définition des zones basée sur FC max estimée
-                CASE 
-                    WHEN average_hr <= (SELECT MAX(max_hr) * 0.6 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL) 
-                        THEN 'Zone 1 - Récupération active'
-                    WHEN average_hr <= (SELECT MAX(max_hr) * 0.7 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL) 
-                        THEN 'Zone 2 - Endurance fondamentale'
-                    WHEN average_hr <= (SELECT MAX(max_hr) * 0.8 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL) 
-                        THEN 'Zone 3 - Tempo/Seuil aérobie'
-                    WHEN average_hr <= (SELECT MAX(max_hr) * 0.9 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL) 
-                        THEN 'Zone 4 - Seuil anaérobie'
-                    ELSE 'Zone 5 - Puissance/VO2max'
-                END as hr_zone,
-                (distance_meters/duration_seconds) * 3.6 as pace_kmh
-            FROM activities 
-            WHERE user_id = :user_id 
-              AND average_hr IS NOT NULL 
-              AND duration_seconds > 300
-        )
-        SELECT 
-            hr_zone,
-            COUNT(*) as activities_count,
-            ROUND(AVG(duration_seconds)/60.0, 1) as avg_duration_min,
-            ROUND(SUM(duration_seconds)/3600.0, 1) as total_hours,
-            ROUND(AVG(training_load), 1) as avg_training_load,
-            ROUND(AVG(pace_kmh), 2) as avg_pace_kmh,
-            ROUND(MIN(average_hr), 0) as min_hr,
-            ROUND(MAX(average_hr), 0) as max_hr,
-            ROUND(AVG(average_hr), 0) as avg_hr
-        FROM hr_zones
-        GROUP BY hr_zone
-        ORDER BY 
-            CASE hr_zone
-                WHEN 'Zone 1 - Récupération active' THEN 1
-                WHEN 'Zone 2 - Endurance fondamentale' THEN 2  
-                WHEN 'Zone 3 - Tempo/Seuil aérobie' THEN 3
-                WHEN 'Zone 4 - Seuil anaérobie' THEN 4
-                WHEN 'Zone 5 - Puissance/VO2max' THEN 5
-            END
-        """)
-        
         try:
-            with self.engine.connect() as conn:
-                # FC max info
-                max_hr_result = conn.execute(max_hr_query, {'user_id': user_id}).fetchone()
-                
-                # Analyse des zones
-                zones_result = conn.execute(zones_query, {'user_id': user_id})
-                zones = [dict(row._mapping) for row in zones_result]
-                
-            max_hr_info = dict(max_hr_result._mapping) if max_hr_result else {}
+            profile = get_hr_profile(self.engine, user_id, resting_hr=resting_hr)
+            zones = zone_distribution(self.engine, profile)
             
             return {
                 'user_id': user_id,
-                'max_hr_info': max_hr_info,
+                'max_hr_info': profile.info(),
                 'zones_analysis': zones,
                 'recommendations': self._generate_zone_recommendations(zones)
             }
@@ -176,27 +81,8 @@ class AnalyticsService:
         Utilise des calculs complexes avec pandas impossible avec Django ORM
         """
         
-        # Récupérer les données via SQLAlchemy pour pandas
-        query = text("""
-        SELECT 
-            distance_meters/1000.0 as distance_km,
-            duration_seconds/60.0 as duration_min,
-            (distance_meters/duration_seconds) * 3.6 as pace_kmh,
-            average_hr,
-            max_hr,
-            training_load,
-            start_time
-        FROM activities 
-        WHERE user_id = :user_id 
-          AND distance_meters >= 3000  -- Au moins 3km
-          AND duration_seconds > 600
-        ORDER BY start_time DESC
-        LIMIT 100
-        """)
-        
         try:
-            # Utiliser pandas pour des calculs avancés
-            df = pd.read_sql(query, self.engine, params={'user_id': user_id})
+            df = self._load_prediction_history(user_id)
             
             if df.empty:
                 return {'error': 'Pas assez de données pour les prédictions'}
@@ -215,6 +101,32 @@ class AnalyticsService:
             logger.error(f"Erreur lors des prédictions pour user {user_id}: {e}")
             raise HTTPException(status_code=500, detail=f"Erreur prédictions: {str(e)}")
     
+    def _load_prediction_history(self, user_id: int) -> pd.DataFrame:
+        """
+        100 dernières sorties d'au moins 3 km et 10 minutes
+        Lues sur l'export Parquet si ANALYTICS_READ_PARQUET (colonnes et filtres poussés au fichier),
+        sinon sur la base
+        """
+        if ANALYTICS_READ_PARQUET and parquet_export_available():
+            df = read_activities(
+                user_id,
+                columns=['distance_meters', 'duration_seconds', 'average_hr', 'max_hr', 'training_load', 'start_time'],
+                filter=(ds.field('distance_meters') >= 3000) & (ds.field('duration_seconds') > 600),
+                latest=100,
+            )
+            return pd.DataFrame({
+                'distance_km': df['distance_meters'] / 1000.0,
+                'duration_min': df['duration_seconds'] / 60.0,
+                'pace_kmh': (df['distance_meters'] / df['duration_seconds']) * 3.6,
+                'average_hr': df['average_hr'],
+                'max_hr': df['max_hr'],
+                'training_load': df['training_load'],
+                'start_time': df['start_time'],
+            })
+        
+        # Requête Core compilée une fois par dialecte (cache de compilation du moteur)
+        return pd.read_sql(PREDICTION_HISTORY, self.engine, params={'user_id': user_id})
+    
     def _analyze_trends(self, trends: List[Dict]) -> Dict[str, Any]:
         """Analyse les tendances pour donner des insights"""
         if not trends:
@@ -290,4 +202,27 @@ class AnalyticsService:
             'data_consistency': float(1 - df['pace_kmh'].std() / df['pace_kmh'].mean()) if df['pace_kmh'].mean() > 0 else 0,
             'recent_activity_score': min(1.0, len(df) / 50),  # Score basé sur le nombre d'activités
             'pace_stability': float(1 - df['pace_kmh'].rolling(5).std().mean() / df['pace_kmh'].mean()) if len(df) >= 5 else 0.5
-        }
\ No newline at end of file
+        }
+
+
+_service: Optional[AnalyticsService] = None
+_service_lock = threading.Lock()
+
+
+def get_analytics_service() -> AnalyticsService:
+    """Service analytique du processus, construit à la première utilisation"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = AnalyticsService()
+    return _service
+
+
+def reset_analytics_service():
+    """Libère le service et son pool (arrêt de l'application, tests)"""
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.engine.dispose()
+        _service = None
@@ -24,7 +24,7 @@ import os
 # Add project root to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
 
-from django_db_connector import db_connector
+from django_db_connector import db_connector, async_db_connector
 from E3_model_IA.scripts.advanced_agent import get_coaching_graph
 from django_auth_service import django_auth_service
 from django_auth_service import UserInfo
@@ -65,6 +65,7 @@ async def lifespan(app: FastAPI):
 
     # Connexion à PostgreSQL Django
     app.state.db_connector = db_connector
+    app.state.async_db_connector = async_db_connector
     connection_test = db_connector.test_connection()
     if connection_test['status'] == 'connected':
         rprint(f"[green]PostgreSQL Django connectée: {connection_test['total_activities']} activités[/green]")
@@ -78,11 +79,18 @@ async def lifespan(app: FastAPI):
     app.state.analytics_db = db_connector
     rprint("[green]Service Analytics PostgreSQL Django prêt.[/green]")
 
+    # Service analytique E1 partagé (moteur en lecture seule, aucune connexion ni DDL ici)
+    from analytics_service import get_analytics_service, reset_analytics_service
+    app.state.analytics_service = get_analytics_service()
+    app.state.analytics_engine = app.state.analytics_service.engine
+
     rprint("[bold green]Application démarrée. L'agent et analytics sont prêts.[/bold green]")
 
     yield
 
     rprint("[yellow]Arrêt de l'application...[/yellow]")
+    await async_db_connector.dispose()
+    reset_analytics_service()
 
 
 
@@ -184,8 +192,8 @@ async def get_user_activities(
 ):
     """Récupérer les activités d'un utilisateur depuis PostgreSQL Django"""
     try:
-        db_connector = fastapi_request.app.state.db_connector
-        activities = db_connector.get_user_activities(user_id, limit=limit)
+        db_connector = fastapi_request.app.state.async_db_connector
+        activities = await db_connector.get_user_activities(user_id, limit=limit)
         
         return {
             "user_id": user_id,
@@ -202,8 +210,8 @@ async def get_user_stats(
 ):
     """Obtenir les statistiques d'un utilisateur depuis PostgreSQL Django"""
     try:
-        db_connector = fastapi_request.app.state.db_connector
-        stats = db_connector.get_user_stats(user_id)
+        db_connector = fastapi_request.app.state.async_db_connector
+        stats = await db_connector.get_user_stats(user_id)
         
         return {
             "user_id": user_id,
@@ -216,8 +224,8 @@ async def get_user_stats(
 async def database_status(fastapi_request: Request = None):
     """Vérifier le statut de la connexion PostgreSQL Django"""
     try:
-        db_connector = fastapi_request.app.state.db_connector
-        status = db_connector.test_connection()
+        db_connector = fastapi_request.app.state.async_db_connector
+        status = await db_connector.test_connection()
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur test connexion: {str(e)}")
@@ -613,81 +621,24 @@ async def generate_training_plan_advanced(
 # ===== ENDPOINTS ANALYTICS AVANCÉS (SQLAlchemy E1) =====
 
 def get_performance_trends_data(engine, user_id: int, period_weeks: int = 12):
-    """Analyse des tendances de performance avec moyennes mobiles"""
-    from sqlalchemy import text
-    
-    query = text("""
-    SELECT 
-        start_time,
-        distance_meters/1000.0 as distance_km,
-        duration_seconds/60.0 as duration_min,
-        CASE 
-            WHEN duration_seconds > 0 THEN (distance_meters/duration_seconds) * 3.6 
-            ELSE 0 
-        END as pace_kmh,
-        average_hr,
-        COALESCE(training_load, 0) as training_load
-    FROM activities 
-    WHERE user_id = :user_id 
-      AND start_time >= datetime('now', '-' || :weeks || ' days')
-      AND duration_seconds > 600  -- Au moins 10 minutes
-    ORDER BY start_time DESC
-    LIMIT 50
-    """)
-    
-    with engine.connect() as conn:
-        result = conn.execute(query, {'user_id': user_id, 'weeks': period_weeks * 7})
-        trends = [dict(row._mapping) for row in result]
-    
-    return {
-        'user_id': user_id,
-        'period_weeks': period_weeks,
-        'trends_count': len(trends),
-        'trends': trends
-    }
+    """Analyse des tendances de performance (charges 7j/28j lues sur daily_user_load)"""
+    from E1_gestion_donnees.daily_load import get_load_trends
+
+    return get_load_trends(engine, user_id, period_weeks)
 
 def get_zones_analysis_data(engine, user_id: int):
-    """Analyse des zones d'entraînement basée sur la FC"""
-    from sqlalchemy import text
-    
-    # D'abord, récupérer la FC max
-    max_hr_query = text("""
-    SELECT MAX(max_hr) as max_hr_recorded,
-           COUNT(*) as activities_with_hr
-    FROM activities 
-    WHERE user_id = :user_id AND max_hr IS NOT NULL
-    """)
-    
-    zones_query = text("""
-    SELECT 
-        CASE 
-            WHEN average_hr <= (SELECT MAX(max_hr) * 0.7 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL) 
-                THEN 'Zone 1-2 - Endurance'
-            WHEN average_hr <= (SELECT MAX(max_hr) * 0.85 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL) 
-                THEN 'Zone 3-4 - Tempo/Seuil'
-            ELSE 'Zone 5 - VO2max'
-        END as hr_zone,
-        COUNT(*) as activities_count,
-        ROUND(AVG(duration_seconds)/60.0, 1) as avg_duration_min,
-        ROUND(AVG(average_hr), 0) as avg_hr
-    FROM activities 
-    WHERE user_id = :user_id 
-      AND average_hr IS NOT NULL 
-      AND duration_seconds > 300
-    GROUP BY 1
-    ORDER BY avg_hr
-    """)
-    
-    with engine.connect() as conn:
-        max_hr_result = conn.execute(max_hr_query, {'user_id': user_id}).fetchone()
-        zones_result = conn.execute(zones_query, {'user_id': user_id})
-        zones = [dict(row._mapping) for row in zones_result]
-    
-    max_hr_info = dict(max_hr_result._mapping) if max_hr_result else {}
+    """Analyse des zones d'entraînement basée sur la FC (profil FC en cache, un seul passage)"""
+    from E1_gestion_donnees.hr_zones import THREE_ZONES, get_hr_profile, zone_distribution
+    
+    profile = get_hr_profile(engine, user_id)
+    zones = [
+        {key: zone[key] for key in ('hr_zone', 'activities_count', 'avg_duration_min', 'avg_hr')}
+        for zone in zone_distribution(engine, profile, zones=THREE_ZONES)
+    ]
     
     return {
         'user_id': user_id,
-        'max_hr_info': max_hr_info,
+        'max_hr_info': profile.info(),
         'zones_analysis': zones
     }
 
@@ -76,6 +76,24 @@ knowledge_base_size = Gauge(
     'Nombre de documents dans la base de connaissances'
 )
 
+# ========== CACHE SÉMANTIQUE DE L'AGENT ==========
+semantic_cache_requests_total = Counter(
+    'semantic_cache_requests_total',
+    'Consultations du cache semantique des reponses de l agent',
+    ['endpoint', 'result']  # hit, miss
+)
+
+semantic_cache_saved_tokens_total = Counter(
+    'semantic_cache_saved_tokens_total',
+    'Tokens OpenAI economises par le cache semantique',
+    ['endpoint']
+)
+
+semantic_cache_hit_ratio = Gauge(
+    'semantic_cache_hit_ratio',
+    'Taux de succes du cache semantique (0-1)'
+)
+
 # ========== COÛTS ET QUOTAS ==========
 # Prix approximatifs OpenAI (à ajuster)
 MODEL_PRICING = {
@@ -177,6 +195,14 @@ def record_database_query(query_type, status='success'):
     """Enregistre une requête base de données"""
     database_queries_total.labels(query_type=query_type, status=status).inc()
 
+def record_semantic_cache(endpoint, hit, saved_tokens=0, hit_ratio=None):
+    """Enregistre une consultation du cache sémantique (et les tokens économisés si succès)"""
+    semantic_cache_requests_total.labels(endpoint=endpoint, result='hit' if hit else 'miss').inc()
+    if hit and saved_tokens:
+        semantic_cache_saved_tokens_total.labels(endpoint=endpoint).inc(saved_tokens)
+    if hit_ratio is not None:
+        semantic_cache_hit_ratio.set(hit_ratio)
+
 def get_metrics_summary():
     """Retourne un résumé des métriques pour debug"""
     try:
@@ -25,6 +25,10 @@ API_KEY_NAME = "X-API-Key"
 # Configuration CORS
 CORS_ORIGINS = ["http://localhost:8502", "http://localhost:8002"]
 
+# Pagination de /v1/activities (JSON) ; le flux NDJSON n'est borné que par un limit explicite
+ACTIVITIES_PAGE_SIZE = 20
+ACTIVITIES_MAX_PAGE_SIZE = int(os.getenv("ACTIVITIES_MAX_PAGE_SIZE", "500"))
+
 # Configuration rate limiting OWASP
 RATE_LIMIT_COACHING = "10/minute"
 RATE_LIMIT_LEGACY = "5/minute"
@@ -32,6 +36,17 @@ RATE_LIMIT_LEGACY = "5/minute"
 # Configuration métriques
 METRICS_PORT = 8080
 
+# Cache sémantique des réponses de l'agent (opt-in : réponses partagées entre profils similaires)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "21600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+# Cache des utilisateurs authentifiés (JWT vérifié localement, invalidé dans tous les processus
+# à chaque modification de l'utilisateur)
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "300"))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "4096"))
+
 # Configuration logging
 SECURITY_LOG_FILE = "security.log"
 
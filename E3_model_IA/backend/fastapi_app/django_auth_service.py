@@ -1,6 +1,9 @@
 import os
 import sys
+import threading
+import time
 import django
+from collections import OrderedDict
 from pathlib import Path
 import requests
 from typing import Optional, Dict, Any
@@ -32,13 +35,29 @@ from django.contrib.auth import get_user_model
 from accounts.models import UserProfile
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from django.contrib.auth.backends import BaseBackend
 
+from config.settings import AUTH_USER_CACHE_MAX_ENTRIES, AUTH_USER_CACHE_TTL_SECONDS
+from src.stats_cache import AUTH_MARKER_NAMESPACE, UserStatsCache
+
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
+# Attributs (et empreinte du mot de passe) des utilisateurs authentifiés par identifiant.
+# Marqueurs propres à l'authentification, publiés par coaching/signals.py à chaque
+# modification de l'utilisateur (tous processus) ; les écritures d'activités ne les
+# touchent pas, et les consultations restent hors de cache_efficiency_ratio.
+user_info_cache = UserStatsCache(
+    ttl_seconds=AUTH_USER_CACHE_TTL_SECONDS, max_entries=AUTH_USER_CACHE_MAX_ENTRIES,
+    marker_namespace=AUTH_MARKER_NAMESPACE, green_metrics=False,
+)
+
+
 class UserInfo(BaseModel):
     """Modèle Pydantic pour les informations utilisateur"""
     id: int
@@ -62,39 +81,79 @@ class DjangoAuthService:
     def __init__(self):
         self.jwt_auth = JWTAuthentication()
         self.django_url = os.getenv('DJANGO_URL', 'http://localhost:8002')
+        # Tokens dont la signature est déjà vérifiée : seule l'expiration est recontrôlée
+        self._verified_tokens: "OrderedDict[str, Token]" = OrderedDict()
+        self._verified_lock = threading.Lock()
+        
+    def validate_token(self, token: str) -> Optional[Token]:
+        """Signature et expiration du JWT vérifiées localement, sans requête ; None si invalide"""
+        with self._verified_lock:
+            validated_token = self._verified_tokens.get(token)
+            if validated_token is not None:
+                self._verified_tokens.move_to_end(token)
+        if validated_token is not None and validated_token['exp'] > time.time():
+            return validated_token
         
-    def authenticate_token(self, token: str) -> Optional[UserInfo]:
-        """Authentifier un token JWT Django depuis FastAPI"""
         try:
-            # Valider le token JWT
             validated_token = self.jwt_auth.get_validated_token(token)
-            user = self.jwt_auth.get_user(validated_token)
-            
-            if not user or not user.is_active:
-                return None
-            
-            # Convertir en modèle Pydantic
-            user_info = UserInfo(
-                id=user.id,
-                username=user.username,
-                email=user.email,
-                first_name=user.first_name,
-                last_name=user.last_name,
-                is_active=user.is_active,
-                is_premium=user.is_premium,
-                preferred_activity=user.preferred_activity,
-                main_goal=user.main_goal,
-                created_at=user.created_at
-            )
-            
-            return user_info
-            
         except (InvalidToken, TokenError) as e:
             logger.warning(f"Token invalide : {e}")
+            with self._verified_lock:
+                self._verified_tokens.pop(token, None)
+            return None
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            logger.warning("Token sans identifiant utilisateur")
+            return None
+        
+        with self._verified_lock:
+            self._verified_tokens[token] = validated_token
+            while len(self._verified_tokens) > AUTH_USER_CACHE_MAX_ENTRIES:
+                self._verified_tokens.popitem(last=False)
+        return validated_token
+    
+    def get_cached_user(self, validated_token: Token) -> Optional[UserInfo]:
+        """Utilisateur du token depuis le cache (chemin rapide) ; None si absent ou périmé"""
+        entry = user_info_cache.get(validated_token[api_settings.USER_ID_CLAIM])
+        if entry is None or not self._token_not_revoked(validated_token, entry['password_hash']):
+            return None
+        # Attributs en JSON : copie du cache triviale, validation par pydantic-core
+        return UserInfo.model_validate_json(entry['user'])
+    
+    def load_user(self, validated_token: Token) -> Optional[UserInfo]:
+        """Utilisateur du token depuis l'ORM, mis en cache s'il est actif"""
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        # Version lue avant la requête : une sauvegarde concurrente rend l'entrée obsolète
+        version = user_info_cache.version(user_id)
+        try:
+            user = self.jwt_auth.get_user(validated_token)
+        except (InvalidToken, AuthenticationFailed) as e:
+            logger.warning(f"Utilisateur du token refusé : {e}")
             return None
         except Exception as e:
             logger.error(f"Erreur d'authentification : {e}")
             return None
+        
+        if not user or not user.is_active:
+            return None
+        
+        user_info = UserInfo.model_validate(user)
+        password_hash = get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None
+        user_info_cache.set(user_id, {'user': user_info.model_dump_json(), 'password_hash': password_hash}, version)
+        return user_info
+    
+    @staticmethod
+    def _token_not_revoked(validated_token: Token, password_hash: Optional[str]) -> bool:
+        """CHECK_REVOKE_TOKEN : le token porte l'empreinte du mot de passe en vigueur"""
+        if not api_settings.CHECK_REVOKE_TOKEN:
+            return True
+        return validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) == password_hash
+    
+    def authenticate_token(self, token: str) -> Optional[UserInfo]:
+        """Authentifier un token JWT Django depuis FastAPI (sans requête si l'utilisateur est en cache)"""
+        validated_token = self.validate_token(token)
+        if validated_token is None:
+            return None
+        return self.get_cached_user(validated_token) or self.load_user(validated_token)
     
     def get_user_by_id(self, user_id: int) -> Optional[UserInfo]:
         """Récupérer un utilisateur par son ID"""
@@ -208,26 +267,30 @@ class DjangoAuthService:
             logger.error(f"Erreur lors du comptage des objectifs: {e}")
             return 0
     
-    def get_user_context_for_coaching(self, user_id: int) -> Dict[str, Any]:
-        """Récupérer le contexte utilisateur pour le coaching IA"""
+    def get_user_context_for_coaching(self, user_id: int, build: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Récupérer le contexte utilisateur pour le coaching IA (instantané partagé, une consultation).
+        build=False : sans requête, None si l'instantané n'est pas en cache.
+        """
         try:
-            profile_data = self.get_user_profile(user_id)
-            if not profile_data:
+            from coaching.context import get_coaching_context
+            snapshot = get_coaching_context(user_id, 'fastapi', build=build)
+            if snapshot is None:
+                return None
+            if snapshot['user'] is None:
                 return {}
             
-            activities_count = self.get_user_activities_count(user_id)
-            goals_count = self.get_user_goals_count(user_id)
-            
+            user = snapshot['user']
             return {
-                'user_profile': profile_data,
+                'user_profile': {'user': user, 'profile': snapshot['profile']},
                 'stats': {
-                    'activities_count': activities_count,
-                    'active_goals': goals_count,
+                    'activities_count': snapshot['stats']['total_activities'],
+                    'active_goals': snapshot['active_goals'],
                 },
                 'preferences': {
-                    'preferred_activity': profile_data['user']['preferred_activity'],
-                    'main_goal': profile_data['user']['main_goal'],
-                    'is_premium': profile_data['user']['is_premium'],
+                    'preferred_activity': user['preferred_activity'],
+                    'main_goal': user['main_goal'],
+                    'is_premium': user['is_premium'],
                 }
             }
             
@@ -6,30 +6,302 @@ Remplace E1_gestion_donnees.db_manager pour utiliser la base unifiée
 
 import os
 import sys
+import json
+import base64
 import logging
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from datetime import datetime
 
+try:
+    from src.stats_cache import UserStatsCache, user_stats_cache
+except ImportError:
+    sys.path.append(str(Path(__file__).resolve().parents[3]))
+    from src.stats_cache import UserStatsCache, user_stats_cache
+
 # Configuration logging
 log = logging.getLogger(__name__)
 
+def build_database_url() -> str:
+    """URL PostgreSQL Django (même configuration que Django)"""
+    explicit_url = os.getenv('DJANGO_DATABASE_URL')
+    if explicit_url:
+        return explicit_url
+    return "postgresql://{user}:{password}@{host}:{port}/{database}".format(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'coach_ia_db'),
+        user=os.getenv('DB_USER', 'coach_user'),
+        password=os.getenv('DB_PASSWORD', 'coach_password')
+    )
+
+
+def to_async_url(database_url: str) -> str:
+    """Convertit une URL synchrone vers son driver asyncio (asyncpg, aiosqlite)"""
+    url = sa.engine.make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == 'postgresql':
+        url = url.set(drivername='postgresql+asyncpg')
+    elif backend == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+    return url.render_as_string(hide_password=False)
+
+
+def calculate_pace(duration_seconds: Optional[float], distance_meters: Optional[float]) -> Optional[str]:
+    """Calculer l'allure en min/km"""
+    if not duration_seconds or not distance_meters or distance_meters <= 0:
+        return None
+    
+    pace_seconds = (duration_seconds / distance_meters) * 1000
+    minutes = int(pace_seconds // 60)
+    seconds = int(pace_seconds % 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+activities_table = sa.table(
+    "activities_activity",
+    sa.column("id", sa.Integer),
+    sa.column("user_id", sa.Integer),
+    sa.column("activity_id"),
+    sa.column("activity_name"),
+    sa.column("activity_type"),
+    # Non typée : la valeur brute du driver sert de curseur (texte Django sous SQLite)
+    sa.column("start_time"),
+    sa.column("duration_seconds", sa.Float),
+    sa.column("distance_meters", sa.Float),
+    sa.column("average_speed"),
+    sa.column("max_speed"),
+    sa.column("calories"),
+    sa.column("average_hr"),
+    sa.column("max_hr"),
+    sa.column("elevation_gain"),
+    sa.column("elevation_loss"),
+    sa.column("steps"),
+    sa.column("average_cadence"),
+    sa.column("vo2_max"),
+    sa.column("training_load"),
+    sa.column("aerobic_effect"),
+    sa.column("anaerobic_effect"),
+)
+
+
+def _pace_per_km_expression(duration, distance):
+    """Allure 'm:ss' par km calculée en SQL (portable SQLite / PostgreSQL)"""
+    pace_seconds = duration / distance * 1000
+    truncated = sa.cast(pace_seconds, sa.Integer)
+    # CAST arrondit sous PostgreSQL et tronque sous SQLite : on ramène au plancher
+    whole_seconds = truncated - sa.case((truncated > pace_seconds, 1), else_=0)
+    minutes = whole_seconds // 60
+    seconds = whole_seconds % 60
+    formatted = (
+        sa.cast(minutes, sa.String) + ':'
+        + sa.case((seconds < 10, '0'), else_='') + sa.cast(seconds, sa.String)
+    )
+    return sa.case((sa.and_(duration > 0, distance > 0), formatted), else_=sa.null())
+
+
+_a = activities_table.c
+ACTIVITY_FIELDS = {
+    'id': _a.id,
+    'garmin_id': _a.activity_id.label('garmin_id'),
+    'activity_name': _a.activity_name,
+    'activity_type': _a.activity_type,
+    'start_time': _a.start_time,
+    'duration_seconds': _a.duration_seconds,
+    'distance_meters': _a.distance_meters,
+    'distance_km': sa.func.coalesce(
+        sa.cast(sa.func.round(sa.cast(_a.distance_meters / 1000.0, sa.Numeric), 2), sa.Float), 0
+    ).label('distance_km'),
+    'average_speed': _a.average_speed,
+    'max_speed': _a.max_speed,
+    'calories': _a.calories,
+    'average_hr': _a.average_hr,
+    'max_hr': _a.max_hr,
+    'elevation_gain': _a.elevation_gain,
+    'elevation_loss': _a.elevation_loss,
+    'steps': _a.steps,
+    'average_cadence': _a.average_cadence,
+    'vo2_max': _a.vo2_max,
+    'training_load': _a.training_load,
+    'aerobic_effect': _a.aerobic_effect,
+    'anaerobic_effect': _a.anaerobic_effect,
+    'pace_per_km': _pace_per_km_expression(_a.duration_seconds, _a.distance_meters).label('pace_per_km'),
+}
+
+_CURSOR_TIME = '_cursor_start_time'
+_CURSOR_ID = '_cursor_id'
+
+
+def parse_fields(fields) -> List[str]:
+    """Valide une projection `fields=` ('a,b' ou liste) ; toutes les colonnes par défaut"""
+    if not fields:
+        return list(ACTIVITY_FIELDS)
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in ACTIVITY_FIELDS]
+    if unknown:
+        raise ValueError(f"Champs inconnus : {', '.join(unknown)}. Champs disponibles : {', '.join(ACTIVITY_FIELDS)}")
+    return list(dict.fromkeys(fields))
+
+
+def encode_cursor(start_time, activity_id: int) -> str:
+    """Curseur opaque de pagination sur (start_time, id)"""
+    value = start_time.isoformat() if isinstance(start_time, datetime) else str(start_time)
+    payload = json.dumps({"t": value, "id": activity_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Décode un curseur en (start_time brut, id) ; ValueError s'il est invalide"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(payload["t"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Curseur de pagination invalide : {cursor}") from e
+
+
+def build_activities_query(
+    user_id: int,
+    dialect_name: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields=None
+):
+    """
+    Requête des activités, triée par (start_time, id) décroissants.
+    Les colonnes du curseur sont toujours sélectionnées pour calculer la page suivante.
+    """
+    columns = [ACTIVITY_FIELDS[field] for field in parse_fields(fields)]
+    columns += [_a.start_time.label(_CURSOR_TIME), _a.id.label(_CURSOR_ID)]
+    query = (
+        sa.select(*columns)
+        .where(_a.user_id == user_id)
+        .order_by(_a.start_time.desc(), _a.id.desc())
+    )
+    if cursor:
+        start_time, activity_id = decode_cursor(cursor)
+        # Sous SQLite, Django stocke la date en texte : on compare la valeur brute
+        if dialect_name != 'sqlite':
+            start_time = datetime.fromisoformat(start_time)
+            start_time = sa.literal(start_time, sa.DateTime(timezone=start_time.tzinfo is not None))
+        query = query.where(sa.or_(
+            _a.start_time < start_time,
+            sa.and_(_a.start_time == start_time, _a.id < activity_id)
+        ))
+    if limit:
+        query = query.limit(int(limit))
+    return query
+
+
+def activity_row_to_dict(row) -> Dict[str, Any]:
+    activity = dict(row._mapping)
+    activity.pop(_CURSOR_TIME)
+    activity.pop(_CURSOR_ID)
+    return activity
+
+
+def build_activities_page(rows, limit: int) -> Dict[str, Any]:
+    """Découpe `limit + 1` lignes en une page et son curseur suivant"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor(last[_CURSOR_TIME], last[_CURSOR_ID])
+    return {
+        'activities': [activity_row_to_dict(row) for row in rows],
+        'next_cursor': next_cursor
+    }
+
+
+def build_stats_query(user_id: int, dialect_name: str):
+    """
+    Statistiques en un seul passage sur activities_activity : agrégats par type,
+    plus la ligne de total via ROLLUP quand le dialecte le permet (PostgreSQL).
+    """
+    query = sa.select(
+        _a.activity_type,
+        sa.func.count().label('activity_count'),
+        sa.func.sum(_a.distance_meters).label('total_distance_meters'),
+        sa.func.sum(_a.duration_seconds).label('total_duration_seconds'),
+        sa.func.sum(_a.calories).label('total_calories'),
+        sa.func.sum(_a.average_hr).label('sum_heart_rate'),
+        sa.func.count(_a.average_hr).label('heart_rate_samples'),
+        sa.func.max(_a.distance_meters).label('max_distance_meters'),
+        sa.func.max(_a.duration_seconds).label('max_duration_seconds'),
+    ).where(_a.user_id == user_id)
+    if dialect_name == 'postgresql':
+        return query.add_columns(
+            sa.func.grouping(_a.activity_type).label('is_total')
+        ).group_by(sa.func.rollup(_a.activity_type))
+    return query.add_columns(sa.literal(0).label('is_total')).group_by(_a.activity_type)
+
+
+def _sum(values):
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
+
+
+def _max(values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _fold_totals(type_rows) -> Dict[str, Any]:
+    """Ligne de total calculée à partir des agrégats par type (dialectes sans ROLLUP)"""
+    return {
+        'activity_count': sum(row.activity_count for row in type_rows),
+        'total_distance_meters': _sum(row.total_distance_meters for row in type_rows),
+        'total_duration_seconds': _sum(row.total_duration_seconds for row in type_rows),
+        'total_calories': _sum(row.total_calories for row in type_rows),
+        'sum_heart_rate': _sum(row.sum_heart_rate for row in type_rows),
+        'heart_rate_samples': sum(row.heart_rate_samples for row in type_rows),
+        'max_distance_meters': _max(row.max_distance_meters for row in type_rows),
+        'max_duration_seconds': _max(row.max_duration_seconds for row in type_rows),
+    }
+
+
+def build_stats(rows) -> Dict[str, Any]:
+    type_rows = [row for row in rows if not row.is_total]
+    total_rows = [row for row in rows if row.is_total]
+    totals = dict(total_rows[0]._mapping) if total_rows else _fold_totals(type_rows)
+
+    if not totals['activity_count']:
+        return {
+            'total_activities': 0,
+            'message': 'Aucune activité trouvée'
+        }
+
+    activity_types = {
+        row.activity_type: {
+            'count': row.activity_count,
+            'total_distance_km': round(row.total_distance_meters / 1000, 2) if row.total_distance_meters else 0
+        }
+        for row in sorted(type_rows, key=lambda row: row.activity_count, reverse=True)
+    }
+
+    avg_heart_rate = totals['sum_heart_rate'] / totals['heart_rate_samples'] if totals['heart_rate_samples'] else None
+    return {
+        'total_activities': totals['activity_count'],
+        'total_distance_km': round(totals['total_distance_meters'] / 1000, 2) if totals['total_distance_meters'] else 0,
+        'total_duration_hours': round(totals['total_duration_seconds'] / 3600, 1) if totals['total_duration_seconds'] else 0,
+        'total_calories': totals['total_calories'] or 0,
+        'avg_heart_rate': round(avg_heart_rate) if avg_heart_rate else None,
+        'max_distance_km': round(totals['max_distance_meters'] / 1000, 2) if totals['max_distance_meters'] else 0,
+        'max_duration_hours': round(totals['max_duration_seconds'] / 3600, 1) if totals['max_duration_seconds'] else 0,
+        'activity_types': activity_types
+    }
+
+
 class DjangoDBConnector:
     """Connecteur à la base PostgreSQL Django depuis FastAPI"""
     
-    def __init__(self):
-        # Configuration PostgreSQL (même que Django)
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', '5432'),
-            'database': os.getenv('DB_NAME', 'coach_ia_db'),
-            'user': os.getenv('DB_USER', 'coach_user'),
-            'password': os.getenv('DB_PASSWORD', 'coach_password')
-        }
-        
-        self.database_url = f"postgresql://{self.db_config['user']}:{self.db_config['password']}@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
+    def __init__(self, database_url: Optional[str] = None, stats_cache: UserStatsCache = user_stats_cache):
+        self.database_url = database_url or build_database_url()
+        self.stats_cache = stats_cache
         self.engine = None
         self.SessionLocal = None
         
@@ -37,12 +309,13 @@ class DjangoDBConnector:
         """Créer ou récupérer l'engine SQLAlchemy"""
         if self.engine is None:
             try:
+                connect_args = {'application_name': 'fastapi_coach_ai'} if self.database_url.startswith('postgresql') else {}
                 self.engine = sa.create_engine(
                     self.database_url,
                     pool_pre_ping=True,
                     pool_timeout=30,
                     pool_recycle=3600,
-                    connect_args={'application_name': 'fastapi_coach_ai'}
+                    connect_args=connect_args
                 )
                 
                 # Test de connexion
@@ -66,148 +339,88 @@ class DjangoDBConnector:
             self.get_engine()
         return self.SessionLocal()
 
-    def get_user_activities(self, user_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def get_user_activities(
+        self,
+        user_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields=None
+    ) -> List[Dict[str, Any]]:
         """Récupérer les activités d'un utilisateur depuis PostgreSQL Django"""
         try:
+            query = build_activities_query(user_id, self.get_engine().dialect.name, limit, cursor, fields)
             with self.get_session() as session:
-                query = sa.text("""
-                    SELECT 
-                        a.id,
-                        a.activity_id as garmin_id,
-                        a.activity_name,
-                        a.activity_type,
-                        a.start_time,
-                        a.duration_seconds,
-                        a.distance_meters,
-                        a.average_speed,
-                        a.max_speed,
-                        a.calories,
-                        a.average_hr,
-                        a.max_hr,
-                        a.elevation_gain,
-                        a.elevation_loss,
-                        a.steps,
-                        a.average_cadence,
-                        a.vo2_max,
-                        a.training_load,
-                        a.aerobic_effect,
-                        a.anaerobic_effect
-                    FROM activities_activity a
-                    WHERE a.user_id = :user_id
-                    ORDER BY a.start_time DESC
-                """ + (f" LIMIT {limit}" if limit else ""))
-                
-                result = session.execute(query, {"user_id": user_id})
-                
-                activities = []
-                for row in result:
-                    activity = {
-                        'id': row.id,
-                        'garmin_id': row.garmin_id,
-                        'activity_name': row.activity_name,
-                        'activity_type': row.activity_type,
-                        'start_time': row.start_time,
-                        'duration_seconds': row.duration_seconds,
-                        'distance_meters': row.distance_meters,
-                        'distance_km': round(row.distance_meters / 1000, 2) if row.distance_meters else 0,
-                        'average_speed': row.average_speed,
-                        'max_speed': row.max_speed,
-                        'calories': row.calories,
-                        'average_hr': row.average_hr,
-                        'max_hr': row.max_hr,
-                        'elevation_gain': row.elevation_gain,
-                        'elevation_loss': row.elevation_loss,
-                        'steps': row.steps,
-                        'average_cadence': row.average_cadence,
-                        'vo2_max': row.vo2_max,
-                        'training_load': row.training_load,
-                        'aerobic_effect': row.aerobic_effect,
-                        'anaerobic_effect': row.anaerobic_effect,
-                        'pace_per_km': self._calculate_pace(row.duration_seconds, row.distance_meters)
-                    }
-                    activities.append(activity)
+                activities = [activity_row_to_dict(row) for row in session.execute(query)]
                 
                 log.info(f"✅ Récupération {len(activities)} activités pour utilisateur {user_id}")
                 return activities
                 
+        except ValueError:
+            raise
         except Exception as e:
             log.error(f"❌ Erreur récupération activités: {e}")
             return []
 
+    def get_user_activities_page(
+        self,
+        user_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        fields=None
+    ) -> Dict[str, Any]:
+        """Page d'activités (pagination par curseur sur start_time, id)"""
+        query = build_activities_query(user_id, self.get_engine().dialect.name, limit + 1, cursor, fields)
+        with self.get_session() as session:
+            rows = session.execute(query).fetchall()
+        return build_activities_page(rows, limit)
+
+    def iter_user_activities(
+        self,
+        user_id: int,
+        cursor: Optional[str] = None,
+        fields=None,
+        limit: Optional[int] = None,
+        batch_size: int = 500
+    ):
+        """Itère sur les activités par lots, sans charger tout l'historique en mémoire"""
+        query = build_activities_query(user_id, self.get_engine().dialect.name, limit, cursor, fields)
+        with self.get_engine().connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+            for row in result:
+                yield activity_row_to_dict(row)
+
     def get_user_stats(self, user_id: int) -> Dict[str, Any]:
-        """Calculer statistiques utilisateur depuis PostgreSQL Django"""
+        """Calculer statistiques utilisateur depuis PostgreSQL Django (mises en cache par utilisateur)"""
+        cached = self.stats_cache.get(user_id)
+        if cached is not None:
+            return cached
         try:
+            version = self.stats_cache.version(user_id)
+            query = build_stats_query(user_id, self.get_engine().dialect.name)
             with self.get_session() as session:
-                # Statistiques générales
-                stats_query = sa.text("""
-                    SELECT 
-                        COUNT(*) as total_activities,
-                        SUM(distance_meters) as total_distance_meters,
-                        SUM(duration_seconds) as total_duration_seconds,
-                        SUM(calories) as total_calories,
-                        AVG(average_hr) as avg_heart_rate,
-                        MAX(distance_meters) as max_distance_meters,
-                        MAX(duration_seconds) as max_duration_seconds
-                    FROM activities_activity 
-                    WHERE user_id = :user_id
-                """)
-                
-                result = session.execute(stats_query, {"user_id": user_id}).fetchone()
-                
-                if result.total_activities == 0:
-                    return {
-                        'total_activities': 0,
-                        'message': 'Aucune activité trouvée'
-                    }
-                
-                # Répartition par type d'activité
-                type_query = sa.text("""
-                    SELECT 
-                        activity_type,
-                        COUNT(*) as count,
-                        SUM(distance_meters) as total_distance
-                    FROM activities_activity 
-                    WHERE user_id = :user_id
-                    GROUP BY activity_type
-                    ORDER BY count DESC
-                """)
+                stats = build_stats(session.execute(query).fetchall())
+            self.stats_cache.set(user_id, stats, version)
                 
-                type_result = session.execute(type_query, {"user_id": user_id})
-                activity_types = {
-                    row.activity_type: {
-                        'count': row.count,
-                        'total_distance_km': round(row.total_distance / 1000, 2) if row.total_distance else 0
-                    }
-                    for row in type_result
-                }
-                
-                stats = {
-                    'total_activities': result.total_activities,
-                    'total_distance_km': round(result.total_distance_meters / 1000, 2) if result.total_distance_meters else 0,
-                    'total_duration_hours': round(result.total_duration_seconds / 3600, 1) if result.total_duration_seconds else 0,
-                    'total_calories': result.total_calories or 0,
-                    'avg_heart_rate': round(result.avg_heart_rate) if result.avg_heart_rate else None,
-                    'max_distance_km': round(result.max_distance_meters / 1000, 2) if result.max_distance_meters else 0,
-                    'max_duration_hours': round(result.max_duration_seconds / 3600, 1) if result.max_duration_seconds else 0,
-                    'activity_types': activity_types
-                }
-                
-                log.info(f"✅ Statistiques calculées pour utilisateur {user_id}")
-                return stats
+            log.info(f"✅ Statistiques calculées pour utilisateur {user_id}")
+            return stats
                 
         except Exception as e:
             log.error(f"❌ Erreur calcul statistiques: {e}")
             return {'error': str(e)}
 
+    def get_resting_heart_rate(self, user_id: int) -> Optional[int]:
+        """FC de repos du UserProfile Django (None si absente ou base indisponible)"""
+        query = sa.text("SELECT resting_heart_rate FROM accounts_userprofile WHERE user_id = :user_id")
+        try:
+            with self.get_engine().connect() as conn:
+                return conn.execute(query, {'user_id': user_id}).scalar()
+        except Exception as e:
+            log.warning(f"FC de repos indisponible pour l'utilisateur {user_id}: {e}")
+            return None
+
     def _calculate_pace(self, duration_seconds: Optional[float], distance_meters: Optional[float]) -> Optional[str]:
         """Calculer l'allure en min/km"""
-        if not duration_seconds or not distance_meters or distance_meters <= 0:
-            return None
-        
-        pace_seconds = (duration_seconds / distance_meters) * 1000
-        minutes = int(pace_seconds // 60)
-        seconds = int(pace_seconds % 60)
-        return f"{minutes}:{seconds:02d}"
+        return calculate_pace(duration_seconds, distance_meters)
 
     def test_connection(self) -> Dict[str, Any]:
         """Tester la connexion et retourner des informations"""
@@ -221,7 +434,7 @@ class DjangoDBConnector:
                 
                 return {
                     'status': 'connected',
-                    'database_url': self.database_url.replace(self.db_config['password'], '***'),
+                    'database_url': self.engine.url.render_as_string(hide_password=True),
                     'total_activities': result.total,
                     'database_version': db_info.version,
                     'timestamp': datetime.now().isoformat()
@@ -234,5 +447,149 @@ class DjangoDBConnector:
                 'timestamp': datetime.now().isoformat()
             }
 
+
+class AsyncDjangoDBConnector:
+    """
+    Connecteur asyncio (asyncpg / aiosqlite) à la base Django.
+
+    Mêmes méthodes que DjangoDBConnector, mais awaitables : les endpoints
+    `async def` ne bloquent plus la boucle d'événements (et donc les flux de chat).
+    """
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        pool_size: int = 10,
+        max_overflow: int = 10,
+        stats_cache: UserStatsCache = user_stats_cache
+    ):
+        self.database_url = to_async_url(database_url or build_database_url())
+        self.stats_cache = stats_cache
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.engine: Optional[AsyncEngine] = None
+
+    def get_engine(self) -> AsyncEngine:
+        """Créer ou récupérer l'engine asynchrone (la connexion est ouverte au premier appel)"""
+        if self.engine is None:
+            engine_kwargs = {'pool_pre_ping': True, 'pool_recycle': 3600}
+            if self.database_url.startswith('postgresql'):
+                engine_kwargs.update(
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_timeout=30,
+                    connect_args={'server_settings': {'application_name': 'fastapi_coach_ai'}}
+                )
+            self.engine = create_async_engine(self.database_url, **engine_kwargs)
+        return self.engine
+
+    async def get_user_activities(
+        self,
+        user_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields=None
+    ) -> List[Dict[str, Any]]:
+        """Récupérer les activités d'un utilisateur depuis PostgreSQL Django"""
+        try:
+            engine = self.get_engine()
+            query = build_activities_query(user_id, engine.dialect.name, limit, cursor, fields)
+            async with engine.connect() as conn:
+                result = await conn.execute(query)
+                activities = [activity_row_to_dict(row) for row in result]
+
+            log.info(f"✅ Récupération {len(activities)} activités pour utilisateur {user_id}")
+            return activities
+
+        except ValueError:
+            raise
+        except Exception as e:
+            log.error(f"❌ Erreur récupération activités: {e}")
+            return []
+
+    async def get_user_activities_page(
+        self,
+        user_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        fields=None
+    ) -> Dict[str, Any]:
+        """Page d'activités (pagination par curseur sur start_time, id)"""
+        engine = self.get_engine()
+        query = build_activities_query(user_id, engine.dialect.name, limit + 1, cursor, fields)
+        async with engine.connect() as conn:
+            rows = (await conn.execute(query)).fetchall()
+        return build_activities_page(rows, limit)
+
+    async def stream_user_activities(
+        self,
+        user_id: int,
+        cursor: Optional[str] = None,
+        fields=None,
+        limit: Optional[int] = None,
+        batch_size: int = 500
+    ):
+        """Itère sur les activités par lots (curseur serveur), pour les réponses NDJSON"""
+        engine = self.get_engine()
+        query = build_activities_query(user_id, engine.dialect.name, limit, cursor, fields)
+        async with engine.connect() as conn:
+            result = await conn.stream(query.execution_options(yield_per=batch_size))
+            async for partition in result.partitions():
+                for row in partition:
+                    yield activity_row_to_dict(row)
+
+    async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
+        """Calculer statistiques utilisateur depuis PostgreSQL Django (mises en cache par utilisateur)"""
+        cached = self.stats_cache.get(user_id)
+        if cached is not None:
+            return cached
+        try:
+            version = self.stats_cache.version(user_id)
+            engine = self.get_engine()
+            async with engine.connect() as conn:
+                rows = (await conn.execute(build_stats_query(user_id, engine.dialect.name))).fetchall()
+            stats = build_stats(rows)
+            self.stats_cache.set(user_id, stats, version)
+
+            log.info(f"✅ Statistiques calculées pour utilisateur {user_id}")
+            return stats
+
+        except Exception as e:
+            log.error(f"❌ Erreur calcul statistiques: {e}")
+            return {'error': str(e)}
+
+    async def test_connection(self) -> Dict[str, Any]:
+        """Tester la connexion et retourner des informations"""
+        try:
+            engine = self.get_engine()
+            async with engine.connect() as conn:
+                result = (await conn.execute(sa.text("SELECT COUNT(*) as total FROM activities_activity"))).fetchone()
+                if engine.dialect.name == 'sqlite':
+                    version = (await conn.execute(sa.text("SELECT sqlite_version() as version"))).fetchone().version
+                else:
+                    version = (await conn.execute(sa.text("SELECT version()"))).fetchone().version
+
+            return {
+                'status': 'connected',
+                'database_url': engine.url.render_as_string(hide_password=True),
+                'total_activities': result.total,
+                'database_version': version,
+                'timestamp': datetime.now().isoformat()
+            }
+
+        except Exception as e:
+            return {
+                'status': 'error',
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }
+
+    async def dispose(self):
+        """Fermer le pool de connexions (arrêt de l'application)"""
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
 # Instance globale
-db_connector = DjangoDBConnector()
\ No newline at end of file
+db_connector = DjangoDBConnector()
+async_db_connector = AsyncDjangoDBConnector()
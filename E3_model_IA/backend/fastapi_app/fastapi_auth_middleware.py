@@ -1,6 +1,7 @@
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, Dict, Any
+import asyncio
 import logging
 import os
 from django_auth_service import django_auth_service, UserInfo
@@ -11,12 +12,27 @@ logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
+async def _current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserInfo:
+    """Dépendance unique de l'utilisateur courant : FastAPI la résout une fois par requête"""
+    return await auth_middleware.get_current_user(credentials)
+
+
 class FastAPIAuthMiddleware:
     """Middleware d'authentification FastAPI avec Django"""
     
     def __init__(self):
         self.auth_service = django_auth_service
     
+    async def authenticate(self, token: str) -> Optional[UserInfo]:
+        """JWT vérifié localement puis utilisateur en cache ; l'ORM, en cas d'absence, hors de la boucle"""
+        validated_token = self.auth_service.validate_token(token)
+        if validated_token is None:
+            return None
+        user_info = self.auth_service.get_cached_user(validated_token)
+        if user_info is None:
+            user_info = await asyncio.to_thread(self.auth_service.load_user, validated_token)
+        return user_info
+    
     async def get_current_user(
         self, 
         credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -30,8 +46,7 @@ class FastAPIAuthMiddleware:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        token = credentials.credentials
-        user_info = self.auth_service.authenticate_token(token)
+        user_info = await self.authenticate(credentials.credentials)
         
         if not user_info:
             raise HTTPException(
@@ -51,12 +66,11 @@ class FastAPIAuthMiddleware:
         if not credentials or not credentials.credentials:
             return None
         
-        token = credentials.credentials
-        return self.auth_service.authenticate_token(token)
+        return await self.authenticate(credentials.credentials)
     
     async def get_current_premium_user(
         self, 
-        current_user: UserInfo = Depends(lambda: auth_middleware.get_current_user)
+        current_user: UserInfo = Depends(_current_user)
     ) -> UserInfo:
         """Récupérer l'utilisateur actuel (premium uniquement)"""
         
@@ -70,11 +84,14 @@ class FastAPIAuthMiddleware:
     
     async def get_user_context(
         self, 
-        current_user: UserInfo = Depends(lambda: auth_middleware.get_current_user)
+        current_user: UserInfo = Depends(_current_user)
     ) -> Dict[str, Any]:
         """Récupérer le contexte utilisateur pour le coaching"""
         
-        context = self.auth_service.get_user_context_for_coaching(current_user.id)
+        # Instantané en cache lu directement ; sinon ORM Django synchrone, hors de la boucle d'événements
+        context = self.auth_service.get_user_context_for_coaching(current_user.id, build=False)
+        if context is None:
+            context = await asyncio.to_thread(self.auth_service.get_user_context_for_coaching, current_user.id)
         
         if not context:
             raise HTTPException(
@@ -104,7 +121,7 @@ auth_middleware = FastAPIAuthMiddleware()
 
 # Dépendances réutilisables - Export des fonctions directement
 # Pour utiliser avec Depends() dans les endpoints
-get_current_user = auth_middleware.get_current_user
+get_current_user = _current_user
 
 get_current_user_optional = auth_middleware.get_current_user_optional
 get_current_premium_user = Depends(auth_middleware.get_current_premium_user)
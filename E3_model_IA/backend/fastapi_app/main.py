@@ -29,8 +29,9 @@ from middleware.rate_limit import setup_rate_limiting
 from routers import data, coaching, analytics
 
 # Services externes
-from django_db_connector import db_connector
-from E3_model_IA.scripts.advanced_agent import get_coaching_graph
+from django_db_connector import db_connector, async_db_connector
+from E3_model_IA.scripts.advanced_agent import get_coaching_graph, set_user_context_provider
+from E3_model_IA.scripts.agent_metrics_cache import user_metrics
 
 # SOLUTION DÉFINITIVE: Métriques AI intégrées dans FastAPI (registre séparé)
 from prometheus_client import Counter, Histogram, CollectorRegistry
@@ -75,13 +76,15 @@ async def lifespan(app: FastAPI):
 
     # Connexion à PostgreSQL Django
     app.state.db_connector = db_connector
+    app.state.async_db_connector = async_db_connector
     connection_test = db_connector.test_connection()
     if connection_test['status'] == 'connected':
         rprint(f"[green]PostgreSQL Django connectée: {connection_test['total_activities']} activités[/green]")
     else:
         rprint(f"[red]Erreur connexion PostgreSQL: {connection_test['error']}[/red]")
 
-    # Initialisation de l'agent IA
+    # Initialisation de l'agent IA ; l'outil de métriques lit les métriques en cache par utilisateur
+    set_user_context_provider(user_metrics)
     coaching_agent = await get_coaching_graph()
     app.state.coaching_agent = coaching_agent
     
@@ -89,11 +92,18 @@ async def lifespan(app: FastAPI):
     app.state.analytics_db = db_connector
     rprint("[green]Service Analytics PostgreSQL Django prêt.[/green]")
 
+    # Service analytique E1 partagé (moteur en lecture seule, aucune connexion ni DDL ici)
+    from analytics_service import get_analytics_service, reset_analytics_service
+    app.state.analytics_service = get_analytics_service()
+    app.state.analytics_engine = app.state.analytics_service.engine
+
     rprint("[bold green]Application modulaire démarrée. L'agent et analytics sont prêts.[/bold green]")
 
     yield
 
     rprint("[yellow]Arrêt de l'application modulaire...[/yellow]")
+    await async_db_connector.dispose()
+    reset_analytics_service()
 
 def create_app() -> FastAPI:
     """Factory pour créer l'application FastAPI"""
@@ -2,6 +2,8 @@
 Router pour les endpoints d'analytics avancés
 """
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Depends, Request
 from datetime import datetime
 from config.security import get_api_key
@@ -9,81 +11,33 @@ from config.security import get_api_key
 router = APIRouter(prefix="/v1/analytics", tags=["Analytics E1"])
 
 def get_performance_trends_data(engine, user_id: int, period_weeks: int = 12):
-    """Analyse des tendances de performance avec moyennes mobiles"""
-    from sqlalchemy import text
-    
-    query = text("""
-    SELECT 
-        start_time,
-        distance_meters/1000.0 as distance_km,
-        duration_seconds/60.0 as duration_min,
-        CASE 
-            WHEN duration_seconds > 0 THEN (distance_meters/duration_seconds) * 3.6 
-            ELSE 0 
-        END as pace_kmh,
-        average_hr,
-        COALESCE(training_load, 0) as training_load
-    FROM activities 
-    WHERE user_id = :user_id 
-      AND start_time >= datetime('now', '-' || :weeks || ' days')
-      AND duration_seconds > 600  -- Au moins 10 minutes
-    ORDER BY start_time DESC
-    LIMIT 50
-    """)
-    
-    with engine.connect() as conn:
-        result = conn.execute(query, {'user_id': user_id, 'weeks': period_weeks * 7})
-        trends = [dict(row._mapping) for row in result]
-    
-    return {
-        'user_id': user_id,
-        'period_weeks': period_weeks,
-        'trends_count': len(trends),
-        'trends': trends
-    }
+    """Analyse des tendances de performance (charges 7j/28j lues sur daily_user_load)"""
+    from E1_gestion_donnees.daily_load import get_load_trends
 
-def get_zones_analysis_data(engine, user_id: int):
-    """Analyse des zones d'entraînement basée sur la FC"""
-    from sqlalchemy import text
-    
-    # D'abord, récupérer la FC max
-    max_hr_query = text("""
-    SELECT MAX(max_hr) as max_hr_recorded,
-           COUNT(*) as activities_with_hr
-    FROM activities 
-    WHERE user_id = :user_id AND max_hr IS NOT NULL
-    """)
-    
-    zones_query = text("""
-    SELECT 
-        CASE 
-            WHEN average_hr <= (SELECT MAX(max_hr) * 0.7 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL) 
-                THEN 'Zone 1-2 - Endurance'
-            WHEN average_hr <= (SELECT MAX(max_hr) * 0.85 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL) 
-                THEN 'Zone 3-4 - Tempo/Seuil'
-            ELSE 'Zone 5 - VO2max'
-        END as hr_zone,
-        COUNT(*) as activities_count,
-        ROUND(AVG(duration_seconds)/60.0, 1) as avg_duration_min,
-        ROUND(AVG(average_hr), 0) as avg_hr
-    FROM activities 
-    WHERE user_id = :user_id 
-      AND average_hr IS NOT NULL 
-      AND duration_seconds > 300
-    GROUP BY 1
-    ORDER BY avg_hr
-    """)
-    
-    with engine.connect() as conn:
-        max_hr_result = conn.execute(max_hr_query, {'user_id': user_id}).fetchone()
-        zones_result = conn.execute(zones_query, {'user_id': user_id})
-        zones = [dict(row._mapping) for row in zones_result]
+    return get_load_trends(engine, user_id, period_weeks)
+
+def resting_hr_reader(request: Request):
+    """Lecture de la FC de repos du UserProfile Django, si le connecteur est disponible"""
+    connector = getattr(request.app.state, 'db_connector', None)
+    return connector.get_resting_heart_rate if connector else None
+
+def get_zones_analysis_data(engine, user_id: int, resting_hr_loader=None):
+    """
+    Analyse des zones d'entraînement basée sur la FC (profil FC en cache, un seul passage)
+
+    La FC de repos n'est lue qu'au recalcul du profil et conservée avec lui
+    """
+    from E1_gestion_donnees.hr_zones import THREE_ZONES, get_hr_profile, zone_distribution
     
-    max_hr_info = dict(max_hr_result._mapping) if max_hr_result else {}
+    profile = get_hr_profile(engine, user_id, resting_hr_loader=resting_hr_loader)
+    zones = [
+        {key: zone[key] for key in ('hr_zone', 'activities_count', 'avg_duration_min', 'avg_hr')}
+        for zone in zone_distribution(engine, profile, zones=THREE_ZONES)
+    ]
     
     return {
         'user_id': user_id,
-        'max_hr_info': max_hr_info,
+        'max_hr_info': profile.info(),
         'zones_analysis': zones
     }
 
@@ -119,7 +73,7 @@ async def get_training_zones_analysis(
         raise HTTPException(status_code=503, detail="Moteur analytics non disponible")
     
     try:
-        zones_analysis = get_zones_analysis_data(engine, user_id)
+        zones_analysis = await asyncio.to_thread(get_zones_analysis_data, engine, user_id, resting_hr_reader(request))
         return zones_analysis
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur analytics zones: {str(e)}")
@@ -151,7 +105,7 @@ async def get_analytics_dashboard(
             dashboard_data['trends'] = {'error': str(e)}
             
         try:
-            dashboard_data['zones'] = get_zones_analysis_data(engine, user_id)
+            dashboard_data['zones'] = await asyncio.to_thread(get_zones_analysis_data, engine, user_id, resting_hr_reader(request))
         except Exception as e:
             dashboard_data['zones'] = {'error': str(e)}
         
@@ -8,14 +8,14 @@ from datetime import datetime
 from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import StreamingResponse
 # SOLUTION DIRECTE: Métriques sans CallbackHandler 
-from prometheus_client import Counter
 from direct_metrics import collect_openai_metrics
 
-# Métrique pour les plans générés
-training_plans_generated = Counter('training_plans_generated_total', 'Nombre total de plans d entrainement generes')
+# Métriques Coach AI (plans générés, cache sémantique) définies une seule fois dans coach_metrics
+from coach_metrics import training_plans_generated
 
 from models.schemas import ChatRequest, SimpleTrainingPlanRequest, TrainingPlanRequest, TrainingPlanResponse
 from services.ai_service import AIService
+from services.semantic_cache import get_semantic_cache
 from config.security import get_api_key
 from config.settings import RATE_LIMIT_COACHING, RATE_LIMIT_LEGACY
 from middleware.rate_limit import limiter, RATE_LIMITING_AVAILABLE
@@ -30,7 +30,7 @@ async def chat_with_coach(
     """Chat avec le coach IA (authentification Django JWT)"""
     
     coaching_agent = request.app.state.coaching_agent
-    ai_service = AIService(coaching_agent)
+    ai_service = AIService(coaching_agent, get_semantic_cache())
     
     async def stream_response():
         async for chunk in ai_service.chat_stream(chat_request):
@@ -65,12 +65,12 @@ async def generate_training_plan_simple(
     
     try:
         coaching_agent = request.app.state.coaching_agent
-        ai_service = AIService(coaching_agent)
+        ai_service = AIService(coaching_agent, get_semantic_cache())
         
         result = await ai_service.generate_training_plan(plan_request)
         
         # Incrémenter métriques (les métriques OpenAI sont automatiquement gérées par advanced_agent)
-        training_plans_generated.inc()
+        training_plans_generated.labels(objective=plan_request.goal, level=plan_request.level).inc()
         # Les vrais appels OpenAI génèrent automatiquement AI_REQUESTS_TOTAL, AI_COST_USD_TOTAL etc.
         
         return result
@@ -197,7 +197,10 @@ async def generate_training_plan_advanced(
         generation_time = time.time() - start_time
         
         # Incrémenter la métrique de plans générés + collecter métriques OpenAI
-        training_plans_generated.inc()
+        training_plans_generated.labels(
+            objective=plan_request.running_goal.get('race_type', ''),
+            level=plan_request.personal_info.get('experience_level', '')
+        ).inc()
         
         # SOLUTION DIRECTE: Collecter métriques OpenAI après génération
         collect_openai_metrics(
@@ -2,27 +2,62 @@
 Router pour les endpoints de données utilisateur
 """
 
-from fastapi import APIRouter, HTTPException, Request
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional
 
+from config.settings import ACTIVITIES_MAX_PAGE_SIZE, ACTIVITIES_PAGE_SIZE
+from django_db_connector import parse_fields, decode_cursor
+
 router = APIRouter(prefix="/v1", tags=["Données"])
 
 @router.get("/activities/{user_id}")
 async def get_user_activities(
     user_id: int,
-    limit: Optional[int] = 20,
+    limit: Optional[int] = Query(None, ge=1, le=ACTIVITIES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = "json",
     request: Request = None
 ):
-    """Récupérer les activités d'un utilisateur depuis PostgreSQL Django"""
+    """
+    Récupérer les activités d'un utilisateur depuis PostgreSQL Django
+
+    - `limit` : taille de page JSON (20 par défaut, au plus ACTIVITIES_MAX_PAGE_SIZE) ;
+      en NDJSON, nombre maximal d'activités (tout l'historique par défaut)
+    - `cursor` : curseur `next_cursor` renvoyé par la page précédente
+    - `fields` : projection, ex. `fields=start_time,distance_km,pace_per_km`
+    - `format=ndjson` (ou `Accept: application/x-ndjson`) : streaming d'une activité par ligne
+    """
+    db_connector = request.app.state.async_db_connector
     try:
-        db_connector = request.app.state.db_connector
-        activities = db_connector.get_user_activities(user_id, limit=limit)
-        
+        if format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+            # Valide la projection et le curseur avant d'ouvrir le flux
+            parse_fields(fields)
+            if cursor:
+                decode_cursor(cursor)
+
+            async def stream_activities():
+                async for activity in db_connector.stream_user_activities(
+                    user_id, cursor=cursor, fields=fields, limit=limit
+                ):
+                    yield json.dumps(activity, default=str) + "\n"
+
+            return StreamingResponse(stream_activities(), media_type="application/x-ndjson")
+
+        page = await db_connector.get_user_activities_page(
+            user_id, limit=limit or ACTIVITIES_PAGE_SIZE, cursor=cursor, fields=fields
+        )
+
         return {
             "user_id": user_id,
-            "total_returned": len(activities),
-            "activities": activities
+            "total_returned": len(page["activities"]),
+            "next_cursor": page["next_cursor"],
+            "activities": page["activities"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur récupération activités: {str(e)}")
 
@@ -33,8 +68,8 @@ async def get_user_stats(
 ):
     """Obtenir les statistiques d'un utilisateur depuis PostgreSQL Django"""
     try:
-        db_connector = request.app.state.db_connector
-        stats = db_connector.get_user_stats(user_id)
+        db_connector = request.app.state.async_db_connector
+        stats = await db_connector.get_user_stats(user_id)
         
         return {
             "user_id": user_id,
@@ -47,8 +82,8 @@ async def get_user_stats(
 async def database_status(request: Request = None):
     """Vérifier le statut de la connexion PostgreSQL Django"""
     try:
-        db_connector = request.app.state.db_connector
-        status = db_connector.test_connection()
+        db_connector = request.app.state.async_db_connector
+        status = await db_connector.test_connection()
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur test connexion: {str(e)}")
\ No newline at end of file
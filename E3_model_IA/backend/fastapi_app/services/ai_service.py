@@ -2,6 +2,7 @@
 Service IA pour la gestion des interactions avec l'agent
 """
 
+import asyncio
 import json
 import time
 import uuid
@@ -9,10 +10,33 @@ from datetime import datetime
 from langchain_core.messages import HumanMessage
 
 from django_auth_service import django_auth_service
+from services import semantic_cache as sc
+
+CHAT_ENDPOINT = "/v1/coaching/chat"
+PLAN_ENDPOINT = "/v1/coaching/generate-training-plan"
 
 class AIService:
-    def __init__(self, coaching_agent):
+    def __init__(self, coaching_agent, semantic_cache=None):
         self.coaching_agent = coaching_agent
+        self.semantic_cache = semantic_cache
+    
+    async def _cache_lookup(self, endpoint, user_id, request_key, text):
+        """Consulte le cache sémantique : (réponse en cache ou None, clé (portée, embedding) pour store)"""
+        metrics = await asyncio.to_thread(sc.load_user_metrics, user_id)
+        scope = (endpoint, *request_key, sc.metrics_fingerprint(metrics))
+        vector = await self.semantic_cache.embed(text)
+        hit = self.semantic_cache.lookup(scope, vector)
+        sc.record_lookup(self.semantic_cache, endpoint, hit)
+        return hit, (scope, vector)
+    
+    async def _has_history(self, config):
+        """Vrai si le fil a déjà des messages : la réponse dépend alors de la conversation"""
+        try:
+            state = await self.coaching_agent.aget_state(config)
+        except ValueError:
+            # Graphe sans checkpointer : chaque appel est indépendant
+            return False
+        return bool(state.values.get("messages"))
     
     async def chat_stream(self, chat_request, user_id=None):
         """Stream de chat avec l'agent IA"""
@@ -23,11 +47,15 @@ class AIService:
         full_input = f"Je suis l'utilisateur {user_id}. {chat_request.message}"
         thread_id = chat_request.thread_id or f"user-thread-{user_id}"
         
-        # SOLUTION FINALE: CallbackHandler intégré 
-        from prometheus_callback import prometheus_callback
+        # SOLUTION FINALE: CallbackHandler intégré (optionnel : requiert langchain)
+        try:
+            from prometheus_callback import prometheus_callback
+            callbacks = [prometheus_callback]
+        except ImportError:
+            callbacks = []
         config = {
             "configurable": {"thread_id": thread_id},
-            "callbacks": [prometheus_callback]
+            "callbacks": callbacks
         }
 
         # Stocker la session de coaching
@@ -45,15 +73,30 @@ class AIService:
         # Déterminer le mode basé sur le thread_id
         mode = "plan_generator" if "plan-generation" in thread_id else "streamlit"
         
-        async for event in self.coaching_agent.astream({
-            "messages": [HumanMessage(content=full_input)], 
-            "mode": mode
-        }, config=config):
-            for step in event.values():
-                message = step["messages"][-1]
-                if hasattr(message, 'content') and message.content:
-                    ai_response_parts.append(message.content)
-                    yield json.dumps({"type": "content", "data": message.content}) + "\n"
+        # Cache sémantique : premier message d'un fil uniquement (sans historique de conversation)
+        cached = cache_key = None
+        if self.semantic_cache is not None and not await self._has_history(config):
+            cached, cache_key = await self._cache_lookup(CHAT_ENDPOINT, user_id, (mode,), chat_request.message)
+        
+        if cached is not None:
+            ai_response_parts.append(cached.response)
+            yield json.dumps({"type": "content", "data": cached.response}) + "\n"
+        else:
+            messages = []
+            async for event in self.coaching_agent.astream({
+                "messages": [HumanMessage(content=full_input)], 
+                "mode": mode
+            }, config=config):
+                for step in event.values():
+                    message = step["messages"][-1]
+                    messages.append(message)
+                    if hasattr(message, 'content') and message.content:
+                        ai_response_parts.append(message.content)
+                        yield json.dumps({"type": "content", "data": message.content}) + "\n"
+            
+            if cache_key is not None and ai_response_parts:
+                response = ''.join(ai_response_parts)
+                self.semantic_cache.store(*cache_key, response, sc.response_tokens(messages, response))
         
         # Finaliser la session
         end_time = time.time()
@@ -104,14 +147,16 @@ class AIService:
         if plan_request.target_time:
             target_time_info = f"- TEMPS OBJECTIF: {plan_request.target_time} sur {plan_request.goal}"
         
-        full_input = f"""Je suis l'utilisateur {plan_request.user_id}.
-
-ANALYSE ET GÉNÈRE un plan d'entraînement intelligent:
-- Objectif: {plan_request.goal}  
+        plan_spec = f"""- Objectif: {plan_request.goal}  
 - Niveau déclaré: {plan_request.level}
 - {plan_request.sessions_per_week} séances/semaine
 {target_time_info}
-{duration_instruction}
+{duration_instruction}"""
+        
+        full_input = f"""Je suis l'utilisateur {plan_request.user_id}.
+
+ANALYSE ET GÉNÈRE un plan d'entraînement intelligent:
+{plan_spec}
 
 ÉTAPES OBLIGATOIRES:
 1. UTILISE get_user_metrics_from_db({plan_request.user_id}) pour analyser le niveau réel
@@ -131,8 +176,28 @@ Sois précis, réaliste et justifie tes choix."""
         print(f"Génération plan pour user {plan_request.user_id}...")
         start_generation = time.time()
         
-        # Utiliser invoke pour plus de vitesse
-        result = self.coaching_agent.invoke({
+        # Cache sémantique : champs structurés (objectif et niveau normalisés compris) exacts dans la portée,
+        # similarité réservée au texte libre
+        cached = cache_key = None
+        if self.semantic_cache is not None:
+            request_key = (
+                sc.normalize_field(plan_request.goal), sc.normalize_field(plan_request.level),
+                plan_request.sessions_per_week, plan_request.duration_weeks, sc.normalize_field(plan_request.target_time),
+            )
+            cached, cache_key = await self._cache_lookup(PLAN_ENDPOINT, plan_request.user_id, request_key, plan_spec)
+        
+        if cached is not None:
+            return {
+                "success": True,
+                "plan_content": cached.response,
+                "user_id": plan_request.user_id,
+                "goal": plan_request.goal,
+                "method": "semantic_cache",
+                "generation_time_seconds": round(time.time() - start_generation, 2)
+            }
+        
+        # ainvoke : n'occupe pas la boucle d'événements, outils du même tour en parallèle
+        result = await self.coaching_agent.ainvoke({
             "messages": [HumanMessage(content=full_input)], 
             "mode": "plan_generator"
         }, config=config)
@@ -150,6 +215,12 @@ Sois précis, réaliste et justifie tes choix."""
         if not full_response or len(full_response) < 50:
             print(f"Réponse trop courte: {full_response}")
             full_response = "Erreur: Plan non généré correctement"
+        elif cache_key is not None:
+            # Messages produits par cet appel : après la dernière demande du fil
+            messages = result["messages"]
+            last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+            tokens = sc.response_tokens(messages[last_human + 1:], full_response)
+            self.semantic_cache.store(*cache_key, full_response, tokens)
         
         return {
             "success": True,
@@ -0,0 +1,202 @@
+"""
+Cache sémantique des réponses de l'agent de coaching
+
+Beaucoup de demandes sont quasi identiques (« plan 10k en 8 semaines » pour des
+coureurs au profil proche) et relancent chacune la boucle call_llm/use_tool
+complète. Une réponse est réutilisée si :
+- la portée est identique : endpoint, paramètres structurés de la demande et
+  empreinte des métriques de l'utilisateur regroupées par tranches ;
+- l'embedding du texte de la demande est assez proche (similarité cosinus
+  >= SEMANTIC_CACHE_THRESHOLD) d'une demande déjà servie.
+
+Les entrées expirent après SEMANTIC_CACHE_TTL_SECONDS ; au-delà de
+SEMANTIC_CACHE_MAX_ENTRIES, la moins récemment utilisée est évincée.
+Désactivé par défaut (SEMANTIC_CACHE_ENABLED) : une réponse peut être servie
+à un autre utilisateur de la même tranche de profil.
+"""
+
+import itertools
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from config.settings import (
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL_SECONDS
+)
+
+# Largeur des tranches par métrique (table metrics E1 ou synthèse 90 jours)
+METRIC_BUCKETS = {
+    "vma_kmh": 0.5,
+    "vo2max_estime": 2.0,
+    "prediction_10k_min": 2.0,
+    "charge_7j": 50.0,
+    "charge_28j": 150.0,
+    "avg_speed_kmh": 0.5,
+    "avg_distance_km": 2.0,
+    "avg_heart_rate": 5.0,
+    "total_activities": 5,
+    "total_distance_km": 50.0,
+}
+
+NO_METRICS = "sans-metriques"
+
+
+def load_user_metrics(user_id: int) -> Dict[str, Any]:
+    """Métriques vues par l'agent (outil get_user_metrics_from_db), en dictionnaire"""
+    from E3_model_IA.scripts.advanced_agent import get_user_metrics_from_db
+    return json.loads(get_user_metrics_from_db.invoke({"user_id": user_id}))
+
+
+def metrics_fingerprint(metrics: Optional[Dict[str, Any]]) -> str:
+    """Empreinte des métriques par tranches : deux profils proches partagent la même"""
+    if not metrics or "error" in metrics:
+        return NO_METRICS
+    parts = [
+        f"{name}:{math.floor(value / width)}"
+        for name, width in METRIC_BUCKETS.items()
+        if isinstance(value := metrics.get(name), (int, float)) and not isinstance(value, bool)
+    ]
+    return "|".join(parts) or NO_METRICS
+
+
+def normalize_field(value: Any) -> str:
+    """Champ structuré d'une demande pour la portée : casse et espaces ignorés ('10K ' == '10k')"""
+    return " ".join(str(value or "").split()).casefold()
+
+
+class CachedResponse(NamedTuple):
+    response: str
+    tokens: int
+    similarity: float
+
+
+class _Entry(NamedTuple):
+    scope: Hashable
+    vector: np.ndarray
+    response: str
+    tokens: int
+    expires_at: float
+
+
+class SemanticCache:
+    """Réponses indexées par portée exacte puis par similarité d'embedding, avec TTL et LRU"""
+
+    def __init__(self, embeddings, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._scopes: Dict[Hashable, Dict[int, None]] = {}
+        # Embeddings empilés par portée, reconstruits après un ajout ou une suppression
+        self._matrices: Dict[Hashable, Tuple[List[int], np.ndarray]] = {}
+        self.stats = {"lookups": 0, "hits": 0, "saved_tokens": 0, "evictions": 0}
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embedding normalisé (la similarité cosinus devient un produit scalaire)"""
+        vector = np.asarray(await self.embeddings.aembed_query(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def lookup(self, scope: Hashable, vector: np.ndarray) -> Optional[CachedResponse]:
+        """Réponse la plus proche dans la portée si elle dépasse le seuil"""
+        now = self.clock()
+        with self._lock:
+            self.stats["lookups"] += 1
+            for entry_id in [i for i in self._scopes.get(scope, ()) if self._entries[i].expires_at <= now]:
+                self._remove(entry_id)
+            if scope not in self._scopes:
+                return None
+
+            if scope not in self._matrices:
+                ids = list(self._scopes[scope])
+                self._matrices[scope] = ids, np.stack([self._entries[i].vector for i in ids])
+            ids, matrix = self._matrices[scope]
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            entry = self._entries[entry_id]
+            self.stats["hits"] += 1
+            self.stats["saved_tokens"] += entry.tokens
+            return CachedResponse(entry.response, entry.tokens, float(similarities[best]))
+
+    def store(self, scope: Hashable, vector: np.ndarray, response: str, tokens: int):
+        """Ajoute une réponse et évince les moins récemment utilisées au-delà de max_entries"""
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = _Entry(scope, vector, response, tokens, self.clock() + self.ttl_seconds)
+            self._scopes.setdefault(scope, {})[entry_id] = None
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self._matrices.pop(entry.scope, None)
+        scope_ids = self._scopes[entry.scope]
+        del scope_ids[entry_id]
+        if not scope_ids:
+            del self._scopes[entry.scope]
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._matrices.clear()
+
+
+def record_lookup(cache: SemanticCache, endpoint: str, hit: Optional[CachedResponse]):
+    """Exporte la consultation vers les compteurs coach_metrics"""
+    from coach_metrics import record_semantic_cache
+    record_semantic_cache(endpoint, hit is not None, hit.tokens if hit else 0, cache.hit_ratio)
+
+
+def response_tokens(messages, response: str) -> int:
+    """Tokens consommés (usage_metadata des AIMessage), estimés à 4 caractères par token à défaut"""
+    total = sum((getattr(message, "usage_metadata", None) or {}).get("total_tokens", 0) for message in messages)
+    return total or len(response) // 4
+
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Cache partagé par le processus ; None si SEMANTIC_CACHE_ENABLED est faux"""
+    global _semantic_cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            from E3_model_IA.scripts.advanced_agent import get_embedding
+            _semantic_cache = SemanticCache(get_embedding())
+        return _semantic_cache
+
+
+def reset_semantic_cache():
+    """Oublie le cache partagé (tests, rechargement de configuration)"""
+    global _semantic_cache
+    with _semantic_cache_lock:
+        _semantic_cache = None
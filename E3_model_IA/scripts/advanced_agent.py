@@ -2,56 +2,70 @@ import sys
 import os
 import json
 import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from rich import print as rprint
-from typing import Annotated, List, Any
+from typing import Annotated, List, Any, Callable, Dict, Optional
 from dotenv import load_dotenv
 
 
 import operator
-import openai
 from typing_extensions import TypedDict, NotRequired
 
-from langgraph.graph import END, StateGraph
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
-from langchain_core.messages import HumanMessage, ToolMessage, SystemMessage, AnyMessage
+# Les modules lourds (openai, langchain_openai, langgraph.graph, FAISS, checkpointer)
+# sont importés à la première utilisation : importer ce module reste peu coûteux.
+from langgraph.constants import END
+from langchain_core.messages import HumanMessage, ToolMessage, AnyMessage
 from langchain_core.messages.ai import AIMessage
-
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import DirectoryLoader
+from langchain_core.runnables import RunnableLambda
 from langchain_core.tools import tool
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 import sqlalchemy as sa
-import sqlite3
 import asyncio
-import aiosqlite
 
 try:
-    from E1_gestion_donnees.db_manager import create_db_engine
+    from E3_model_IA.scripts.knowledge_index import KnowledgeIndexStore, find_knowledge_base_path
+except ImportError:
+    sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+    from E3_model_IA.scripts.knowledge_index import KnowledgeIndexStore, find_knowledge_base_path
+
+from E3_model_IA.scripts.history_window import build_window, record_window, summarize_with_llm
+
+try:
+    from E1_gestion_donnees.analytics_queries import RECENT_ACTIVITY_SUMMARY, recent_summary_params
+    from E1_gestion_donnees.db_manager import create_db_engine, engine_kwargs_for
 except ImportError:
     print("Impossible d'importer db_manager - mode sans base de données")
     create_db_engine = None
+    engine_kwargs_for = None
 
 try:
-    from src.config import DATABASE_URL, OPENAI_API_KEY
+    from src.config import (
+        DATABASE_URL, OPENAI_API_KEY, DB_FAILOVER_RETRY_SECONDS, AGENT_TOOL_WORKERS, AGENT_TOOL_TIMEOUT_SECONDS
+    )
 except ImportError:
     import os
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///data/garmin_data.db')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    DB_FAILOVER_RETRY_SECONDS = float(os.getenv('DB_FAILOVER_RETRY_SECONDS', '60'))
+    AGENT_TOOL_WORKERS = int(os.getenv('AGENT_TOOL_WORKERS', '8'))
+    AGENT_TOOL_TIMEOUT_SECONDS = float(os.getenv('AGENT_TOOL_TIMEOUT_SECONDS', '30'))
 
 load_dotenv()
-api_key = OPENAI_API_KEY
 
-if not api_key:
+
+def get_api_key() -> str:
+    """Retourne la clé OpenAI (clé factice en CI), vérifiée à la première utilisation."""
+    api_key = OPENAI_API_KEY or os.getenv('OPENAI_API_KEY')
+    if api_key:
+        return api_key
     # En mode CI, utiliser une clé factice pour les tests
-    import os
     if os.getenv('CI') == 'true' or os.getenv('PYTEST_RUNNING') == '1':
-        api_key = 'sk-fake-key-for-ci-testing'
         print("Mode CI détecté - utilisation d'une clé API factice")
-    else:
-        raise ValueError("Clé API OpenAI manquante. Assurez-vous que OPENAI_API_KEY est bien définie dans le fichier .env.")
+        return 'sk-fake-key-for-ci-testing'
+    raise ValueError("Clé API OpenAI manquante. Assurez-vous que OPENAI_API_KEY est bien définie dans le fichier .env.")
 
 STREAMLIT_SYSTEM_PROMPT = """
 Tu es un coach sportif expert, prudent et encourageant, basé sur les données. Ton nom est "Coach Michael", mais tu précises quand tu te présentes que tu es un coach IA. Tu dois demander à l'utilisateur s'il préfère que tu sois un coach plutôt aggressif, doux, motivant, pour que tu adoptes ta personnalité en fonction de ses réponses.
@@ -167,41 +181,87 @@ Tu es Coach Michael, un expert en planification d'entraînement de course à pie
 # Mode par défaut (Streamlit)
 SYSTEM_PROMPT = STREAMLIT_SYSTEM_PROMPT
 
-llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0, api_key=api_key)
-embedding = OpenAIEmbeddings(api_key=api_key)
+# === Registre des ressources de l'agent (construites à la première utilisation) ===
+_resources: Dict[str, Any] = {}
+_resources_lock = threading.RLock()
+
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    """Construit une ressource une seule fois par processus et la met en cache."""
+    if name in _resources:
+        return _resources[name]
+    with _resources_lock:
+        if name not in _resources:
+            _resources[name] = factory()
+        return _resources[name]
+
+
+def reset_agent_resources():
+    """Vide le cache des ressources (tests, rechargement de configuration)."""
+    with _resources_lock:
+        for resource in _resources.values():
+            if isinstance(resource, AgentDatabase):
+                resource.dispose()
+            elif isinstance(resource, ThreadPoolExecutor):
+                resource.shutdown(wait=False)
+        _resources.clear()
+
+
+def get_llm():
+    def build():
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model="gpt-3.5-turbo", temperature=0, api_key=get_api_key())
+    return _get_or_create("llm", build)
+
+
+def get_embedding():
+    def build():
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(api_key=get_api_key())
+    return _get_or_create("embedding", build)
+
+
+def _build_knowledge_retriever():
+    try:
+        knowledge_base_path = find_knowledge_base_path()
+        if not knowledge_base_path:
+            raise FileNotFoundError("Directory not found: 'knowledge_base/'")
+
+        # Index persistant : chargement depuis le disque, ré-embedding des seuls chunks modifiés
+        knowledge_store = KnowledgeIndexStore()
+        vectorstore = knowledge_store.load_or_build(knowledge_base_path, get_embedding())
+        if vectorstore is None:
+            rprint("[bold red]Dossier 'knowledge_base' vide ou manquant. L'outil RAG ne fonctionnera pas.[/bold red]")
+            return None
+        rprint(f"[bold green]Base de connaissances initialisée avec succès ({knowledge_store.last_sync}).[/bold green]")
+        return vectorstore.as_retriever()
+    except Exception as e:
+        rprint(f"[bold red]Erreur lors de l'initialisation du RAG : {e}[/bold red]")
+        return None
+
+
+def get_knowledge_retriever():
+    return _get_or_create("knowledge_retriever", _build_knowledge_retriever)
+
+
+def get_llm_with_tools():
+    return _get_or_create("llm_with_tools", lambda: get_llm().bind_tools(tools))
+
+
+_LAZY_ATTRIBUTES = {
+    "api_key": get_api_key,
+    "llm": get_llm,
+    "embedding": get_embedding,
+    "knowledge_retriever": get_knowledge_retriever,
+    "llm_with_tools": get_llm_with_tools,
+}
 
-try:
-    possible_paths = [
-        "knowledge_base/",
-        "/app/knowledge_base/", 
-        "../../../knowledge_base/",
-        "../../knowledge_base/"
-    ]
-    
-    knowledge_base_path = None
-    for path in possible_paths:
-        if os.path.exists(path) and os.path.isdir(path):
-            knowledge_base_path = path
-            break
-    
-    if not knowledge_base_path:
-        raise FileNotFoundError("Directory not found: 'knowledge_base/'")
-        
-    loader = DirectoryLoader(knowledge_base_path, glob="**/*.md", show_progress=True)
-    documents = loader.load()
-    if not documents:
-        rprint("[bold red]Dossier 'knowledge_base' vide ou manquant. L'outil RAG ne fonctionnera pas.[/bold red]")
-        knowledge_retriever = None
-    else:
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        splits = text_splitter.split_documents(documents)
-        vectorstore = FAISS.from_documents(documents=splits, embedding=embedding)
-        knowledge_retriever = vectorstore.as_retriever()
-        rprint("[bold green]Base de connaissances initialisée avec succès.[/bold green]")
-except Exception as e:
-    rprint(f"[bold red]Erreur lors de l'initialisation du RAG : {e}[/bold red]")
-    knowledge_retriever = None
 
+def __getattr__(name: str) -> Any:
+    # Compatibilité : les anciens attributs de module sont résolus à la demande
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 @tool
 def get_weather_forecast(location: str) -> str:
@@ -221,6 +281,7 @@ def get_training_knowledge(query: str) -> str:
     pour répondre à une question sur les principes d'entraînement.
     Utilise-le pour trouver comment construire un plan basé sur les métriques d'un utilisateur.
     """
+    knowledge_retriever = get_knowledge_retriever()
     if knowledge_retriever is None:
         return "Erreur : La base de connaissances n'est pas disponible."
     
@@ -232,124 +293,199 @@ def get_training_knowledge(query: str) -> str:
         return f"Erreur lors de la recherche : {str(e)}"
 
 
-def get_db_engine_with_fallback():
+DJANGO_SQLITE_CANDIDATES = ["/app/data/django_garmin_data.db", "data/django_garmin_data.db"]
+
+
+class AgentDatabase:
     """
-    Crée une connexion à la base de données avec fallback Django SQLite si PostgreSQL échoue.
+    Moteur SQLAlchemy partagé par les outils de l'agent (un par processus).
+
+    La base principale est sondée une seule fois. Si elle est inaccessible, les
+    appels basculent sur la base SQLite Django et la principale n'est resondée
+    qu'après `retry_interval` secondes. Les tables réfléchies sont mises en cache ;
+    une table absente est recherchée de nouveau après `retry_interval` secondes.
     """
-    # FORCER LE SQLITE POUR CORRIGER LE PROBLÈME TEMPORAIREMENT
-    docker_env = os.getenv('DOCKER_ENV')
-    print(f"DEBUG: DOCKER_ENV={docker_env}, type={type(docker_env)}")
-    
-    if docker_env == 'true':
-        print("Mode Docker - utilisation directe SQLite Django...")
-        rprint("[yellow]Mode Docker - utilisation directe SQLite Django...[/yellow]")
-    else:
-        print(f"Mode local (DOCKER_ENV={docker_env}) - tentative PostgreSQL d'abord...")
-        try:
-            # Essayer d'abord la configuration par défaut (PostgreSQL/SQL Server)
-            engine = create_db_engine()
-            # Test rapide de connexion
-            with engine.connect() as conn:
-                conn.execute(sa.text("SELECT 1"))
-            rprint("[green]Connexion DB principale réussie[/green]")
+
+    def __init__(
+        self,
+        db_url: str = None,
+        fallback_paths: List[str] = None,
+        retry_interval: float = DB_FAILOVER_RETRY_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.db_url = db_url or DATABASE_URL
+        self.fallback_paths = fallback_paths if fallback_paths is not None else DJANGO_SQLITE_CANDIDATES
+        self.retry_interval = retry_interval
+        self.clock = clock
+        # Réentrant : _get_fallback réfléchit une table sous le verrou de get_engine
+        self._lock = threading.RLock()
+        self._primary = None
+        self._fallback = None
+        self._primary_retry_at = 0.0
+        self._tables: Dict[tuple, Any] = {}
+        self._missing_tables: Dict[tuple, float] = {}
+        self.stats = {"primary_probes": 0, "failovers": 0, "reflections": 0}
+
+    def _create_engine(self, url: str):
+        kwargs = engine_kwargs_for(url) if engine_kwargs_for else {}
+        return sa.create_engine(url, **kwargs)
+
+    def _probe_primary(self):
+        with self._lock:
+            self.stats["primary_probes"] += 1
+            engine = self._primary or self._create_engine(self.db_url)
+            try:
+                with engine.connect() as conn:
+                    conn.execute(sa.text("SELECT 1"))
+            except Exception as e:
+                engine.dispose()
+                self._primary = None
+                self._primary_retry_at = self.clock() + self.retry_interval
+                self.stats["failovers"] += 1
+                rprint(f"[yellow]DB principale inaccessible: {e}[/yellow]")
+                rprint(f"[yellow]Basculement vers SQLite Django (nouvel essai dans {self.retry_interval:.0f}s)...[/yellow]")
+                return None
+            if self._primary is None and self._fallback is not None:
+                rprint("[green]DB principale de nouveau accessible[/green]")
+            self._primary = engine
             return engine
-        except Exception as e:
-            rprint(f"[yellow]DB principale inaccessible: {e}[/yellow]")
-            rprint("[yellow]Basculement vers SQLite Django...[/yellow]")
-        
-    # Fallback vers la base SQLite Django  
-    django_db_path = "/app/data/django_garmin_data.db"
-    if not os.path.exists(django_db_path):
-        # En développement local
-        django_db_path = "data/django_garmin_data.db"
-    
-    if os.path.exists(django_db_path):
-        sqlite_url = f"sqlite:///{django_db_path}"
-        engine = sa.create_engine(sqlite_url, connect_args={'check_same_thread': False})
-        rprint(f"[green]SQLite activé: {django_db_path}[/green]")
-        
-        # Test de connexion et vérification des tables
-        try:
-            with engine.connect() as conn:
-                result = conn.execute(sa.text("SELECT name FROM sqlite_master WHERE type='table' AND name='activities_activity'"))
-                table_exists = result.fetchone()
-                if table_exists:
-                    rprint(f"[green]Table activities_activity trouvée[/green]")
-                else:
-                    rprint(f"[red]Table activities_activity manquante[/red]")
-                    # Afficher toutes les tables disponibles
-                    result = conn.execute(sa.text("SELECT name FROM sqlite_master WHERE type='table'"))
-                    tables = [row[0] for row in result.fetchall()]
-                    rprint(f"[yellow]Tables disponibles: {tables}[/yellow]")
-        except Exception as e:
-            rprint(f"[red]Erreur test connexion SQLite: {e}[/red]")
-        
-        return engine
-    else:
-        raise Exception(f"Aucune base de données accessible (ni principale ni SQLite)")
 
-@tool
-def get_user_metrics_from_db(user_id: int) -> str:
+    def _get_fallback(self):
+        if self._fallback is not None:
+            return self._fallback
+        for path in self.fallback_paths:
+            if os.path.exists(path):
+                self._fallback = self._create_engine(f"sqlite:///{path}")
+                rprint(f"[green]SQLite activé: {path}[/green]")
+                if self.get_table(self._fallback, "activities_activity") is None:
+                    rprint("[red]Table activities_activity manquante[/red]")
+                return self._fallback
+        raise Exception("Aucune base de données accessible (ni principale ni SQLite)")
+
+    def get_engine(self):
+        """Retourne le moteur actif sans resonder la base à chaque appel."""
+        primary = self._primary
+        if primary is not None:
+            return primary
+        with self._lock:
+            if self._primary is not None:
+                return self._primary
+            # Mode Docker : la base SQLite Django est utilisée directement
+            if os.getenv('DOCKER_ENV') != 'true' and self.clock() >= self._primary_retry_at:
+                engine = self._probe_primary()
+                if engine is not None:
+                    return engine
+            return self._get_fallback()
+
+    def report_failure(self, engine):
+        """
+        Signale une erreur SQL sur `engine`. Si la base principale ne répond plus
+        au test de santé, elle est mise en quarantaine jusqu'au prochain essai.
+        """
+        with self._lock:
+            if engine is None or engine is not self._primary:
+                return
+            self._probe_primary()
+
+    def get_table(self, engine, name: str):
+        """Réflexion d'une table, mise en cache par moteur (None si absente, resondée après retry_interval)."""
+        key = (str(engine.url), name)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None or self.clock() < self._missing_tables.get(key, 0.0):
+                return table
+            self.stats["reflections"] += 1
+            try:
+                table = sa.Table(name, sa.MetaData(), autoload_with=engine)
+            except sa.exc.NoSuchTableError:
+                self._missing_tables[key] = self.clock() + self.retry_interval
+                return None
+            self._tables[key] = table
+            self._missing_tables.pop(key, None)
+            return table
+
+    def dispose(self):
+        for engine in (self._primary, self._fallback):
+            if engine is not None:
+                engine.dispose()
+
+
+def get_agent_database() -> AgentDatabase:
+    return _get_or_create("agent_database", AgentDatabase)
+
+
+def get_db_engine_with_fallback():
     """
-    Récupère les métriques de performance les plus récentes pour un utilisateur donné.
-    Retourne les données au format JSON.
+    Retourne le moteur partagé de l'agent, avec fallback SQLite Django si la base principale échoue.
+    """
+    return get_agent_database().get_engine()
+
+def query_user_metrics(user_id: int) -> Dict[str, Any]:
     """
+    Métriques de l'agent : dernière ligne de la table metrics E1, sinon synthèse
+    des 90 derniers jours. Lève l'exception de la base en cas d'échec.
+    """
+    database = get_agent_database()
+    engine = None
     try:
-        engine = get_db_engine_with_fallback()
-        rprint(f"[cyan]DEBUG get_user_metrics_from_db: engine={engine.url}[/cyan]")
+        engine = database.get_engine()
         with engine.connect() as conn:
             # Essayer d'abord avec la table metrics FastAPI
-            try:
-                metadata = sa.MetaData()
-                metrics_table = sa.Table("metrics", metadata, autoload_with=engine)
+            metrics_table = database.get_table(engine, "metrics")
+            if metrics_table is not None:
                 stmt = sa.select(metrics_table).where(
                     metrics_table.c.user_id == user_id
                 ).order_by(sa.desc(metrics_table.c.date_calcul))
                 result = conn.execute(stmt).mappings().first()
                 
                 if result:
-                    return json.dumps(dict(result), default=str)
-            except:
-                pass
-            
-            # Déterminer le type de base pour adapter la requête
-            if 'sqlite' in str(engine.url):
-                date_filter = "date('now', '-90 days')"
-            else:
-                date_filter = "CURRENT_DATE - INTERVAL '90 days'"
+                    return dict(result)
             
-            result = conn.execute(sa.text(f"""
-                SELECT 
-                    COUNT(*) as total_activities,
-                    AVG(distance_meters/1000.0) as avg_distance_km,
-                    AVG(duration_seconds/60.0) as avg_duration_min,
-                    AVG(average_hr) as avg_heart_rate,
-                    MAX(start_time) as last_activity_date,
-                    AVG(average_speed) as avg_speed_kmh,
-                    SUM(distance_meters/1000.0) as total_distance_km,
-                    SUM(duration_seconds/3600.0) as total_duration_hours
-                FROM activities_activity 
-                WHERE user_id = :user_id
-                    AND start_time >= {date_filter}
-            """), {"user_id": user_id}).fetchone()
-
-        if not result or result[0] == 0:
-            return json.dumps({"error": f"Aucune métrique trouvée pour l'utilisateur {user_id}."})
-        
-        # Convertir en dictionnaire avec noms explicites
-        metrics = {
-            "user_id": user_id,
-            "total_activities": result[0],
-            "avg_distance_km": round(result[1] or 0, 2),
-            "avg_duration_min": round(result[2] or 0, 1),
-            "avg_heart_rate": round(result[3] or 0, 0) if result[3] else None,
-            "last_activity_date": result[4],
-            "avg_speed_kmh": round(result[5] or 0, 2),
-            "total_distance_km": round(result[6] or 0, 1),
-            "total_duration_hours": round(result[7] or 0, 1),
-            "period": "90 derniers jours"
-        }
-        
+            # Même requête Core pour tous les dialectes, fenêtre de 90 jours liée en paramètre
+            result = conn.execute(RECENT_ACTIVITY_SUMMARY, recent_summary_params(user_id)).fetchone()
+    except sa.exc.DBAPIError:
+        database.report_failure(engine)
+        raise
+
+    if not result or result[0] == 0:
+        return {"error": f"Aucune métrique trouvée pour l'utilisateur {user_id}."}
+    
+    # Convertir en dictionnaire avec noms explicites
+    return {
+        "user_id": user_id,
+        "total_activities": result[0],
+        "avg_distance_km": round(result[1] or 0, 2),
+        "avg_duration_min": round(result[2] or 0, 1),
+        "avg_heart_rate": round(result[3] or 0, 0) if result[3] else None,
+        "last_activity_date": result[4],
+        "avg_speed_kmh": round(result[5] or 0, 2),
+        "total_distance_km": round(result[6] or 0, 1),
+        "total_duration_hours": round(result[7] or 0, 1),
+        "period": "90 derniers jours"
+    }
+
+
+# Métriques en cache par utilisateur (agent_metrics_cache.user_metrics sous Django et FastAPI) :
+# fournies sans requête tant que les données de l'utilisateur sont inchangées
+_user_context_provider: Optional[Callable[[int], Optional[Dict[str, Any]]]] = None
+
+
+def set_user_context_provider(provider: Optional[Callable[[int], Optional[Dict[str, Any]]]]):
+    """Branche (ou retire avec None) la source des métriques mises en cache ; None en retour = requête directe"""
+    global _user_context_provider
+    _user_context_provider = provider
+
+
+@tool
+def get_user_metrics_from_db(user_id: int) -> str:
+    """
+    Récupère les métriques de performance les plus récentes pour un utilisateur donné.
+    Retourne les données au format JSON.
+    """
+    try:
+        metrics = _user_context_provider(user_id) if _user_context_provider is not None else None
+        if metrics is None:
+            metrics = query_user_metrics(user_id)
         return json.dumps(metrics, default=str)
     
     except Exception as e:
@@ -363,6 +499,7 @@ def call_openai_agent(messages):
     start_time = time.time()
     try:
         # API OpenAI moderne
+        import openai
         client = openai.OpenAI()
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
@@ -379,14 +516,13 @@ def call_openai_agent(messages):
 # === Enregistrement des outils ===
 tools = [get_user_metrics_from_db, get_training_knowledge, get_weather_forecast]
 
-# Réinitialisation du LLM avec les outils
-llm_with_tools = llm.bind_tools(tools)
-
 
 # === Structure d'état du graphe ===
 class AgentState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
     mode: NotRequired[str]  # "streamlit" ou "plan_generator"
+    history_summary: NotRequired[str]  # résumé des tours sortis de la fenêtre d'historique
+    summarized_messages: NotRequired[int]  # nombre de messages couverts par ce résumé
 
 
 # === Fonctions du graphe ===
@@ -398,12 +534,20 @@ def call_llm(state: AgentState) -> AgentState:
     else:
         system_prompt = STREAMLIT_SYSTEM_PROMPT
     
-    system_msg = SystemMessage(content=system_prompt)
-    full_history = [system_msg] + state["messages"]
+    # Prompt système épinglé, tours anciens sans outils, résumés au-delà du budget de tokens
+    window = build_window(
+        system_prompt, state["messages"],
+        summary=state.get("history_summary", ""), summarized=state.get("summarized_messages", 0),
+        summarize=lambda previous, messages: summarize_with_llm(get_llm(), previous, messages),
+    )
+    record_window(window, mode)
     
     try:
-        response = llm_with_tools.invoke(full_history)
-        return {"messages": [response]}
+        response = get_llm_with_tools().invoke(window.messages)
+        update = {"messages": [response]}
+        if window.summarized != state.get("summarized_messages", 0):
+            update.update(history_summary=window.summary, summarized_messages=window.summarized)
+        return update
     except Exception as e:
         rprint(f"[bold red]Erreur lors de l'appel au LLM : {e}[/bold red]")
         error_msg = AIMessage(content=f"Désolé, une erreur s'est produite : {str(e)}")
@@ -417,59 +561,121 @@ def needs_tool(state: AgentState) -> str:
     return END
 
 
+# Délai maximal par outil (secondes) ; les autres outils utilisent AGENT_TOOL_TIMEOUT_SECONDS
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "get_weather_forecast": 10.0,
+    "get_user_metrics_from_db": 15.0,
+    "get_training_knowledge": 20.0,
+}
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Pool borné des outils synchrones (requêtes SQL, recherche d'embeddings)."""
+    return _get_or_create("tool_executor", lambda: ThreadPoolExecutor(
+        max_workers=AGENT_TOOL_WORKERS, thread_name_prefix="agent-tool"
+    ))
+
+
+def _tool_timeout(tool_name: str) -> float:
+    return TOOL_TIMEOUTS.get(tool_name, AGENT_TOOL_TIMEOUT_SECONDS)
+
+
+def _tool_message(call, content: str) -> ToolMessage:
+    return ToolMessage(tool_call_id=call["id"], name=call["name"], content=content)
+
+
+def _unknown_tool(call) -> ToolMessage:
+    rprint(f"[bold red]Outil inconnu : {call['name']}[/bold red]")
+    return _tool_message(call, f"Outil inconnu : {call['name']}")
+
+
+def _tool_error(call, error: Exception) -> ToolMessage:
+    if isinstance(error, TimeoutError):
+        timeout = _tool_timeout(call["name"])
+        rprint(f"[bold red]Délai dépassé pour l'outil {call['name']} ({timeout:g} s)[/bold red]")
+        return _tool_message(call, f"Délai dépassé pour l'outil {call['name']} ({timeout:g} s)")
+    rprint(f"[bold red]Erreur lors de l'exécution de l'outil {call['name']} : {error}[/bold red]")
+    return _tool_message(call, f"Erreur lors de l'exécution de l'outil : {str(error)}")
+
+
+def _submit_tool(tool_to_use, call):
+    """Lance un outil synchrone dans le pool, avec le contexte courant (callbacks LangChain)"""
+    rprint(f"[bold cyan]Utilisation de l'outil : {tool_to_use.name}({call['args']})[/bold cyan]")
+    if getattr(tool_to_use, "func", None) is None and getattr(tool_to_use, "coroutine", None) is not None:
+        # Outil uniquement asynchrone appelé depuis graph.invoke : sa propre boucle dans le thread du pool
+        def runner(args):
+            return asyncio.run(tool_to_use.ainvoke(args))
+    else:
+        runner = tool_to_use.invoke
+    context = contextvars.copy_context()
+    return get_tool_executor().submit(context.run, runner, call["args"])
+
+
+async def _arun_tool_call(call, available_tools) -> ToolMessage:
+    tool_to_use = available_tools.get(call["name"])
+    if tool_to_use is None:
+        return _unknown_tool(call)
+    try:
+        if getattr(tool_to_use, "coroutine", None) is not None:
+            rprint(f"[bold cyan]Utilisation de l'outil : {tool_to_use.name}({call['args']})[/bold cyan]")
+            pending = tool_to_use.ainvoke(call["args"])
+        else:
+            pending = asyncio.wrap_future(_submit_tool(tool_to_use, call))
+        # Au-delà du délai, un outil synchrone finit dans son thread mais son résultat est ignoré
+        output = await asyncio.wait_for(pending, _tool_timeout(call["name"]))
+    except Exception as e:
+        return _tool_error(call, e)
+    return _tool_message(call, str(output))
+
+
+async def ause_tool(state: AgentState) -> AgentState:
+    """
+    Exécute en parallèle les appels d'outils d'un tour du LLM (métriques SQL et
+    base de connaissances ensemble), chacun avec son délai ; l'ordre des
+    ToolMessage suit celui des tool_calls.
+    """
+    tool_calls = state["messages"][-1].tool_calls
+    available_tools = {t.name: t for t in tools}
+    results = await asyncio.gather(*(_arun_tool_call(call, available_tools) for call in tool_calls))
+    return {"messages": list(results)}
+
+
 def use_tool(state: AgentState) -> AgentState:
+    """Version synchrone (graph.invoke) : mêmes appels parallèles dans le pool d'outils."""
     tool_calls = state["messages"][-1].tool_calls
-    results = []
-    
-    # Création du dictionnaire des outils disponibles
     available_tools = {t.name: t for t in tools}
-    
+
+    pending = []
     for call in tool_calls:
-        tool_name = call["name"]
-        if tool_name in available_tools:
-            tool_to_use = available_tools[tool_name]
-            rprint(f"[bold cyan]Utilisation de l'outil : {tool_to_use.name}({call['args']})[/bold cyan]")
-            
-            try:
-                output = tool_to_use.invoke(call["args"])
-                results.append(ToolMessage(
-                    tool_call_id=call["id"], 
-                    name=call["name"], 
-                    content=str(output)
-                ))
-            except Exception as e:
-                rprint(f"[bold red]Erreur lors de l'exécution de l'outil {tool_name} : {e}[/bold red]")
-                results.append(ToolMessage(
-                    tool_call_id=call["id"], 
-                    name=call["name"], 
-                    content=f"Erreur lors de l'exécution de l'outil : {str(e)}"
-                ))
+        tool_to_use = available_tools.get(call["name"])
+        if tool_to_use is None:
+            pending.append((call, None, 0.0))
         else:
-            rprint(f"[bold red]Outil inconnu : {tool_name}[/bold red]")
-            results.append(ToolMessage(
-                tool_call_id=call["id"], 
-                name=call["name"], 
-                content=f"Outil inconnu : {tool_name}"
-            ))
-    
+            deadline = time.monotonic() + _tool_timeout(call["name"])
+            pending.append((call, _submit_tool(tool_to_use, call), deadline))
+
+    results = []
+    for call, future, deadline in pending:
+        if future is None:
+            results.append(_unknown_tool(call))
+            continue
+        try:
+            output = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except Exception as e:
+            results.append(_tool_error(call, e))
+        else:
+            results.append(_tool_message(call, str(output)))
     return {"messages": results}
 
 
 async def create_async_checkpointer():
     """
-    Crée un checkpointer AsyncSqliteSaver de manière asynchrone.
+    Crée le checkpointer de la mémoire de l'agent (SQLite WAL ou PostgreSQL, voir checkpoint_store).
     """
+    from E3_model_IA.scripts.checkpoint_store import create_checkpointer
+
     try:
-        # Créer le répertoire data s'il n'existe pas
-        os.makedirs("data", exist_ok=True)
-        
-        # Créer le checkpointer avec AsyncSqliteSaver
-        checkpointer = AsyncSqliteSaver.from_conn_string("data/agent_memory.sqlite")
-        
-        # Initialiser les tables de façon asynchrone
-        await checkpointer.setup()
-        
-        return checkpointer
+        return await create_checkpointer()
     except Exception as e:
         rprint(f"[bold red]Erreur lors de la création du checkpointer : {e}[/bold red]")
         return None
@@ -480,9 +686,11 @@ async def get_coaching_graph():
     Construit et compile le graphe LangGraph de l'agent coach de façon asynchrone.
     Retourne l'objet graphe prêt à l'emploi.
     """
+    from langgraph.graph import StateGraph
+
     graph_builder = StateGraph(AgentState)
     graph_builder.add_node("llm", call_llm)
-    graph_builder.add_node("action", use_tool)
+    graph_builder.add_node("action", RunnableLambda(use_tool, afunc=ause_tool))
     graph_builder.add_conditional_edges("llm", needs_tool, {"action": "action", END: END})
     graph_builder.add_edge("action", "llm")
     graph_builder.set_entry_point("llm")
@@ -0,0 +1,45 @@
+"""
+Métriques de l'agent mises en cache par utilisateur
+
+Fournisseur de l'outil get_user_metrics_from_db
+(advanced_agent.set_user_context_provider), sans dépendance à Django ni à
+FastAPI : branché au démarrage de FastAPI et de l'agent Django, et lu par
+l'instantané du contexte de coaching Django (coaching.context).
+
+Le cache est local au processus ; il réutilise les marqueurs de version de
+src.stats_cache : une synchronisation Garmin, le pipeline E1 ou une
+modification des données de l'utilisateur sous Django l'invalident dans tous
+les processus. Ses consultations ne sont pas comptées dans
+cache_efficiency_ratio.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from src.stats_cache import UserStatsCache
+
+log = logging.getLogger(__name__)
+
+agent_metrics_cache = UserStatsCache(max_entries=4096, green_metrics=False)
+
+
+def user_metrics(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Métriques de query_user_metrics, servies depuis le cache tant que la
+    version de l'utilisateur est inchangée ; None si la base de l'agent est
+    indisponible (l'outil refait alors la requête à l'appel)
+    """
+    metrics = agent_metrics_cache.get(user_id)
+    if metrics is not None:
+        return metrics
+
+    # Version lue avant la requête : une invalidation concurrente rend l'entrée obsolète
+    version = agent_metrics_cache.version(user_id)
+    try:
+        from E3_model_IA.scripts.advanced_agent import query_user_metrics
+        metrics = query_user_metrics(user_id)
+    except Exception as e:
+        log.warning(f"Métriques de l'agent indisponibles (utilisateur {user_id}) : {e}")
+        return None
+    agent_metrics_cache.set(user_id, metrics, version)
+    return metrics
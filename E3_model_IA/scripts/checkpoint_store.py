@@ -0,0 +1,284 @@
+"""
+Stockage des checkpoints LangGraph (mémoire des conversations de l'agent)
+
+Le backend est choisi par AGENT_MEMORY_URL :
+- sqlite:///chemin : AsyncSqliteSaver en mode WAL (les lectures ne bloquent plus
+  l'écrivain), synchronous=NORMAL et busy_timeout pour les écritures concurrentes ;
+- postgresql://... : AsyncPostgresSaver sur un pool de connexions psycopg
+  (dépendances optionnelles langgraph-checkpoint-postgres et psycopg-pool).
+
+Rétention : après chaque checkpoint écrit, seuls les AGENT_MEMORY_KEEP_CHECKPOINTS
+derniers du fil (thread_id) sont conservés, avec leurs écritures intermédiaires.
+L'état courant d'une conversation est entièrement porté par son dernier
+checkpoint ; seul l'historique rejouable (time travel) est tronqué.
+
+Métriques : latence d'écriture des checkpoints et taille de la base, exposées
+par stats() et, si prometheus_client est installé, en histogramme et jauge.
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import sqlalchemy as sa
+
+try:
+    from src.config import AGENT_MEMORY_KEEP_CHECKPOINTS, AGENT_MEMORY_POOL_SIZE, AGENT_MEMORY_URL
+except ImportError:
+    AGENT_MEMORY_URL = os.getenv("AGENT_MEMORY_URL", "sqlite:///data/agent_memory.sqlite")
+    AGENT_MEMORY_KEEP_CHECKPOINTS = int(os.getenv("AGENT_MEMORY_KEEP_CHECKPOINTS", "20"))
+    AGENT_MEMORY_POOL_SIZE = int(os.getenv("AGENT_MEMORY_POOL_SIZE", "5"))
+
+try:
+    from prometheus_client import Gauge, Histogram
+
+    checkpoint_write_seconds = Histogram(
+        'agent_checkpoint_write_seconds',
+        'Latence d ecriture des checkpoints de l agent en secondes',
+        ['backend'],
+    )
+    checkpoint_db_size_bytes = Gauge(
+        'agent_checkpoint_db_size_bytes',
+        'Taille de la base des checkpoints de l agent en octets',
+        ['backend'],
+    )
+except ImportError:
+    checkpoint_write_seconds = checkpoint_db_size_bytes = None
+
+log = logging.getLogger(__name__)
+
+# PRAGMA appliqués à chaque connexion SQLite (journal_mode=WAL est persistant dans le fichier)
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+)
+
+# Taille de la base recalculée toutes les N écritures (et à la demande)
+SIZE_REFRESH_EVERY = 100
+
+
+class CheckpointMetrics:
+    """Latence d'écriture et taille de la base, cumulées par processus"""
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.write_seconds = 0.0
+        self.max_write_seconds = 0.0
+        self.compacted = 0
+        self.db_size_bytes: Optional[int] = None
+
+    def observe_write(self, seconds: float):
+        with self._lock:
+            self.writes += 1
+            self.write_seconds += seconds
+            self.max_write_seconds = max(self.max_write_seconds, seconds)
+        if checkpoint_write_seconds is not None:
+            checkpoint_write_seconds.labels(self.backend).observe(seconds)
+
+    def observe_compaction(self, removed: int):
+        with self._lock:
+            self.compacted += removed
+
+    def observe_size(self, size_bytes: int):
+        self.db_size_bytes = size_bytes
+        if checkpoint_db_size_bytes is not None:
+            checkpoint_db_size_bytes.labels(self.backend).set(size_bytes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "writes": self.writes,
+                "avg_write_ms": round(self.write_seconds / self.writes * 1000, 3) if self.writes else None,
+                "max_write_ms": round(self.max_write_seconds * 1000, 3),
+                "compacted_checkpoints": self.compacted,
+                "db_size_bytes": self.db_size_bytes,
+            }
+
+
+class RetentionMixin:
+    """Mesure chaque écriture de checkpoint puis compacte le fil concerné"""
+
+    keep_last: int
+    metrics: CheckpointMetrics
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        start = time.perf_counter()
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        self.metrics.observe_write(time.perf_counter() - start)
+
+        if self.keep_last:
+            configurable = next_config["configurable"]
+            removed = await self.acompact(configurable["thread_id"], configurable.get("checkpoint_ns", ""))
+            if removed:
+                self.metrics.observe_compaction(removed)
+        if self.metrics.writes % SIZE_REFRESH_EVERY == 1:
+            await self.adatabase_size()
+        return next_config
+
+    def stats(self) -> Dict[str, Any]:
+        return self.metrics.snapshot()
+
+
+@functools.lru_cache(maxsize=None)
+def _sqlite_saver_class():
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    class RetainingSqliteSaver(RetentionMixin, AsyncSqliteSaver):
+        """AsyncSqliteSaver en WAL avec rétention par fil"""
+
+        def __init__(self, conn, path: Path, keep_last: int):
+            super().__init__(conn)
+            self.path = path
+            self.keep_last = keep_last
+            self.metrics = CheckpointMetrics("sqlite")
+
+        async def acompact(self, thread_id: str, checkpoint_ns: str = "") -> int:
+            """Supprime les checkpoints du fil au-delà des keep_last plus récents"""
+            key = (str(thread_id), checkpoint_ns)
+            async with self.lock:
+                # Les checkpoint_id (uuid6) sont croissants dans le temps
+                cursor = await self.conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ("
+                    " SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?)",
+                    (*key, *key, self.keep_last),
+                )
+                removed = cursor.rowcount
+                if removed:
+                    await self.conn.execute(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                        " SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?)",
+                        (*key, *key),
+                    )
+                await self.conn.commit()
+            return removed
+
+        async def adatabase_size(self) -> int:
+            """Fichier principal + journal WAL, en octets"""
+            size = sum(
+                os.path.getsize(f) for f in (self.path, Path(f"{self.path}-wal")) if os.path.exists(f)
+            )
+            self.metrics.observe_size(size)
+            return size
+
+        async def aclose(self):
+            await self.conn.close()
+
+    return RetainingSqliteSaver
+
+
+@functools.lru_cache(maxsize=None)
+def _postgres_saver_class():
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+    class RetainingPostgresSaver(RetentionMixin, AsyncPostgresSaver):
+        """AsyncPostgresSaver sur pool psycopg avec rétention par fil"""
+
+        def __init__(self, pool, keep_last: int):
+            super().__init__(pool)
+            self.pool = pool
+            self.keep_last = keep_last
+            self.metrics = CheckpointMetrics("postgresql")
+
+        async def acompact(self, thread_id: str, checkpoint_ns: str = "") -> int:
+            """Supprime les checkpoints anciens du fil, leurs écritures et les blobs devenus orphelins"""
+            params = {"thread_id": str(thread_id), "checkpoint_ns": checkpoint_ns, "keep": self.keep_last}
+            async with self.pool.connection() as conn, conn.transaction():
+                cursor = await conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = %(thread_id)s AND checkpoint_ns = %(checkpoint_ns)s"
+                    " AND checkpoint_id IN (SELECT checkpoint_id FROM checkpoints"
+                    " WHERE thread_id = %(thread_id)s AND checkpoint_ns = %(checkpoint_ns)s"
+                    " ORDER BY checkpoint_id DESC OFFSET %(keep)s)",
+                    params,
+                )
+                removed = cursor.rowcount
+                if removed:
+                    await conn.execute(
+                        "DELETE FROM checkpoint_writes w WHERE w.thread_id = %(thread_id)s"
+                        " AND w.checkpoint_ns = %(checkpoint_ns)s AND NOT EXISTS (SELECT 1 FROM checkpoints c"
+                        " WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns"
+                        " AND c.checkpoint_id = w.checkpoint_id)",
+                        params,
+                    )
+                    # Un blob reste référencé tant qu'un checkpoint conservé pointe sur sa version
+                    await conn.execute(
+                        "DELETE FROM checkpoint_blobs b WHERE b.thread_id = %(thread_id)s"
+                        " AND b.checkpoint_ns = %(checkpoint_ns)s AND NOT EXISTS (SELECT 1 FROM checkpoints c"
+                        " WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns"
+                        " AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version)",
+                        params,
+                    )
+            return removed
+
+        async def adatabase_size(self) -> int:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute(
+                    "SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0) AS size FROM pg_class c"
+                    " WHERE c.oid IN (to_regclass('checkpoints'), to_regclass('checkpoint_blobs'),"
+                    " to_regclass('checkpoint_writes'))"
+                )
+                row = await cursor.fetchone()
+            size = int(row["size"] if isinstance(row, dict) else row[0])
+            self.metrics.observe_size(size)
+            return size
+
+        async def aclose(self):
+            await self.pool.close()
+
+    return RetainingPostgresSaver
+
+
+def libpq_conninfo(url: sa.engine.URL) -> str:
+    """URL SQLAlchemy (postgresql+driver://) -> URI libpq pour psycopg"""
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+async def create_checkpointer(url: Optional[str] = None, keep_last: Optional[int] = None,
+                              pool_size: Optional[int] = None):
+    """
+    Crée le checkpointer configuré, tables comprises.
+    À appeler depuis la boucle asyncio qui exécutera le graphe.
+    """
+    url = sa.engine.make_url(url or AGENT_MEMORY_URL)
+    keep_last = AGENT_MEMORY_KEEP_CHECKPOINTS if keep_last is None else keep_last
+    if keep_last:
+        # Le dernier checkpoint et son parent restent nécessaires à la reprise d'un fil
+        keep_last = max(keep_last, 2)
+    backend = url.get_backend_name()
+
+    if backend == "sqlite":
+        import aiosqlite
+
+        path = Path(url.database or "data/agent_memory.sqlite")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = await aiosqlite.connect(str(path))
+        for pragma in SQLITE_PRAGMAS:
+            await conn.execute(pragma)
+        saver = _sqlite_saver_class()(conn, path, keep_last)
+    elif backend == "postgresql":
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+
+        pool = AsyncConnectionPool(
+            libpq_conninfo(url), max_size=pool_size or AGENT_MEMORY_POOL_SIZE, open=False,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        )
+        await pool.open()
+        saver = _postgres_saver_class()(pool, keep_last)
+    else:
+        raise ValueError(f"Backend de mémoire de l'agent non supporté : {backend}")
+
+    await saver.setup()
+    await saver.adatabase_size()
+    log.info(f"Mémoire de l'agent : {backend}, {keep_last or 'tous les'} derniers checkpoints par fil")
+    return saver
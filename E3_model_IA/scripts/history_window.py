@@ -0,0 +1,206 @@
+"""
+Fenêtre d'historique de l'agent bornée en tokens
+
+call_llm envoyait [prompt système] + tous les messages du fil ; avec la mémoire
+persistante, un fil user-thread-{id} accumule chaque échange, y compris le JSON
+des ToolMessage et les passages RAG, et le coût de chaque tour croît sans fin.
+La fenêtre envoyée au LLM :
+- garde le prompt système en tête (épinglé) ;
+- garde le tour courant en entier (dernière demande et ses appels d'outils) ;
+- retire des tours précédents les appels d'outils et leurs résultats, périmés
+  une fois la réponse du coach rédigée ;
+- au-delà de AGENT_HISTORY_MAX_TOKENS, résume les plus anciens tours jusqu'à
+  revenir sous TARGET_RATIO du budget. Le résumé est conservé dans l'état du
+  graphe (history_summary, summarized_messages) et complété au fil du fil.
+
+Tokens comptés avec tiktoken (encodage AGENT_HISTORY_ENCODING) ou, à défaut,
+estimés à 4 caractères par token. Tokens envoyés et économisés par requête
+exportés en histogrammes si prometheus_client est installé.
+"""
+
+import functools
+import json
+import logging
+import os
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+
+try:
+    from src.config import AGENT_HISTORY_ENCODING, AGENT_HISTORY_MAX_TOKENS
+except ImportError:
+    AGENT_HISTORY_MAX_TOKENS = int(os.getenv("AGENT_HISTORY_MAX_TOKENS", "6000"))
+    AGENT_HISTORY_ENCODING = os.getenv("AGENT_HISTORY_ENCODING", "cl100k_base")
+
+try:
+    from prometheus_client import Histogram
+
+    TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+    history_prompt_tokens = Histogram(
+        'agent_history_prompt_tokens',
+        'Tokens de l historique envoyes au LLM par requete',
+        ['mode'], buckets=TOKEN_BUCKETS,
+    )
+    history_saved_tokens = Histogram(
+        'agent_history_saved_tokens',
+        'Tokens economises par requete grace a la fenetre d historique',
+        ['mode'], buckets=(0,) + TOKEN_BUCKETS,
+    )
+except ImportError:
+    history_prompt_tokens = history_saved_tokens = None
+
+log = logging.getLogger(__name__)
+
+# Après un résumé, la fenêtre redescend à cette fraction du budget (évite de résumer à chaque tour)
+TARGET_RATIO = 0.6
+
+# Surcoût de structure par message (rôle, séparateurs) dans le format chat d'OpenAI
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_MAX_CHARS = 2000
+SUMMARY_LINE_CHARS = 300
+
+SUMMARY_PROMPT = """Tu résumes une conversation entre un coureur et son coach IA.
+Intègre le résumé précédent et les nouveaux échanges en un seul résumé de 200 mots maximum.
+Conserve les faits utiles pour la suite : objectifs, niveau, métriques citées, blessures,
+contraintes, plans proposés et décisions. Ne mentionne pas les outils."""
+
+Summarizer = Callable[[str, List[AnyMessage]], str]
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    """Encodage tiktoken, ou None (non installé, fichier BPE indisponible hors ligne)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(AGENT_HISTORY_ENCODING)
+    except Exception as e:
+        log.warning("tiktoken indisponible (%s) : tokens estimés à 4 caractères par token", e)
+        return None
+
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Tokens d'un texte ; mis en cache, l'historique d'un fil étant recompté à chaque tour"""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: AnyMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(content)
+    for call in getattr(message, "tool_calls", None) or ():
+        tokens += count_tokens(call["name"]) + count_tokens(json.dumps(call["args"], ensure_ascii=False))
+    return tokens
+
+
+def messages_tokens(messages: List[AnyMessage]) -> int:
+    return sum(message_tokens(message) for message in messages)
+
+
+class HistoryWindow(NamedTuple):
+    messages: List[AnyMessage]
+    summary: str
+    summarized: int
+    full_tokens: int
+    sent_tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.full_tokens - self.sent_tokens)
+
+
+def split_turns(messages: List[AnyMessage]) -> List[Tuple[int, int]]:
+    """Bornes [début, fin) des tours : chaque HumanMessage ouvre un tour"""
+    starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return list(zip(starts, starts[1:] + [len(messages)]))
+
+
+def without_tools(messages: List[AnyMessage]) -> List[AnyMessage]:
+    """Tour terminé : retire les résultats d'outils et les demandes d'appel, garde le texte"""
+    kept = []
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            continue
+        if isinstance(message, AIMessage) and message.tool_calls:
+            if message.content:
+                kept.append(AIMessage(content=message.content))
+            continue
+        kept.append(message)
+    return kept
+
+
+def system_message(system_prompt: str, summary: str) -> SystemMessage:
+    if not summary:
+        return SystemMessage(content=system_prompt)
+    return SystemMessage(content=f"{system_prompt}\n\nRÉSUMÉ DE LA CONVERSATION PRÉCÉDENTE :\n{summary}")
+
+
+def transcript(messages: List[AnyMessage], line_chars: Optional[int] = None) -> str:
+    lines = []
+    for message in messages:
+        role = "Utilisateur" if isinstance(message, HumanMessage) else "Coach"
+        text = message.content if isinstance(message.content, str) else str(message.content)
+        lines.append(f"{role} : {text[:line_chars] if line_chars else text}")
+    return "\n".join(lines)
+
+
+def extractive_summary(previous: str, messages: List[AnyMessage]) -> str:
+    """Résumé sans LLM : début de chaque échange, borné aux SUMMARY_MAX_CHARS plus récents"""
+    text = "\n".join(part for part in (previous, transcript(messages, SUMMARY_LINE_CHARS)) if part)
+    return text[-SUMMARY_MAX_CHARS:]
+
+
+def summarize_with_llm(llm, previous: str, messages: List[AnyMessage]) -> str:
+    """Résumé incrémental par le LLM, résumé extractif en cas d'échec"""
+    request = f"RÉSUMÉ PRÉCÉDENT :\n{previous or '(aucun)'}\n\nNOUVEAUX ÉCHANGES :\n{transcript(messages)}"
+    try:
+        response = llm.invoke([SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=request)])
+        return response.content.strip() or extractive_summary(previous, messages)
+    except Exception as e:
+        log.warning("Résumé de l'historique par le LLM impossible (%s) : résumé extractif", e)
+        return extractive_summary(previous, messages)
+
+
+def build_window(system_prompt: str, messages: List[AnyMessage], summary: str = "", summarized: int = 0,
+                 max_tokens: Optional[int] = None,
+                 summarize: Summarizer = extractive_summary) -> HistoryWindow:
+    """
+    Messages à envoyer au LLM pour l'état courant du fil.
+    `summarized` : nombre de messages de l'état déjà couverts par `summary`
+    (toujours une frontière de tour, l'historique étant en ajout seul).
+    """
+    max_tokens = AGENT_HISTORY_MAX_TOKENS if max_tokens is None else max_tokens
+    full_tokens = message_tokens(SystemMessage(content=system_prompt)) + messages_tokens(messages)
+
+    turns = split_turns(messages)
+    current_start = turns[-1][0]
+    summarized = min(summarized, current_start)
+    older = [without_tools(messages[start:end]) for start, end in turns[:-1] if start >= summarized]
+    older_ends = [end for start, end in turns[:-1] if start >= summarized]
+    current = messages[current_start:]
+
+    older_tokens = [messages_tokens(turn) for turn in older]
+    fixed_tokens = message_tokens(system_message(system_prompt, summary)) + messages_tokens(current)
+    if fixed_tokens + sum(older_tokens) > max_tokens and older:
+        target = max_tokens * TARGET_RATIO
+        dropped = 0
+        while dropped < len(older) and fixed_tokens + sum(older_tokens[dropped:]) > target:
+            dropped += 1
+        summary = summarize(summary, [message for turn in older[:dropped] for message in turn])
+        summarized = older_ends[dropped - 1]
+        older = older[dropped:]
+
+    window = [system_message(system_prompt, summary)] + [message for turn in older for message in turn] + current
+    return HistoryWindow(window, summary, summarized, full_tokens, messages_tokens(window))
+
+
+def record_window(window: HistoryWindow, mode: str):
+    """Exporte les tokens envoyés et économisés de la requête"""
+    if history_prompt_tokens is not None:
+        history_prompt_tokens.labels(mode=mode).observe(window.sent_tokens)
+        history_saved_tokens.labels(mode=mode).observe(window.saved_tokens)
@@ -0,0 +1,267 @@
+"""
+Index FAISS persistant de la base de connaissances (RAG)
+
+L'index est sauvegardé sur disque (FAISS save_local/load_local) avec un
+manifeste JSON qui contient le hash de chaque fichier Markdown et les
+identifiants de ses chunks. Au démarrage, seuls les fichiers ajoutés ou
+modifiés sont relus et seuls les chunks nouveaux sont ré-embeddés.
+
+Reconstruction hors ligne :
+    python -m E3_model_IA.scripts.knowledge_index --rebuild
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+log = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+DEFAULT_INDEX_DIR = os.getenv("KNOWLEDGE_INDEX_DIR", "data/knowledge_index")
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHUNK_OVERLAP = 200
+
+KNOWLEDGE_BASE_CANDIDATES = [
+    "knowledge_base/",
+    "/app/knowledge_base/",
+    "../../../knowledge_base/",
+    "../../knowledge_base/"
+]
+
+
+def find_knowledge_base_path(candidates: Optional[List[str]] = None) -> Optional[str]:
+    """Retourne le premier dossier knowledge_base existant parmi les candidats."""
+    for path in candidates or KNOWLEDGE_BASE_CANDIDATES:
+        if os.path.exists(path) and os.path.isdir(path):
+            return path
+    return None
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_markdown_file(path: Path) -> List[Document]:
+    """Charge un fichier avec le même loader que DirectoryLoader (Unstructured)."""
+    from langchain_community.document_loaders import UnstructuredFileLoader
+    return UnstructuredFileLoader(str(path)).load()
+
+
+def _embedding_signature(embedding) -> str:
+    """Identifie le modèle d'embedding pour invalider l'index s'il change."""
+    model = getattr(embedding, "model", None) or getattr(embedding, "model_name", None)
+    return f"{type(embedding).__name__}:{model}" if model else type(embedding).__name__
+
+
+class KnowledgeIndexStore:
+    """
+    Stockage incrémental de l'index FAISS de la base de connaissances.
+
+    Les identifiants de chunks sont dérivés de leur contenu : un chunk inchangé
+    garde le même identifiant et n'est jamais ré-embeddé.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = DEFAULT_INDEX_DIR,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+        loader=_load_markdown_file
+    ):
+        self.index_dir = Path(index_dir)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.loader = loader
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.last_sync: Dict[str, int] = {}
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.index_dir / MANIFEST_FILENAME
+
+    def read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def clear(self):
+        """Supprime l'index et son manifeste : plus rien à servir depuis le disque"""
+        for name in ("index.faiss", "index.pkl", MANIFEST_FILENAME):
+            (self.index_dir / name).unlink(missing_ok=True)
+
+    def _manifest_header(self, embedding) -> Dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "embedding": _embedding_signature(embedding),
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+        }
+
+    def _split_with_ids(self, relpath: str, documents: List[Document]) -> Tuple[List[Document], List[str]]:
+        chunks = self.splitter.split_documents(documents)
+        ids = []
+        seen: Dict[str, int] = {}
+        for chunk in chunks:
+            content_hash = hashlib.sha1(chunk.page_content.encode("utf-8")).hexdigest()
+            occurrence = seen.get(content_hash, 0)
+            seen[content_hash] = occurrence + 1
+            ids.append(f"{relpath}::{content_hash[:16]}::{occurrence}")
+        return chunks, ids
+
+    def _scan(self, knowledge_base_path: str) -> Dict[str, Path]:
+        root = Path(knowledge_base_path)
+        return {
+            path.relative_to(root).as_posix(): path
+            for path in sorted(root.glob("**/*.md"))
+            if path.is_file() and not path.name.startswith(".")
+        }
+
+    def _load_index(self, embedding):
+        from langchain_community.vectorstores import FAISS
+        return FAISS.load_local(
+            str(self.index_dir), embedding, allow_dangerous_deserialization=True
+        )
+
+    def load_or_build(self, knowledge_base_path: str, embedding, force_rebuild: bool = False):
+        """
+        Charge l'index depuis le disque et le synchronise avec la base de connaissances.
+        Retourne le vectorstore FAISS, ou None si aucun document n'est disponible.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        files = self._scan(knowledge_base_path)
+        manifest = self.read_manifest()
+        header = self._manifest_header(embedding)
+        compatible = all(manifest.get(key) == value for key, value in header.items())
+
+        vectorstore = None
+        indexed_files: Dict[str, Dict[str, Any]] = {}
+        if not force_rebuild and compatible and (self.index_dir / "index.faiss").exists():
+            try:
+                vectorstore = self._load_index(embedding)
+                indexed_files = manifest.get("files", {})
+            except Exception as e:
+                log.warning(f"Index FAISS illisible, reconstruction complète : {e}")
+                vectorstore = None
+
+        ids_to_delete: List[str] = []
+        chunks_to_add: List[Document] = []
+        ids_to_add: List[str] = []
+        new_files: Dict[str, Dict[str, Any]] = {}
+        reused = 0
+
+        for relpath, path in files.items():
+            sha = _file_sha256(path)
+            previous = indexed_files.get(relpath)
+            if previous and previous.get("sha256") == sha:
+                new_files[relpath] = previous
+                reused += len(previous.get("chunk_ids", []))
+                continue
+
+            chunks, ids = self._split_with_ids(relpath, self.loader(path))
+            previous_ids = set(previous.get("chunk_ids", [])) if previous else set()
+            ids_to_delete.extend(previous_ids - set(ids))
+            for chunk, chunk_id in zip(chunks, ids):
+                if chunk_id in previous_ids:
+                    reused += 1
+                else:
+                    chunks_to_add.append(chunk)
+                    ids_to_add.append(chunk_id)
+            new_files[relpath] = {"sha256": sha, "chunk_ids": ids}
+
+        for relpath, entry in indexed_files.items():
+            if relpath not in files:
+                ids_to_delete.extend(entry.get("chunk_ids", []))
+
+        self.last_sync = {
+            "files": len(files),
+            "chunks_reused": reused,
+            "chunks_embedded": len(chunks_to_add),
+            "chunks_deleted": len(ids_to_delete),
+        }
+
+        if not files:
+            log.warning(f"Aucun fichier Markdown dans {knowledge_base_path}")
+            self.clear()
+            return None
+
+        changed = bool(ids_to_delete or chunks_to_add) or vectorstore is None
+        if vectorstore is not None and ids_to_delete:
+            vectorstore.delete(ids_to_delete)
+        if chunks_to_add:
+            if vectorstore is None:
+                vectorstore = FAISS.from_documents(chunks_to_add, embedding, ids=ids_to_add)
+            else:
+                vectorstore.add_documents(chunks_to_add, ids=ids_to_add)
+
+        if vectorstore is None:
+            # Aucun chunk : un index précédent (illisible ou incompatible) ne doit pas être rechargé
+            self.clear()
+            return None
+
+        if changed:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            vectorstore.save_local(str(self.index_dir))
+            self._write_manifest({**header, "files": new_files, "updated_at": time.time()})
+
+        log.info(
+            f"Index de connaissances prêt : {self.last_sync['chunks_reused']} chunks réutilisés, "
+            f"{self.last_sync['chunks_embedded']} embeddés, {self.last_sync['chunks_deleted']} supprimés"
+        )
+        return vectorstore
+
+
+def main():
+    """Reconstruit ou met à jour l'index hors ligne."""
+    parser = argparse.ArgumentParser(description="Construction de l'index FAISS de la base de connaissances.")
+    parser.add_argument("--kb-path", default=None, help="Dossier knowledge_base (détecté automatiquement par défaut).")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR, help=f"Dossier de l'index (défaut: {DEFAULT_INDEX_DIR}).")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore l'index existant et ré-embedde tout.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    kb_path = args.kb_path or find_knowledge_base_path()
+    if not kb_path:
+        log.error("Directory not found: 'knowledge_base/'")
+        sys.exit(1)
+
+    sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+    from dotenv import load_dotenv
+    from langchain_openai import OpenAIEmbeddings
+    load_dotenv()
+
+    store = KnowledgeIndexStore(index_dir=args.index_dir)
+    start = time.perf_counter()
+    vectorstore = store.load_or_build(kb_path, OpenAIEmbeddings(), force_rebuild=args.rebuild)
+    duration = time.perf_counter() - start
+    if vectorstore is None:
+        log.error("Aucun document indexé.")
+        sys.exit(1)
+    log.info(f"Index synchronisé en {duration:.2f}s : {store.last_sync}")
+
+
+if __name__ == "__main__":
+    main()
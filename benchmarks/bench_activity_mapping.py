@@ -0,0 +1,104 @@
+"""
+Benchmark de la normalisation des activités Garmin : ancienne boucle
+(dict de 35 clés par activité, pd.to_datetime et datetime.now() par ligne)
+vs table de correspondance compilée (activity_mapping.normalize_activities),
+sur l'enregistrement raw_garmin_data_*.json répété.
+
+Usage :
+    python benchmarks/bench_activity_mapping.py
+    python benchmarks/bench_activity_mapping.py --copies 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+from E1_gestion_donnees.activity_mapping import E1_COLUMNS, activity_records, normalize_activities
+
+RECORDED = sorted((Path(__file__).resolve().parent.parent / "E1_gestion_donnees" / "data").glob("raw_garmin_data_*.json"))[0]
+
+
+def legacy_process(activities, user_id):
+    """Ancienne process_garmin_activities"""
+    processed_data = []
+    for activity in activities:
+        processed_data.append({
+            "user_id": user_id,
+            "activity_id": activity.get("activityId"),
+            "activity_name": activity.get("activityName"),
+            "activity_type": activity.get("activityType", {}).get("typeKey"),
+            "start_time": pd.to_datetime(activity.get("startTimeLocal")) if activity.get("startTimeLocal") else None,
+            "distance_meters": activity.get("distance", 0.0),
+            "duration_seconds": activity.get("duration", 0.0),
+            "average_speed": activity.get("averageSpeed"),
+            "max_speed": activity.get("maxSpeed"),
+            "calories": activity.get("calories", 0.0),
+            "average_hr": activity.get("averageHR"),
+            "max_hr": activity.get("maxHR"),
+            "elevation_gain": activity.get("elevationGain", 0.0),
+            "elevation_loss": activity.get("elevationLoss", 0.0),
+            "start_latitude": activity.get("startLatitude"),
+            "start_longitude": activity.get("startLongitude"),
+            "device_name": activity.get("deviceName"),
+            "created_timestamp": datetime.now(),
+            "steps": activity.get("steps"),
+            "average_running_cadence": activity.get("averageRunningCadenceInStepsPerMinute"),
+            "max_running_cadence": activity.get("maxRunningCadenceInStepsPerMinute"),
+            "stride_length": activity.get("avgStrideLength"),
+            "vo2max_estime": activity.get("vO2MaxValue"),
+            "training_load": activity.get("activityTrainingLoad"),
+            "aerobic_effect": activity.get("aerobicTrainingEffect"),
+            "anaerobic_effect": activity.get("anaerobicTrainingEffect"),
+            "temp_min": activity.get("minTemperature"),
+            "temp_max": activity.get("maxTemperature"),
+            "fastest_split_5000": activity.get("fastestSplit_5000"),
+            "fastest_split_10000": activity.get("fastestSplit_10000"),
+            "hr_zone_1": activity.get("hrTimeInZone_1"),
+            "hr_zone_2": activity.get("hrTimeInZone_2"),
+            "hr_zone_3": activity.get("hrTimeInZone_3"),
+            "hr_zone_4": activity.get("hrTimeInZone_4"),
+            "hr_zone_5": activity.get("hrTimeInZone_5"),
+        })
+    return processed_data
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalisation Garmin : boucle vs table compilée.")
+    parser.add_argument("--copies", type=int, default=20, help="Répétitions de l'enregistrement (380 activités)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(RECORDED) as f:
+        activities = json.load(f) * args.copies
+
+    variants = [
+        ("boucle -> dicts E1", lambda: legacy_process(activities, 1)),
+        ("boucle -> DataFrame", lambda: pd.DataFrame(legacy_process(activities, 1))),
+        ("table -> dicts E1", lambda: activity_records(normalize_activities(activities, user_id=1), E1_COLUMNS)),
+        ("table -> DataFrame", lambda: normalize_activities(activities, user_id=1)),
+    ]
+    print(f"{len(activities)} activités")
+    print(f"{'variante':>22} {'durée':>10} {'débit':>16}")
+    for label, fn in variants:
+        elapsed = timed(fn, args.repeat)
+        print(f"{label:>22} {elapsed * 1000:>8.0f}ms {len(activities) / elapsed:>11.0f} act/s")
+
+
+if __name__ == "__main__":
+    main()
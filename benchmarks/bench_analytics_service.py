@@ -0,0 +1,91 @@
+"""
+Benchmark du coût de démarrage et par requête du service analytique :
+ancienne instanciation par appel (create_db_engine avec SELECT 1, puis
+create_tables avec create_all et migration des index) vs service partagé
+par processus sur un moteur en lecture seule (get_analytics_service).
+
+Usage :
+    python benchmarks/bench_analytics_service.py
+    python benchmarks/bench_analytics_service.py --requests 500
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent / "E3_model_IA" / "backend" / "fastapi_app"))
+
+import sqlalchemy as sa
+
+import analytics_service
+from analytics_service import AnalyticsService, get_analytics_service, reset_analytics_service
+from E1_gestion_donnees import db_manager
+
+
+def legacy_service(db_url):
+    """Ancien AnalyticsService() : connexion de test et DDL à chaque instanciation"""
+    engine = db_manager.create_db_engine(db_url)
+    db_manager.create_tables(engine)
+    return AnalyticsService(engine=engine)
+
+
+def timed_ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service analytique : instanciation par appel vs partagé.")
+    parser.add_argument("--activities", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    db_manager.invalidate_user_stats = lambda user_id: None
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_analytics_service_"))
+    try:
+        db_url = f"sqlite:///{workdir / 'garmin.db'}"
+        engine = sa.create_engine(db_url)
+        tables = db_manager.create_tables(engine)
+        start = datetime.combine(date.today() - timedelta(days=args.activities // 3), datetime.min.time())
+        db_manager.store_activities_in_db(engine, tables, [{
+            "user_id": 1, "activity_id": i, "activity_type": "running", "start_time": start + timedelta(hours=8 * i),
+            "distance_meters": 8000.0, "duration_seconds": 2400.0, "average_hr": 145.0, "training_load": 80.0,
+        } for i in range(args.activities)])
+        engine.dispose()
+        analytics_service.ANALYTICS_DATABASE_URL = db_url
+
+        def legacy_request():
+            service = legacy_service(db_url)
+            service.get_performance_trends(1)
+            service.engine.dispose()
+
+        def shared_startup():
+            reset_analytics_service()
+            get_analytics_service()
+
+        print(f"{args.activities} activités, {args.requests} requêtes")
+        print(f"{'variante':>34} {'durée':>10}")
+        repeat = max(1, args.requests // 10)
+        print(f"{'démarrage : instanciation':>34} {timed_ms(lambda: legacy_service(db_url).engine.dispose(), repeat):>8.2f}ms")
+        print(f"{'démarrage : service partagé':>34} {timed_ms(shared_startup, repeat):>8.2f}ms")
+        print(f"{'requête : instanciation + trends':>34} {timed_ms(legacy_request, repeat):>8.2f}ms")
+        reset_analytics_service()
+        get_analytics_service().get_performance_trends(1)
+        shared = timed_ms(lambda: get_analytics_service().get_performance_trends(1), args.requests)
+        print(f"{'requête : service partagé + trends':>34} {shared:>8.2f}ms")
+        reset_analytics_service()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
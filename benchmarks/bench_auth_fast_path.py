@@ -0,0 +1,171 @@
+"""
+Benchmark de la chaîne de dépendances d'authentification FastAPI
+(fastapi_auth_middleware.py) : get_current_user puis get_user_context.
+
+Historique : JWT validé puis utilisateur relu par l'ORM (JWTAuthentication.get_user)
+et UserInfo reconstruit à chaque requête, contexte assemblé en quatre requêtes.
+Chemin rapide : signature et expiration vérifiées localement, attributs de
+l'utilisateur servis par un cache local au processus (TTL, marqueur
+d'authentification publié à chaque modification de l'utilisateur) et contexte
+par l'instantané de coaching.
+Base Django SQLite temporaire migrée.
+
+Usage :
+    python benchmarks/bench_auth_fast_path.py
+    python benchmarks/bench_auth_fast_path.py --users 50 --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+os.environ["DB_TYPE"] = "sqlite"
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coach_ai_web.settings")
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "E3_model_IA" / "backend" / "django_app"))
+sys.path.append(str(project_root / "E3_model_IA" / "backend" / "fastapi_app"))
+
+import django
+from django.conf import settings
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="bench_auth_fast_path_"))
+os.environ["STATS_CACHE_DIR"] = str(WORKDIR / "markers")
+django.setup()
+# Avant toute connexion : base temporaire à la place de data/django_garmin_data.db
+settings.DATABASES["default"]["NAME"] = str(WORKDIR / "django.sqlite")
+
+from django.core.management import call_command
+from django.db import connection
+from fastapi.security import HTTPAuthorizationCredentials
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User, UserProfile
+from activities.models import Activity
+from coaching.models import Goal
+from coaching import context
+from coaching.context import coaching_context_cache
+from django_auth_service import UserInfo, django_auth_service, user_info_cache
+from fastapi_auth_middleware import auth_middleware
+
+
+def legacy_authenticate(token):
+    """Ancien authenticate_token : JWT validé, get_user (requête ORM), UserInfo validé"""
+    jwt_auth = django_auth_service.jwt_auth
+    user = jwt_auth.get_user(jwt_auth.get_validated_token(token))
+    return UserInfo(
+        id=user.id, username=user.username, email=user.email, first_name=user.first_name,
+        last_name=user.last_name, is_active=user.is_active, is_premium=user.is_premium,
+        preferred_activity=user.preferred_activity, main_goal=user.main_goal, created_at=user.created_at,
+    )
+
+
+def legacy_context(user_id):
+    """Ancien get_user_context_for_coaching : utilisateur, get_or_create du profil, deux comptages"""
+    user = User.objects.get(id=user_id, is_active=True)
+    UserProfile.objects.get_or_create(user=user)
+    Activity.objects.filter(user_id=user_id).count()
+    Goal.objects.filter(user_id=user_id, is_active=True).count()
+
+
+def legacy_chain(token):
+    legacy_context(legacy_authenticate(token).id)
+
+
+async def fast_chain(credentials):
+    current_user = await auth_middleware.get_current_user(credentials)
+    await auth_middleware.get_user_context(current_user)
+
+
+class QueryCounter:
+    """execute_wrapper : compte les requêtes de la connexion du thread principal"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def mean_us(run, items):
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        run(item)
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings) * 1e6
+
+
+async def mean_us_async(run, items):
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        await run(item)
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authentification FastAPI : ORM à chaque requête vs chemin rapide.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Chaîne d'authentification seule : pas de base de l'agent pour les métriques de l'instantané
+    context._agent_metrics = lambda user_id: None
+    try:
+        call_command("migrate", verbosity=0)
+        users = [User.objects.create(email=f"coureur{u}@example.com", username=f"coureur{u}")
+                 for u in range(args.users)]
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+        sequence = [tokens[i % args.users] for i in range(args.requests)]
+        credentials = [HTTPAuthorizationCredentials(scheme="Bearer", credentials=token) for token in sequence]
+
+        legacy = {"get_current_user": mean_us(legacy_authenticate, sequence)}
+        legacy_queries = QueryCounter()
+        with connection.execute_wrapper(legacy_queries):
+            legacy["chaîne complète"] = mean_us(legacy_chain, sequence)
+
+        # Premier passage : caches remplis (une requête ORM par utilisateur et par version)
+        for item in credentials[:args.users]:
+            asyncio.run(fast_chain(item))
+
+        async def fast():
+            return {
+                "get_current_user": await mean_us_async(auth_middleware.get_current_user, credentials),
+                "chaîne complète": await mean_us_async(fast_chain, credentials),
+            }
+
+        # L'ORM du chemin rapide tourne dans des threads (connexions propres) : on compte les défauts de cache
+        misses_before = user_info_cache.misses + coaching_context_cache.misses
+        fast_results = asyncio.run(fast())
+        fast_loads = user_info_cache.misses + coaching_context_cache.misses - misses_before
+        validated = [django_auth_service.validate_token(token) for token in sequence[:args.users]]
+        stages = {
+            "vérification JWT locale": mean_us(django_auth_service.validate_token, sequence),
+            "utilisateur en cache": mean_us(django_auth_service.get_cached_user,
+                                            [validated[i % args.users] for i in range(args.requests)]),
+        }
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    print(f"{args.users} utilisateurs, {args.requests} requêtes authentifiées")
+    print(f"{'dépendance':>18} {'historique':>12} {'rapide':>12}")
+    for name in legacy:
+        print(f"{name:>18} {legacy[name]:>10.0f}µs {fast_results[name]:>10.0f}µs")
+    print(f"requêtes ORM par requête (chaîne complète) : {legacy_queries.count / args.requests:.1f} historique, "
+          f"{fast_loads} rechargement(s) depuis l'ORM sur {2 * args.requests} consultations en cache")
+    for name, value in stages.items():
+        print(f"  {name} : {value:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
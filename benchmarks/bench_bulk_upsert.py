@@ -0,0 +1,111 @@
+"""
+Benchmark d'ingestion d'un lot d'activités selon la taille de la table :
+lecture de tous les activity_id puis filtrage Python (comportement historique)
+vs upsert ON CONFLICT par lots (store_activities_in_db).
+
+Usage :
+    python benchmarks/bench_bulk_upsert.py
+    python benchmarks/bench_bulk_upsert.py --sizes 10000 1000000 --batch 1000
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import sqlalchemy as sa
+
+from E1_gestion_donnees import db_manager
+
+SEED_CHUNK = 50_000
+
+
+def make_activity(activity_id, user_id):
+    return {
+        "user_id": user_id,
+        "activity_id": activity_id,
+        "activity_name": f"Sortie {activity_id}",
+        "activity_type": "running",
+        "start_time": datetime(2020, 1, 1, 7) + timedelta(hours=activity_id % 50_000),
+        "distance_meters": 8000.0 + activity_id % 1000,
+        "duration_seconds": 2700.0,
+        "training_load": 60.0,
+    }
+
+
+def seed(engine, tables, size):
+    activities = tables["activities"]
+    with engine.begin() as conn:
+        for start in range(0, size, SEED_CHUNK):
+            conn.execute(sa.insert(activities), [
+                make_activity(i, user_id=1 + i % 1000) for i in range(start, min(start + SEED_CHUNK, size))
+            ])
+
+
+def legacy_store(engine, tables, batch):
+    # Comportement historique : tous les identifiants de la table chargés en mémoire
+    activities = tables["activities"]
+    with engine.connect() as conn:
+        existing_ids = {row[0] for row in conn.execute(sa.select(activities.c.activity_id))}
+    new_activities = [activity for activity in batch if activity["activity_id"] not in existing_ids]
+    if new_activities:
+        with engine.begin() as conn:
+            conn.execute(sa.insert(activities), new_activities)
+
+
+def measure(fn, runs, make_batch):
+    durations = []
+    for run in range(runs):
+        batch = make_batch(run)
+        start = time.perf_counter()
+        fn(batch)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion d'un lot : lecture de tous les identifiants vs upsert ON CONFLICT.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch", type=int, default=1000, help="Activités par lot (moitié déjà présentes).")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    db_manager.invalidate_user_stats = lambda user_id: None
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_upsert_"))
+    try:
+        print(f"{'lignes':>10} {'historique':>12} {'upsert':>10}")
+        for size in args.sizes:
+            engine = sa.create_engine(f"sqlite:///{workdir / f'bench_{size}.db'}")
+            tables = db_manager.create_tables(engine)
+            seed(engine, tables, size)
+            next_id = [size + 10_000_000]
+
+            def make_batch(run):
+                # Moitié de nouvelles activités, moitié d'activités existantes modifiées
+                existing = [make_activity(i, user_id=1) for i in range(run * args.batch, run * args.batch + args.batch // 2)]
+                for activity in existing:
+                    activity["training_load"] = 70.0 + run
+                fresh = [make_activity(next_id[0] + i, user_id=1) for i in range(args.batch - len(existing))]
+                next_id[0] += args.batch
+                return existing + fresh
+
+            legacy = measure(lambda batch: legacy_store(engine, tables, batch), args.runs, make_batch)
+            upsert = measure(lambda batch: db_manager.store_activities_in_db(engine, tables, batch), args.runs, make_batch)
+            print(f"{size:>10} {legacy:>10.1f}ms {upsert:>8.1f}ms")
+            engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
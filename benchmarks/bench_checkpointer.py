@@ -0,0 +1,86 @@
+"""
+Benchmark de la mémoire de l'agent (checkpoints LangGraph sous SQLite) :
+AsyncSqliteSaver par défaut (sans rétention, synchronous=FULL) vs checkpointer
+de checkpoint_store (WAL, synchronous=NORMAL, N derniers checkpoints par fil).
+Mesure la latence d'une invocation du graphe et la taille finale de la base.
+
+Usage :
+    python benchmarks/bench_checkpointer.py
+    python benchmarks/bench_checkpointer.py --threads 50 --turns 40 --keep 20
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from E3_model_IA.scripts.checkpoint_store import create_checkpointer
+from tests.test_e3_checkpoint_store import build_graph
+
+
+def file_size(path):
+    return sum(os.path.getsize(f) for f in (path, Path(f"{path}-wal")) if os.path.exists(f))
+
+
+async def run(saver, path, args):
+    graph = build_graph(saver)
+    start = time.perf_counter()
+    for turn in range(args.turns):
+        # Fils entrelacés, comme plusieurs utilisateurs qui discutent en parallèle
+        await asyncio.gather(*(
+            graph.ainvoke({"messages": [f"question {turn} " + "x" * args.message_size]},
+                          {"configurable": {"thread_id": f"user-thread-{t}"}})
+            for t in range(args.threads)
+        ))
+    elapsed = time.perf_counter() - start
+    return elapsed / (args.turns * args.threads) * 1000, file_size(path)
+
+
+async def main_async(args):
+    workdir = Path(tempfile.mkdtemp(prefix="bench_checkpointer_"))
+    try:
+        path = workdir / "default.sqlite"
+        conn = await aiosqlite.connect(str(path))
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        default = await run(saver, path, args)
+        await conn.close()
+
+        path = workdir / "store.sqlite"
+        saver = await create_checkpointer(f"sqlite:///{path}", keep_last=args.keep)
+        store = await run(saver, path, args)
+        stats = saver.stats()
+        await saver.aclose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.threads} fils x {args.turns} tours, rétention {args.keep} checkpoints par fil")
+    print(f"{'variante':>28} {'invocation':>12} {'taille base':>14}")
+    print(f"{'AsyncSqliteSaver par défaut':>28} {default[0]:>10.2f}ms {default[1] / 1024:>11.0f} Ko")
+    print(f"{'checkpoint_store':>28} {store[0]:>10.2f}ms {store[1] / 1024:>11.0f} Ko")
+    print(f"écriture d'un checkpoint (store, attente du verrou comprise) : "
+          f"moyenne {stats['avg_write_ms']} ms, max {stats['max_write_ms']} ms, "
+          f"{stats['compacted_checkpoints']} checkpoints compactés")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire de l'agent : saver par défaut vs WAL + rétention.")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--keep", type=int, default=20)
+    parser.add_argument("--message-size", type=int, default=500, help="Caractères par message")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark du contexte de coaching par requête (coaching/context.py) :
+assemblage historique par les trois chemins (contexte FastAPI, vue Django
+get_user_context, outil get_user_metrics_from_db) vs instantané partagé lu
+en une consultation (métriques de l'outil en cache, agent_metrics_cache). Base Django SQLite temporaire migrée, partagée avec
+la base de l'agent ; compte les requêtes et mesure la latence par chemin.
+
+Usage :
+    python benchmarks/bench_coaching_context.py
+    python benchmarks/bench_coaching_context.py --users 50 --activities 400 --requests 2000
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+os.environ["DB_TYPE"] = "sqlite"
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coach_ai_web.settings")
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "E3_model_IA" / "backend" / "django_app"))
+
+import django
+from django.conf import settings
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="bench_coaching_context_"))
+os.environ["STATS_CACHE_DIR"] = str(WORKDIR / "markers")
+django.setup()
+# Avant toute connexion : base temporaire à la place de data/django_garmin_data.db
+settings.DATABASES["default"]["NAME"] = str(WORKDIR / "django.sqlite")
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Avg, Count, Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+from activities.models import Activity
+from coaching import context
+from coaching.models import Goal
+from E3_model_IA.scripts import advanced_agent
+from E3_model_IA.scripts.advanced_agent import AgentDatabase, get_user_metrics_from_db
+from E3_model_IA.scripts.agent_metrics_cache import user_metrics
+
+
+def populate(users, activities_per_user):
+    now = timezone.now()
+    for u in range(users):
+        user = User.objects.create_user(email=f"coureur{u}@example.com", username=f"coureur{u}", password="x")
+        UserProfile.objects.create(user=user, vma=14 + u % 4)
+        Goal.objects.create(user=user, name="10k", goal_type="race_time", target_value=45,
+                            target_unit="min", target_date=date.today() + timedelta(days=60))
+        Activity.objects.bulk_create(
+            Activity(user=user, activity_name=f"Sortie {i}", start_time=now - timedelta(days=i % 365, hours=i),
+                     distance_meters=8000 + i, duration_seconds=2400 + i, average_hr=145 + i % 20)
+            for i in range(activities_per_user)
+        )
+
+
+def legacy_fastapi(user_id):
+    """Ancien get_user_context_for_coaching : profil, get_or_create, deux comptages"""
+    user = User.objects.get(id=user_id, is_active=True)
+    UserProfile.objects.get_or_create(user=user)
+    Activity.objects.filter(user_id=user_id).count()
+    Goal.objects.filter(user_id=user_id, is_active=True).count()
+
+
+def legacy_django(user_id):
+    """Ancienne vue get_user_context : exists, agrégat, activités récentes, dernière activité"""
+    activities = Activity.objects.filter(user_id=user_id)
+    if activities.exists():
+        activities.aggregate(Count("id"), Sum("distance_meters"), Sum("duration_seconds"), Avg("average_hr"))
+        activities.filter(start_time__gte=timezone.now() - timedelta(days=30)).count()
+        activities.order_by("-start_time").first()
+
+
+def measure(paths, user_ids):
+    """Latence moyenne par chemin (µs) et requêtes ORM par requête"""
+    timings = {name: [] for name in paths}
+    with CaptureQueriesContext(connection) as queries:
+        for user_id in user_ids:
+            for name, run in paths.items():
+                start = time.perf_counter()
+                run(user_id)
+                timings[name].append(time.perf_counter() - start)
+    return {name: statistics.mean(values) * 1e6 for name, values in timings.items()}, len(queries) / len(user_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contexte de coaching : trois assemblages vs instantané partagé.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--activities", type=int, default=200, help="Activités par utilisateur")
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    try:
+        call_command("migrate", verbosity=0)
+        populate(args.users, args.activities)
+        advanced_agent._resources["agent_database"] = AgentDatabase(
+            db_url=f"sqlite:///{settings.DATABASES['default']['NAME']}", fallback_paths=[]
+        )
+        user_ids = [1 + i % args.users for i in range(args.requests)]
+
+        legacy, legacy_queries = measure({
+            "FastAPI": legacy_fastapi,
+            "vue Django": legacy_django,
+            "outil agent": lambda user_id: get_user_metrics_from_db.invoke({"user_id": user_id}),
+        }, user_ids)
+
+        advanced_agent.set_user_context_provider(user_metrics)
+        start = time.perf_counter()
+        for user_id in range(1, args.users + 1):
+            context.get_coaching_context(user_id, "bench")
+        build_us = (time.perf_counter() - start) / args.users * 1e6
+        snapshot, snapshot_queries = measure({
+            "FastAPI": lambda user_id: context.get_coaching_context(user_id, "fastapi"),
+            "vue Django": lambda user_id: context.get_coaching_context(user_id, "django"),
+            "outil agent": lambda user_id: get_user_metrics_from_db.invoke({"user_id": user_id}),
+        }, user_ids)
+    finally:
+        advanced_agent.reset_agent_resources()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    print(f"{args.users} utilisateurs x {args.activities} activités, {args.requests} requêtes par chemin")
+    print(f"{'chemin':>12} {'historique':>12} {'instantané':>12}")
+    for name in legacy:
+        print(f"{name:>12} {legacy[name]:>10.0f}µs {snapshot[name]:>10.0f}µs")
+    print(f"requêtes ORM par requête (3 chemins) : {legacy_queries:.1f} -> {snapshot_queries:.1f} "
+          f"(+ requêtes SQLAlchemy de l'outil en historique)")
+    print(f"construction d'un instantané : {build_us:.0f} µs, une fois par version des données")
+
+
+if __name__ == "__main__":
+    main()
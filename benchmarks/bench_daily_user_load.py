@@ -0,0 +1,112 @@
+"""
+Benchmark des fenêtres de charge 7j/28j et des tendances selon la taille de l'historique :
+recalcul depuis les activités brutes (comportement historique) vs lecture de daily_user_load.
+
+Usage :
+    python benchmarks/bench_daily_user_load.py
+    python benchmarks/bench_daily_user_load.py --sizes 1000 10000 100000 --calls 20
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+import sqlalchemy as sa
+
+from E1_gestion_donnees import db_manager
+from E1_gestion_donnees.daily_load import get_load_trends, get_load_windows
+
+USER_ID = 1
+
+
+def seed(engine, tables, activities):
+    """Historique de `activities` activités (3 par jour) se terminant aujourd'hui"""
+    today = date.today()
+    rows = [
+        {
+            "user_id": USER_ID,
+            "activity_id": i,
+            "activity_type": "running" if i % 3 else "cycling",
+            "start_time": datetime.combine(today - timedelta(days=i // 3), datetime.min.time()) + timedelta(hours=6 + i % 3),
+            "distance_meters": 8000.0,
+            "duration_seconds": 2700.0,
+            "average_hr": 145.0,
+            "training_load": 60.0 + i % 40,
+        }
+        for i in range(activities)
+    ]
+    db_manager.store_activities_in_db(engine, tables, rows)
+
+
+def raw_windows(engine):
+    # Comportement historique : tout l'historique chargé puis filtré en pandas
+    df = pd.read_sql(
+        sa.text("SELECT start_time, training_load FROM activities WHERE user_id = :user_id"),
+        engine, params={"user_id": USER_ID}
+    )
+    df["start_time"] = pd.to_datetime(df["start_time"])
+    now = pd.Timestamp.now()
+    return (
+        df[df["start_time"] >= now - pd.Timedelta(days=7)]["training_load"].sum(),
+        df[df["start_time"] >= now - pd.Timedelta(days=28)]["training_load"].sum(),
+    )
+
+
+def raw_trends(engine):
+    # Ancienne requête de tendances avec fenêtres glissantes sur les activités
+    with engine.connect() as conn:
+        return conn.execute(sa.text("""
+            SELECT start_time, training_load,
+                   SUM(COALESCE(training_load, 0)) OVER (ORDER BY start_time ROWS BETWEEN 6 PRECEDING AND CURRENT ROW)
+            FROM activities WHERE user_id = :user_id
+            ORDER BY start_time DESC LIMIT 50
+        """), {"user_id": USER_ID}).fetchall()
+
+
+def measure(calls, fn):
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fenêtres de charge : activités brutes vs synthèse daily_user_load.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_daily_load_"))
+    db_manager.invalidate_user_stats = lambda user_id: None
+    try:
+        print(f"{'activités':>10} {'fenêtres brutes':>16} {'fenêtres synthèse':>18} {'tendances brutes':>17} {'tendances synthèse':>19}")
+        for size in args.sizes:
+            engine = sa.create_engine(f"sqlite:///{workdir / f'bench_{size}.db'}")
+            tables = db_manager.create_tables(engine)
+            seed(engine, tables, size)
+            results = [
+                measure(args.calls, lambda: raw_windows(engine)),
+                measure(args.calls, lambda: get_load_windows(engine, USER_ID)),
+                measure(args.calls, lambda: raw_trends(engine)),
+                measure(args.calls, lambda: get_load_trends(engine, USER_ID, period_weeks=12)),
+            ]
+            print(f"{size:>10} " + " ".join(f"{value:>{width}.2f}ms" for value, width in zip(results, (14, 16, 15, 17))))
+            engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
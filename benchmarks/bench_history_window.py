@@ -0,0 +1,81 @@
+"""
+Benchmark de la fenêtre d'historique de l'agent (history_window.py) : tokens
+envoyés au LLM à chaque tour d'un fil long, historique complet (comportement
+historique de call_llm) vs fenêtre bornée (sorties d'outils périmées retirées,
+anciens tours résumés). Chaque tour simule un appel à get_user_metrics_from_db
+et à get_training_knowledge (JSON et passages RAG volumineux).
+Mesure aussi le coût de construction de la fenêtre.
+
+Usage :
+    python benchmarks/bench_history_window.py
+    python benchmarks/bench_history_window.py --turns 100 --budget 4000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from E3_model_IA.scripts import history_window
+from E3_model_IA.scripts.advanced_agent import STREAMLIT_SYSTEM_PROMPT
+from E3_model_IA.scripts.history_window import build_window, extractive_summary, messages_tokens
+
+METRICS_JSON = json.dumps({"user_id": 1, "vma_kmh": 14.2, "charge_7j": 210.0, "charge_28j": 760.0,
+                           "prediction_10k_min": 51.3, "activites": [{"km": 10.2, "fc": 151}] * 20})
+RAG_PASSAGES = "Principe d'entraînement : progressivité, spécificité, récupération. " * 40
+
+
+def tool_turn(i):
+    calls = [{"name": "get_user_metrics_from_db", "args": {"user_id": 1}, "id": f"m{i}"},
+             {"name": "get_training_knowledge", "args": {"query": f"séance {i}"}, "id": f"k{i}"}]
+    return [
+        HumanMessage(content=f"Je suis l'utilisateur 1. Question {i} sur ma préparation du 10k ?"),
+        AIMessage(content="", tool_calls=calls),
+        ToolMessage(content=METRICS_JSON, tool_call_id=f"m{i}", name="get_user_metrics_from_db"),
+        ToolMessage(content=RAG_PASSAGES, tool_call_id=f"k{i}", name="get_training_knowledge"),
+        AIMessage(content="Voici ma recommandation détaillée pour cette semaine. " * 12),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historique de l'agent : complet vs fenêtre bornée en tokens.")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=6000, help="AGENT_HISTORY_MAX_TOKENS")
+    args = parser.parse_args()
+
+    counter = "tiktoken" if history_window._encoding() is not None else "estimation 4 caractères/token"
+    messages, summary, summarized = [], "", 0
+    full_total = sent_total = summaries = 0
+    build_seconds = 0.0
+    for i in range(args.turns):
+        turn = tool_turn(i)
+        # Premier appel du LLM du tour (demande seule), puis second après les outils
+        for visible in (messages + turn[:1], messages + turn[:4]):
+            start = time.perf_counter()
+            window = build_window(STREAMLIT_SYSTEM_PROMPT, visible, summary, summarized,
+                                  max_tokens=args.budget, summarize=extractive_summary)
+            build_seconds += time.perf_counter() - start
+            summaries += window.summarized != summarized
+            summary, summarized = window.summary, window.summarized
+            full_total += window.full_tokens
+            sent_total += window.sent_tokens
+        messages += turn
+    calls = args.turns * 2
+
+    print(f"{args.turns} tours (2 appels LLM par tour), budget {args.budget} tokens, comptage {counter}")
+    print(f"{'variante':>22} {'tokens/appel':>13} {'dernier appel':>14}")
+    print(f"{'historique complet':>22} {full_total / calls:>13.0f} {window.full_tokens:>14}")
+    print(f"{'fenêtre bornée':>22} {sent_total / calls:>13.0f} {messages_tokens(window.messages):>14}")
+    print(f"tokens économisés : {1 - sent_total / full_total:.1%} ({full_total - sent_total} au total), "
+          f"{summaries} résumés, construction {build_seconds / calls * 1000:.2f} ms/appel")
+
+
+if __name__ == "__main__":
+    main()
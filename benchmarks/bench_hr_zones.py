@@ -0,0 +1,76 @@
+"""
+Benchmark de get_training_zones_analysis : ancienne requête (CASE à sous-requêtes
+MAX(max_hr) corrélées, réévaluées par zone et par activité) vs profil FC en cache
+et répartition en une agrégation à bornes liées, pour un utilisateur de 5 000 activités.
+
+Usage :
+    python benchmarks/bench_hr_zones.py
+    python benchmarks/bench_hr_zones.py --activities 20000 --others 20
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import sqlalchemy as sa
+
+from E1_gestion_donnees import db_manager
+from E1_gestion_donnees.hr_zones import compute_hr_profile, get_hr_profile, zone_distribution
+from src.stats_cache import UserStatsCache
+from tests.test_e1_hr_zones import LEGACY_ZONES_QUERY, synthetic_activities
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zones FC : sous-requêtes corrélées vs profil en cache.")
+    parser.add_argument("--activities", type=int, default=5000, help="Activités de l'utilisateur mesuré")
+    parser.add_argument("--others", type=int, default=10, help="Autres utilisateurs (mêmes volumes)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_hr_zones_"))
+    try:
+        engine = sa.create_engine(f"sqlite:///{workdir / 'garmin.db'}")
+        tables = db_manager.create_tables(engine)
+        db_manager.invalidate_user_stats = lambda user_id: None
+        for user_id in range(1, args.others + 2):
+            db_manager.store_activities_in_db(engine, tables, synthetic_activities(user_id, args.activities, seed=user_id))
+        cache = UserStatsCache(marker_dir=workdir / "markers")
+
+        def legacy():
+            with engine.connect() as conn:
+                return conn.execute(LEGACY_ZONES_QUERY, {"user_id": 1}).all()
+
+        def cold():
+            cache.clear()
+            return zone_distribution(engine, get_hr_profile(engine, 1, cache=cache))
+
+        variants = [
+            ("sous-requêtes corrélées", legacy),
+            ("profil seul (agrégat)", lambda: compute_hr_profile(engine, 1)),
+            ("profil + agrégation", cold),
+            ("profil en cache + agrégation", lambda: zone_distribution(engine, get_hr_profile(engine, 1, cache=cache))),
+        ]
+        print(f"{args.activities} activités pour l'utilisateur mesuré, {args.others + 1} utilisateurs")
+        print(f"{'variante':>28} {'durée':>10}")
+        for label, fn in variants:
+            print(f"{label:>28} {timed(fn, args.repeat) * 1000:>8.1f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
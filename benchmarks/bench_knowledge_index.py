@@ -0,0 +1,84 @@
+"""
+Benchmark de démarrage de la base de connaissances RAG :
+reconstruction à froid (tous les chunks embeddés) vs chargement à chaud
+depuis l'index persistant.
+
+Par défaut, un embedding factice simule la latence réseau d'OpenAI par appel.
+
+Usage :
+    python benchmarks/bench_knowledge_index.py --kb-path E3_model_IA/knowledge_base
+    python benchmarks/bench_knowledge_index.py --files 40 --embed-latency-ms 300
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from E3_model_IA.scripts.knowledge_index import KnowledgeIndexStore
+
+
+class LatencyEmbedding(DeterministicFakeEmbedding):
+    """Embedding factice avec une latence fixe par requête d'embedding"""
+    latency_s: float = 0.2
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency_s)
+        return super().embed_documents(texts)
+
+
+def text_loader(path):
+    return [Document(page_content=path.read_text(encoding="utf-8"), metadata={"source": str(path)})]
+
+
+def generate_knowledge_base(root: Path, files: int) -> Path:
+    kb = root / "knowledge_base"
+    kb.mkdir()
+    paragraph = "Principe de surcharge progressive : augmenter le volume de 10% par semaine. "
+    for i in range(files):
+        (kb / f"fiche_{i:03d}.md").write_text(f"# Fiche {i}\n" + paragraph * 80, encoding="utf-8")
+    return kb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark démarrage à froid vs à chaud de l'index RAG.")
+    parser.add_argument("--kb-path", default=None, help="Base de connaissances réelle (sinon générée).")
+    parser.add_argument("--files", type=int, default=20, help="Nombre de fichiers générés.")
+    parser.add_argument("--embed-latency-ms", type=float, default=200.0, help="Latence simulée par appel d'embedding.")
+    parser.add_argument("--runs", type=int, default=5, help="Nombre de chargements à chaud mesurés.")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_kb_"))
+    try:
+        kb_path = Path(args.kb_path) if args.kb_path else generate_knowledge_base(workdir, args.files)
+        index_dir = workdir / "index"
+        embedding = LatencyEmbedding(size=1536, latency_s=args.embed_latency_ms / 1000)
+
+        start = time.perf_counter()
+        store = KnowledgeIndexStore(index_dir=str(index_dir), loader=text_loader)
+        store.load_or_build(str(kb_path), embedding, force_rebuild=True)
+        cold = time.perf_counter() - start
+        print(f"Reconstruction à froid : {cold * 1000:8.1f} ms  ({store.last_sync})")
+
+        warm_runs = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            store = KnowledgeIndexStore(index_dir=str(index_dir), loader=text_loader)
+            store.load_or_build(str(kb_path), embedding)
+            warm_runs.append(time.perf_counter() - start)
+        warm = sorted(warm_runs)[len(warm_runs) // 2]
+        print(f"Chargement à chaud     : {warm * 1000:8.1f} ms  (médiane sur {args.runs}, {store.last_sync})")
+        print(f"Gain                   : x{cold / warm:.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark du recalcul nocturne des métriques de performance :
+compute_performance_metrics appelée utilisateur par utilisateur (comportement historique)
+vs compute_performance_metrics_batch sur un DataFrame long.
+
+Le calcul par utilisateur est chronométré sur un échantillon puis extrapolé à toute la base.
+
+Usage :
+    python benchmarks/bench_metrics_batch.py
+    python benchmarks/bench_metrics_batch.py --users 10000 --activities 500 --sample 200
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from E1_gestion_donnees.data_manager import compute_performance_metrics, compute_performance_metrics_batch
+
+NOW = pd.Timestamp("2025-06-30 12:00:00")
+
+
+def build_activities(users, activities_per_user, seed=0):
+    rng = np.random.default_rng(seed)
+    size = users * activities_per_user
+    return pd.DataFrame({
+        "user_id": np.repeat(np.arange(1, users + 1), activities_per_user),
+        "activity_type": rng.choice(["running", "running", "cycling", "swimming"], size),
+        "start_time": NOW - pd.to_timedelta(rng.uniform(0, 24 * 365 * 2, size), unit="h"),
+        "duration_seconds": rng.uniform(600, 7200, size),
+        "distance_meters": rng.uniform(2000, 30000, size),
+        "max_speed": rng.uniform(2, 6, size),
+        "training_load": rng.uniform(10, 200, size),
+        "vo2max_estime": rng.uniform(40, 60, size),
+        "fastest_split_10000": np.where(rng.random(size) < 0.05, rng.uniform(2400, 4000, size), np.nan),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Métriques de performance : boucle par utilisateur vs calcul en lot.")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--activities", type=int, default=500)
+    parser.add_argument("--sample", type=int, default=200, help="Utilisateurs chronométrés pour la boucle historique.")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    activities = build_activities(args.users, args.activities)
+    print(f"{len(activities):,} activités, {args.users:,} utilisateurs")
+
+    sample_ids = set(range(1, min(args.sample, args.users) + 1))
+    sample = activities[activities["user_id"].isin(sample_ids)]
+    start = time.perf_counter()
+    for user_id, user_df in sample.groupby("user_id"):
+        compute_performance_metrics(user_df, user_id, now=NOW)
+    per_user = (time.perf_counter() - start) / len(sample_ids)
+
+    start = time.perf_counter()
+    batch = compute_performance_metrics_batch(activities, now=NOW)
+    batch_duration = time.perf_counter() - start
+
+    loop_duration = per_user * args.users
+    print(f"Boucle par utilisateur : {per_user * 1000:.2f} ms/utilisateur, ~{loop_duration:.1f} s extrapolées")
+    print(f"Calcul en lot          : {batch_duration:.2f} s pour {len(batch):,} utilisateurs")
+    print(f"Gain : x{loop_duration / batch_duration:.0f}")
+
+
+if __name__ == "__main__":
+    main()
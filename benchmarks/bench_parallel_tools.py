@@ -0,0 +1,112 @@
+"""
+Benchmark du nœud use_tool de l'agent : appels d'outils d'un tour exécutés
+l'un après l'autre (comportement historique, .invoke séquentiel) vs en
+parallèle (ause_tool : asyncio.gather + pool borné), avec des outils
+factices de latence connue (SQL des métriques, embedding de la base de
+connaissances, météo).
+
+Usage :
+    python benchmarks/bench_parallel_tools.py
+    python benchmarks/bench_parallel_tools.py --metrics-ms 120 --knowledge-ms 300 --turns 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from E3_model_IA.scripts import advanced_agent
+
+
+def stub_tools(metrics_s, knowledge_s, weather_s):
+    @tool
+    def get_user_metrics_from_db(user_id: int) -> str:
+        """Métriques factices"""
+        time.sleep(metrics_s)
+        return "{}"
+
+    @tool
+    def get_training_knowledge(query: str) -> str:
+        """Connaissances factices"""
+        time.sleep(knowledge_s)
+        return "..."
+
+    @tool
+    def get_weather_forecast(location: str) -> str:
+        """Météo factice"""
+        time.sleep(weather_s)
+        return "12°C"
+
+    return [get_user_metrics_from_db, get_training_knowledge, get_weather_forecast]
+
+
+def plan_turn(user_id):
+    return {"messages": [AIMessage(content="", tool_calls=[
+        {"name": "get_user_metrics_from_db", "args": {"user_id": user_id}, "id": f"m{user_id}"},
+        {"name": "get_training_knowledge", "args": {"query": "plan 10k"}, "id": f"k{user_id}"},
+        {"name": "get_weather_forecast", "args": {"location": "Lille"}, "id": f"w{user_id}"},
+    ])]}
+
+
+def sequential_use_tool(state):
+    """Comportement historique : .invoke de chaque appel, l'un après l'autre"""
+    available_tools = {t.name: t for t in advanced_agent.tools}
+    return {"messages": [available_tools[call["name"]].invoke(call["args"]) for call in state["messages"][-1].tool_calls]}
+
+
+async def concurrent_turns(turns, concurrency):
+    """`concurrency` requêtes simultanées, chacune avec son tour d'outils"""
+    start = time.perf_counter()
+    for first in range(0, turns, concurrency):
+        await asyncio.gather(*(advanced_agent.ause_tool(plan_turn(u)) for u in range(first, min(turns, first + concurrency))))
+    return (time.perf_counter() - start) / turns * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="use_tool : outils séquentiels vs parallèles.")
+    parser.add_argument("--metrics-ms", type=float, default=80.0, help="Latence de get_user_metrics_from_db")
+    parser.add_argument("--knowledge-ms", type=float, default=150.0, help="Latence de get_training_knowledge")
+    parser.add_argument("--weather-ms", type=float, default=20.0, help="Latence de get_weather_forecast")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4, help="Requêtes simultanées (dernière mesure)")
+    args = parser.parse_args()
+
+    advanced_agent.tools = stub_tools(args.metrics_ms / 1000, args.knowledge_ms / 1000, args.weather_ms / 1000)
+
+    start = time.perf_counter()
+    for u in range(args.turns):
+        sequential_use_tool(plan_turn(u))
+    sequential_ms = (time.perf_counter() - start) / args.turns * 1000
+
+    start = time.perf_counter()
+    for u in range(args.turns):
+        asyncio.run(advanced_agent.ause_tool(plan_turn(u)))
+    parallel_ms = (time.perf_counter() - start) / args.turns * 1000
+
+    start = time.perf_counter()
+    for u in range(args.turns):
+        advanced_agent.use_tool(plan_turn(u))
+    sync_ms = (time.perf_counter() - start) / args.turns * 1000
+
+    shared_ms = asyncio.run(concurrent_turns(args.turns * args.concurrency, args.concurrency))
+
+    print(f"tour de 3 outils : {args.metrics_ms:.0f} + {args.knowledge_ms:.0f} + {args.weather_ms:.0f} ms, "
+          f"pool de {advanced_agent.AGENT_TOOL_WORKERS} threads")
+    print(f"{'variante':>34} {'par tour':>10}")
+    print(f"{'séquentiel (.invoke)':>34} {sequential_ms:>8.1f}ms")
+    print(f"{'parallèle (ause_tool)':>34} {parallel_ms:>8.1f}ms")
+    print(f"{'parallèle synchrone (use_tool)':>34} {sync_ms:>8.1f}ms")
+    print(f"{f'ause_tool, {args.concurrency} requêtes simultanées':>34} {shared_ms:>8.1f}ms (débit)")
+    advanced_agent.reset_agent_resources()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark de la charge de get_performance_predictions : chargement de
+l'historique d'un utilisateur puis _calculate_predictions/_calculate_confidence,
+à partir d'un export CSV (export_to_csv), de la base (pd.read_sql) et de
+l'export Parquet (read_activities avec colonnes et filtres poussés).
+
+Second scénario : la même sélection pour tous les utilisateurs à la fois
+(analyse de cohorte), où la lecture colonnaire évite le parcours de la
+table ligne à ligne.
+
+Usage :
+    python benchmarks/bench_parquet_predictions.py
+    python benchmarks/bench_parquet_predictions.py --users 200 --activities 1000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent / "E3_model_IA" / "backend" / "fastapi_app"))
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import sqlalchemy as sa
+
+from E1_gestion_donnees import db_manager
+from E1_gestion_donnees.parquet_store import read_activities, refresh_parquet_export
+from analytics_service import AnalyticsService
+
+COLUMNS = ["distance_meters", "duration_seconds", "average_hr", "max_hr", "training_load", "start_time"]
+
+
+def synthetic_activities(users, per_user, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2023, 1, 1, 7)
+    activities = []
+    for user_id in range(1, users + 1):
+        for i in range(per_user):
+            activities.append({
+                "user_id": user_id,
+                "activity_id": user_id * 1_000_000 + i,
+                "activity_name": f"Sortie {i}",
+                "activity_type": "running",
+                "start_time": start + timedelta(hours=int(rng.integers(0, 2 * 365 * 24))),
+                "distance_meters": float(rng.uniform(1500, 25000)),
+                "duration_seconds": float(rng.uniform(400, 9000)),
+                "average_speed": float(rng.uniform(2, 4.5)),
+                "average_hr": float(rng.uniform(120, 175)),
+                "max_hr": int(rng.integers(160, 200)),
+                "calories": int(rng.integers(150, 1500)),
+                "elevation_gain": float(rng.uniform(0, 400)),
+                "training_load": float(rng.uniform(20, 250)),
+                "created_timestamp": datetime(2025, 1, 1),
+            })
+    return activities
+
+
+def prepare(df):
+    df = df.sort_values("start_time", ascending=False, kind="stable").head(100)
+    return pd.DataFrame({
+        "distance_km": df["distance_meters"] / 1000.0,
+        "duration_min": df["duration_seconds"] / 60.0,
+        "pace_kmh": (df["distance_meters"] / df["duration_seconds"]) * 3.6,
+    })
+
+
+def from_csv(path, user_id):
+    # Un export CSV se relit en entier, toutes colonnes, puis se filtre en mémoire
+    df = pd.read_csv(path, parse_dates=["start_time"])
+    df = df[(df["user_id"] == user_id) & (df["distance_meters"] >= 3000) & (df["duration_seconds"] > 600)]
+    return prepare(df)
+
+
+def from_parquet(root, user_id):
+    df = read_activities(
+        user_id, columns=COLUMNS, root=root,
+        filter=(ds.field("distance_meters") >= 3000) & (ds.field("duration_seconds") > 600), latest=100,
+    )
+    return prepare(df)
+
+
+def cohort_from_csv(path):
+    df = pd.read_csv(path, parse_dates=["start_time"])
+    return df[(df["distance_meters"] >= 3000) & (df["duration_seconds"] > 600)][["user_id", *COLUMNS]]
+
+
+def cohort_from_sql(engine, tables):
+    a = tables["activities"].c
+    query = sa.select(a.user_id, *[a[name] for name in COLUMNS]).where(a.distance_meters >= 3000, a.duration_seconds > 600)
+    return pd.read_sql(query, engine)
+
+
+def cohort_from_parquet(root):
+    return read_activities(columns=["user_id", *COLUMNS], root=root,
+                           filter=(ds.field("distance_meters") >= 3000) & (ds.field("duration_seconds") > 600))
+
+
+def vma_by_user(df):
+    pace = (df["distance_meters"] / df["duration_seconds"]) * 3.6
+    return pace.groupby(df["user_id"]).max()
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prédictions : CSV vs SQL vs Parquet.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--activities", type=int, default=1000, help="Activités par utilisateur")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_parquet_"))
+    try:
+        engine = sa.create_engine(f"sqlite:///{workdir / 'garmin.db'}")
+        tables = db_manager.create_tables(engine)
+        db_manager.invalidate_user_stats = lambda user_id: None
+        db_manager.store_activities_in_db(engine, tables, synthetic_activities(args.users, args.activities))
+
+        csv_path = workdir / "activities.csv"
+        pd.read_sql(sa.select(tables["activities"]), engine).to_csv(csv_path, index=False)
+        start = time.perf_counter()
+        stats = refresh_parquet_export(engine, tables, root=workdir / "parquet")
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        refresh = refresh_parquet_export(engine, tables, root=workdir / "parquet")
+        refresh_time = time.perf_counter() - start
+        parquet_size = sum(p.stat().st_size for p in (workdir / "parquet").rglob("*.parquet"))
+
+        service = AnalyticsService(engine=engine)
+        user_id = args.users // 2
+
+        def workload(load):
+            df = load()
+            service._calculate_predictions(df)
+            service._calculate_confidence(df)
+
+        sources = [
+            ("csv", csv_path.stat().st_size, lambda: from_csv(csv_path, user_id)),
+            ("sql", (workdir / "garmin.db").stat().st_size, lambda: service._load_prediction_history(user_id)),
+            ("parquet", parquet_size, lambda: from_parquet(workdir / "parquet", user_id)),
+        ]
+        print(f"{args.users * args.activities} activités, {stats['written']} partitions Parquet écrites en {build_time:.1f}s ; "
+              f"rafraîchissement sans changement {refresh_time * 1000:.0f} ms ({refresh['unchanged']} inchangées)")
+        cohorts = {
+            "csv": lambda: cohort_from_csv(csv_path),
+            "sql": lambda: cohort_from_sql(engine, tables),
+            "parquet": lambda: cohort_from_parquet(workdir / "parquet"),
+        }
+        print(f"{'source':>8} {'taille':>10} {'prédiction':>12} {'cohorte':>10}")
+        for label, size, load in sources:
+            elapsed = timed(lambda: workload(load), args.repeat)
+            cohort = timed(lambda: vma_by_user(cohorts[label]()), max(1, args.repeat // 5))
+            print(f"{label:>8} {size / 1e6:>8.2f}Mo {elapsed * 1000:>10.1f}ms {cohort * 1000:>8.0f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
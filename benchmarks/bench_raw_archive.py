@@ -0,0 +1,104 @@
+"""
+Benchmark de l'archive brute Garmin : JSON indenté (ancien save_raw_data) vs
+NDJSON compressé par pages (gzip, zstd) — taille, écriture et relecture.
+
+Le parcours décode seulement les enregistrements ; la relecture mesure le
+débit de process_garmin_activities alimenté par le fichier. La mémoire est
+celle du parcours (le JSON indenté est chargé en entier, le NDJSON est lu en flux).
+
+Usage :
+    python benchmarks/bench_raw_archive.py
+    python benchmarks/bench_raw_archive.py --copies 50 --page-size 100
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from E1_gestion_donnees.data_manager import process_garmin_activities
+from E1_gestion_donnees.raw_archive import RawArchiveWriter, iter_raw_activities, resolve_codec
+
+RECORDED = sorted((Path(__file__).resolve().parent.parent / "E1_gestion_donnees" / "data").glob("raw_garmin_data_*.json"))[0]
+
+
+def synthetic_history(copies):
+    """L'enregistrement répété `copies` fois avec des identifiants distincts"""
+    with open(RECORDED) as f:
+        recorded = json.load(f)
+    activities = []
+    for copy in range(copies):
+        for activity in recorded:
+            activities.append(dict(activity, activityId=activity["activityId"] * 1000 + copy))
+    return activities
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def write_legacy(path, activities):
+    with open(path, "w") as f:
+        json.dump(activities, f, indent=4)
+
+
+def write_archive(path, activities, page_size):
+    writer = RawArchiveWriter(path=path)
+    for start in range(0, len(activities), page_size):
+        writer.write_page(activities[start:start + page_size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive brute : JSON indenté vs NDJSON compressé.")
+    parser.add_argument("--copies", type=int, default=20, help="Répétitions de l'historique enregistré (380 activités)")
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    activities = synthetic_history(args.copies)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_raw_archive_"))
+    formats = [("json indenté", "raw.json")]
+    if resolve_codec("zstd") == "zstd":
+        formats.append(("ndjson zstd", "raw.ndjson.zst"))
+    formats.append(("ndjson gzip", "raw.ndjson.gz"))
+
+    try:
+        print(f"{len(activities)} activités")
+        print(f"{'format':>13} {'taille':>10} {'écriture':>10} {'parcours':>10} {'relecture':>10} {'débit':>14} {'mémoire parcours':>17}")
+        for label, name in formats:
+            path = workdir / name
+            if name.endswith(".json"):
+                _, write_time = timed(lambda: write_legacy(path, activities))
+            else:
+                _, write_time = timed(lambda: write_archive(path, activities, args.page_size))
+            _, scan_time = timed(lambda: sum(1 for _ in iter_raw_activities(path)))
+            processed, replay_time = timed(lambda: process_garmin_activities(iter_raw_activities(path), user_id=1))
+            assert len(processed) == len(activities)
+            peak = peak_memory(lambda: sum(1 for _ in iter_raw_activities(path)))
+            print(
+                f"{label:>13} {path.stat().st_size / 1e6:>8.2f}Mo {write_time:>9.2f}s {scan_time:>9.2f}s {replay_time:>9.2f}s "
+                f"{len(activities) / replay_time:>9.0f} act/s {peak / 1e6:>15.1f}Mo"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
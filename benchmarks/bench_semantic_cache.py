@@ -0,0 +1,107 @@
+"""
+Benchmark du cache sémantique de l'agent (services/semantic_cache.py) :
+génération de plans sans cache vs avec cache sur un trafic de demandes
+proches (quelques objectifs, formulations variées, profils regroupés par
+tranches), avec un LLM factice local à latence fixe.
+Mesure taux de succès, appels LLM, tokens économisés, latence moyenne et
+coût d'une consultation du cache plein.
+
+Usage :
+    python benchmarks/bench_semantic_cache.py
+    python benchmarks/bench_semantic_cache.py --requests 500 --llm-ms 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("CI", "true")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent / "E3_model_IA" / "backend" / "fastapi_app"))
+
+import numpy as np
+
+import django_auth_service
+from services import semantic_cache
+from services.ai_service import AIService
+from services.semantic_cache import SemanticCache
+from tests.test_e3_semantic_cache import FakeEmbeddings, FakeLLM, build_agent, plan_request
+
+GOALS = [("10k", "10K", "10 k"), ("semi", "Semi", "semi-marathon"), ("marathon", "Marathon", "MARATHON"), ("5k", "5K", "5 k")]
+LEVELS = ("intermédiaire", "Intermédiaire", "débutant", "Débutant")
+
+
+class SlowLLM(FakeLLM):
+    """LLM factice avec la latence d'un appel distant"""
+
+    def __init__(self, latency_s):
+        super().__init__()
+        self.latency_s = latency_s
+
+    def __call__(self, state):
+        time.sleep(self.latency_s)
+        return super().__call__(state)
+
+
+def workload(n, users, seed=0):
+    rng = random.Random(seed)
+    return [plan_request(
+        rng.randrange(1, users + 1), goal=rng.choice(rng.choice(GOALS)), level=rng.choice(LEVELS),
+        sessions_per_week=rng.choice((3, 4)), target_time="",
+    ) for _ in range(n)]
+
+
+async def run(requests, cache, llm_ms):
+    llm = SlowLLM(llm_ms / 1000)
+    service = AIService(build_agent(llm), cache)
+    start = time.perf_counter()
+    for request in requests:
+        await service.generate_training_plan(request)
+    return (time.perf_counter() - start) / len(requests) * 1000, llm.calls
+
+
+def lookup_cost_us(entries, dims=1536, repeat=2000):
+    """Consultation d'une portée de `entries` embeddings de dimension OpenAI"""
+    cache = SemanticCache(FakeEmbeddings(), max_entries=entries)
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(entries, dims)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for vector in vectors:
+        cache.store("portée", vector, "plan", 1200)
+    start = time.perf_counter()
+    for i in range(repeat):
+        cache.lookup("portée", vectors[i % entries])
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache sémantique : plans sans cache vs avec cache.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--buckets", type=int, default=6, help="Tranches de profil distinctes")
+    parser.add_argument("--llm-ms", type=float, default=20.0, help="Latence simulée d'un appel LLM")
+    args = parser.parse_args()
+
+    semantic_cache.load_user_metrics = lambda user_id: {"vma_kmh": 12.0 + (user_id % args.buckets)}
+    django_auth_service.django_auth_service.create_coaching_session = lambda user_id, data: None
+    requests = workload(args.requests, args.users)
+
+    baseline_ms, baseline_calls = asyncio.run(run(requests, None, args.llm_ms))
+    cache = SemanticCache(FakeEmbeddings(), threshold=0.95)
+    cached_ms, cached_calls = asyncio.run(run(requests, cache, args.llm_ms))
+
+    print(f"{args.requests} demandes de plan, {args.buckets} tranches de profil, LLM factice {args.llm_ms:.0f} ms")
+    print(f"{'variante':>12} {'latence':>10} {'appels LLM':>11}")
+    print(f"{'sans cache':>12} {baseline_ms:>8.2f}ms {baseline_calls:>11}")
+    print(f"{'avec cache':>12} {cached_ms:>8.2f}ms {cached_calls:>11}")
+    print(f"taux de succès {cache.hit_ratio:.1%}, tokens économisés {cache.stats['saved_tokens']}")
+    for entries in (100, 1000):
+        print(f"consultation d'une portée de {entries} entrées (dim 1536) : {lookup_cost_us(entries):.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
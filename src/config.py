@@ -39,6 +39,32 @@ elif DB_TYPE == "postgresql":
 else:
     raise ValueError(f"Type de base de données non pris en charge: {DB_TYPE}")
 
+# Pool de connexions (moteurs partagés par processus)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+# Délai avant de retester la base principale après une bascule vers SQLite
+DB_FAILOVER_RETRY_SECONDS = float(os.getenv("DB_FAILOVER_RETRY_SECONDS", "60"))
+# Requêtes compilées conservées par moteur (cache de compilation SQLAlchemy, query_cache_size)
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+# Nombre de lignes par instruction d'upsert lors de l'ingestion des activités
+DB_UPSERT_CHUNK_SIZE = int(os.getenv("DB_UPSERT_CHUNK_SIZE", "1000"))
+
+# Récupération des activités Garmin : pages préchargées en parallèle et relances avec attente exponentielle
+GARMIN_FETCH_WORKERS = int(os.getenv("GARMIN_FETCH_WORKERS", "4"))
+GARMIN_FETCH_RETRIES = int(os.getenv("GARMIN_FETCH_RETRIES", "3"))
+GARMIN_FETCH_BACKOFF_SECONDS = float(os.getenv("GARMIN_FETCH_BACKOFF_SECONDS", "1.0"))
+# Archive brute des activités Garmin (NDJSON compressé par utilisateur et par jour) : zstd ou gzip
+RAW_ARCHIVE_DIR = Path(os.getenv("RAW_ARCHIVE_DIR", str(DATA_DIR / "raw_archive")))
+RAW_ARCHIVE_CODEC = os.getenv("RAW_ARCHIVE_CODEC", "zstd")
+# Export Parquet des activités (par utilisateur et par mois) lu par l'analytique si ANALYTICS_READ_PARQUET
+PARQUET_EXPORT_DIR = Path(os.getenv("PARQUET_EXPORT_DIR", str(DATA_DIR / "parquet")))
+ANALYTICS_READ_PARQUET = os.getenv("ANALYTICS_READ_PARQUET", "False").lower() == "true"
+# Moteur analytique en lecture seule, partagé par processus (réplica de lecture si ANALYTICS_DATABASE_URL)
+ANALYTICS_DATABASE_URL = os.getenv("ANALYTICS_DATABASE_URL") or DATABASE_URL
+ANALYTICS_DB_POOL_SIZE = int(os.getenv("ANALYTICS_DB_POOL_SIZE", "5"))
+
 # Configuration de l'API
 API_HOST = os.environ.get("API_HOST", "0.0.0.0")
 API_PORT = int(os.environ.get("API_PORT", "8000"))
@@ -53,6 +79,23 @@ else:
     print("Aucune clé API (OPENAI_API_KEY) n'a été trouvée dans l'environnement.")
 # --- FIN DE L'AJOUT DE DEBUG ---
 
+# Cache des statistiques utilisateur (invalidé à chaque synchronisation Garmin)
+STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "600"))
+STATS_CACHE_DIR = Path(os.getenv("STATS_CACHE_DIR", str(DATA_DIR / "cache" / "user_stats")))
+
+# Mémoire des conversations de l'agent (checkpoints LangGraph) : sqlite:///... ou postgresql://...
+AGENT_MEMORY_URL = os.getenv("AGENT_MEMORY_URL", f"sqlite:///{DATA_DIR / 'agent_memory.sqlite'}")
+AGENT_MEMORY_KEEP_CHECKPOINTS = int(os.getenv("AGENT_MEMORY_KEEP_CHECKPOINTS", "20"))
+AGENT_MEMORY_POOL_SIZE = int(os.getenv("AGENT_MEMORY_POOL_SIZE", "5"))
+
+# Outils de l'agent : appels d'un même tour exécutés en parallèle
+AGENT_TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", "8"))
+AGENT_TOOL_TIMEOUT_SECONDS = float(os.getenv("AGENT_TOOL_TIMEOUT_SECONDS", "30"))
+
+# Historique envoyé au LLM : budget en tokens (tours anciens résumés au-delà)
+AGENT_HISTORY_MAX_TOKENS = int(os.getenv("AGENT_HISTORY_MAX_TOKENS", "6000"))
+AGENT_HISTORY_ENCODING = os.getenv("AGENT_HISTORY_ENCODING", "cl100k_base")
+
 # Planification
 FETCH_INTERVAL_HOURS = int(os.environ.get("FETCH_INTERVAL_HOURS", "12"))
 
@@ -0,0 +1,138 @@
+"""
+Cache des statistiques utilisateur (get_user_stats)
+
+Les statistiques ne changent qu'à la synchronisation Garmin. Le cache est local
+au processus (FastAPI), mais l'invalidation est partagée entre processus
+(Django, pipeline E1, FastAPI) : chaque écriture d'activités remplace un
+marqueur de version par utilisateur dans STATS_CACHE_DIR (volume data/ commun).
+Une entrée n'est servie que si la version lue avant son calcul est inchangée.
+
+Les utilisateurs authentifiés de FastAPI ont leurs propres marqueurs
+(sous-répertoire AUTH_MARKER_NAMESPACE, invalidate_user_auth) : une écriture
+d'activités n'évince pas les entrées d'authentification.
+"""
+
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from src.config import STATS_CACHE_DIR, STATS_CACHE_TTL_SECONDS
+from src.green_metrics import green_collector
+
+log = logging.getLogger(__name__)
+
+
+class UserStatsCache:
+    """
+    Cache LRU des statistiques par utilisateur, avec TTL et marqueurs d'invalidation.
+    green_metrics=False : consultations hors de cache_efficiency_ratio (caches annexes)
+    marker_namespace : sous-répertoire de marqueurs distinct (invalidations indépendantes)
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = STATS_CACHE_TTL_SECONDS,
+        marker_dir: Optional[Path] = None,
+        max_entries: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+        green_metrics: bool = True,
+        marker_namespace: str = ""
+    ):
+        self.ttl_seconds = ttl_seconds
+        # None : STATS_CACHE_DIR résolu à chaque accès (redirigeable sans recréer les caches du module)
+        self.marker_dir = Path(marker_dir) if marker_dir is not None else None
+        self.max_entries = max_entries
+        self.clock = clock
+        self.green_metrics = green_metrics
+        self.marker_namespace = marker_namespace
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _marker_path(self, user_id: int) -> Path:
+        marker_dir = self.marker_dir if self.marker_dir is not None else STATS_CACHE_DIR
+        return Path(marker_dir) / self.marker_namespace / f"{int(user_id)}.version"
+
+    def version(self, user_id: int) -> str:
+        """Version courante des données de l'utilisateur (à lire avant le calcul)"""
+        try:
+            return self._marker_path(user_id).read_text()
+        except OSError:
+            return ""
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+        hit = False
+        if entry is not None:
+            stats, version, expires_at = entry
+            hit = self.clock() < expires_at and version == self.version(user_id)
+            if not hit:
+                with self._lock:
+                    self._entries.pop(user_id, None)
+
+        self._record(hit)
+        if hit:
+            with self._lock:
+                if user_id in self._entries:
+                    self._entries.move_to_end(user_id)
+            return copy.deepcopy(stats)
+        return None
+
+    def set(self, user_id: int, stats: Dict[str, Any], version: str):
+        with self._lock:
+            self._entries[user_id] = (copy.deepcopy(stats), version, self.clock() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Invalide l'entrée locale et publie une nouvelle version pour les autres processus"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        marker = self._marker_path(user_id)
+        try:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = marker.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(uuid.uuid4().hex)
+            os.replace(tmp_path, marker)
+        except OSError as e:
+            log.warning(f"Impossible de publier l'invalidation du cache stats (utilisateur {user_id}) : {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.green_metrics:
+            green_collector.record_cache_hit(hit)
+
+
+user_stats_cache = UserStatsCache()
+
+
+def invalidate_user_stats(user_id: Optional[int]):
+    """À appeler après toute écriture d'activités pour l'utilisateur"""
+    if user_id is not None:
+        user_stats_cache.invalidate(user_id)
+
+
+# Marqueurs des utilisateurs authentifiés (django_auth_service.user_info_cache)
+AUTH_MARKER_NAMESPACE = "auth"
+
+
+def invalidate_user_auth(user_id: Optional[int]):
+    """À appeler après toute modification de l'utilisateur (mot de passe, désactivation, attributs)"""
+    if user_id is not None:
+        UserStatsCache(marker_namespace=AUTH_MARKER_NAMESPACE, green_metrics=False).invalidate(user_id)
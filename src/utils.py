@@ -49,6 +49,17 @@ def export_to_csv(df, filename=None):
     logger.info(f"Données exportées vers {filename}")
     return filename
 
+def export_to_parquet(df, filename=None):
+    if filename is None:
+        parquet_dir = DATA_DIR / "exports"
+        parquet_dir.mkdir(exist_ok=True)
+        filename = parquet_dir / f"garmin_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+    
+    # Colonnaire et compressé : relu colonne par colonne, bien plus compact que le CSV
+    df.to_parquet(filename, index=False, compression="zstd")
+    logger.info(f"Données exportées vers {filename}")
+    return filename
+
 def load_json_file(file_path):
     try:
         with open(file_path, 'r') as f:
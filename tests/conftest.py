@@ -16,6 +16,12 @@ def setup_paths():
     sys.path.insert(0, os.path.join(project_root, 'E3_model_IA/backend/fastapi_app'))
     sys.path.insert(0, os.path.join(project_root, 'E3_model_IA/backend/django_app'))
 
+@pytest.fixture(autouse=True)
+def isolated_stats_markers(monkeypatch, tmp_path):
+    """Marqueurs d'invalidation des caches par utilisateur dans tmp_path, jamais dans data/cache/user_stats"""
+    from src import stats_cache
+    monkeypatch.setattr(stats_cache, "STATS_CACHE_DIR", tmp_path / "stats_markers")
+
 # Fixtures communes
 @pytest.fixture
 def mock_api_key():
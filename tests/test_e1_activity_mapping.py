@@ -0,0 +1,129 @@
+"""
+Tests pour E1 - Normalisation des activités Garmin par table de correspondance
+Vérifie l'équivalence avec l'ancienne normalisation ligne à ligne, les types et les rejets
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E1_gestion_donnees.activity_mapping import (
+    ACTIVITY_FIELDS, E1_COLUMNS, activity_records, normalize_activities
+)
+from E1_gestion_donnees.data_manager import process_garmin_activities
+
+RECORDED = sorted((Path(project_root) / "E1_gestion_donnees" / "data").glob("raw_garmin_data_*.json"))[0]
+
+
+@pytest.fixture(scope="module")
+def recorded():
+    with open(RECORDED) as f:
+        return json.load(f)
+
+
+def legacy_process(activities, user_id):
+    """Ancienne normalisation ligne à ligne, référence de comparaison"""
+    return [{
+        "user_id": user_id,
+        "activity_id": a.get("activityId"),
+        "activity_name": a.get("activityName"),
+        "activity_type": a.get("activityType", {}).get("typeKey"),
+        "start_time": pd.to_datetime(a.get("startTimeLocal")) if a.get("startTimeLocal") else None,
+        "distance_meters": a.get("distance", 0.0),
+        "duration_seconds": a.get("duration", 0.0),
+        "average_speed": a.get("averageSpeed"),
+        "max_speed": a.get("maxSpeed"),
+        "calories": a.get("calories", 0.0),
+        "average_hr": a.get("averageHR"),
+        "max_hr": a.get("maxHR"),
+        "elevation_gain": a.get("elevationGain", 0.0),
+        "elevation_loss": a.get("elevationLoss", 0.0),
+        "start_latitude": a.get("startLatitude"),
+        "start_longitude": a.get("startLongitude"),
+        "device_name": a.get("deviceName"),
+        "steps": a.get("steps"),
+        "average_running_cadence": a.get("averageRunningCadenceInStepsPerMinute"),
+        "max_running_cadence": a.get("maxRunningCadenceInStepsPerMinute"),
+        "stride_length": a.get("avgStrideLength"),
+        "vo2max_estime": a.get("vO2MaxValue"),
+        "training_load": a.get("activityTrainingLoad"),
+        "aerobic_effect": a.get("aerobicTrainingEffect"),
+        "anaerobic_effect": a.get("anaerobicTrainingEffect"),
+        "temp_min": a.get("minTemperature"),
+        "temp_max": a.get("maxTemperature"),
+        "fastest_split_5000": a.get("fastestSplit_5000"),
+        "fastest_split_10000": a.get("fastestSplit_10000"),
+        **{f"hr_zone_{n}": a.get(f"hrTimeInZone_{n}") for n in range(1, 6)},
+    } for a in activities]
+
+
+class TestNormalizeActivities:
+    """Table de correspondance compilée en traitement par colonnes"""
+
+    def test_equivalent_a_l_ancienne_normalisation(self, recorded):
+        processed = process_garmin_activities(recorded, user_id=7)
+        expected = legacy_process(recorded, user_id=7)
+        assert len(processed) == len(expected) == len(recorded)
+        for row, reference in zip(processed, expected):
+            assert set(row) == set(E1_COLUMNS)
+            assert isinstance(row["created_timestamp"], datetime)
+            assert {k: v for k, v in row.items() if k != "created_timestamp"} == reference
+
+    def test_types_python_pour_l_insertion(self, recorded):
+        row = process_garmin_activities(recorded[:1], user_id=7)[0]
+        assert type(row["activity_id"]) is int and type(row["steps"]) is int
+        assert type(row["distance_meters"]) is float
+        assert type(row["start_time"]) is datetime and row["start_time"] == datetime(2025, 8, 22, 18, 36, 33)
+
+    def test_une_seule_date_de_creation_par_lot(self, recorded):
+        frame = normalize_activities(recorded, user_id=7)
+        assert frame["created_timestamp"].nunique() == 1
+        assert frame["start_time"].dtype.kind == "M"
+
+    def test_flux_et_lot_vide(self, recorded):
+        assert len(normalize_activities(iter(recorded[:5]), user_id=1)) == 5
+        empty = normalize_activities([], user_id=1)
+        assert empty.empty and set(E1_COLUMNS) <= set(empty.columns)
+        assert process_garmin_activities([], user_id=1) == []
+
+    def test_flux_lu_par_tranches(self, recorded):
+        consumed = []
+
+        def stream():
+            for activity in recorded[:5]:
+                consumed.append(activity["activityId"])
+                yield activity
+        chunked = normalize_activities(stream(), user_id=1, chunk_size=2)
+        whole = normalize_activities(recorded[:5], user_id=1)
+        assert len(consumed) == 5
+        pd.testing.assert_frame_equal(chunked.drop(columns="created_timestamp"), whole.drop(columns="created_timestamp"))
+        assert chunked["created_timestamp"].nunique() == 1
+
+    def test_valeurs_illisibles(self):
+        frame = normalize_activities([
+            {"activityId": 1, "startTimeLocal": "invalide", "activityType": "pas un objet"},
+            {"activityId": 2, "duration": "x"},
+            {"activityId": "3", "distance": "5000.5", "startTimeLocal": "2025-06-01T07:30:00"},
+        ], user_id=1)
+        # Valeur numérique illisible : activité rejetée ; date illisible : laissée vide
+        assert frame.attrs["rejected"] == 1
+        records = activity_records(frame)
+        assert [r["activity_id"] for r in records] == [1, 3]
+        assert records[0]["start_time"] is None and records[0]["activity_type"] is None
+        assert records[1]["distance_meters"] == 5000.5
+        assert records[1]["start_time"] == datetime(2025, 6, 1, 7, 30)
+
+    def test_table_de_correspondance_coherente(self):
+        names = [spec.name for spec in ACTIVITY_FIELDS]
+        assert len(names) == len(set(names))
+        django_fields = [field for spec in ACTIVITY_FIELDS for field in spec.django]
+        assert len(django_fields) == len(set(django_fields))
+        assert {spec.dtype for spec in ACTIVITY_FIELDS} <= {"int", "float", "str", "datetime"}
@@ -0,0 +1,149 @@
+"""
+Tests pour E1 - Requêtes analytiques Core portables et cache de compilation
+Exécutés sous SQLite et, si TEST_POSTGRES_URL est défini (ex. service postgres
+de deployment/docker-compose.yml), sous PostgreSQL dans un schéma jetable
+"""
+
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import mssql, postgresql, sqlite
+from sqlalchemy.engine.default import CACHE_HIT
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'E3_model_IA', 'backend', 'fastapi_app'))
+
+from E1_gestion_donnees import db_manager
+from E1_gestion_donnees.analytics_queries import (
+    PREDICTION_HISTORY, RECENT_ACTIVITY_SUMMARY, recent_summary_params
+)
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+TODAY = date(2025, 6, 30)
+
+
+def django_activities_table(metadata):
+    return sa.Table(
+        "activities_activity", metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, nullable=False),
+        sa.Column("distance_meters", sa.Float),
+        sa.Column("duration_seconds", sa.Float),
+        sa.Column("average_hr", sa.Float),
+        sa.Column("average_speed", sa.Float),
+        sa.Column("start_time", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+@pytest.fixture(params=["sqlite", pytest.param("postgresql", marks=pytest.mark.integration)])
+def backend(request, tmp_path, monkeypatch):
+    """Moteur configuré comme en production (engine_kwargs_for) et tables E1 + Django"""
+    monkeypatch.setattr(db_manager, "invalidate_user_stats", lambda user_id: None)
+    schema = None
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path / 'garmin.db'}"
+        engine = sa.create_engine(url, **db_manager.engine_kwargs_for(url))
+    else:
+        if not TEST_POSTGRES_URL:
+            pytest.skip("TEST_POSTGRES_URL non défini")
+        schema = f"analytics_test_{uuid.uuid4().hex[:8]}"
+        with sa.create_engine(TEST_POSTGRES_URL).begin() as conn:
+            conn.exec_driver_sql(f"CREATE SCHEMA {schema}")
+        kwargs = db_manager.engine_kwargs_for(TEST_POSTGRES_URL)
+        kwargs["connect_args"] = {**kwargs.get("connect_args", {}), "options": f"-csearch_path={schema}"}
+        engine = sa.create_engine(TEST_POSTGRES_URL, **kwargs)
+
+    tables = dict(db_manager.create_tables(engine))
+    metadata = sa.MetaData()
+    tables["activities_activity"] = django_activities_table(metadata)
+    metadata.create_all(engine)
+    yield request.param, engine, tables
+
+    engine.dispose()
+    if schema:
+        with sa.create_engine(TEST_POSTGRES_URL).begin() as conn:
+            conn.exec_driver_sql(f"DROP SCHEMA {schema} CASCADE")
+
+
+def timed_ms(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+class TestPortabilite:
+    """Une seule construction Core, compilable pour chaque dialecte"""
+
+    @pytest.mark.parametrize("dialect", [sqlite.dialect(), postgresql.dialect(), mssql.dialect()])
+    def test_compilation_sans_sql_propre_a_un_dialecte(self, dialect):
+        for statement in (PREDICTION_HISTORY, RECENT_ACTIVITY_SUMMARY):
+            sql = str(statement.compile(dialect=dialect))
+            assert "datetime(" not in sql and "'now'" not in sql and "INTERVAL" not in sql
+            assert "user_id" in statement.compile(dialect=dialect).params
+
+    def test_fenetre_liee_en_parametre(self):
+        params = recent_summary_params(3, days=90, today=TODAY)
+        assert params == {"user_id": 3, "since": date(2025, 4, 1)}
+
+
+class TestBackends:
+    """Mêmes résultats et réutilisation de la compilation sur chaque backend"""
+
+    def test_historique_des_predictions(self, backend, record_property):
+        import analytics_service
+
+        name, engine, tables = backend
+        start = datetime(2025, 1, 1, 7)
+        activities = [{
+            "user_id": user_id, "activity_id": user_id * 1000 + i, "start_time": start + timedelta(days=i),
+            "distance_meters": 2000.0 + 100 * i, "duration_seconds": 300.0 + 30 * i, "average_hr": 140.0,
+        } for user_id in (1, 2) for i in range(150)]
+        db_manager.store_activities_in_db(engine, tables, activities)
+
+        service = analytics_service.AnalyticsService(engine=engine)
+        df = service._load_prediction_history(1)
+        expected = [a for a in activities if a["user_id"] == 1 and a["distance_meters"] >= 3000 and a["duration_seconds"] > 600]
+        expected = sorted(expected, key=lambda a: a["start_time"], reverse=True)[:100]
+        assert len(df) == 100
+        assert list(df["distance_km"]) == pytest.approx([a["distance_meters"] / 1000.0 for a in expected])
+        assert df["pace_kmh"].iloc[0] == pytest.approx(expected[0]["distance_meters"] / expected[0]["duration_seconds"] * 3.6)
+        record_property(f"prediction_history_ms_{name}", round(timed_ms(lambda: service._load_prediction_history(1)), 2))
+
+    def test_synthese_des_90_derniers_jours(self, backend, record_property):
+        name, engine, tables = backend
+        rows = [{
+            "user_id": 1, "distance_meters": 10000.0, "duration_seconds": 3000.0, "average_hr": 150.0,
+            "average_speed": 3.3, "start_time": datetime.combine(TODAY - timedelta(days=days), datetime.min.time()),
+        } for days in (0, 10, 89, 90, 91, 200)]
+        rows.append({**rows[0], "user_id": 2})
+        with engine.begin() as conn:
+            conn.execute(tables["activities_activity"].insert(), rows)
+            summary = conn.execute(RECENT_ACTIVITY_SUMMARY, recent_summary_params(1, today=TODAY)).one()
+
+        # Jour limite inclus (comme date('now', '-90 days') / CURRENT_DATE - 90 jours)
+        assert summary.total_activities == 4
+        assert summary.total_distance_km == pytest.approx(40.0)
+        assert summary.avg_duration_min == pytest.approx(50.0)
+        assert summary.last_activity_date.date() == TODAY
+
+        def run():
+            with engine.connect() as conn:
+                conn.execute(RECENT_ACTIVITY_SUMMARY, recent_summary_params(1, today=TODAY)).one()
+        record_property(f"recent_summary_ms_{name}", round(timed_ms(run), 2))
+
+    def test_requete_compilee_reutilisee(self, backend):
+        _, engine, _ = backend
+        with engine.connect() as conn:
+            results = [conn.execute(RECENT_ACTIVITY_SUMMARY, recent_summary_params(user_id)) for user_id in (1, 2, 3)]
+            hits = [result.context.cache_hit == CACHE_HIT for result in results]
+            for result in results:
+                result.close()
+        # Compilée au premier appel, servie depuis le cache ensuite malgré des valeurs différentes
+        assert hits[1:] == [True, True]
@@ -0,0 +1,150 @@
+"""
+Tests pour E1 - Upsert en masse des activités et des métriques
+Vérifie ON CONFLICT par dialecte, le découpage en lots et la détection des existants en base
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E1_gestion_donnees import db_manager
+
+
+def make_activity(activity_id, user_id=1, distance=5000.0, day=0):
+    return {
+        "user_id": user_id,
+        "activity_id": activity_id,
+        "activity_name": f"Sortie {activity_id}",
+        "activity_type": "running",
+        "start_time": datetime(2025, 6, 1, 8) + timedelta(days=day),
+        "distance_meters": distance,
+        "duration_seconds": 1800.0,
+        "training_load": 50.0,
+        "created_timestamp": datetime.now(),
+    }
+
+
+@pytest.fixture
+def database(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(db_manager, "invalidate_user_stats", invalidated.append)
+    engine = sa.create_engine("sqlite://")
+    tables = db_manager.create_tables(engine)
+    yield engine, tables, invalidated
+    engine.dispose()
+
+
+def count_statements(engine):
+    statements = []
+    sa.event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+class TestActivitiesUpsert:
+    """store_activities_in_db : INSERT ... ON CONFLICT par lots"""
+
+    def test_insertion_puis_mise_a_jour_des_seules_lignes_modifiees(self, database):
+        engine, tables, invalidated = database
+        assert db_manager.store_activities_in_db(engine, tables, [make_activity(i) for i in range(1, 11)]) == 10
+
+        batch = [make_activity(i) for i in range(1, 11)]
+        batch[3]["distance_meters"] = 12000.0
+        batch.append(make_activity(99, user_id=2))
+        assert db_manager.store_activities_in_db(engine, tables, batch) == 2
+
+        activities = tables["activities"]
+        with engine.connect() as conn:
+            assert conn.execute(sa.select(sa.func.count()).select_from(activities)).scalar() == 11
+            assert conn.execute(
+                sa.select(activities.c.distance_meters).where(activities.c.activity_id == 4)
+            ).scalar() == 12000.0
+        assert invalidated[0] == 1 and sorted(invalidated[1:]) == [1, 2]
+
+    def test_lot_identique_sans_ecriture(self, database):
+        engine, tables, invalidated = database
+        db_manager.store_activities_in_db(engine, tables, [make_activity(i) for i in range(1, 6)])
+        # created_timestamp change à chaque traitement mais n'est jamais réécrit
+        assert db_manager.store_activities_in_db(engine, tables, [make_activity(i) for i in range(1, 6)]) == 0
+        assert invalidated == [1]
+
+    def test_doublons_dans_le_lot_derniere_version_retenue(self, database):
+        engine, tables, _ = database
+        batch = [make_activity(1, distance=1000.0), make_activity(1, distance=2000.0)]
+        assert db_manager.store_activities_in_db(engine, tables, batch) == 1
+        with engine.connect() as conn:
+            assert conn.execute(sa.select(tables["activities"].c.distance_meters)).scalar() == 2000.0
+
+    def test_existants_detectes_en_base_sans_lire_la_table(self, database):
+        engine, tables, _ = database
+        db_manager.store_activities_in_db(engine, tables, [make_activity(i) for i in range(1, 200)])
+        statements = count_statements(engine)
+        db_manager.store_activities_in_db(engine, tables, [make_activity(i) for i in range(150, 260)], chunk_size=50)
+
+        upserts = [sql for sql in statements if "ON CONFLICT (activity_id) DO UPDATE" in sql]
+        assert len(upserts) == 3  # 110 lignes par lots de 50
+        assert not any(sql.strip().startswith("SELECT activities.activity_id") for sql in statements)
+
+    def test_synthese_quotidienne_maintenue_apres_mise_a_jour(self, database):
+        engine, tables, _ = database
+        db_manager.store_activities_in_db(engine, tables, [make_activity(i, day=i % 3) for i in range(1, 10)])
+        updated = make_activity(4, day=1)
+        updated["training_load"] = 150.0
+        db_manager.store_activities_in_db(engine, tables, [updated])
+
+        load = tables["daily_user_load"]
+        with engine.connect() as conn:
+            total = conn.execute(sa.select(sa.func.sum(load.c.training_load))).scalar()
+        assert total == 8 * 50.0 + 150.0
+
+    def test_repli_generique_sans_on_conflict(self, database, monkeypatch):
+        engine, tables, _ = database
+        monkeypatch.setattr(db_manager, "upsert_statement", lambda *args: None)
+        db_manager.store_activities_in_db(engine, tables, [make_activity(i) for i in range(1, 6)])
+        batch = [make_activity(i, distance=7000.0) for i in range(3, 9)]
+        assert db_manager.store_activities_in_db(engine, tables, batch, chunk_size=4) == 6
+        with engine.connect() as conn:
+            distances = conn.execute(
+                sa.select(tables["activities"].c.distance_meters).order_by(tables["activities"].c.activity_id)
+            ).scalars().all()
+        assert distances == [5000.0] * 2 + [7000.0] * 6
+
+    def test_on_conflict_postgresql(self, database):
+        _, tables, _ = database
+        stmt = db_manager.upsert_statement("postgresql", tables["activities"], ["activity_id"], ["distance_meters"])
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (activity_id) DO UPDATE SET distance_meters = excluded.distance_meters" in sql
+        assert "WHERE activities.distance_meters IS DISTINCT FROM excluded.distance_meters" in sql
+
+
+class TestMetricsUpsert:
+    """store_metrics_in_db : upsert atomique sur l'index unique (user_id, date_calcul)"""
+
+    def test_insertion_puis_mise_a_jour(self, database):
+        engine, tables, _ = database
+        date_calcul = datetime(2025, 6, 30, 12)
+        db_manager.store_metrics_in_db(engine, tables, {"user_id": 1, "date_calcul": date_calcul, "charge_7j": 10.0})
+        statements = count_statements(engine)
+        db_manager.store_metrics_in_db(engine, tables, {"user_id": 1, "date_calcul": date_calcul, "charge_7j": 20.0})
+
+        assert len(statements) == 1
+        assert "ON CONFLICT (user_id, date_calcul) DO UPDATE" in statements[0]
+        with engine.connect() as conn:
+            rows = conn.execute(sa.select(tables["metrics"].c.charge_7j)).scalars().all()
+        assert rows == [20.0]
+
+    def test_repli_generique_sans_on_conflict(self, database, monkeypatch):
+        engine, tables, _ = database
+        monkeypatch.setattr(db_manager, "upsert_statement", lambda *args: None)
+        date_calcul = datetime(2025, 6, 30, 12)
+        for charge in (10.0, 20.0):
+            db_manager.store_metrics_in_db(engine, tables, {"user_id": 1, "date_calcul": date_calcul, "charge_7j": charge})
+        with engine.connect() as conn:
+            rows = conn.execute(sa.select(tables["metrics"].c.charge_7j)).scalars().all()
+        assert rows == [20.0]
@@ -0,0 +1,160 @@
+"""
+Tests pour E1 - Table de synthèse daily_user_load
+Vérifie la maintenance incrémentale, les fenêtres de charge 7j/28j et les tendances lues sur la synthèse
+"""
+
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E1_gestion_donnees import db_manager
+from E1_gestion_donnees.daily_load import (
+    activity_day_expression, get_load_trends, get_load_windows, rebuild_daily_user_load
+)
+from E1_gestion_donnees.data_manager import compute_performance_metrics
+
+TODAY = date(2025, 6, 30)
+
+
+def make_activity(activity_id, days_ago, hour=8, user_id=1, activity_type="running", training_load=None):
+    return {
+        "user_id": user_id,
+        "activity_id": activity_id,
+        "activity_name": f"Sortie {activity_id}",
+        "activity_type": activity_type,
+        "start_time": datetime.combine(TODAY - timedelta(days=days_ago), datetime.min.time()) + timedelta(hours=hour),
+        "distance_meters": 5000.0 + activity_id,
+        "duration_seconds": 1500.0 + activity_id,
+        "average_hr": None if activity_id % 4 == 0 else 140.0 + activity_id % 10,
+        "training_load": training_load if training_load is not None else 40.0 + activity_id % 30,
+        "calories": 300,
+        "hr_zone_2": 600.0,
+    }
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(db_manager, "invalidate_user_stats", lambda user_id: None)
+    engine = sa.create_engine("sqlite://")
+    tables = db_manager.create_tables(engine)
+    yield engine, tables
+    engine.dispose()
+
+
+def load_rows(engine, tables):
+    table = tables["daily_user_load"]
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(sa.select(table).order_by(table.c.user_id, table.c.day, table.c.activity_type))]
+
+
+def raw_daily_load(engine, user_id):
+    """Charge par jour recalculée depuis les activités brutes"""
+    with engine.connect() as conn:
+        rows = conn.execute(sa.text(
+            "SELECT date(start_time), SUM(COALESCE(training_load, 0)) FROM activities "
+            "WHERE user_id = :user_id GROUP BY date(start_time)"
+        ), {"user_id": user_id}).fetchall()
+    return {date.fromisoformat(day): load for day, load in rows}
+
+
+class TestDailyUserLoadMaintenance:
+    """Maintenance incrémentale par store_activities_in_db"""
+
+    def test_insertions_successives_identiques_a_une_reconstruction(self, database):
+        engine, tables = database
+        # Deux activités par jour certains jours, deux types, puis un lot qui recouvre des jours existants
+        first = [make_activity(i, days_ago=i // 2, activity_type="cycling" if i % 5 == 0 else "running") for i in range(1, 60)]
+        second = [make_activity(i, days_ago=i % 20, hour=18) for i in range(100, 130)]
+        db_manager.store_activities_in_db(engine, tables, first)
+        db_manager.store_activities_in_db(engine, tables, second)
+        incremental = load_rows(engine, tables)
+
+        rebuild_daily_user_load(engine, tables)
+        assert load_rows(engine, tables) == incremental
+
+        table = tables["daily_user_load"]
+        with engine.connect() as conn:
+            total = conn.execute(sa.select(sa.func.sum(table.c.activity_count))).scalar()
+            zone_2 = conn.execute(sa.select(sa.func.sum(table.c.hr_zone_2_seconds))).scalar()
+        assert total == len(first) + len(second)
+        assert zone_2 == 600.0 * total
+
+    def test_seuls_les_jours_touches_sont_recalcules(self, database):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, [make_activity(i, days_ago=i) for i in range(1, 11)])
+        table = tables["daily_user_load"]
+        with engine.begin() as conn:
+            # Marqueur sur un jour hors du lot suivant : il ne doit pas être réécrit
+            conn.execute(table.update().where(table.c.day == TODAY - timedelta(days=10)).values(calories=-1))
+
+        db_manager.store_activities_in_db(engine, tables, [make_activity(50, days_ago=2), make_activity(51, days_ago=3)])
+
+        with engine.connect() as conn:
+            untouched = conn.execute(sa.select(table.c.calories).where(table.c.day == TODAY - timedelta(days=10))).scalar()
+            day_2 = conn.execute(sa.select(table.c.activity_count).where(table.c.day == TODAY - timedelta(days=2))).scalar()
+        assert untouched == -1
+        assert day_2 == 2
+
+    def test_jour_calcule_par_cast_sous_postgresql(self):
+        column = sa.column("start_time", sa.DateTime(timezone=True))
+        sql = str(activity_day_expression(column, "postgresql").compile(dialect=postgresql.dialect()))
+        assert sql == "CAST(start_time AS DATE)"
+
+
+class TestLoadWindows:
+    """Charges 7j/28j, ACWR et tendances lues sur la synthèse"""
+
+    @pytest.fixture
+    def history(self, database):
+        engine, tables = database
+        activities = [make_activity(i, days_ago=(i * 3) % 90) for i in range(1, 120)]
+        activities += [make_activity(500, days_ago=0, user_id=2, training_load=999)]
+        db_manager.store_activities_in_db(engine, tables, activities)
+        return engine, tables
+
+    def test_fenetres_identiques_au_calcul_brut(self, history):
+        engine, tables = history
+        raw = raw_daily_load(engine, 1)
+        windows = get_load_windows(engine, 1, as_of=TODAY)
+        assert windows["charge_7j"] == pytest.approx(sum(v for d, v in raw.items() if d > TODAY - timedelta(days=7)))
+        assert windows["charge_28j"] == pytest.approx(sum(v for d, v in raw.items() if d > TODAY - timedelta(days=28)))
+        assert windows["acwr"] == pytest.approx(windows["charge_7j"] / (windows["charge_28j"] / 4))
+
+    def test_compute_performance_metrics_utilise_la_synthese(self, history):
+        engine, tables = history
+        windows = get_load_windows(engine, 1, as_of=TODAY)
+        df = pd.DataFrame([make_activity(i, days_ago=i) for i in range(1, 5)])
+        metrics = compute_performance_metrics(df, user_id=1, load_windows=windows)
+        assert metrics["charge_7j"] == round(windows["charge_7j"], 1)
+        assert metrics["forme"] == round(windows["charge_28j"], 1)
+
+    def test_tendances_quotidiennes(self, history):
+        engine, tables = history
+        raw = raw_daily_load(engine, 1)
+        trends = get_load_trends(engine, 1, period_weeks=4, as_of=TODAY)
+
+        assert trends["trends_count"] == len([d for d in raw if d > TODAY - timedelta(weeks=4)])
+        days = [date.fromisoformat(t["date"]) for t in trends["trends"]]
+        assert days == sorted(days, reverse=True)
+        for trend, day in zip(trends["trends"], days):
+            expected_7j = sum(v for d, v in raw.items() if day - timedelta(days=7) < d <= day)
+            expected_28j = sum(v for d, v in raw.items() if day - timedelta(days=28) < d <= day)
+            assert trend["charge_7j"] == round(expected_7j, 1)
+            assert trend["charge_28j"] == round(expected_28j, 1)
+            assert trend["training_load"] == round(raw[day], 1)
+
+    def test_lecture_sans_parcourir_les_activites(self, history):
+        engine, tables = history
+        before = get_load_trends(engine, 1, period_weeks=12, as_of=TODAY)
+        with engine.begin() as conn:
+            conn.execute(sa.delete(tables["activities"]))
+        assert get_load_trends(engine, 1, period_weeks=12, as_of=TODAY) == before
+        assert get_load_windows(engine, 2, as_of=TODAY)["charge_7j"] == 999
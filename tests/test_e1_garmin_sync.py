@@ -0,0 +1,141 @@
+"""
+Tests pour E1 - Récupération Garmin incrémentale, concurrente et reprenable
+Client Garmin simulé servant les activités enregistrées dans raw_garmin_data_*.json
+"""
+
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E1_gestion_donnees import db_manager, garmin_sync
+from E1_gestion_donnees.data_manager import get_all_garmin_activities
+from E1_gestion_donnees.garmin_sync import (
+    decode_resume_token, fetch_garmin_activities, load_sync_state, save_sync_state
+)
+
+RECORDED = sorted((Path(project_root) / "E1_gestion_donnees" / "data").glob("raw_garmin_data_*.json"))[0]
+
+
+class FakeGarminClient:
+    """get_activities(start, limit) sur l'enregistrement, avec pannes injectables par index"""
+
+    def __init__(self, failures=None):
+        with open(RECORDED) as f:
+            self.activities = json.load(f)
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_activities(self, start, limit):
+        with self.lock:
+            self.calls.append(start)
+            if self.failures.get(start, 0) > 0:
+                self.failures[start] -= 1
+                raise ConnectionError(f"Garmin indisponible à l'index {start}")
+        return self.activities[start:start + limit]
+
+
+def ids(activities):
+    return [activity["activityId"] for activity in activities]
+
+
+class TestFetchGarminActivities:
+    """Pagination concurrente, arrêt incrémental, relances et reprise"""
+
+    def test_recuperation_complete_dans_l_ordre(self):
+        client = FakeGarminClient()
+        result = fetch_garmin_activities(client, batch_size=50, max_workers=4)
+        assert result.complete and result.resume_token is None
+        assert ids(result.activities) == ids(client.activities)
+        assert result.high_water_mark == client.activities[0]["activityId"]
+
+    def test_incremental_s_arrete_au_repere(self):
+        client = FakeGarminClient()
+        stop_at = client.activities[30]["activityId"]
+        result = fetch_garmin_activities(client, batch_size=50, stop_at_activity_id=stop_at, max_workers=4)
+        assert ids(result.activities) == ids(client.activities[:30])
+        # Fenêtre de préchargement initiale d'une page : pas de pagination inutile de l'historique
+        assert client.calls == [0]
+        assert result.high_water_mark == client.activities[0]["activityId"]
+
+    def test_incremental_sans_nouvelle_activite(self):
+        client = FakeGarminClient()
+        stop_at = client.activities[0]["activityId"]
+        result = fetch_garmin_activities(client, batch_size=50, stop_at_activity_id=stop_at)
+        assert result.activities == [] and result.complete
+        assert result.high_water_mark == stop_at
+
+    def test_relance_avec_attente_sur_erreur_transitoire(self):
+        client = FakeGarminClient(failures={100: 2})
+        result = fetch_garmin_activities(client, batch_size=50, max_retries=3, backoff_seconds=0)
+        assert result.complete
+        assert ids(result.activities) == ids(client.activities)
+        assert client.calls.count(100) == 3
+
+    def test_echec_definitif_puis_reprise(self):
+        client = FakeGarminClient(failures={150: 10})
+        stop_at = client.activities[300]["activityId"]
+        first = fetch_garmin_activities(client, batch_size=50, stop_at_activity_id=stop_at, max_retries=1, backoff_seconds=0)
+        assert not first.complete
+        assert ids(first.activities) == ids(client.activities[:150])
+        assert decode_resume_token(first.resume_token)["start"] == 150
+        # Le repère n'avance pas tant que la récupération est incomplète
+        assert first.high_water_mark == stop_at
+
+        client.failures.clear()
+        resumed = fetch_garmin_activities(client, batch_size=50, resume_token=first.resume_token, backoff_seconds=0)
+        assert resumed.complete
+        assert set(ids(first.activities)) | set(ids(resumed.activities)) == set(ids(client.activities[:300]))
+        assert resumed.high_water_mark == client.activities[0]["activityId"]
+
+    def test_jeton_invalide(self):
+        with pytest.raises(ValueError):
+            fetch_garmin_activities(FakeGarminClient(), resume_token="pas-un-jeton")
+
+    def test_get_all_garmin_activities_renvoie_une_liste_partielle(self, monkeypatch):
+        monkeypatch.setattr(garmin_sync.time, "sleep", lambda seconds: None)
+        client = FakeGarminClient(failures={50: 10})
+        activities = get_all_garmin_activities(client, batch_size=50)
+        assert ids(activities) == ids(client.activities[:50])
+
+
+class TestSyncState:
+    """Repère persisté par utilisateur dans garmin_sync_state"""
+
+    @pytest.fixture
+    def database(self):
+        engine = sa.create_engine("sqlite://")
+        tables = db_manager.create_tables(engine)
+        yield engine, tables
+        engine.dispose()
+
+    def test_cycle_incremental_persiste(self, database):
+        engine, tables = database
+        client = FakeGarminClient(failures={100: 10})
+        assert load_sync_state(engine, 1) == {"high_water_activity_id": None, "resume_token": None}
+
+        interrupted = fetch_garmin_activities(client, batch_size=50, max_retries=0)
+        save_sync_state(engine, 1, interrupted)
+        state = load_sync_state(engine, 1)
+        assert state["high_water_activity_id"] is None and state["resume_token"]
+
+        client.failures.clear()
+        resumed = fetch_garmin_activities(
+            client, batch_size=50, stop_at_activity_id=state["high_water_activity_id"], resume_token=state["resume_token"]
+        )
+        save_sync_state(engine, 1, resumed)
+        assert load_sync_state(engine, 1) == {
+            "high_water_activity_id": client.activities[0]["activityId"], "resume_token": None
+        }
+
+        client.calls.clear()
+        latest = fetch_garmin_activities(client, batch_size=50, stop_at_activity_id=client.activities[0]["activityId"])
+        assert latest.activities == [] and client.calls == [0]
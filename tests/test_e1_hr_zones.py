@@ -0,0 +1,179 @@
+"""
+Tests pour E1 - Profil FC en cache et répartition par zones en une agrégation
+Vérifie l'équivalence avec l'ancienne requête à sous-requêtes corrélées et l'invalidation du cache
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+import sqlalchemy as sa
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E1_gestion_donnees import db_manager
+from E1_gestion_donnees.hr_zones import (
+    THREE_ZONES, compute_hr_profile, get_hr_profile, zone_distribution
+)
+from src.stats_cache import UserStatsCache
+
+LEGACY_ZONES_QUERY = sa.text("""
+WITH hr_zones AS (
+    SELECT *,
+        CASE
+            WHEN average_hr <= (SELECT MAX(max_hr) * 0.6 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL)
+                THEN 'Zone 1 - Récupération active'
+            WHEN average_hr <= (SELECT MAX(max_hr) * 0.7 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL)
+                THEN 'Zone 2 - Endurance fondamentale'
+            WHEN average_hr <= (SELECT MAX(max_hr) * 0.8 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL)
+                THEN 'Zone 3 - Tempo/Seuil aérobie'
+            WHEN average_hr <= (SELECT MAX(max_hr) * 0.9 FROM activities WHERE user_id = :user_id AND max_hr IS NOT NULL)
+                THEN 'Zone 4 - Seuil anaérobie'
+            ELSE 'Zone 5 - Puissance/VO2max'
+        END as hr_zone,
+        (distance_meters/duration_seconds) * 3.6 as pace_kmh
+    FROM activities
+    WHERE user_id = :user_id AND average_hr IS NOT NULL AND duration_seconds > 300
+)
+SELECT hr_zone, COUNT(*) as activities_count,
+    AVG(duration_seconds)/60.0 as avg_duration_min, SUM(duration_seconds)/3600.0 as total_hours,
+    AVG(training_load) as avg_training_load, AVG(pace_kmh) as avg_pace_kmh,
+    MIN(average_hr) as min_hr, MAX(average_hr) as max_hr, AVG(average_hr) as avg_hr
+FROM hr_zones GROUP BY hr_zone ORDER BY hr_zone
+""")
+
+
+def synthetic_activities(user_id, count, seed=0, with_max_hr=True):
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 1, 1, 7)
+    return [{
+        "user_id": user_id,
+        "activity_id": user_id * 100_000 + i,
+        "activity_type": "running",
+        "start_time": start + timedelta(hours=i * 13),
+        "distance_meters": float(rng.uniform(2000, 20000)),
+        "duration_seconds": float(rng.uniform(100, 7200)),
+        "average_hr": None if i % 11 == 0 else float(rng.uniform(100, 185)),
+        "max_hr": int(rng.integers(150, 200)) if with_max_hr and i % 7 else None,
+        "training_load": None if i % 5 == 0 else float(rng.uniform(10, 300)),
+    } for i in range(count)]
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(db_manager, "invalidate_user_stats", lambda user_id: None)
+    engine = sa.create_engine("sqlite://")
+    tables = db_manager.create_tables(engine)
+    yield engine, tables
+    engine.dispose()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return UserStatsCache(ttl_seconds=600, marker_dir=tmp_path / "markers")
+
+
+class TestZoneDistribution:
+    """Répartition en une agrégation sur les bornes du profil"""
+
+    def test_equivalente_a_l_ancienne_requete(self, database, cache):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, synthetic_activities(1, 600) + synthetic_activities(2, 50, seed=1))
+        with engine.connect() as conn:
+            legacy = [dict(row._mapping) for row in conn.execute(LEGACY_ZONES_QUERY, {"user_id": 1})]
+
+        zones = zone_distribution(engine, get_hr_profile(engine, 1, cache=cache))
+        assert [z["hr_zone"] for z in zones] == [row["hr_zone"] for row in legacy]
+        for zone, row in zip(zones, legacy):
+            assert zone["activities_count"] == row["activities_count"]
+            for key, digits in (("avg_duration_min", 1), ("total_hours", 1), ("avg_training_load", 1),
+                                ("avg_pace_kmh", 2), ("min_hr", 0), ("max_hr", 0), ("avg_hr", 0)):
+                assert zone[key] == pytest.approx(row[key], abs=10 ** -digits), key
+
+    def test_sans_fc_max_tout_en_derniere_zone(self, database, cache):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, synthetic_activities(3, 40, with_max_hr=False))
+        profile = get_hr_profile(engine, 3, cache=cache)
+        assert profile.max_hr_recorded is None and profile.boundaries() == ()
+        zones = zone_distribution(engine, profile, zones=THREE_ZONES)
+        assert [z["hr_zone"] for z in zones] == ["Zone 5 - VO2max"]
+
+    def test_utilisateur_sans_activite(self, database, cache):
+        engine, _ = database
+        profile = get_hr_profile(engine, 99, cache=cache)
+        assert profile.activities_with_hr == 0
+        assert zone_distribution(engine, profile) == []
+
+    def test_bornes_incluses_dans_la_zone_inferieure(self, database, cache):
+        engine, tables = database
+        rows = [{"user_id": 4, "activity_id": 400 + i, "duration_seconds": 1800.0, "distance_meters": 5000.0,
+                 "average_hr": hr, "max_hr": 200} for i, hr in enumerate([120.0, 120.5, 180.0, 181.0])]
+        db_manager.store_activities_in_db(engine, tables, rows)
+        zones = zone_distribution(engine, get_hr_profile(engine, 4, cache=cache))
+        assert [(z["hr_zone"][:6], z["activities_count"]) for z in zones] == [
+            ("Zone 1", 1), ("Zone 2", 1), ("Zone 4", 1), ("Zone 5", 1)
+        ]
+
+
+class TestHRProfileCache:
+    """Profil calculé une fois, invalidé par les marqueurs de version"""
+
+    def test_cache_puis_invalidation(self, database, cache, monkeypatch):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, synthetic_activities(1, 20))
+        calls = []
+        import E1_gestion_donnees.hr_zones as hr_zones
+        monkeypatch.setattr(hr_zones, "compute_hr_profile", lambda *args: calls.append(1) or compute_hr_profile(*args))
+
+        first = get_hr_profile(engine, 1, resting_hr=52, cache=cache)
+        second = get_hr_profile(engine, 1, resting_hr=48, cache=cache)
+        assert len(calls) == 1
+        assert (first.resting_hr, second.resting_hr) == (52, 48)
+        assert first.max_hr_recorded == second.max_hr_recorded
+
+        db_manager.store_activities_in_db(engine, tables, [{"user_id": 1, "activity_id": 999, "max_hr": 215}])
+        cache.invalidate(1)
+        assert get_hr_profile(engine, 1, cache=cache).max_hr_recorded == 215
+        assert len(calls) == 2
+
+    def test_fc_de_repos_conservee_avec_le_profil(self, database, cache):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, synthetic_activities(1, 20))
+        loads = []
+
+        def load_resting_hr(user_id):
+            loads.append(user_id)
+            return 50 + len(loads)
+
+        for _ in range(3):
+            assert get_hr_profile(engine, 1, cache=cache, resting_hr_loader=load_resting_hr).resting_hr == 51
+        assert loads == [1]
+        # Valeur imposée par l'appelant, sans écraser celle du cache
+        assert get_hr_profile(engine, 1, resting_hr=45, cache=cache).resting_hr == 45
+        assert get_hr_profile(engine, 1, cache=cache).resting_hr == 51
+
+        # Modification du UserProfile (signal Django) : nouvelle version, relecture
+        cache.invalidate(1)
+        assert get_hr_profile(engine, 1, cache=cache, resting_hr_loader=load_resting_hr).resting_hr == 52
+        assert loads == [1, 1]
+
+    def test_service_analytics(self, database):
+        import analytics_service
+        from E1_gestion_donnees.hr_zones import hr_profile_cache
+
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, synthetic_activities(1, 100))
+        # Cache du processus : une entrée d'un autre test (autre base) ne doit pas être servie
+        hr_profile_cache.clear()
+
+        service = analytics_service.AnalyticsService(engine=engine)
+        result = service.get_training_zones_analysis(1, resting_hr=50)
+        assert result["max_hr_info"]["resting_hr"] == 50
+        assert sum(z["activities_count"] for z in result["zones_analysis"]) == sum(
+            1 for a in synthetic_activities(1, 100) if a["average_hr"] is not None and a["duration_seconds"] > 300
+        )
+        assert result["recommendations"]
+        hr_profile_cache.clear()
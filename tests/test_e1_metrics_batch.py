@@ -0,0 +1,119 @@
+"""
+Tests pour E1 - Calcul des métriques de performance en lot (multi-utilisateurs)
+Vérifie l'égalité stricte avec compute_performance_metrics appelée utilisateur par utilisateur
+"""
+
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E1_gestion_donnees.data_manager import (
+    METRICS_COLUMNS, compute_performance_metrics, compute_performance_metrics_batch
+)
+
+NOW = pd.Timestamp("2025-06-30 12:00:00")
+ACTIVITY_TYPES = ["running", "running", "cycling", "running", "swimming"]
+
+
+def random_activities(users=80, seed=7):
+    """Historique varié : durées/distances manquantes, splits absents, utilisateurs sans course"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for user_id in range(1, users + 1):
+        no_running = user_id % 11 == 0
+        for i in range(int(rng.integers(1, 40))):
+            activity_type = "cycling" if no_running else ACTIVITY_TYPES[int(rng.integers(0, 5))]
+            # Valeurs manquantes hors course : idxmax/idxmin de la version par utilisateur échouent sur un groupe tout NaN
+            missing = activity_type != "running" and rng.random() < 0.1
+            rows.append({
+                "user_id": user_id,
+                "activity_type": activity_type,
+                "start_time": (NOW - pd.Timedelta(hours=float(rng.uniform(-24, 24 * 60)))).strftime("%Y-%m-%d %H:%M:%S"),
+                "duration_seconds": np.nan if missing else float(rng.uniform(200, 7200)),
+                "distance_meters": np.nan if missing else float(rng.uniform(500, 25000)),
+                "max_speed": float(rng.uniform(2, 6)) if rng.random() > 0.2 else np.nan,
+                "training_load": float(rng.uniform(10, 200)) if rng.random() > 0.1 else np.nan,
+                "vo2max_estime": float(rng.uniform(40, 60)) if user_id % 3 == 0 and rng.random() > 0.5 else np.nan,
+                "fastest_split_1000": float(rng.uniform(-10, 400)) if user_id % 4 == 0 and rng.random() > 0.5 else np.nan,
+                "fastest_split_10000": float(rng.uniform(2400, 4000)) if user_id % 5 == 0 and rng.random() > 0.7 else np.nan,
+            })
+    return pd.DataFrame(rows)
+
+
+def assert_same_metrics(expected, row):
+    for column in METRICS_COLUMNS:
+        value = row[column]
+        if expected[column] is None:
+            assert value is None or (isinstance(value, float) and math.isnan(value)), column
+        elif isinstance(expected[column], float) and math.isnan(expected[column]):
+            assert math.isnan(value), column
+        else:
+            assert value == expected[column], (column, expected[column], value)
+
+
+class TestComputePerformanceMetricsBatch:
+    """Égalité lot / utilisateur par utilisateur"""
+
+    def test_egalite_avec_le_calcul_par_utilisateur(self):
+        activities = random_activities()
+        batch = compute_performance_metrics_batch(activities, now=NOW).set_index("user_id", drop=False)
+
+        assert list(batch.columns) == METRICS_COLUMNS
+        assert len(batch) == activities["user_id"].nunique()
+        for user_id, user_df in activities.groupby("user_id"):
+            expected = compute_performance_metrics(user_df.reset_index(drop=True), user_id, now=NOW)
+            assert_same_metrics(expected, batch.loc[user_id])
+
+    def test_toutes_les_branches_sont_couvertes(self):
+        batch = compute_performance_metrics_batch(random_activities(), now=NOW)
+        assert batch["vma_kmh"].isna().any() and batch["vma_kmh"].notna().any()
+        assert set(batch["recommandation_jour"]) == {
+            "Entraînement normal", "Repos ou récupération conseillée.", "Nouveau cycle d'entraînement possible."
+        }
+
+    def test_colonnes_optionnelles_absentes(self):
+        activities = random_activities(users=12).drop(
+            columns=["fastest_split_1000", "fastest_split_10000", "max_speed", "vo2max_estime"]
+        )
+        batch = compute_performance_metrics_batch(activities, now=NOW).set_index("user_id", drop=False)
+        for user_id, user_df in activities.groupby("user_id"):
+            assert_same_metrics(compute_performance_metrics(user_df.reset_index(drop=True), user_id, now=NOW), batch.loc[user_id])
+
+    def test_vma_nulle_conservee(self):
+        """Effort long sans distance : VMA de 0.0 identique dans les deux chemins"""
+        activities = pd.DataFrame([{
+            "user_id": 1, "activity_type": "running", "start_time": "2025-06-29 08:00:00",
+            "duration_seconds": 1800.0, "distance_meters": 0.0, "training_load": 40.0,
+        }])
+        expected = compute_performance_metrics(activities, 1, now=NOW)
+        assert expected["vma_kmh"] == 0.0
+        assert_same_metrics(expected, compute_performance_metrics_batch(activities, now=NOW).iloc[0])
+
+    @pytest.mark.parametrize("now", [NOW.tz_localize("UTC"), NOW.tz_localize("Europe/Paris")])
+    def test_dates_avec_fuseau(self, now):
+        """start_time DateTime(timezone=True) lu sous PostgreSQL : dates et `now` avec fuseau"""
+        activities = random_activities(users=20)
+        activities["start_time"] = pd.to_datetime(activities["start_time"]).dt.tz_localize("UTC").dt.tz_convert("Europe/Paris")
+        batch = compute_performance_metrics_batch(activities, now=now).set_index("user_id", drop=False)
+        for user_id, user_df in activities.groupby("user_id"):
+            assert_same_metrics(compute_performance_metrics(user_df.reset_index(drop=True), user_id, now=now), batch.loc[user_id])
+        assert batch["charge_28j"].gt(0).any()
+
+    def test_dataframe_vide(self):
+        batch = compute_performance_metrics_batch(pd.DataFrame(), now=NOW)
+        assert batch.empty
+        assert list(batch.columns) == METRICS_COLUMNS
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_egalite_sur_plusieurs_tirages(self, seed):
+        activities = random_activities(users=30, seed=seed)
+        batch = compute_performance_metrics_batch(activities, now=NOW).set_index("user_id", drop=False)
+        for user_id, user_df in activities.groupby("user_id"):
+            assert_same_metrics(compute_performance_metrics(user_df.reset_index(drop=True), user_id, now=NOW), batch.loc[user_id])
@@ -0,0 +1,188 @@
+"""
+Tests pour E1 - Export Parquet des activités (partitions utilisateur/mois)
+Vérifie l'aller-retour, le rafraîchissement incrémental, les suppressions et la lecture avec filtres poussés
+"""
+
+import functools
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+import sqlalchemy as sa
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'E3_model_IA', 'backend', 'fastapi_app'))
+
+from E1_gestion_donnees import db_manager
+from E1_gestion_donnees.parquet_store import (
+    parquet_export_available, read_activities, refresh_parquet_export
+)
+
+
+def make_activity(activity_id, user_id=1, day=0, distance=5000.0, duration=1800.0):
+    return {
+        "user_id": user_id,
+        "activity_id": activity_id,
+        "activity_name": f"Sortie {activity_id}",
+        "activity_type": "running",
+        "start_time": datetime(2025, 5, 1, 8) + timedelta(days=day),
+        "distance_meters": distance,
+        "duration_seconds": duration,
+        "average_hr": 140.0 + activity_id % 20,
+        "max_hr": 170 + activity_id % 10,
+        "training_load": 40.0 + activity_id % 30,
+        "created_timestamp": datetime(2025, 8, 1),
+    }
+
+
+def history(user_id=1, count=90, first_id=1):
+    # Une sortie par jour sur trois mois, distances et durées variées
+    return [
+        make_activity(first_id + i, user_id=user_id, day=i,
+                      distance=2000.0 + (i * 397) % 12000, duration=500.0 + (i * 211) % 4000)
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(db_manager, "invalidate_user_stats", lambda user_id: None)
+    engine = sa.create_engine("sqlite://")
+    tables = db_manager.create_tables(engine)
+    yield engine, tables
+    engine.dispose()
+
+
+def partition_files(root):
+    return sorted(p.relative_to(root).as_posix() for p in root.rglob("*.parquet"))
+
+
+class TestParquetExport:
+    """refresh_parquet_export : partitions réécrites seulement si leur empreinte change"""
+
+    def test_aller_retour_par_partition(self, database, tmp_path):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, history(user_id=1) + history(user_id=2, count=10, first_id=1000))
+
+        stats = refresh_parquet_export(engine, tables, root=tmp_path)
+        assert stats == {"written": 4, "deleted": 0, "unchanged": 0, "rows": 100}
+        assert parquet_export_available(tmp_path)
+        assert partition_files(tmp_path) == [
+            "activities/user_id=1/month=2025-05/part-0.parquet",
+            "activities/user_id=1/month=2025-06/part-0.parquet",
+            "activities/user_id=1/month=2025-07/part-0.parquet",
+            "activities/user_id=2/month=2025-05/part-0.parquet",
+        ]
+
+        exported = read_activities(1, root=tmp_path).sort_values("activity_id").reset_index(drop=True)
+        stored = pd.read_sql(sa.select(tables["activities"]).where(tables["activities"].c.user_id == 1)
+                             .order_by(tables["activities"].c.activity_id), engine)
+        assert exported["activity_id"].tolist() == stored["activity_id"].tolist()
+        assert exported["distance_meters"].tolist() == stored["distance_meters"].tolist()
+        assert (exported["start_time"] == pd.to_datetime(stored["start_time"])).all()
+        assert set(exported["user_id"]) == {1}
+
+    def test_rafraichissement_incremental(self, database, tmp_path):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, history())
+        refresh_parquet_export(engine, tables, root=tmp_path)
+
+        assert refresh_parquet_export(engine, tables, root=tmp_path) == {"written": 0, "deleted": 0, "unchanged": 3, "rows": 0}
+
+        changed = history()[40]
+        changed["distance_meters"] = 21100.0
+        db_manager.store_activities_in_db(engine, tables, [changed])
+        # Seul le mois de l'activité modifiée est relu et réécrit
+        assert refresh_parquet_export(engine, tables, root=tmp_path) == {"written": 1, "deleted": 0, "unchanged": 2, "rows": 30}
+        updated = read_activities(1, filter=ds.field("activity_id") == changed["activity_id"], root=tmp_path)
+        assert updated["distance_meters"].tolist() == [21100.0]
+
+    def test_mise_a_jour_hors_empreinte(self, database, tmp_path):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, history())
+        refresh_parquet_export(engine, tables, root=tmp_path)
+
+        # max_hr n'entre pas dans les sommes de l'empreinte : seul updated_at signale la modification
+        changed = history()[40]
+        changed["max_hr"] = 199
+        assert db_manager.store_activities_in_db(engine, tables, [changed]) == 1
+        assert refresh_parquet_export(engine, tables, root=tmp_path) == {"written": 1, "deleted": 0, "unchanged": 2, "rows": 30}
+        updated = read_activities(1, columns=["max_hr"], filter=ds.field("activity_id") == changed["activity_id"], root=tmp_path)
+        assert updated["max_hr"].tolist() == [199]
+
+        # Upsert sans changement : updated_at conservé, rien à réécrire
+        assert db_manager.store_activities_in_db(engine, tables, [changed]) == 0
+        assert refresh_parquet_export(engine, tables, root=tmp_path)["written"] == 0
+
+    def test_partition_supprimee(self, database, tmp_path):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, history())
+        refresh_parquet_export(engine, tables, root=tmp_path)
+
+        activities = tables["activities"]
+        with engine.begin() as conn:
+            conn.execute(sa.delete(activities).where(activities.c.start_time >= datetime(2025, 7, 1)))
+
+        stats = refresh_parquet_export(engine, tables, root=tmp_path)
+        assert stats["deleted"] == 1 and stats["unchanged"] == 2
+        assert not (tmp_path / "activities" / "user_id=1" / "month=2025-07").exists()
+        assert len(read_activities(1, root=tmp_path)) == 61
+
+    def test_rafraichissement_limite_a_un_utilisateur(self, database, tmp_path):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, history(user_id=1, count=10) + history(user_id=2, count=10, first_id=1000))
+        refresh_parquet_export(engine, tables, root=tmp_path)
+
+        activities = tables["activities"]
+        with engine.begin() as conn:
+            conn.execute(sa.delete(activities).where(activities.c.user_id == 2))
+        # Les partitions des autres utilisateurs ne sont ni comparées ni supprimées
+        assert refresh_parquet_export(engine, tables, root=tmp_path, user_ids=[1])["deleted"] == 0
+        assert len(read_activities(2, root=tmp_path)) == 10
+
+    def test_fichier_temporaire_ignore_a_la_lecture(self, database, tmp_path):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, history(count=10))
+        refresh_parquet_export(engine, tables, root=tmp_path)
+        (tmp_path / "activities" / "user_id=1" / "month=2025-05" / ".part-0.parquet.tmp").write_bytes(b"interrompu")
+        assert len(read_activities(1, root=tmp_path)) == 10
+
+
+class TestParquetAnalytics:
+    """Lecture colonnaire avec filtres poussés, équivalente à la requête SQL"""
+
+    def test_filtres_pousses_equivalents_au_sql(self, database, tmp_path):
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, history())
+        refresh_parquet_export(engine, tables, root=tmp_path)
+
+        df = read_activities(
+            1, columns=["activity_id", "distance_meters"],
+            filter=(ds.field("distance_meters") >= 3000) & (ds.field("duration_seconds") > 600), root=tmp_path,
+        )
+        assert list(df.columns) == ["activity_id", "distance_meters"]
+        expected = [a["activity_id"] for a in history() if a["distance_meters"] >= 3000 and a["duration_seconds"] > 600]
+        assert sorted(df["activity_id"]) == expected
+
+    def test_predictions_identiques_sql_et_parquet(self, database, tmp_path, monkeypatch):
+        import analytics_service
+
+        engine, tables = database
+        db_manager.store_activities_in_db(engine, tables, history(count=150))
+        refresh_parquet_export(engine, tables, root=tmp_path)
+
+        service = analytics_service.AnalyticsService(engine=engine)
+        from_sql = service.get_performance_predictions(1)
+
+        monkeypatch.setattr(analytics_service, "ANALYTICS_READ_PARQUET", True)
+        monkeypatch.setattr(analytics_service, "parquet_export_available", lambda: True)
+        monkeypatch.setattr(analytics_service, "read_activities", functools.partial(read_activities, root=tmp_path))
+        from_parquet = service.get_performance_predictions(1)
+
+        assert from_sql["data_points"] == from_parquet["data_points"] == 100
+        assert from_parquet["predictions"] == from_sql["predictions"]
+        assert from_parquet["confidence_metrics"] == pytest.approx(from_sql["confidence_metrics"])
@@ -0,0 +1,93 @@
+"""
+Tests pour E1 - Archive brute NDJSON compressée (ajout seul, partition utilisateur/jour)
+Vérifie l'écriture page par page, la relecture en flux et la compatibilité avec process_garmin_activities
+"""
+
+import json
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E1_gestion_donnees import raw_archive
+from E1_gestion_donnees.data_manager import process_garmin_activities, save_raw_data
+from E1_gestion_donnees.garmin_sync import fetch_garmin_activities
+from E1_gestion_donnees.raw_archive import (
+    RawArchiveWriter, archive_paths, iter_raw_activities, iter_user_archive
+)
+
+RECORDED = sorted((Path(project_root) / "E1_gestion_donnees" / "data").glob("raw_garmin_data_*.json"))[0]
+
+
+@pytest.fixture(scope="module")
+def recorded():
+    with open(RECORDED) as f:
+        return json.load(f)
+
+
+def comparable(processed):
+    # created_timestamp est horodaté au traitement
+    return [{k: v for k, v in row.items() if k != "created_timestamp"} for row in processed]
+
+
+class TestRawArchive:
+    """Écriture par pages et relecture en flux"""
+
+    @pytest.mark.parametrize("codec, suffix", [("zstd", ".ndjson.zst"), ("gzip", ".ndjson.gz")])
+    def test_aller_retour_par_pages(self, tmp_path, recorded, codec, suffix):
+        writer = RawArchiveWriter(user_id=7, root=tmp_path, codec=codec, day=date(2025, 8, 25))
+        for start in range(0, len(recorded), 100):
+            writer.write_page(recorded[start:start + 100])
+
+        assert writer.path == tmp_path / "user_7" / f"2025-08-25{suffix}"
+        assert writer.count == len(recorded)
+        assert list(iter_raw_activities(writer.path)) == recorded
+        # Plusieurs fois plus compact que le JSON indenté d'origine
+        assert writer.path.stat().st_size * 5 < RECORDED.stat().st_size
+
+    def test_relecture_compatible_avec_process_garmin_activities(self, tmp_path, recorded):
+        RawArchiveWriter(user_id=7, root=tmp_path, day=date(2025, 8, 25)).write_page(recorded)
+        replayed = process_garmin_activities(iter_user_archive(7, root=tmp_path), user_id=7)
+        assert comparable(replayed) == comparable(process_garmin_activities(recorded, user_id=7))
+
+    def test_ajouts_successifs_et_partitions_par_jour(self, tmp_path, recorded):
+        for day, page in [(date(2025, 8, 1), recorded[:10]), (date(2025, 8, 2), recorded[10:20]),
+                          (date(2025, 8, 2), recorded[20:25]), (date(2025, 8, 3), recorded[25:30])]:
+            RawArchiveWriter(user_id=3, root=tmp_path, day=day).write_page(page)
+        RawArchiveWriter(user_id=4, root=tmp_path, day=date(2025, 8, 2)).write_page(recorded[30:40])
+
+        assert [p.name.split(".")[0] for p in archive_paths(3, root=tmp_path)] == ["2025-08-01", "2025-08-02", "2025-08-03"]
+        window = list(iter_user_archive(3, root=tmp_path, start=date(2025, 8, 2), end=date(2025, 8, 2)))
+        assert window == recorded[10:25]
+        assert list(iter_user_archive(3, root=tmp_path)) == recorded[:30]
+
+    def test_ecriture_au_fil_de_la_pagination(self, tmp_path, recorded):
+        class FakeGarmin:
+            def get_activities(self, start, limit):
+                return recorded[start:start + limit]
+
+        writer = RawArchiveWriter(user_id=1, root=tmp_path, day=date(2025, 8, 25))
+        stop_at = recorded[120]["activityId"]
+        result = fetch_garmin_activities(FakeGarmin(), batch_size=50, stop_at_activity_id=stop_at, on_page=writer.write_page)
+        assert list(iter_raw_activities(writer.path)) == result.activities == recorded[:120]
+
+    def test_save_raw_data_respecte_le_nom_de_fichier(self, tmp_path, recorded):
+        target = tmp_path / "export" / "garmin.ndjson.gz"
+        assert save_raw_data(recorded[:5], filename=target) == str(target)
+        assert list(iter_raw_activities(target)) == recorded[:5]
+
+    def test_repli_gzip_sans_zstandard(self, tmp_path, recorded, monkeypatch):
+        monkeypatch.setattr(raw_archive, "zstandard", None)
+        writer = RawArchiveWriter(user_id=1, root=tmp_path, codec="zstd", day=date(2025, 8, 25))
+        writer.write_page(recorded[:3])
+        assert writer.path.name.endswith(".ndjson.gz")
+        assert list(iter_raw_activities(writer.path)) == recorded[:3]
+
+    def test_ancien_format_json_toujours_lisible(self, recorded):
+        activities = iter_raw_activities(RECORDED)
+        assert next(activities) == recorded[0]
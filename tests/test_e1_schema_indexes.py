@@ -0,0 +1,142 @@
+"""
+Tests pour E1 - Index du schéma SQLAlchemy et migration des bases existantes
+Vérifie par EXPLAIN QUERY PLAN que les requêtes fréquentes passent par les index
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E1_gestion_donnees import db_manager
+from E1_gestion_donnees.daily_load import activity_day_expression
+
+INDEXES = {
+    "activities": {"ix_activities_user_id_start_time"},
+    "metrics": {"uq_metrics_user_id_date_calcul"},
+    "splits": {"ix_splits_activity_id"},
+    "gps_data": {"ix_gps_data_activity_id"},
+}
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(db_manager, "invalidate_user_stats", lambda user_id: None)
+    engine = sa.create_engine("sqlite://")
+    tables = db_manager.create_tables(engine)
+    yield engine, tables
+    engine.dispose()
+
+
+def query_plan(conn, statement):
+    """Lignes de EXPLAIN QUERY PLAN (SQLite) pour une requête Core ou un texte SQL"""
+    compiled = statement.compile(conn, compile_kwargs={"literal_binds": True}) if not isinstance(statement, str) else statement
+    return " | ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}"))
+
+
+def index_names(engine, table):
+    return {index["name"] for index in sa.inspect(engine).get_indexes(table)}
+
+
+class TestIndexes:
+    """Index déclarés dans create_tables et utilisés par les requêtes fréquentes"""
+
+    def test_index_crees(self, database):
+        engine, _ = database
+        for table, expected in INDEXES.items():
+            assert expected <= index_names(engine, table)
+
+    def test_activites_recentes_d_un_utilisateur(self, database):
+        engine, tables = database
+        a = tables["activities"].c
+        # Historique des prédictions (AnalyticsService) et partitions de l'export Parquet
+        recent = (
+            sa.select(a.distance_meters, a.duration_seconds, a.start_time)
+            .where(a.user_id == 1, a.distance_meters >= 3000)
+            .order_by(a.start_time.desc()).limit(100)
+        )
+        window = sa.select(a.activity_id).where(a.user_id == 1, a.start_time >= datetime(2025, 6, 1), a.start_time < datetime(2025, 7, 1))
+        with engine.connect() as conn:
+            for statement in (recent, window):
+                plan = query_plan(conn, statement)
+                assert "USING INDEX ix_activities_user_id_start_time" in plan
+                assert "USE TEMP B-TREE FOR ORDER BY" not in plan
+
+    def test_jours_touches_recalcules_par_index(self, database):
+        engine, tables = database
+        a = tables["activities"].c
+        day = activity_day_expression(a.start_time, "sqlite")
+        statement = sa.select(a.training_load).where(a.user_id == 1, day.in_(["2025-06-01", "2025-06-02"]))
+        with engine.connect() as conn:
+            assert "ix_activities_user_id_start_time" in query_plan(conn, statement)
+
+    def test_dernieres_metriques(self, database):
+        engine, tables = database
+        m = tables["metrics"].c
+        statement = sa.select(m.vma_kmh).where(m.user_id == 1).order_by(m.date_calcul.desc()).limit(1)
+        with engine.connect() as conn:
+            plan = query_plan(conn, statement)
+        assert "uq_metrics_user_id_date_calcul" in plan and "TEMP B-TREE" not in plan
+
+    def test_splits_d_une_activite(self, database):
+        engine, tables = database
+        s = tables["splits"].c
+        with engine.connect() as conn:
+            plan = query_plan(conn, sa.select(s.split_index, s.duration_seconds).where(s.activity_id == 42))
+        assert "USING INDEX ix_splits_activity_id" in plan
+
+    def test_ddl_postgresql(self, database):
+        _, tables = database
+        ddl = str(CreateIndex(tables["metrics"].indexes.pop()).compile(dialect=postgresql.dialect()))
+        assert ddl.strip() == "CREATE UNIQUE INDEX uq_metrics_user_id_date_calcul ON metrics (user_id, date_calcul)"
+
+
+class TestMigration:
+    """migrate_schema : index ajoutés aux tables créées avant leur déclaration"""
+
+    def test_base_existante_migree(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(db_manager, "invalidate_user_stats", lambda user_id: None)
+        engine = sa.create_engine(f"sqlite:///{tmp_path / 'ancienne.db'}")
+        tables = db_manager.create_tables(engine)
+        # Base créée avant les index : aucun index secondaire, des métriques en double
+        with engine.begin() as conn:
+            for names in INDEXES.values():
+                for name in names:
+                    conn.exec_driver_sql(f"DROP INDEX {name}")
+            date_calcul = datetime(2025, 6, 30, 12)
+            rows = [
+                {"user_id": 1, "date_calcul": date_calcul, "charge_7j": 10.0},
+                {"user_id": 1, "date_calcul": date_calcul, "charge_7j": 20.0},
+                {"user_id": 1, "date_calcul": date_calcul + timedelta(days=1), "charge_7j": 30.0},
+                {"user_id": 2, "date_calcul": None, "charge_7j": 1.0},
+                {"user_id": 2, "date_calcul": None, "charge_7j": 2.0},
+            ]
+            conn.execute(tables["metrics"].insert(), rows)
+            # Base antérieure à la colonne activities.updated_at
+            conn.exec_driver_sql("ALTER TABLE activities DROP COLUMN updated_at")
+        engine.dispose()
+
+        engine = sa.create_engine(f"sqlite:///{tmp_path / 'ancienne.db'}")
+        tables = db_manager.create_tables(engine)
+        assert "updated_at" in {column["name"] for column in sa.inspect(engine).get_columns("activities")}
+        for table, expected in INDEXES.items():
+            assert expected <= index_names(engine, table)
+        m = tables["metrics"].c
+        with engine.connect() as conn:
+            kept = conn.execute(sa.select(m.user_id, m.charge_7j).order_by(m.metrics_id)).all()
+        # Doublon (user_id, date_calcul) : la ligne la plus récente est gardée ; dates absentes intactes
+        assert [tuple(row) for row in kept] == [(1, 20.0), (1, 30.0), (2, 1.0), (2, 2.0)]
+
+        # Migration idempotente, upsert opérationnel sur la base migrée
+        assert db_manager.migrate_schema(engine, tables["metrics"].metadata) == []
+        db_manager.store_metrics_in_db(engine, tables, {"user_id": 1, "date_calcul": datetime(2025, 6, 30, 12), "charge_7j": 25.0})
+        with engine.connect() as conn:
+            assert conn.execute(sa.select(sa.func.count()).select_from(tables["metrics"])).scalar() == 4
+        engine.dispose()
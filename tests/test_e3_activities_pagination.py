@@ -0,0 +1,187 @@
+"""
+Tests pour E3 - Pagination par curseur et projection des activités
+Vérifie le keyset (start_time, id), le paramètre fields=, l'allure calculée en SQL et le NDJSON
+"""
+
+import json
+import os
+import sys
+
+import httpx
+import pytest
+import sqlalchemy as sa
+from fastapi import FastAPI
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+fastapi_root = os.path.join(project_root, 'E3_model_IA/backend/fastapi_app')
+sys.path.append(project_root)
+sys.path.append(fastapi_root)
+
+from django_db_connector import (
+    AsyncDjangoDBConnector, DjangoDBConnector, calculate_pace, encode_cursor, parse_fields
+)
+from config.settings import ACTIVITIES_MAX_PAGE_SIZE
+from routers.data import router as data_router
+
+# (durée s, distance m) : allures entières, limites de seconde, valeurs nulles
+PACE_SAMPLES = [
+    (3000, 10000), (1799.99, 6000), (1800, 6000), (3601, 12000), (2700.5, 9000),
+    (299.9999, 1000), (4999, 7777), (0, 5000), (1500, 0), (None, 5000), (1500, None),
+]
+
+
+@pytest.fixture
+def django_db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'django_garmin_data.db'}"
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(sa.text("""
+            CREATE TABLE activities_activity (
+                id INTEGER PRIMARY KEY, user_id INTEGER, activity_id INTEGER, activity_name TEXT,
+                activity_type TEXT, start_time DATETIME, duration_seconds REAL, distance_meters REAL,
+                average_speed REAL, max_speed REAL, calories REAL, average_hr REAL, max_hr REAL,
+                elevation_gain REAL, elevation_loss REAL, steps INTEGER, average_cadence INTEGER,
+                vo2_max REAL, training_load REAL, aerobic_effect REAL, anaerobic_effect REAL
+            )
+        """))
+        rows = []
+        for i in range(45):
+            duration, distance = PACE_SAMPLES[i % len(PACE_SAMPLES)]
+            rows.append({
+                "user_id": 1,
+                "activity_id": 1000 + i,
+                # Trois activités par horodatage : le départage se fait sur l'id
+                "start_time": f"2025-03-{1 + i // 3:02d} 07:30:00",
+                "duration_seconds": duration,
+                "distance_meters": distance,
+            })
+        conn.execute(sa.text("""
+            INSERT INTO activities_activity (user_id, activity_id, activity_name, activity_type, start_time,
+                duration_seconds, distance_meters, average_hr)
+            VALUES (:user_id, :activity_id, 'Sortie', 'running', :start_time, :duration_seconds, :distance_meters, 150)
+        """), rows)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def connector(django_db_url):
+    connector = DjangoDBConnector(django_db_url)
+    yield connector
+    connector.engine.dispose()
+
+
+class TestActivitiesProjection:
+    """Projection fields= et allure calculée en SQL"""
+
+    def test_allure_sql_identique_au_calcul_python(self, connector):
+        activities = connector.get_user_activities(1, fields="duration_seconds,distance_meters,pace_per_km")
+        assert len(activities) == 45
+        for activity in activities:
+            assert activity["pace_per_km"] == calculate_pace(activity["duration_seconds"], activity["distance_meters"])
+
+    def test_projection_ne_retourne_que_les_champs_demandes(self, connector):
+        activities = connector.get_user_activities(1, limit=3, fields="start_time,distance_km")
+        assert [list(activity) for activity in activities] == [["start_time", "distance_km"]] * 3
+
+    def test_champs_par_defaut_compatibles(self, connector):
+        activity = connector.get_user_activities(1, limit=1)[0]
+        assert list(activity) == parse_fields(None)
+        assert activity["distance_km"] == round(activity["distance_meters"] / 1000, 2)
+
+    def test_champ_inconnu_refuse(self, connector):
+        with pytest.raises(ValueError, match="Champs inconnus"):
+            connector.get_user_activities(1, fields="id,password")
+
+
+class TestActivitiesKeysetPagination:
+    """Pagination par curseur sur (start_time, id)"""
+
+    def test_pages_sans_doublon_ni_trou(self, connector):
+        seen, cursor = [], None
+        while True:
+            page = connector.get_user_activities_page(1, limit=7, cursor=cursor, fields="id,start_time")
+            seen.extend(activity["id"] for activity in page["activities"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        full = [activity["id"] for activity in connector.get_user_activities(1, fields="id")]
+        assert seen == full
+        assert len(set(seen)) == 45
+
+    def test_derniere_page_sans_curseur(self, connector):
+        page = connector.get_user_activities_page(1, limit=45)
+        assert len(page["activities"]) == 45
+        assert page["next_cursor"] is None
+
+    def test_curseur_invalide(self, connector):
+        with pytest.raises(ValueError, match="Curseur de pagination invalide"):
+            connector.get_user_activities_page(1, cursor="pas-un-curseur")
+
+    async def test_connecteur_async_meme_pagination(self, connector, django_db_url):
+        async_connector = AsyncDjangoDBConnector(django_db_url)
+        try:
+            first = await async_connector.get_user_activities_page(1, limit=10)
+            assert first == connector.get_user_activities_page(1, limit=10)
+            second = await async_connector.get_user_activities_page(1, limit=10, cursor=first["next_cursor"])
+            assert second == connector.get_user_activities_page(1, limit=10, cursor=first["next_cursor"])
+        finally:
+            await async_connector.dispose()
+
+
+class TestActivitiesEndpoint:
+    """Endpoint /v1/activities : JSON paginé et NDJSON en streaming"""
+
+    async def request(self, django_db_url, *args, **kwargs):
+        connector = AsyncDjangoDBConnector(django_db_url)
+        app = FastAPI()
+        app.include_router(data_router)
+        app.state.async_db_connector = connector
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get(*args, **kwargs)
+        finally:
+            await connector.dispose()
+
+    async def test_page_json_avec_curseur(self, django_db_url):
+        response = await self.request(django_db_url, "/v1/activities/1?limit=20&fields=id,pace_per_km")
+        body = response.json()
+        assert response.status_code == 200
+        assert body["total_returned"] == 20
+        assert body["next_cursor"]
+        assert set(body["activities"][0]) == {"id", "pace_per_km"}
+
+    async def test_streaming_ndjson(self, django_db_url):
+        response = await self.request(django_db_url, "/v1/activities/1?format=ndjson&fields=id,start_time")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 45
+        assert lines[0] == {"id": 45, "start_time": "2025-03-15 07:30:00"}
+
+    async def test_streaming_ndjson_depuis_un_curseur(self, django_db_url):
+        cursor = encode_cursor("2025-03-15 07:30:00", 43)
+        response = await self.request(
+            django_db_url, f"/v1/activities/1?fields=id&cursor={cursor}",
+            headers={"Accept": "application/x-ndjson"}
+        )
+        ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+        assert ids == list(range(42, 0, -1))
+
+    async def test_streaming_ndjson_borne_par_limit(self, django_db_url):
+        response = await self.request(django_db_url, "/v1/activities/1?format=ndjson&limit=5&fields=id")
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == [45, 44, 43, 42, 41]
+
+    async def test_page_json_par_defaut_et_limit_borne(self, django_db_url):
+        body = (await self.request(django_db_url, "/v1/activities/1?fields=id")).json()
+        assert body["total_returned"] == 20 and body["next_cursor"]
+        # Plus de réponse JSON non paginée : limit hors de 1..ACTIVITIES_MAX_PAGE_SIZE refusé
+        for limit in (0, ACTIVITIES_MAX_PAGE_SIZE + 1):
+            response = await self.request(django_db_url, f"/v1/activities/1?limit={limit}")
+            assert response.status_code == 422
+
+    async def test_parametres_invalides_400(self, django_db_url):
+        response = await self.request(django_db_url, "/v1/activities/1?fields=inconnu")
+        assert response.status_code == 400
+        response = await self.request(django_db_url, "/v1/activities/1?format=ndjson&cursor=%%%")
+        assert response.status_code == 400
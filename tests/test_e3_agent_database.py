@@ -0,0 +1,144 @@
+"""
+Tests pour E3 - Moteur de base de données partagé de l'agent
+Vérifie la réutilisation du moteur, le cache de réflexion et la bascule SQLite
+"""
+
+import json
+import os
+import sys
+
+import pytest
+import sqlalchemy as sa
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E3_model_IA.scripts import advanced_agent
+from E3_model_IA.scripts.advanced_agent import AgentDatabase, get_user_metrics_from_db
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def primary_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'primary.db'}"
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE metrics (user_id INTEGER, date_calcul TEXT, vma_kmh REAL)"))
+        conn.execute(sa.text("INSERT INTO metrics VALUES (1, '2025-01-01', 14.5), (1, '2025-02-01', 15.0)"))
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def django_sqlite(tmp_path):
+    path = tmp_path / "django_garmin_data.db"
+    engine = sa.create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "CREATE TABLE activities_activity (user_id INTEGER, distance_meters REAL, duration_seconds REAL, "
+            "average_hr REAL, start_time TEXT, average_speed REAL)"
+        ))
+        conn.execute(sa.text(
+            "INSERT INTO activities_activity VALUES (2, 10000, 3000, 150, date('now'), 3.3)"
+        ))
+    engine.dispose()
+    return str(path)
+
+
+@pytest.fixture
+def agent_database(monkeypatch):
+    """Installe une AgentDatabase donnée dans le registre de l'agent"""
+    def install(database):
+        monkeypatch.setitem(advanced_agent._resources, "agent_database", database)
+        return database
+    yield install
+    advanced_agent.reset_agent_resources()
+
+
+class TestAgentDatabase:
+    """Tests du moteur partagé de l'outil get_user_metrics_from_db"""
+
+    def test_moteur_et_reflexion_reutilises(self, primary_url, agent_database):
+        """Plusieurs appels d'outil : une seule sonde et une seule réflexion"""
+        database = agent_database(AgentDatabase(db_url=primary_url, fallback_paths=[]))
+        for _ in range(5):
+            result = json.loads(get_user_metrics_from_db.invoke({"user_id": 1}))
+            assert result["vma_kmh"] == 15.0
+
+        assert database.stats["primary_probes"] == 1
+        assert database.stats["reflections"] == 1
+        assert database.get_engine() is database.get_engine()
+
+    def test_instantane_du_contexte_sans_requete(self, primary_url, agent_database, monkeypatch):
+        """Fournisseur d'instantané branché (Django, FastAPI) : métriques servies sans requête"""
+        database = agent_database(AgentDatabase(db_url=primary_url, fallback_paths=[]))
+        monkeypatch.setattr(advanced_agent, "_user_context_provider", {1: {"user_id": 1, "vma_kmh": 16.0}}.get)
+        assert json.loads(get_user_metrics_from_db.invoke({"user_id": 1}))["vma_kmh"] == 16.0
+        assert database.stats["primary_probes"] == 0
+
+        # Instantané sans métriques (base de l'agent indisponible à sa construction) : requête directe
+        advanced_agent.set_user_context_provider(lambda user_id: None)
+        assert json.loads(get_user_metrics_from_db.invoke({"user_id": 1}))["vma_kmh"] == 15.0
+        assert database.stats["primary_probes"] == 1
+
+    def test_bascule_sans_resonde_a_chaque_appel(self, tmp_path, django_sqlite, agent_database):
+        """Base principale en panne : bascule SQLite, nouvel essai seulement après le délai"""
+        clock = FakeClock()
+        unreachable = f"sqlite:///{tmp_path / 'absent' / 'primary.db'}"
+        database = agent_database(AgentDatabase(
+            db_url=unreachable, fallback_paths=[django_sqlite], retry_interval=60, clock=clock
+        ))
+
+        for _ in range(3):
+            result = json.loads(get_user_metrics_from_db.invoke({"user_id": 2}))
+            assert result["total_activities"] == 1
+        assert database.stats["primary_probes"] == 1
+        assert database.stats["failovers"] == 1
+
+        clock.now = 61
+        database.get_engine()
+        assert database.stats["primary_probes"] == 2
+
+    def test_table_creee_apres_coup(self, primary_url):
+        """Table absente : pas de réflexion à chaque appel, mais vue une fois le délai écoulé"""
+        clock = FakeClock()
+        database = AgentDatabase(db_url=primary_url, fallback_paths=[], retry_interval=30, clock=clock)
+        engine = database.get_engine()
+        assert database.get_table(engine, "daily_user_load") is None
+        assert database.get_table(engine, "daily_user_load") is None
+        assert database.stats["reflections"] == 1
+
+        with engine.begin() as conn:
+            conn.execute(sa.text("CREATE TABLE daily_user_load (user_id INTEGER, day TEXT)"))
+        clock.now = 31
+        assert database.get_table(engine, "daily_user_load") is not None
+        assert database.get_table(engine, "daily_user_load") is not None
+        assert database.stats["reflections"] == 2
+        database.dispose()
+
+    def test_retour_sur_la_base_principale(self, tmp_path, primary_url, django_sqlite):
+        """La base principale redevenue accessible est reprise après le délai"""
+        clock = FakeClock()
+        database = AgentDatabase(
+            db_url=f"sqlite:///{tmp_path / 'absent' / 'primary.db'}",
+            fallback_paths=[django_sqlite], retry_interval=10, clock=clock
+        )
+        assert database.get_engine().url.database == django_sqlite
+
+        database.db_url = primary_url
+        clock.now = 11
+        assert database.get_engine().url.database.endswith("primary.db")
+        database.dispose()
+
+    def test_aucune_base_disponible(self, tmp_path):
+        """Sans base principale ni SQLite Django, une erreur explicite est levée"""
+        database = AgentDatabase(db_url=f"sqlite:///{tmp_path / 'absent' / 'x.db'}", fallback_paths=[])
+        with pytest.raises(Exception, match="Aucune base de données accessible"):
+            database.get_engine()
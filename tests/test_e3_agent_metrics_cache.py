@@ -0,0 +1,65 @@
+"""
+Tests pour E3 - Métriques de l'agent en cache (fournisseur de get_user_metrics_from_db)
+Vérifie la consultation sans requête, l'invalidation par les marqueurs partagés,
+l'absence de mise en cache des échecs et la séparation de cache_efficiency_ratio
+"""
+
+import os
+import sys
+
+import pytest
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E3_model_IA.scripts import advanced_agent, agent_metrics_cache
+from src.green_metrics import green_collector
+from src.stats_cache import UserStatsCache, invalidate_user_stats
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Cache neuf, query_user_metrics remplacée par un compteur"""
+    monkeypatch.setattr(agent_metrics_cache, "agent_metrics_cache", UserStatsCache(green_metrics=False))
+    calls = []
+
+    def query_user_metrics(user_id):
+        calls.append(user_id)
+        return {"user_id": user_id, "vma_kmh": 15.0 + len(calls)}
+    monkeypatch.setattr(advanced_agent, "query_user_metrics", query_user_metrics)
+    return calls
+
+
+class TestMetriquesEnCache:
+    """user_metrics : une requête par version des données de l'utilisateur"""
+
+    def test_une_requete_puis_cache(self, queries):
+        requests_before = green_collector.cache_requests
+        first = agent_metrics_cache.user_metrics(1)
+        assert agent_metrics_cache.user_metrics(1) == first == {"user_id": 1, "vma_kmh": 16.0}
+        assert queries == [1]
+        # Hors du ratio des statistiques utilisateur
+        assert green_collector.cache_requests == requests_before
+
+    def test_invalidation_partagee(self, queries):
+        agent_metrics_cache.user_metrics(1)
+        # Écriture d'activités (pipeline E1, ingestion Garmin, signaux Django) : même marqueur
+        invalidate_user_stats(1)
+        assert agent_metrics_cache.user_metrics(1)["vma_kmh"] == 17.0
+        assert queries == [1, 1]
+
+    def test_echec_non_mis_en_cache(self, queries, monkeypatch):
+        def unavailable(user_id):
+            raise RuntimeError("base de l'agent indisponible")
+        monkeypatch.setattr(advanced_agent, "query_user_metrics", unavailable)
+        assert agent_metrics_cache.user_metrics(1) is None
+        assert agent_metrics_cache.agent_metrics_cache.get(1) is None
+
+    def test_outil_servi_par_le_fournisseur(self, queries):
+        advanced_agent.set_user_context_provider(agent_metrics_cache.user_metrics)
+        try:
+            for _ in range(3):
+                assert '"vma_kmh": 16.0' in advanced_agent.get_user_metrics_from_db.invoke({"user_id": 2})
+        finally:
+            advanced_agent.set_user_context_provider(None)
+        assert queries == [2]
@@ -0,0 +1,140 @@
+"""
+Tests de charge pour E3 - Endpoints de données sur le connecteur asyncio
+Vérifie que les flux de chat continuent pendant de nombreuses requêtes /v1/activities et /v1/stats
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+import pytest
+import sqlalchemy as sa
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+fastapi_root = os.path.join(project_root, 'E3_model_IA/backend/fastapi_app')
+sys.path.append(project_root)
+sys.path.append(fastapi_root)
+
+from django_db_connector import AsyncDjangoDBConnector, DjangoDBConnector
+from src.stats_cache import UserStatsCache
+from routers.data import router as data_router
+
+TOKEN_INTERVAL_S = 0.01
+TOKENS_PER_STREAM = 40
+
+
+def seed_django_database(path, activities_per_user=20000, users=3):
+    engine = sa.create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(sa.text("""
+            CREATE TABLE activities_activity (
+                id INTEGER PRIMARY KEY, user_id INTEGER, activity_id INTEGER, activity_name TEXT,
+                activity_type TEXT, start_time TEXT, duration_seconds REAL, distance_meters REAL,
+                average_speed REAL, max_speed REAL, calories REAL, average_hr REAL, max_hr REAL,
+                elevation_gain REAL, elevation_loss REAL, steps INTEGER, average_cadence REAL,
+                vo2_max REAL, training_load REAL, aerobic_effect REAL, anaerobic_effect REAL
+            )
+        """))
+        conn.execute(sa.text("""
+            INSERT INTO activities_activity (user_id, activity_id, activity_name, activity_type, start_time,
+                duration_seconds, distance_meters, average_speed, calories, average_hr)
+            VALUES (:user_id, :activity_id, 'Footing', :activity_type, :start_time, 3000, 10000, 3.33, 600, 145)
+        """), [
+            {
+                "user_id": user_id,
+                "activity_id": user_id * 1_000_000 + i,
+                "activity_type": "running" if i % 3 else "cycling",
+                "start_time": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} 08:{i % 60:02d}:00",
+            }
+            for user_id in range(1, users + 1) for i in range(activities_per_user)
+        ])
+    engine.dispose()
+
+
+def build_app(connector):
+    """Application minimale : endpoints de données + un chat qui streame des tokens"""
+    app = FastAPI()
+    app.include_router(data_router)
+    app.state.async_db_connector = connector
+    app.state.stream_gaps = []
+    app.state.streaming = asyncio.Event()
+
+    @app.post("/v1/coaching/chat")
+    async def chat():
+        async def stream_response():
+            last = time.perf_counter()
+            for i in range(TOKENS_PER_STREAM):
+                await asyncio.sleep(TOKEN_INTERVAL_S)
+                now = time.perf_counter()
+                app.state.stream_gaps.append(now - last)
+                app.state.streaming.set()
+                last = now
+                yield json.dumps({"type": "content", "data": f"token-{i}"}) + "\n"
+            yield json.dumps({"type": "end", "data": "Stream finished."}) + "\n"
+        return StreamingResponse(stream_response(), media_type="application/x-ndjson")
+
+    return app
+
+
+@pytest.fixture(scope="module")
+def django_db_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("django_db") / "django_garmin_data.db"
+    seed_django_database(path)
+    return path
+
+
+class TestAsyncDjangoDBConnector:
+    """Parité du connecteur asyncio avec le connecteur synchrone"""
+
+    async def test_memes_resultats_que_le_connecteur_synchrone(self, django_db_path):
+        url = f"sqlite:///{django_db_path}"
+        sync_connector = DjangoDBConnector(url, stats_cache=UserStatsCache(ttl_seconds=0))
+        async_connector = AsyncDjangoDBConnector(url, stats_cache=UserStatsCache(ttl_seconds=0))
+        try:
+            assert await async_connector.get_user_activities(1, limit=5) == sync_connector.get_user_activities(1, limit=5)
+            assert await async_connector.get_user_stats(2) == sync_connector.get_user_stats(2)
+            assert (await async_connector.get_user_stats(99))['total_activities'] == 0
+            status = await async_connector.test_connection()
+            assert status['status'] == 'connected'
+            assert status['total_activities'] == 60000
+        finally:
+            await async_connector.dispose()
+            sync_connector.engine.dispose()
+
+
+class TestChatStreamsUnderDataLoad:
+    """Test de charge : flux de chat concurrents pendant les requêtes de données"""
+
+    async def test_flux_de_chat_fluides_pendant_les_requetes_de_donnees(self, django_db_path):
+        connector = AsyncDjangoDBConnector(f"sqlite:///{django_db_path}", stats_cache=UserStatsCache(ttl_seconds=0))
+        app = build_app(connector)
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                chat_streams = [asyncio.ensure_future(client.post("/v1/coaching/chat")) for _ in range(5)]
+                # Les requêtes de données arrivent pendant que les tokens sont streamés
+                await app.state.streaming.wait()
+                data_requests = [
+                    client.get(f"/v1/stats/{1 + i % 3}") if i % 2 else client.get(f"/v1/activities/{1 + i % 3}?limit=200")
+                    for i in range(60)
+                ]
+                responses = await asyncio.gather(*chat_streams, *data_requests)
+        finally:
+            await connector.dispose()
+
+        assert all(response.status_code == 200 for response in responses)
+        for response in responses[:5]:
+            lines = response.text.strip().splitlines()
+            assert len(lines) == TOKENS_PER_STREAM + 1
+        assert responses[6].json()['stats']['total_activities'] == 20000
+        assert responses[5].json()['total_returned'] == 200
+
+        # Aucun token ne doit attendre derrière une requête SQL bloquant la boucle
+        # (≈2 s d'attente avec l'ancien connecteur synchrone sur ce scénario)
+        max_gap = max(app.state.stream_gaps)
+        assert max_gap < TOKEN_INTERVAL_S + 0.5, f"Flux de chat bloqué {max_gap * 1000:.0f} ms"
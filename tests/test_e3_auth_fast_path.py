@@ -0,0 +1,234 @@
+"""
+Tests pour E3 - Authentification FastAPI sans requête ORM par requête
+Vérifie la vérification locale des JWT (signature, expiration), le cache des
+utilisateurs et son invalidation (marqueurs d'authentification publiés par les signaux de
+User, distincts de ceux des activités), et la chaîne de
+dépendances get_current_user / get_user_context
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.db.models.signals import post_save
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'E3_model_IA', 'backend', 'fastapi_app'))
+
+import django_auth_service
+import fastapi_auth_middleware
+from accounts.models import User, UserProfile
+from coaching import context
+from django_auth_service import DjangoAuthService
+from fastapi_auth_middleware import get_current_user, get_user_context
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from src.green_metrics import green_collector
+from src.stats_cache import AUTH_MARKER_NAMESPACE, UserStatsCache, invalidate_user_auth, invalidate_user_stats
+
+USER_ID = 7
+
+
+def make_user(**overrides):
+    attributes = dict(
+        id=USER_ID, username="coureur", email="coureur@example.com", first_name="Léa", last_name="Martin",
+        is_active=True, is_premium=False, preferred_activity="running", main_goal="10k",
+        created_at=datetime(2025, 1, 1), password="hash",
+    )
+    attributes.update(overrides)
+    return SimpleNamespace(**attributes)
+
+
+def token_for(user_id=USER_ID, lifetime=None):
+    token = AccessToken.for_user(SimpleNamespace(id=user_id))
+    if lifetime is not None:
+        token.set_exp(lifetime=lifetime)
+    return str(token)
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    """Service neuf, caches vides (marqueurs du contexte dans tmp_path), ORM remplacé par un compteur"""
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(django_auth_service, "user_info_cache", UserStatsCache(
+        marker_namespace=AUTH_MARKER_NAMESPACE, green_metrics=False, clock=lambda: clock.now))
+    monkeypatch.setattr(context.coaching_context_cache, "marker_dir", tmp_path)
+    auth_service = DjangoAuthService()
+    users = {USER_ID: make_user()}
+    lookups = []
+
+    def get_user(validated_token):
+        # Jamais sur la boucle d'événements : l'ORM Django y est interdit
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        lookups.append(validated_token["user_id"])
+        return users[validated_token["user_id"]]
+
+    monkeypatch.setattr(auth_service.jwt_auth, "get_user", get_user)
+    return SimpleNamespace(auth=auth_service, users=users, lookups=lookups, clock=clock)
+
+
+class TestVerificationLocale:
+    """Signature et expiration contrôlées sans base de données"""
+
+    def test_token_valide_une_seule_requete(self, service):
+        token = token_for()
+        first = service.auth.authenticate_token(token)
+        second = service.auth.authenticate_token(token)
+
+        assert first == second
+        assert (second.id, second.email, second.created_at) == (USER_ID, "coureur@example.com", datetime(2025, 1, 1))
+        assert service.lookups == [USER_ID]
+
+    def test_signature_alteree_refusee(self, service):
+        header, payload, signature = token_for().split(".")
+        forged = ".".join([header, payload, signature[:-4] + ("AAAA" if signature[-4:] != "AAAA" else "BBBB")])
+        assert service.auth.authenticate_token(forged) is None
+        assert service.lookups == []
+
+    def test_token_expire_refuse(self, service):
+        assert service.auth.authenticate_token(token_for(lifetime=timedelta(seconds=-1))) is None
+        assert service.lookups == []
+
+    def test_expiration_recontrolee_pour_un_token_deja_verifie(self, service, monkeypatch):
+        token = token_for()
+        validated = service.auth.validate_token(token)
+        calls = []
+
+        def rejected(raw_token):
+            calls.append(raw_token)
+            raise TokenError("Token is invalid or expired")
+        monkeypatch.setattr(service.auth.jwt_auth, "get_validated_token", rejected)
+
+        # Signature déjà vérifiée : pas de nouveau décodage tant que le token n'a pas expiré
+        assert service.auth.validate_token(token) is validated
+        assert calls == []
+
+        monkeypatch.setattr(django_auth_service, "time", SimpleNamespace(time=lambda: validated["exp"] + 1))
+        assert service.auth.validate_token(token) is None
+        assert calls == [token]
+
+    def test_utilisateur_inactif_refuse_et_non_mis_en_cache(self, service):
+        service.users[USER_ID] = make_user(is_active=False)
+        token = token_for()
+        assert service.auth.authenticate_token(token) is None
+        assert service.auth.authenticate_token(token) is None
+        assert service.lookups == [USER_ID, USER_ID]
+
+
+class TestInvalidation:
+    """Modification de l'utilisateur (tout processus) ou TTL écoulé : l'utilisateur est relu"""
+
+    def test_sauvegarde_utilisateur(self, service):
+        token = token_for()
+        service.auth.authenticate_token(token)
+
+        service.users[USER_ID] = make_user(is_premium=True)
+        post_save.send(sender=User, instance=SimpleNamespace(pk=USER_ID), created=False, raw=False)
+        assert service.auth.authenticate_token(token).is_premium
+        assert service.lookups == [USER_ID, USER_ID]
+
+    def test_profil_et_activites_sans_invalidation(self, service):
+        token = token_for()
+        service.auth.authenticate_token(token)
+        post_save.send(sender=UserProfile, instance=SimpleNamespace(user_id=USER_ID), created=False, raw=False)
+        # Écriture d'activités (ingestion, pipeline E1) : marqueurs des statistiques et du contexte seulement
+        invalidate_user_stats(USER_ID)
+        service.auth.authenticate_token(token)
+        assert service.lookups == [USER_ID]
+
+    def test_connexion_sans_invalidation(self, service):
+        token = token_for()
+        service.auth.authenticate_token(token)
+        post_save.send(sender=User, instance=SimpleNamespace(pk=USER_ID), created=False, raw=False,
+                       update_fields=frozenset({"last_login"}))
+        service.auth.authenticate_token(token)
+        assert service.lookups == [USER_ID]
+
+    def test_desactivation_publiee_entre_processus(self, service):
+        token = token_for()
+        service.auth.authenticate_token(token)
+
+        # Autre processus (Django) : signal de User, marqueur d'authentification dans le répertoire partagé
+        service.users[USER_ID] = make_user(is_active=False)
+        invalidate_user_auth(USER_ID)
+        assert service.auth.authenticate_token(token) is None
+
+    def test_expiration_du_ttl(self, service):
+        token = token_for()
+        service.auth.authenticate_token(token)
+        service.clock.now += django_auth_service.user_info_cache.ttl_seconds
+        service.auth.authenticate_token(token)
+        assert service.lookups == [USER_ID, USER_ID]
+
+    def test_sauvegarde_pendant_le_chargement(self, service, monkeypatch):
+        get_user = service.auth.jwt_auth.get_user
+
+        def concurrent_save(validated_token):
+            user = get_user(validated_token)
+            post_save.send(sender=User, instance=SimpleNamespace(pk=USER_ID), created=False, raw=False)
+            return user
+        monkeypatch.setattr(service.auth.jwt_auth, "get_user", concurrent_save)
+
+        token = token_for()
+        service.auth.authenticate_token(token)
+        # Entrée calculée avant la sauvegarde : non conservée
+        monkeypatch.setattr(service.auth.jwt_auth, "get_user", get_user)
+        service.auth.authenticate_token(token)
+        assert service.lookups == [USER_ID, USER_ID]
+
+    def test_hors_metriques_du_cache_partage(self, service):
+        requests_before = green_collector.cache_requests
+        token = token_for()
+        service.auth.authenticate_token(token)
+        service.auth.authenticate_token(token)
+        assert green_collector.cache_requests == requests_before
+
+
+class TestChaineDeDependances:
+    """get_current_user résolu une fois par requête, contexte sans requête s'il est en cache"""
+
+    @pytest.fixture
+    def client(self, service, monkeypatch):
+        monkeypatch.setattr(fastapi_auth_middleware.auth_middleware, "auth_service", service.auth)
+        contexts = []
+
+        def context_for(user_id, build=True):
+            contexts.append(build)
+            return {"stats": {"activities_count": 3}} if build or len(contexts) > 2 else None
+        monkeypatch.setattr(service.auth, "get_user_context_for_coaching", context_for)
+
+        app = FastAPI()
+
+        @app.get("/moi")
+        async def me(current_user=Depends(get_current_user), user_context=get_user_context):
+            return {"id": current_user.id, "stats": user_context["stats"]}
+
+        service.contexts = contexts
+        return TestClient(app)
+
+    def test_utilisateur_et_contexte(self, client, service, monkeypatch):
+        validations = []
+        validate = service.auth.validate_token
+        monkeypatch.setattr(service.auth, "validate_token", lambda token: validations.append(token) or validate(token))
+        headers = {"Authorization": f"Bearer {token_for()}"}
+
+        first = client.get("/moi", headers=headers)
+        second = client.get("/moi", headers=headers)
+
+        assert first.json() == second.json() == {"id": USER_ID, "stats": {"activities_count": 3}}
+        assert len(validations) == 2
+        assert service.lookups == [USER_ID]
+        # Premier appel : instantané absent puis construit dans un thread ; ensuite lu directement
+        assert service.contexts == [False, True, False]
+
+    def test_token_invalide(self, client, service):
+        response = client.get("/moi", headers={"Authorization": "Bearer pas-un-jwt"})
+        assert response.status_code == 401
+        assert service.lookups == []
@@ -0,0 +1,136 @@
+"""
+Tests pour E3 - Mémoire des conversations de l'agent (checkpoints LangGraph)
+Vérifie le mode WAL, la rétention par fil, les métriques et le branchement dans l'agent
+"""
+
+import operator
+import os
+import sqlite3
+import sys
+from typing import Annotated, List
+
+import pytest
+import sqlalchemy as sa
+from typing_extensions import TypedDict
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E3_model_IA.scripts import advanced_agent, checkpoint_store
+from E3_model_IA.scripts.checkpoint_store import create_checkpointer, libpq_conninfo
+
+
+class ChatState(TypedDict):
+    messages: Annotated[List[str], operator.add]
+
+
+def build_graph(checkpointer):
+    """Graphe minimal : un nœud qui répond à chaque message (un checkpoint par étape)"""
+    from langgraph.graph import END, StateGraph
+
+    def reply(state: ChatState) -> ChatState:
+        return {"messages": [f"réponse {len(state['messages'])}"]}
+
+    builder = StateGraph(ChatState)
+    builder.add_node("reply", reply)
+    builder.set_entry_point("reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def count_rows(path, table, thread_id):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+@pytest.fixture
+async def sqlite_saver(tmp_path):
+    path = tmp_path / "memory" / "agent_memory.sqlite"
+    saver = await create_checkpointer(f"sqlite:///{path}", keep_last=4)
+    yield saver, path
+    await saver.aclose()
+
+
+class TestSqliteCheckpointer:
+    """Backend SQLite : WAL, rétention par fil et métriques"""
+
+    async def test_wal_et_pragmas(self, sqlite_saver):
+        saver, path = sqlite_saver
+        assert path.exists()
+        async with saver.conn.execute("PRAGMA journal_mode") as cursor:
+            assert (await cursor.fetchone())[0] == "wal"
+        async with saver.conn.execute("PRAGMA synchronous") as cursor:
+            assert (await cursor.fetchone())[0] == 1  # NORMAL
+        async with saver.conn.execute("PRAGMA busy_timeout") as cursor:
+            assert (await cursor.fetchone())[0] == 5000
+
+    async def test_retention_des_derniers_checkpoints_par_fil(self, sqlite_saver):
+        saver, path = sqlite_saver
+        graph = build_graph(saver)
+        for i in range(10):
+            await graph.ainvoke({"messages": [f"question {i}"]}, {"configurable": {"thread_id": "long"}})
+        await graph.ainvoke({"messages": ["bonjour"]}, {"configurable": {"thread_id": "court"}})
+
+        assert count_rows(path, "checkpoints", "long") == 4
+        assert count_rows(path, "checkpoints", "court") == 3
+        # Aucune écriture intermédiaire orpheline
+        with sqlite3.connect(path) as conn:
+            orphans = conn.execute(
+                "SELECT COUNT(*) FROM writes w WHERE NOT EXISTS (SELECT 1 FROM checkpoints c "
+                "WHERE c.thread_id = w.thread_id AND c.checkpoint_id = w.checkpoint_id)"
+            ).fetchone()[0]
+        assert orphans == 0
+
+        # L'état courant reste complet : la conversation est portée par le dernier checkpoint
+        state = await graph.aget_state({"configurable": {"thread_id": "long"}})
+        assert len(state.values["messages"]) == 20
+        assert state.values["messages"][-2:] == ["question 9", "réponse 19"]
+
+    async def test_metriques_latence_et_taille(self, sqlite_saver):
+        saver, path = sqlite_saver
+        graph = build_graph(saver)
+        for i in range(5):
+            await graph.ainvoke({"messages": [f"question {i}"]}, {"configurable": {"thread_id": "fil"}})
+
+        stats = saver.stats()
+        assert stats["backend"] == "sqlite"
+        assert stats["writes"] == 15  # entrée, début et fin de chaque invocation
+        assert 0 < stats["avg_write_ms"] <= stats["max_write_ms"]
+        assert stats["compacted_checkpoints"] == 11
+        assert await saver.adatabase_size() == saver.stats()["db_size_bytes"] > 0
+
+    async def test_sans_retention(self, tmp_path):
+        path = tmp_path / "agent_memory.sqlite"
+        saver = await create_checkpointer(f"sqlite:///{path}", keep_last=0)
+        try:
+            graph = build_graph(saver)
+            for i in range(3):
+                await graph.ainvoke({"messages": [f"question {i}"]}, {"configurable": {"thread_id": "fil"}})
+            assert count_rows(path, "checkpoints", "fil") == 9
+        finally:
+            await saver.aclose()
+
+
+class TestConfiguration:
+    """Choix du backend et branchement dans l'agent"""
+
+    def test_url_postgresql_vers_libpq(self):
+        url = sa.engine.make_url("postgresql+psycopg2://coach:secret@db:5432/coach_ia_db")
+        assert libpq_conninfo(url) == "postgresql://coach:secret@db:5432/coach_ia_db"
+
+    async def test_backend_non_supporte(self):
+        with pytest.raises(ValueError, match="mysql"):
+            await create_checkpointer("mysql://coach@db/coach_ia_db")
+
+    async def test_agent_utilise_le_checkpointer_configure(self, tmp_path, monkeypatch):
+        path = tmp_path / "agent_memory.sqlite"
+        monkeypatch.setattr(checkpoint_store, "AGENT_MEMORY_URL", f"sqlite:///{path}")
+        saver = await advanced_agent.create_async_checkpointer()
+        try:
+            assert saver is not None
+            assert saver.keep_last == checkpoint_store.AGENT_MEMORY_KEEP_CHECKPOINTS
+            with sqlite3.connect(path) as conn:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            assert {"checkpoints", "writes"} <= tables
+        finally:
+            await saver.aclose()
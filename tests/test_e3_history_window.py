@@ -0,0 +1,166 @@
+"""
+Tests pour E3 - Fenêtre d'historique de l'agent bornée en tokens
+Vérifie le prompt système épinglé, le retrait des sorties d'outils périmées,
+le résumé incrémental des anciens tours et les métriques, dans le graphe de coaching
+"""
+
+import os
+import sys
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from prometheus_client import REGISTRY
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E3_model_IA.scripts import advanced_agent, history_window
+from E3_model_IA.scripts.history_window import build_window, messages_tokens, summarize_with_llm
+
+SYSTEM = "Tu es un coach."
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokens(monkeypatch):
+    """Comptage à 4 caractères par token : pas de fichier BPE tiktoken hors ligne"""
+    monkeypatch.setattr(history_window, "_encoding", lambda: None)
+    history_window.count_tokens.cache_clear()
+    yield
+    history_window.count_tokens.cache_clear()
+
+
+def turn(i, tool_output_chars=0, answer_chars=200):
+    """Un tour complet : demande, appel d'outil et son résultat, réponse du coach"""
+    messages = [HumanMessage(content=f"Question {i} " + "q" * 80)]
+    if tool_output_chars:
+        messages += [
+            AIMessage(content="", tool_calls=[{"name": "get_user_metrics_from_db", "args": {"user_id": 1}, "id": f"c{i}"}]),
+            ToolMessage(content="{" + "x" * tool_output_chars + "}", tool_call_id=f"c{i}", name="get_user_metrics_from_db"),
+        ]
+    return messages + [AIMessage(content=f"Réponse {i} " + "r" * answer_chars)]
+
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous, messages):
+        self.calls.append((previous, messages))
+        return f"{previous} | {len(messages)} messages résumés".strip(" |")
+
+
+class TestFenetre:
+    """Construction de la fenêtre envoyée au LLM"""
+
+    def test_historique_court_inchange(self):
+        messages = turn(1) + [HumanMessage(content="Et ensuite ?")]
+        window = build_window(SYSTEM, messages, max_tokens=10_000)
+        assert window.messages == [SystemMessage(content=SYSTEM)] + messages
+        assert window.saved_tokens == 0 and window.summarized == 0
+
+    def test_sorties_d_outils_perimees_retirees(self):
+        current = [
+            HumanMessage(content="Mon plan ?"),
+            AIMessage(content="Je regarde", tool_calls=[{"name": "get_training_knowledge", "args": {"query": "10k"}, "id": "k"}]),
+            ToolMessage(content="passages RAG", tool_call_id="k", name="get_training_knowledge"),
+        ]
+        window = build_window(SYSTEM, turn(1, tool_output_chars=4000) + current, max_tokens=10_000)
+
+        old_part = window.messages[1:3]
+        assert [type(m) for m in old_part] == [HumanMessage, AIMessage]
+        assert not any(isinstance(m, ToolMessage) for m in old_part)
+        # Le tour courant garde ses appels d'outils : la boucle call_llm/use_tool en a besoin
+        assert window.messages[3:] == current
+        assert window.saved_tokens >= 1000
+
+    def test_resume_des_anciens_tours_au_dela_du_budget(self):
+        messages = [m for i in range(12) for m in turn(i)] + [HumanMessage(content="Nouvelle question")]
+        summarizer = RecordingSummarizer()
+        window = build_window(SYSTEM, messages, max_tokens=600, summarize=summarizer)
+
+        assert window.sent_tokens <= 600 * history_window.TARGET_RATIO
+        assert window.messages[0].content.startswith(SYSTEM)
+        assert "RÉSUMÉ DE LA CONVERSATION PRÉCÉDENTE" in window.messages[0].content
+        assert window.messages[-1] == messages[-1]
+        # Frontière de tour : le premier message gardé après le résumé est une demande
+        assert isinstance(messages[window.summarized], HumanMessage)
+        assert window.messages[1] is messages[window.summarized]
+        assert len(summarizer.calls) == 1
+        assert summarizer.calls[0][1] == messages[:window.summarized]
+
+        # Tour suivant : le résumé est repris, sans nouvel appel tant que le budget tient
+        messages += [AIMessage(content="ok"), HumanMessage(content="Merci")]
+        again = build_window(SYSTEM, messages, window.summary, window.summarized, max_tokens=600, summarize=summarizer)
+        assert len(summarizer.calls) == 1
+        assert again.summarized == window.summarized
+        assert again.messages[0] == window.messages[0]
+
+    def test_resume_incremental(self):
+        messages = [m for i in range(30) for m in turn(i)] + [HumanMessage(content="Suite")]
+        summarizer = RecordingSummarizer()
+        first = build_window(SYSTEM, messages[:25], max_tokens=600, summarize=summarizer)
+        second = build_window(SYSTEM, messages, first.summary, first.summarized, max_tokens=600, summarize=summarizer)
+        assert len(summarizer.calls) == 2
+        assert summarizer.calls[1][0] == first.summary
+        assert summarizer.calls[1][1] == messages[first.summarized:second.summarized]
+
+    def test_tour_courant_jamais_tronque(self):
+        messages = turn(1) + [HumanMessage(content="q" * 8000)]
+        window = build_window(SYSTEM, messages, max_tokens=500, summarize=RecordingSummarizer())
+        assert window.messages[-1] is messages[-1]
+        assert window.sent_tokens > 500
+
+    def test_resume_extractif_si_le_llm_echoue(self):
+        class BrokenLLM:
+            def invoke(self, messages):
+                raise RuntimeError("quota dépassé")
+
+        summary = summarize_with_llm(BrokenLLM(), "Objectif 10k.", turn(1))
+        assert summary.startswith("Objectif 10k.\nUtilisateur : Question 1")
+        assert len(summary) <= history_window.SUMMARY_MAX_CHARS
+
+
+class RecordingLLM:
+    """LLM factice : enregistre la fenêtre reçue et sert aussi de résumeur"""
+
+    def __init__(self):
+        self.windows = []
+        self.summaries = 0
+
+    def invoke(self, messages):
+        if messages[0].content == history_window.SUMMARY_PROMPT:
+            self.summaries += 1
+            return AIMessage(content=f"résumé {self.summaries}")
+        self.windows.append(messages)
+        return AIMessage(content="Réponse du coach " + "r" * 400)
+
+
+class TestGrapheCoaching:
+    """call_llm envoie la fenêtre et conserve le résumé dans l'état du fil"""
+
+    async def test_fil_long_borne(self, monkeypatch):
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        llm = RecordingLLM()
+
+        async def memory():
+            return InMemorySaver()
+        monkeypatch.setattr(advanced_agent, "create_async_checkpointer", memory)
+        monkeypatch.setattr(advanced_agent, "get_llm_with_tools", lambda: llm)
+        monkeypatch.setattr(advanced_agent, "get_llm", lambda: llm)
+        monkeypatch.setattr(history_window, "AGENT_HISTORY_MAX_TOKENS", 1500)
+        saved_before = REGISTRY.get_sample_value("agent_history_saved_tokens_sum", {"mode": "streamlit"}) or 0.0
+
+        graph = await advanced_agent.get_coaching_graph()
+        config = {"configurable": {"thread_id": "user-thread-1"}}
+        for i in range(20):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"Question {i} " + "q" * 200)]}, config)
+
+        state = (await graph.aget_state(config)).values
+        assert len(state["messages"]) == 40
+        assert state["history_summary"] == f"résumé {llm.summaries}" and llm.summaries >= 1
+        assert isinstance(state["messages"][state["summarized_messages"]], HumanMessage)
+        assert max(messages_tokens(window) for window in llm.windows) <= 1500
+        assert llm.windows[-1][0].content.endswith(state["history_summary"])
+        saved = REGISTRY.get_sample_value("agent_history_saved_tokens_sum", {"mode": "streamlit"}) - saved_before
+        assert saved > 0
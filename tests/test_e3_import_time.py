@@ -0,0 +1,71 @@
+"""
+Tests de non-régression du coût d'import (python -X importtime)
+L'agent IA ne doit plus être construit à l'import de l'API FastAPI ni du projet Django
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+fastapi_root = os.path.join(project_root, 'E3_model_IA/backend/fastapi_app')
+django_root = os.path.join(project_root, 'E3_model_IA/backend/django_app')
+
+# Modules réservés au premier appel de l'agent (LLM, embeddings, FAISS, graphe)
+LAZY_MODULES = ['openai', 'langchain_openai', 'langchain_community', 'faiss', 'langgraph.graph']
+
+# Budgets en secondes, ajustables pour les machines de CI plus lentes
+FASTAPI_IMPORT_BUDGET_S = float(os.getenv('FASTAPI_IMPORT_BUDGET_S', '5.0'))
+DJANGO_IMPORT_BUDGET_S = float(os.getenv('DJANGO_IMPORT_BUDGET_S', '4.0'))
+
+
+def run_importtime(code, extra_path, tmp_path, extra_env=None):
+    """Exécute `code` avec -X importtime et retourne (durée totale en s, modules chargés)"""
+    env = dict(os.environ)
+    env.update({
+        'CI': 'true',
+        'PYTHONPATH': os.pathsep.join([extra_path, project_root]),
+    })
+    env.update(extra_env or {})
+    probe = code + f"\nimport sys, json\nprint(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # module de premier niveau
+            total_us += int(cumulative)
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return total_us / 1e6, loaded
+
+
+class TestImportTime:
+    """Coût d'import des points d'entrée web"""
+
+    def test_import_agent_sans_effet_de_bord(self, tmp_path):
+        """Importer l'agent ne construit ni LLM, ni embeddings, ni index FAISS"""
+        _, loaded = run_importtime("import E3_model_IA.scripts.advanced_agent", project_root, tmp_path)
+        assert loaded == []
+
+    def test_import_application_fastapi(self, tmp_path):
+        """L'application FastAPI s'importe sous le budget, sans charger l'agent"""
+        duration, loaded = run_importtime("import main", fastapi_root, tmp_path)
+        assert loaded == []
+        assert duration < FASTAPI_IMPORT_BUDGET_S, f"Import FastAPI : {duration:.2f}s"
+
+    def test_import_projet_django(self, tmp_path):
+        """Le projet Django (setup + URLconf) s'importe sous le budget, sans charger l'agent"""
+        duration, loaded = run_importtime(
+            "import django\ndjango.setup()\nimport coach_ai_web.urls",
+            django_root, tmp_path,
+            extra_env={'DJANGO_SETTINGS_MODULE': 'coach_ai_web.settings'}
+        )
+        assert loaded == []
+        assert duration < DJANGO_IMPORT_BUDGET_S, f"Import Django : {duration:.2f}s"
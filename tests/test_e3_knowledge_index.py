@@ -0,0 +1,115 @@
+"""
+Tests pour E3 - Index FAISS persistant de la base de connaissances
+Vérifie le chargement à chaud et le ré-embedding incrémental
+"""
+
+import pytest
+import sys
+import os
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E3_model_IA.scripts.knowledge_index import KnowledgeIndexStore
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Embedding factice qui compte les textes embeddés"""
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def text_loader(path):
+    return [Document(page_content=path.read_text(encoding="utf-8"), metadata={"source": str(path)})]
+
+
+@pytest.fixture
+def knowledge_base(tmp_path):
+    kb = tmp_path / "knowledge_base"
+    kb.mkdir()
+    (kb / "endurance.md").write_text("# Endurance\n" + "Footing en aisance respiratoire. " * 60, encoding="utf-8")
+    (kb / "vma.md").write_text("# VMA\n" + "Fractionné 30/30 à 100% VMA. " * 60, encoding="utf-8")
+    return kb
+
+
+class TestKnowledgeIndexStore:
+    """Tests du stockage incrémental de l'index"""
+
+    def make_store(self, tmp_path):
+        return KnowledgeIndexStore(index_dir=str(tmp_path / "index"), chunk_size=200, chunk_overlap=20, loader=text_loader)
+
+    def test_construction_initiale_puis_chargement_a_chaud(self, tmp_path, knowledge_base):
+        """Le second démarrage charge l'index sans aucun embedding"""
+        embedding = CountingEmbedding(size=16)
+        store = self.make_store(tmp_path)
+        vectorstore = store.load_or_build(str(knowledge_base), embedding)
+        assert vectorstore is not None
+        assert embedding.embedded == store.last_sync["chunks_embedded"] > 0
+        assert (tmp_path / "index" / "manifest.json").exists()
+
+        warm_embedding = CountingEmbedding(size=16)
+        warm_store = self.make_store(tmp_path)
+        warm = warm_store.load_or_build(str(knowledge_base), warm_embedding)
+        assert warm_embedding.embedded == 0
+        assert warm_store.last_sync["chunks_reused"] == store.last_sync["chunks_embedded"]
+        assert len(warm.docstore._dict) == len(vectorstore.docstore._dict)
+
+    def test_seuls_les_chunks_modifies_sont_reembeddes(self, tmp_path, knowledge_base):
+        """Ajout et modification de fichiers : ré-embedding partiel"""
+        self.make_store(tmp_path).load_or_build(str(knowledge_base), CountingEmbedding(size=16))
+
+        (knowledge_base / "vma.md").write_text(
+            (knowledge_base / "vma.md").read_text(encoding="utf-8") + "\nNouvelle séance pyramide.", encoding="utf-8"
+        )
+        (knowledge_base / "seuil.md").write_text("# Seuil\nSéance de seuil 3x8 min.", encoding="utf-8")
+
+        embedding = CountingEmbedding(size=16)
+        store = self.make_store(tmp_path)
+        vectorstore = store.load_or_build(str(knowledge_base), embedding)
+        assert 0 < embedding.embedded <= 3
+        assert store.last_sync["chunks_reused"] > 0
+        sources = {doc.metadata["source"] for doc in vectorstore.docstore._dict.values()}
+        assert any(source.endswith("seuil.md") for source in sources)
+
+    def test_fichier_supprime_retire_de_l_index(self, tmp_path, knowledge_base):
+        """Un fichier supprimé disparaît de l'index"""
+        self.make_store(tmp_path).load_or_build(str(knowledge_base), CountingEmbedding(size=16))
+        (knowledge_base / "endurance.md").unlink()
+
+        store = self.make_store(tmp_path)
+        vectorstore = store.load_or_build(str(knowledge_base), CountingEmbedding(size=16))
+        assert store.last_sync["chunks_deleted"] > 0
+        sources = {doc.metadata["source"] for doc in vectorstore.docstore._dict.values()}
+        assert not any(source.endswith("endurance.md") for source in sources)
+
+    def test_base_videe_supprime_l_index(self, tmp_path, knowledge_base):
+        """Tous les fichiers supprimés : index et manifeste effacés, rien de périmé à recharger"""
+        self.make_store(tmp_path).load_or_build(str(knowledge_base), CountingEmbedding(size=16))
+        for path in knowledge_base.glob("*.md"):
+            path.unlink()
+
+        store = self.make_store(tmp_path)
+        assert store.load_or_build(str(knowledge_base), CountingEmbedding(size=16)) is None
+        assert store.read_manifest() == {}
+        assert not (tmp_path / "index" / "index.faiss").exists()
+
+        # Base de nouveau alimentée : reconstruction complète, sans chunk supprimé rechargé
+        (knowledge_base / "seuil.md").write_text("# Seuil\nSéance de seuil 3x8 min.", encoding="utf-8")
+        vectorstore = store.load_or_build(str(knowledge_base), CountingEmbedding(size=16))
+        sources = {doc.metadata["source"] for doc in vectorstore.docstore._dict.values()}
+        assert all(source.endswith("seuil.md") for source in sources)
+
+    def test_changement_de_modele_force_reconstruction(self, tmp_path, knowledge_base):
+        """Un manifeste incompatible (taille de chunk différente) déclenche un rebuild"""
+        self.make_store(tmp_path).load_or_build(str(knowledge_base), CountingEmbedding(size=16))
+
+        embedding = CountingEmbedding(size=16)
+        store = KnowledgeIndexStore(index_dir=str(tmp_path / "index"), chunk_size=300, chunk_overlap=20, loader=text_loader)
+        store.load_or_build(str(knowledge_base), embedding)
+        assert store.last_sync["chunks_reused"] == 0
+        assert embedding.embedded > 0
@@ -0,0 +1,141 @@
+"""
+Tests pour E3 - Exécution parallèle des outils de l'agent (nœud use_tool)
+Vérifie la concurrence, l'ordre des résultats, les délais par outil et le
+branchement dans le graphe (ainvoke et invoke), avec des outils factices
+"""
+
+import os
+import sys
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+
+from E3_model_IA.scripts import advanced_agent, history_window
+from E3_model_IA.scripts.advanced_agent import ause_tool, use_tool
+
+DELAY = 0.2
+
+
+@tool
+def slow_metrics(user_id: int) -> str:
+    """Métriques factices (latence SQL)"""
+    time.sleep(DELAY)
+    return f"métriques {user_id}"
+
+
+@tool
+def slow_knowledge(query: str) -> str:
+    """Connaissances factices (latence d'embedding)"""
+    time.sleep(DELAY)
+    return f"connaissances {query}"
+
+
+@tool
+async def async_weather(location: str) -> str:
+    """Météo factice asynchrone"""
+    return f"météo {location}"
+
+
+@tool
+def broken_tool(query: str) -> str:
+    """Outil factice en erreur"""
+    raise RuntimeError("base indisponible")
+
+
+def tool_turn(*calls):
+    return {"messages": [AIMessage(content="", tool_calls=[
+        {"name": name, "args": args, "id": f"call-{i}"} for i, (name, args) in enumerate(calls)
+    ])]}
+
+
+PLAN_TURN = tool_turn(("slow_metrics", {"user_id": 1}), ("slow_knowledge", {"query": "10k"}),
+                      ("async_weather", {"location": "Lille"}))
+
+
+@pytest.fixture(autouse=True)
+def stub_tools(monkeypatch):
+    monkeypatch.setattr(advanced_agent, "tools", [slow_metrics, slow_knowledge, async_weather, broken_tool])
+    yield
+    advanced_agent.reset_agent_resources()
+
+
+class TestUseToolParallele:
+    """Appels d'un même tour : concurrents, ordonnés, bornés dans le temps"""
+
+    async def test_appels_concurrents_et_ordre_conserve(self):
+        start = time.perf_counter()
+        result = await ause_tool(PLAN_TURN)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 1.5 * DELAY
+        assert [m.tool_call_id for m in result["messages"]] == ["call-0", "call-1", "call-2"]
+        assert [m.content for m in result["messages"]] == ["métriques 1", "connaissances 10k", "météo Lille"]
+
+    def test_version_synchrone_parallele(self):
+        start = time.perf_counter()
+        result = use_tool(PLAN_TURN)
+        assert time.perf_counter() - start < 1.5 * DELAY
+        assert [m.content for m in result["messages"]] == ["métriques 1", "connaissances 10k", "météo Lille"]
+
+    @pytest.mark.parametrize("run", ["async", "sync"])
+    async def test_delai_par_outil(self, monkeypatch, run):
+        monkeypatch.setitem(advanced_agent.TOOL_TIMEOUTS, "slow_knowledge", DELAY / 4)
+        turn = tool_turn(("slow_knowledge", {"query": "10k"}), ("slow_metrics", {"user_id": 1}))
+        result = await ause_tool(turn) if run == "async" else use_tool(turn)
+
+        timed_out, metrics = result["messages"]
+        assert timed_out.content == f"Délai dépassé pour l'outil slow_knowledge ({DELAY / 4:g} s)"
+        assert metrics.content == "métriques 1"
+
+    async def test_erreur_et_outil_inconnu_sans_bloquer_les_autres(self):
+        result = await ause_tool(tool_turn(
+            ("broken_tool", {"query": "x"}), ("absent", {}), ("async_weather", {"location": "Paris"})
+        ))
+        assert [m.content for m in result["messages"]] == [
+            "Erreur lors de l'exécution de l'outil : base indisponible",
+            "Outil inconnu : absent",
+            "météo Paris",
+        ]
+
+    def test_pool_borne(self):
+        executor = advanced_agent.get_tool_executor()
+        assert executor is advanced_agent.get_tool_executor()
+        assert executor._max_workers == advanced_agent.AGENT_TOOL_WORKERS
+
+
+class FakeToolLLM:
+    """Demande les deux outils au premier tour, puis répond avec leurs résultats"""
+
+    def invoke(self, history):
+        if isinstance(history[-1], ToolMessage):
+            return AIMessage(content=" / ".join(m.content for m in history if isinstance(m, ToolMessage)))
+        return PLAN_TURN["messages"][0]
+
+
+class TestGrapheCoaching:
+    """Le nœud action du graphe utilise la version asynchrone sous ainvoke"""
+
+    @pytest.fixture
+    async def graph(self, monkeypatch):
+        async def no_checkpointer():
+            return None
+        monkeypatch.setattr(advanced_agent, "create_async_checkpointer", no_checkpointer)
+        monkeypatch.setattr(advanced_agent, "get_llm_with_tools", lambda: FakeToolLLM())
+        # Pas de téléchargement du fichier BPE tiktoken pendant la mesure
+        monkeypatch.setattr(history_window, "_encoding", lambda: None)
+        return await advanced_agent.get_coaching_graph()
+
+    async def test_ainvoke(self, graph):
+        start = time.perf_counter()
+        result = await graph.ainvoke({"messages": [HumanMessage(content="Plan 10k")], "mode": "plan_generator"})
+        assert time.perf_counter() - start < 1.5 * DELAY
+        assert result["messages"][-1].content == "métriques 1 / connaissances 10k / météo Lille"
+
+    def test_invoke_synchrone_toujours_supporte(self, graph):
+        result = graph.invoke({"messages": [HumanMessage(content="Plan 10k")]})
+        assert result["messages"][-1].content == "métriques 1 / connaissances 10k / météo Lille"
@@ -0,0 +1,213 @@
+"""
+Tests pour E3 - Cache sémantique des réponses de l'agent de coaching
+Vérifie portée, seuil de similarité, TTL, LRU, contournement du graphe et métriques,
+avec un LLM factice local dans un vrai graphe LangGraph
+"""
+
+import json
+import operator
+import os
+import re
+import sys
+import zlib
+from types import SimpleNamespace
+from typing import Annotated, List
+
+import numpy as np
+import pytest
+from langchain_core.messages import AIMessage, AnyMessage
+from prometheus_client import REGISTRY
+from typing_extensions import NotRequired, TypedDict
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'E3_model_IA', 'backend', 'fastapi_app'))
+
+import django_auth_service
+from services import semantic_cache
+from services.ai_service import AIService, CHAT_ENDPOINT, PLAN_ENDPOINT
+from services.semantic_cache import NO_METRICS, SemanticCache, metrics_fingerprint
+
+# Profils : 1 et 2 dans les mêmes tranches, 3 nettement plus rapide
+USER_METRICS = {
+    1: {"user_id": 1, "vma_kmh": 14.2, "charge_7j": 210.0, "prediction_10k_min": 51.3},
+    2: {"user_id": 2, "vma_kmh": 14.4, "charge_7j": 230.0, "prediction_10k_min": 50.6},
+    3: {"user_id": 3, "vma_kmh": 17.1, "charge_7j": 420.0, "prediction_10k_min": 41.0},
+}
+
+
+class FakeEmbeddings:
+    """Sac de mots haché : textes aux mêmes mots -> similarité 1"""
+
+    def __init__(self, dims=256):
+        self.dims = dims
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        vector = np.zeros(self.dims)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(word.encode()) % self.dims] += 1.0
+        return vector.tolist()
+
+
+class FakeLLM:
+    """LLM local déterministe qui compte ses appels et renseigne l'usage de tokens"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, state):
+        self.calls += 1
+        prompt = state["messages"][-1].content
+        return {"messages": [AIMessage(
+            content=f"Réponse n°{self.calls} du coach, plan détaillé semaine par semaine pour : {prompt[-60:]}",
+            usage_metadata={"input_tokens": 900, "output_tokens": 300, "total_tokens": 1200},
+        )]}
+
+
+class AgentState(TypedDict):
+    messages: Annotated[List[AnyMessage], operator.add]
+    mode: NotRequired[str]
+
+
+def build_agent(llm):
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.graph import END, StateGraph
+
+    builder = StateGraph(AgentState)
+    builder.add_node("llm", llm)
+    builder.set_entry_point("llm")
+    builder.add_edge("llm", END)
+    return builder.compile(checkpointer=InMemorySaver())
+
+
+def metric(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "load_user_metrics", lambda user_id: USER_METRICS[user_id])
+    sessions = []
+    monkeypatch.setattr(django_auth_service.django_auth_service, "create_coaching_session",
+                        lambda user_id, data: sessions.append(data))
+    llm = FakeLLM()
+    cache = SemanticCache(FakeEmbeddings(), threshold=0.95, ttl_seconds=3600, max_entries=100)
+    return SimpleNamespace(llm=llm, cache=cache, sessions=sessions, service=AIService(build_agent(llm), cache))
+
+
+def plan_request(user_id, goal="10k", level="intermédiaire", sessions_per_week=4, target_time="50:00"):
+    return SimpleNamespace(
+        user_id=user_id, goal=goal, level=level, sessions_per_week=sessions_per_week,
+        target_time=target_time, duration_weeks=8, use_advanced_agent=True,
+    )
+
+
+async def chat(service, user_id, message, thread_id=None):
+    request = SimpleNamespace(message=message, user_id=user_id, thread_id=thread_id)
+    chunks = [json.loads(line) async for line in service.chat_stream(request)]
+    return "".join(chunk["data"] for chunk in chunks if chunk["type"] == "content")
+
+
+class TestPlansEnCache:
+    """Plans : profil proche et demande similaire -> graphe contourné"""
+
+    async def test_profil_proche_servi_sans_appel_llm(self, agent):
+        saved_before = metric("semantic_cache_saved_tokens_total", endpoint=PLAN_ENDPOINT)
+        hits_before = metric("semantic_cache_requests_total", endpoint=PLAN_ENDPOINT, result="hit")
+
+        first = await agent.service.generate_training_plan(plan_request(1))
+        # Même demande, formulée un peu différemment, par un coureur de la même tranche
+        second = await agent.service.generate_training_plan(plan_request(2, goal="10K", level="Intermédiaire"))
+
+        assert agent.llm.calls == 1
+        assert first["method"] == "invoke_optimized" and second["method"] == "semantic_cache"
+        assert second["plan_content"] == first["plan_content"]
+        assert second["user_id"] == 2
+        assert agent.cache.stats == {"lookups": 2, "hits": 1, "saved_tokens": 1200, "evictions": 0}
+        assert metric("semantic_cache_saved_tokens_total", endpoint=PLAN_ENDPOINT) - saved_before == 1200
+        assert metric("semantic_cache_requests_total", endpoint=PLAN_ENDPOINT, result="hit") - hits_before == 1
+        assert metric("semantic_cache_hit_ratio") == pytest.approx(0.5)
+
+    @pytest.mark.parametrize("other", [
+        plan_request(3),                          # autre tranche de métriques
+        plan_request(2, goal="marathon"),         # demande éloignée
+        plan_request(2, goal="5k"),               # objectif proche en texte, exact dans la portée
+        plan_request(2, level="débutant"),        # niveau différent
+        plan_request(2, target_time="45:00"),     # valeur exacte différente
+        plan_request(2, sessions_per_week=5),
+    ])
+    async def test_demande_ou_profil_different_relance_le_graphe(self, agent, other):
+        await agent.service.generate_training_plan(plan_request(1))
+        result = await agent.service.generate_training_plan(other)
+        assert result["method"] == "invoke_optimized"
+        assert agent.llm.calls == 2
+
+
+class TestChatEnCache:
+    """Chat : seul le premier message d'un fil est servi depuis le cache"""
+
+    async def test_premier_message_partage_puis_suite_de_conversation(self, agent):
+        hits_before = metric("semantic_cache_requests_total", endpoint=CHAT_ENDPOINT, result="hit")
+        first = await chat(agent.service, 1, "Comment préparer un 10k en 8 semaines ?")
+        second = await chat(agent.service, 2, "comment préparer un 10k en 8 semaines")
+        assert second == first
+        assert agent.llm.calls == 1
+        assert agent.sessions[-1]["ai_response"] == first
+        assert metric("semantic_cache_requests_total", endpoint=CHAT_ENDPOINT, result="hit") - hits_before == 1
+
+        # Le fil de l'utilisateur 1 a maintenant un historique : la suite passe par l'agent
+        await chat(agent.service, 1, "Comment préparer un 10k en 8 semaines ?")
+        assert agent.llm.calls == 2
+        assert agent.cache.stats["lookups"] == 2
+
+    async def test_cache_desactive_par_defaut(self, agent):
+        assert semantic_cache.SEMANTIC_CACHE_ENABLED is False
+        assert semantic_cache.get_semantic_cache() is None
+        service = AIService(build_agent(agent.llm))
+        await chat(service, 1, "Bonjour coach")
+        await chat(service, 2, "Bonjour coach")
+        assert agent.llm.calls == 2
+
+
+class TestSemanticCache:
+    """Seuil, TTL, LRU et empreinte des métriques"""
+
+    @staticmethod
+    def unit(*values):
+        vector = np.asarray(values, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def test_seuil_de_similarite(self):
+        cache = SemanticCache(FakeEmbeddings(), threshold=0.9)
+        cache.store("portée", self.unit(1, 0), "réponse", 100)
+        assert cache.lookup("portée", self.unit(1, 0.3)).response == "réponse"  # cos ≈ 0.96
+        assert cache.lookup("portée", self.unit(1, 1)) is None                  # cos ≈ 0.71
+        assert cache.lookup("autre portée", self.unit(1, 0)) is None
+
+    def test_expiration(self):
+        clock = SimpleNamespace(now=0.0)
+        cache = SemanticCache(FakeEmbeddings(), ttl_seconds=60, clock=lambda: clock.now)
+        cache.store("portée", self.unit(1, 0), "réponse", 100)
+        clock.now = 59
+        assert cache.lookup("portée", self.unit(1, 0)) is not None
+        clock.now = 61
+        assert cache.lookup("portée", self.unit(1, 0)) is None
+        assert len(cache) == 0
+
+    def test_eviction_lru(self):
+        cache = SemanticCache(FakeEmbeddings(), max_entries=2)
+        cache.store("a", self.unit(1, 0), "A", 1)
+        cache.store("b", self.unit(1, 0), "B", 1)
+        assert cache.lookup("a", self.unit(1, 0)).response == "A"  # a devient la plus récente
+        cache.store("c", self.unit(1, 0), "C", 1)
+        assert cache.lookup("b", self.unit(1, 0)) is None
+        assert [cache.lookup(s, self.unit(1, 0)).response for s in ("a", "c")] == ["A", "C"]
+        assert cache.stats["evictions"] == 1
+
+    def test_empreinte_par_tranches(self):
+        assert metrics_fingerprint(USER_METRICS[1]) == metrics_fingerprint(USER_METRICS[2])
+        assert metrics_fingerprint(USER_METRICS[1]) != metrics_fingerprint(USER_METRICS[3])
+        assert metrics_fingerprint({"error": "Aucune métrique"}) == NO_METRICS
+        assert metrics_fingerprint({"user_id": 4, "last_activity_date": "2025-06-01"}) == NO_METRICS
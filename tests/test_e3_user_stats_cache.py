@@ -0,0 +1,159 @@
+"""
+Tests pour E3 - Statistiques utilisateur en un seul passage et cache par utilisateur
+Vérifie la parité avec l'ancien calcul en deux requêtes, le ROLLUP PostgreSQL et l'invalidation
+"""
+
+import os
+import sys
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+project_root = os.path.join(os.path.dirname(__file__), '..')
+fastapi_root = os.path.join(project_root, 'E3_model_IA/backend/fastapi_app')
+sys.path.append(project_root)
+sys.path.append(fastapi_root)
+
+from django_db_connector import AsyncDjangoDBConnector, DjangoDBConnector, build_stats_query
+from src.green_metrics import cache_hit_ratio
+from src.stats_cache import UserStatsCache
+from E1_gestion_donnees import db_manager
+
+# Ancien calcul : deux parcours de la table (totaux puis GROUP BY activity_type)
+LEGACY_TOTALS = """
+    SELECT COUNT(*), SUM(distance_meters), SUM(duration_seconds), SUM(calories),
+           AVG(average_hr), MAX(distance_meters), MAX(duration_seconds)
+    FROM activities_activity WHERE user_id = :user_id
+"""
+LEGACY_TYPES = """
+    SELECT activity_type, COUNT(*), SUM(distance_meters)
+    FROM activities_activity WHERE user_id = :user_id GROUP BY activity_type
+"""
+
+
+def legacy_stats(engine, user_id):
+    with engine.connect() as conn:
+        total, distance, duration, calories, hr, max_distance, max_duration = conn.execute(
+            sa.text(LEGACY_TOTALS), {"user_id": user_id}
+        ).one()
+        types = conn.execute(sa.text(LEGACY_TYPES), {"user_id": user_id}).fetchall()
+    return {
+        'total_activities': total,
+        'total_distance_km': round(distance / 1000, 2) if distance else 0,
+        'total_duration_hours': round(duration / 3600, 1) if duration else 0,
+        'total_calories': calories or 0,
+        'avg_heart_rate': round(hr) if hr else None,
+        'max_distance_km': round(max_distance / 1000, 2) if max_distance else 0,
+        'max_duration_hours': round(max_duration / 3600, 1) if max_duration else 0,
+        'activity_types': {
+            activity_type: {'count': count, 'total_distance_km': round(type_distance / 1000, 2) if type_distance else 0}
+            for activity_type, count, type_distance in types
+        }
+    }
+
+
+@pytest.fixture
+def django_db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'django_garmin_data.db'}"
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(sa.text("""
+            CREATE TABLE activities_activity (
+                id INTEGER PRIMARY KEY, user_id INTEGER, activity_type TEXT, start_time TEXT,
+                duration_seconds INTEGER, distance_meters REAL, calories INTEGER, average_hr INTEGER
+            )
+        """))
+        conn.execute(sa.text("""
+            INSERT INTO activities_activity (user_id, activity_type, start_time, duration_seconds,
+                distance_meters, calories, average_hr)
+            VALUES (:user_id, :activity_type, '2025-04-01 08:00:00', :duration, :distance, :calories, :hr)
+        """), [
+            {"user_id": 1, "activity_type": ["running", "cycling", "swimming"][i % 3],
+             "duration": 1200 + 37 * i, "distance": 3000.5 + 211 * i,
+             "calories": None if i % 5 == 0 else 300 + i, "hr": None if i % 4 == 0 else 130 + i % 25}
+            for i in range(50)
+        ])
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def stats_cache(tmp_path):
+    return UserStatsCache(marker_dir=tmp_path / "markers")
+
+
+class TestSinglePassStats:
+    """Agrégation en une requête"""
+
+    def test_parite_avec_l_ancien_calcul(self, django_db_url):
+        connector = DjangoDBConnector(django_db_url, stats_cache=UserStatsCache(ttl_seconds=0))
+        stats = connector.get_user_stats(1)
+        assert stats == legacy_stats(connector.get_engine(), 1)
+        assert list(stats['activity_types'].values())[0]['count'] == 17
+        connector.engine.dispose()
+
+    def test_utilisateur_sans_activite(self, django_db_url, stats_cache):
+        connector = DjangoDBConnector(django_db_url, stats_cache=stats_cache)
+        assert connector.get_user_stats(42) == {'total_activities': 0, 'message': 'Aucune activité trouvée'}
+        connector.engine.dispose()
+
+    def test_rollup_sous_postgresql(self):
+        sql = str(build_stats_query(1, 'postgresql').compile(dialect=postgresql.dialect()))
+        assert "GROUP BY ROLLUP(activities_activity.activity_type)" in sql
+        assert "grouping(activities_activity.activity_type)" in sql.lower()
+
+
+class TestUserStatsCache:
+    """Cache par utilisateur et invalidation à l'écriture"""
+
+    async def test_second_appel_servi_par_le_cache(self, django_db_url, stats_cache):
+        connector = AsyncDjangoDBConnector(django_db_url, stats_cache=stats_cache)
+        try:
+            first = await connector.get_user_stats(1)
+            first['total_activities'] = -1  # la copie retournée ne modifie pas le cache
+            second = await connector.get_user_stats(1)
+        finally:
+            await connector.dispose()
+        assert second['total_activities'] == 50
+        assert (stats_cache.hits, stats_cache.misses) == (1, 1)
+        assert 0 < cache_hit_ratio._value.get() <= 1
+
+    def test_invalidation_publiee_par_un_autre_processus(self, django_db_url, stats_cache, tmp_path):
+        connector = DjangoDBConnector(django_db_url, stats_cache=stats_cache)
+        assert connector.get_user_stats(1)['total_activities'] == 50
+
+        with connector.get_engine().begin() as conn:
+            conn.execute(sa.text(
+                "INSERT INTO activities_activity (user_id, activity_type, duration_seconds, distance_meters) "
+                "VALUES (1, 'running', 1800, 5000)"
+            ))
+        # Le pipeline (autre processus) partage seulement le dossier des marqueurs
+        UserStatsCache(marker_dir=tmp_path / "markers").invalidate(1)
+
+        assert connector.get_user_stats(1)['total_activities'] == 51
+        assert stats_cache.hits == 0
+        connector.engine.dispose()
+
+    def test_expiration_ttl(self, django_db_url, tmp_path):
+        now = [0.0]
+        cache = UserStatsCache(ttl_seconds=60, marker_dir=tmp_path / "markers", clock=lambda: now[0])
+        connector = DjangoDBConnector(django_db_url, stats_cache=cache)
+        connector.get_user_stats(1)
+        connector.get_user_stats(1)
+        now[0] = 61
+        connector.get_user_stats(1)
+        assert (cache.hits, cache.misses) == (1, 2)
+        connector.engine.dispose()
+
+    def test_store_activities_in_db_invalide_les_utilisateurs_modifies(self, monkeypatch):
+        invalidated = []
+        monkeypatch.setattr(db_manager, "invalidate_user_stats", invalidated.append)
+        engine = sa.create_engine("sqlite://")
+        tables = db_manager.create_tables(engine)
+        activity = {"user_id": 7, "activity_id": 123, "activity_name": "Footing", "activity_type": "running"}
+
+        db_manager.store_activities_in_db(engine, tables, [activity])
+        db_manager.store_activities_in_db(engine, tables, [activity])  # doublon : rien d'écrit
+
+        assert invalidated == [7]